@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: provision one VM per simulated site as one slice per site and as
+aggregate slices of ``--per-slice`` sites, comparing submissions, state queries,
+deletions and wall time. In aggregate mode a failed site must fail alone: every
+failed member's error names its own site and every other member is usable.
+
+Run with ``python -m benchmarks.bench_aggregate``.
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from tests.aggregate import provision_aggregated
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.simulator import SimulatedFablib, default_sites
+from tests.teardown import delete_slices
+from tests.topology import NodeSpec, TopologyTemplate
+
+TOPOLOGY = TopologyTemplate(nodes=(NodeSpec(name="node1", cores=2, ram=8, disk=10),))
+
+
+def run(args, per_slice: int = None) -> dict:
+    fablib = SimulatedFablib(sites=default_sites(args.sites, seed=args.seed),
+                             failures={"provision": args.failure_rate}, time_scale=args.time_scale, seed=args.seed)
+    poller = SlicePoller.for_fablib(fablib)
+    lifecycle = SliceLifecycle(max_workers=args.sites, timeout=3600, poller=poller, on_event=None)
+    sites = fablib.site_names()
+    # Failed slices print their tracebacks; keep the table readable.
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        if per_slice:
+            outcomes = provision_aggregated(lifecycle, fablib, TOPOLOGY, {site: {"site": site} for site in sites},
+                                            slice_prefix="bench-agg", per_slice=per_slice)
+        else:
+            outcomes = lifecycle.run({site: (lambda site=site: TOPOLOGY.new_slice(fablib, f"bench-{site.lower()}",
+                                                                                  site=site))
+                                      for site in sites})
+        provisioned = time.perf_counter() - start
+        poller.stop()
+        delete_slices({key: o.slice for key, o in outcomes.items() if o.slice is not None}, quiet=True)
+        elapsed = time.perf_counter() - start
+    return {"provisioned": provisioned, "elapsed": elapsed, "calls": dict(fablib.calls),
+            "failed": sorted(key for key, o in outcomes.items() if not o.ok),
+            "misattributed": sorted(key for key, o in outcomes.items()
+                                    if not o.ok and key not in str(o.error))}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--per-slice", type=int, nargs="+", default=[5, 10, 30])
+    parser.add_argument("--failure-rate", type=float, default=0.1)
+    parser.add_argument("--time-scale", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.sites} simulated sites, provision failure rate {args.failure_rate}, seed {args.seed}")
+    print(f"{'mode':<16}{'submits':>8}{'queries':>9}{'deletes':>9}{'ready (s)':>11}{'wall (s)':>10}{'failed':>8}")
+    modes = [("per site", None)] + [(f"aggregate x{n}", n) for n in args.per_slice]
+    for mode, per_slice in modes:
+        result = run(args, per_slice)
+        calls = result["calls"]
+        print(f"{mode:<16}{calls.get('submit', 0):>8}{calls.get('list_slices', 0):>9}{calls.get('delete', 0):>9}"
+              f"{result['provisioned']:>11.2f}{result['elapsed']:>10.2f}{len(result['failed']):>8}")
+        if result["misattributed"]:
+            print(f"{'':<16}errors not naming their site: {', '.join(result['misattributed'])}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Micro-benchmark: hand-written site filters vs. CapacityIndex queries on a synthetic inventory.
+
+Run with ``python -m benchmarks.bench_capacity_index``.
+"""
+import argparse
+import random
+import time
+
+from tests.capacity import CapacityIndex, COMPONENT_FIELDS, GPU_MODELS, SMART_NIC_MODELS, component_field
+from tests.inventory import Inventory
+
+
+def synthetic_inventory(sites: int, seed: int = 0) -> Inventory:
+    rng = random.Random(seed)
+    site_dicts = []
+    for i in range(sites):
+        site = {"name": f"SITE{i:03d}", "state": "Active" if rng.random() < 0.9 else "Maint",
+                "hosts": rng.randint(1, 6)}
+        for model in COMPONENT_FIELDS:
+            capacity = rng.choice([0, 0, 1, 2, 4, 8])
+            site[component_field(model)] = capacity
+            site[component_field(model, available=True)] = rng.randint(0, capacity)
+        site_dicts.append(site)
+    return Inventory(sites=site_dicts, hosts=[])
+
+
+def scan_queries(inventory: Inventory):
+    """The loops the acceptance modules used to run over the site list."""
+    active = [site for site in inventory.site_list() if site.get("state") == "Active"]
+    results = [
+        [site["name"] for site in active if site.get("hosts", 0) >= 2 and site.get("nic_basic_capacity", 0) >= 1],
+        [site["name"] for site in active if site.get("hosts", 0) >= 2 and site.get("nic_connectx_6_available", 0) >= 1],
+        [site["name"] for site in active if site.get("nvme_capacity", 0) >= 2],
+        [(site["name"], model) for site in active for model in GPU_MODELS if site.get(component_field(model), 0) != 0],
+        [(site["name"], model) for site in active for model in SMART_NIC_MODELS
+         if site.get(component_field(model), 0) >= 2],
+    ]
+    return results
+
+
+def index_queries(index: CapacityIndex):
+    return [
+        index.sites(hosts=2, components={"NIC_Basic": 1}),
+        index.sites(hosts=2, available={"NIC_ConnectX_6": 1}),
+        index.sites(components={"NVME_P4510": 2}),
+        index.component_pairs(GPU_MODELS),
+        index.component_pairs(SMART_NIC_MODELS, minimum=2),
+    ]
+
+
+def timed(fn, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=1000)
+    args = parser.parse_args()
+
+    inventory = synthetic_inventory(args.sites)
+    start = time.perf_counter()
+    index = CapacityIndex(inventory)
+    build = time.perf_counter() - start
+    assert index_queries(index) == scan_queries(inventory)
+
+    scan = timed(lambda: scan_queries(inventory), args.repeat)
+    indexed = timed(lambda: index_queries(index), args.repeat)
+
+    print(f"{args.sites} sites, index built in {build * 1e3:.2f} ms")
+    print(f"{'mode':<10}{'5 queries (us)':>16}")
+    print(f"{'scan':<10}{scan * 1e6:>16.1f}")
+    print(f"{'index':<10}{indexed * 1e6:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Micro-benchmark: per-slice FablibManager construction vs. the shared FablibPool.
+
+Run with ``python -m benchmarks.bench_fablib_pool``.
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.fablib_pool import FablibPool
+
+
+class StandInFablib:
+    """
+    Local stand-in for FablibManager whose constructor sleeps for the time a real one
+    spends reading config, contacting the credential manager and loading tokens.
+    """
+    setup_latency = 0.2
+    constructions = 0
+    _lock = threading.Lock()
+
+    def __init__(self, fabric_rc=None):
+        time.sleep(self.setup_latency)
+        with StandInFablib._lock:
+            StandInFablib.constructions += 1
+
+    def new_slice(self, name):
+        return name
+
+
+def run(get_manager, slices: int, workers: int) -> float:
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(lambda i: get_manager().new_slice(f"slice-{i}"), range(slices)))
+    return time.monotonic() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--slices", type=int, default=60)
+    parser.add_argument("--workers", type=int, default=5)
+    parser.add_argument("--setup-latency", type=float, default=0.2)
+    args = parser.parse_args()
+    StandInFablib.setup_latency = args.setup_latency
+
+    # The per-slice constructions used to run under fim_lock, so they were serialized.
+    lock = threading.Lock()
+
+    def per_slice():
+        with lock:
+            return StandInFablib()
+
+    StandInFablib.constructions = 0
+    baseline = run(per_slice, args.slices, args.workers)
+    baseline_count = StandInFablib.constructions
+
+    pool = FablibPool(factory=StandInFablib)
+    StandInFablib.constructions = 0
+    pooled = run(pool.get, args.slices, args.workers)
+    pooled_count = StandInFablib.constructions
+
+    print(f"{'mode':<12}{'constructions':>15}{'setup time (s)':>16}")
+    print(f"{'per-slice':<12}{baseline_count:>15}{baseline:>16.2f}")
+    print(f"{'pooled':<12}{pooled_count:>15}{pooled:>16.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: ingest years of daily runs into the history store and detect regressions
+for the latest run.
+
+Run with ``python -m benchmarks.bench_history``.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from tests.history import DAY, ELAPSED, HistoryStore, detect_regressions
+from tests.result_sink import make_record
+from tests.timing import PROVISIONING
+
+COMPONENTS = ("NVMe", "GPU", "SmartNIC", "SharedNIC")
+
+
+def synthetic_runs(days: int, sites: int, pairs: int, seed: int = 0):
+    """One run per day: ``pairs`` iperf measurements and a wait timing per site and component."""
+    rng = random.Random(seed)
+    names = [f"SITE{i:02d}" for i in range(sites)]
+    site_pairs = [tuple(rng.sample(names, 2)) for _ in range(pairs)]
+    start = time.time() - days * DAY
+    for day in range(days):
+        run_id, ts = f"run{day:05d}", start + day * DAY
+        records = []
+        for src, dst in site_pairs:
+            value = {"status": "PASS", "src_site": src, "dst_site": dst, "received_bps": rng.gauss(8e9, 5e8)}
+            records.append({**make_record("iperf_test_results", f"{src}->{dst}", value, stage="iperf3"),
+                            "run_id": run_id, "ts": ts})
+        for site in names:
+            for component in COMPONENTS:
+                seconds = rng.gauss(120, 15)
+                value = {"site": site, "component": component, "ok": True, "started": 0.0, "finished": seconds,
+                         ELAPSED: seconds}
+                records.append({**make_record(PROVISIONING, site, value, stage="wait"), "run_id": run_id, "ts": ts})
+        yield records
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--years", type=float, default=3)
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--pairs", type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.sqlite")
+        records = 0
+        start = time.perf_counter()
+        with HistoryStore(path) as store:
+            for run in synthetic_runs(int(args.years * 365), args.sites, args.pairs):
+                records += store.ingest(run)
+        ingest = time.perf_counter() - start
+        size = os.path.getsize(path)
+
+        with HistoryStore(path) as store:
+            start = time.perf_counter()
+            regressions = detect_regressions(store)
+            detect = time.perf_counter() - start
+            start = time.perf_counter()
+            trend = store.daily(ELAPSED, test=PROVISIONING, site="SITE00", component="NVMe")
+            daily = time.perf_counter() - start
+
+    print(f"{records} records over {args.years:g} years, {size / 2 ** 20:.1f} MiB")
+    print(f"{'step':<24}{'time (ms)':>12}")
+    print(f"{'ingest':<24}{ingest * 1e3:>12.0f}")
+    print(f"{'regressions (latest)':<24}{detect * 1e3:>12.1f}  ({len(regressions)} found)")
+    print(f"{'daily trend (1 series)':<24}{daily * 1e3:>12.1f}  ({len(trend)} days)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: bring up one FABNet node per simulated site and fill the path MTU matrix,
+once site by site with blocking ``submit(wait=True)`` followed by one probe pass, and
+once with non-blocking submits and the per-site pipeline that probes every site as
+soon as it is up.
+
+Run with ``python -m benchmarks.bench_mtu_pipeline``.
+"""
+import argparse
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stderr, redirect_stdout
+from functools import partial
+
+from tests.lifecycle import SliceLifecycle
+from tests.mtu import MtuPipeline, probe_matrix, probe_source
+from tests.poller import SlicePoller
+from tests.simulator import SimulatedFablib, default_sites
+from tests.teardown import delete_slices
+
+MTUS = [1500, 8948, 9000]
+
+
+def build(fablib, site: str):
+    slice_obj = fablib.new_slice(f"mtu@{site}")
+    node = slice_obj.add_node(name="node", site=site, cores=1, ram=2, disk=10)
+    node.add_fabnet(net_type="IPv4")
+    node.add_fabnet(net_type="IPv6")
+    return slice_obj
+
+
+def addresses(slice_obj, site: str) -> dict:
+    node = slice_obj.get_node("node")
+    return {af: node.get_interface(network_name=f"FABNET_IPv{af}_{site}").get_ip_addr() for af in (4, 6)}
+
+
+def blocking(fablib, sites: list[str]) -> tuple[dict, dict]:
+    slices = {}
+    for site in sites:
+        slices[site] = slice_obj = build(fablib, site)
+        slice_obj.submit(wait=True)
+    nodes = {site: slice_obj.get_node("node") for site, slice_obj in slices.items()}
+    return slices, probe_matrix(nodes, {site: addresses(s, site) for site, s in slices.items()}, MTUS)
+
+
+def pipelined(fablib, sites: list[str]) -> tuple[dict, dict]:
+    poller = SlicePoller.for_fablib(fablib)
+    lifecycle = SliceLifecycle(max_workers=len(sites), timeout=3600, poller=poller, on_event=None)
+    pipeline = MtuPipeline(partial(probe_source, mtus=MTUS))
+
+    def bring_up(site):
+        outcome = lifecycle.provision(site, partial(build, fablib, site))
+        if outcome.ok:
+            pipeline.add(site, outcome.slice.get_node("node"), addresses(outcome.slice, site))
+        else:
+            pipeline.fail(site, outcome.error)
+        return outcome
+
+    with ThreadPoolExecutor(max_workers=len(sites)) as executor:
+        outcomes = dict(zip(sites, executor.map(bring_up, sites)))
+    matrix = pipeline.result()
+    poller.stop()
+    return {site: o.slice for site, o in outcomes.items() if o.slice is not None}, matrix
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=10)
+    parser.add_argument("--time-scale", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"MTU matrix over {args.sites} simulated sites, seed {args.seed}")
+    print(f"{'mode':<22}{'wall (s)':>10}{'testbed (s)':>13}{'paths':>7}{'errors':>8}")
+    for mode, func in (("blocking, site by site", blocking), ("pipelined", pipelined)):
+        fablib = SimulatedFablib(sites=default_sites(args.sites, seed=args.seed), time_scale=args.time_scale,
+                                 seed=args.seed)
+        with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+            start = time.perf_counter()
+            slices, matrix = func(fablib, fablib.site_names())
+            elapsed = time.perf_counter() - start
+            delete_slices(slices, quiet=True)
+        errors = sum(1 for cell in matrix.values() if cell.error)
+        print(f"{mode:<22}{elapsed:>10.2f}{elapsed / args.time_scale:>13.0f}{len(matrix):>7}{errors:>8}")
+
+
+if __name__ == "__main__":
+    main()
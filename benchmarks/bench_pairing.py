@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: pick a few dozen worker pairs out of growing endpoint sets by sampling the
+full combination list, as the tests used to, and with the lazy pair generator; report
+the peak memory and time of each.
+
+Run with ``python -m benchmarks.bench_pairing``.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+from itertools import combinations
+
+from tests.pairing import sample_pairs
+
+
+def endpoints(count: int, per_site: int) -> list[str]:
+    """``count`` workers, ``per_site`` of them per site, named ``SITExxx-wN``."""
+    return [f"SITE{i // per_site:03d}-w{i % per_site}" for i in range(count)]
+
+
+def site_of(worker: str) -> str:
+    return worker.split("-", 1)[0]
+
+
+def materialized(workers: list[str], count: int) -> list[tuple]:
+    valid = [(a, b) for a, b in combinations(workers, 2) if site_of(a) != site_of(b)]
+    return random.sample(valid, count)
+
+
+def lazy(workers: list[str], count: int) -> list[tuple]:
+    return sample_pairs(workers, count, seed=0, site_of=site_of, distinct_sites=True)
+
+
+def measure(fn, workers: list[str], count: int) -> tuple[float, float, int]:
+    """(peak KiB, ms, pairs) of one call; the endpoint list itself is not counted."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    pairs = fn(workers, count)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 1024, elapsed * 1e3, len(pairs)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pairs", type=int, default=48)
+    parser.add_argument("--per-site", type=int, default=5)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 150, 600, 2000, 10000, 100000])
+    parser.add_argument("--max-materialized", type=int, default=600,
+                        help="Largest endpoint count to run the full combination list for")
+    args = parser.parse_args()
+
+    print(f"{'endpoints':>10}{'combinations':>14}{'list KiB':>12}{'list ms':>10}{'lazy KiB':>10}{'lazy ms':>9}")
+    for size in args.sizes:
+        workers = endpoints(size, args.per_site)
+        if size <= args.max_materialized:
+            list_kib, list_ms, _ = measure(materialized, workers, args.pairs)
+            listed = f"{list_kib:>12.0f}{list_ms:>10.1f}"
+        else:
+            listed = f"{'-':>12}{'-':>10}"
+        lazy_kib, lazy_ms, _ = measure(lazy, workers, args.pairs)
+        print(f"{size:>10}{size * (size - 1) // 2:>14}{listed}{lazy_kib:>10.1f}{lazy_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
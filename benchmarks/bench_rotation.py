@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: exercise every component model at every simulated site that offers it,
+once with a fresh VM per site and model (as the component modules do) and once by
+rotating the components through slice modify on one long-lived VM per site.
+
+Run with ``python -m benchmarks.bench_rotation``.
+"""
+import argparse
+import io
+import statistics
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.result_sink import ResultSink
+from tests.rotation import ROTATION_MODELS, ComponentRotation
+from tests.simulator import SimulatedFablib, default_sites
+from tests.teardown import delete_slices
+from tests.timing import ATTACH, DETACH, ProvisioningTimer
+from tests.warm_pool import WarmPool
+
+
+def fresh_slice(fablib, site: str, model: str):
+    slice_obj = fablib.new_slice(f"bench-{site.lower()}-{model.lower()}")
+    slice_obj.add_node(name="node", site=site, cores=10, ram=20, disk=50).add_component(model=model, name="c1")
+    return slice_obj
+
+
+def run(args, rotate: bool, sink_path: str) -> dict:
+    specs = default_sites(args.sites, seed=args.seed)
+    fablib = SimulatedFablib(sites=specs, time_scale=args.time_scale, seed=args.seed)
+    poller = SlicePoller.for_fablib(fablib)
+    lifecycle = SliceLifecycle(max_workers=64, timeout=3600, poller=poller, on_event=None)
+    plan = {spec.name: [m for m in ROTATION_MODELS if spec.components.get(m, 0) > 0] for spec in specs}
+    timer = ProvisioningTimer(sink=ResultSink(sink_path))
+    # Failed slices print their tracebacks; keep the table readable.
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        if rotate:
+            pool = WarmPool(fablib, poller=poller)
+            results = ComponentRotation(pool, lifecycle, timer=timer).run(plan)
+            failed = sum(1 for info in results.values() if not info["state"])
+            pool.close(quiet=True)
+            steps = {stage: [t.elapsed for t in timer.timings if t.stage == stage] for stage in (ATTACH, DETACH)}
+        else:
+            outcomes = lifecycle.run({(site, model): (lambda site=site, model=model: fresh_slice(fablib, site, model))
+                                      for site, models in plan.items() for model in models})
+            failed = sum(1 for o in outcomes.values() if not o.ok)
+            delete_slices({f"{site}_{model}": o.slice for (site, model), o in outcomes.items() if o.ok}, quiet=True)
+            steps = {"boot": [sum(o.elapsed.values()) for o in outcomes.values() if o.ok]}
+        elapsed = time.perf_counter() - start
+        poller.stop()
+    return {"elapsed": elapsed, "failed": failed, "calls": dict(fablib.calls),
+            "steps": sum(len(models) for models in plan.values()),
+            "p50": {stage: statistics.median(values) / args.time_scale for stage, values in steps.items() if values}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--time-scale", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sink", default="/tmp/bench_rotation.jsonl")
+    args = parser.parse_args()
+
+    print(f"{args.sites} simulated sites, seed {args.seed}")
+    print(f"{'mode':<14}{'models':>8}{'VMs':>6}{'modifies':>10}{'wall (s)':>10}{'failed':>8}  p50 per model (testbed s)")
+    for mode, rotate in (("fresh VMs", False), ("rotation", True)):
+        result = run(args, rotate, args.sink)
+        calls = result["calls"]
+        p50 = ", ".join(f"{stage} {value:.0f}" for stage, value in result["p50"].items())
+        print(f"{mode:<14}{result['steps']:>8}{calls.get('submit', 0):>6}{calls.get('modify', 0):>10}"
+              f"{result['elapsed']:>10.2f}{result['failed']:>8}  {p50}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: provision slices on every site of the simulated testbed, with each slice
+polling on its own and with the shared state poller, and check that a rerun with the
+same seed reproduces every outcome.
+
+Run with ``python -m benchmarks.bench_simulator``.
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.simulator import SimulatedFablib, default_sites
+from tests.teardown import delete_slices
+
+
+def builders(fablib, per_site: int):
+    def build(site, i):
+        slice_obj = fablib.new_slice(f"bench-{site.lower()}-{i}")
+        slice_obj.add_node(name="node", site=site).add_fabnet()
+        return slice_obj
+    return {f"{site}-{i}": (lambda site=site, i=i: build(site, i))
+            for site in fablib.site_names() for i in range(per_site)}
+
+
+def run(args, shared_poller: bool) -> dict:
+    fablib = SimulatedFablib(sites=default_sites(args.sites, seed=args.seed),
+                             failures={"provision": args.failure_rate}, time_scale=args.time_scale, seed=args.seed)
+    poller = SlicePoller.for_fablib(fablib) if shared_poller else None
+    lifecycle = SliceLifecycle(max_workers=args.sites * args.per_site, timeout=3600, poller=poller, on_event=None)
+    # Failed slices print their tracebacks; keep the table readable.
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        outcomes = lifecycle.run(builders(fablib, args.per_site))
+        elapsed = time.perf_counter() - start
+        if poller is not None:
+            poller.stop()
+        delete_slices({key: o.slice for key, o in outcomes.items() if o.ok}, quiet=True)
+    return {"elapsed": elapsed, "queries": fablib.calls.get("list_slices", 0),
+            "outcomes": {key: (o.state, o.error) for key, o in sorted(outcomes.items())}}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--per-site", type=int, default=4)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--time-scale", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.sites * args.per_site} slices on {args.sites} simulated sites, seed {args.seed}")
+    print(f"{'mode':<16}{'wall (s)':>10}{'state queries':>16}{'failed':>8}")
+    runs = {}
+    for mode, shared in (("per-slice wait", False), ("shared poller", True)):
+        runs[mode] = result = run(args, shared)
+        failed = sum(1 for state, _ in result["outcomes"].values() if state != "StableOK")
+        print(f"{mode:<16}{result['elapsed']:>10.2f}{result['queries']:>16}{failed:>8}")
+    rerun = run(args, True)
+    print(f"rerun with seed {args.seed} reproduces outcomes: {rerun['outcomes'] == runs['shared poller']['outcomes']}")
+
+
+if __name__ == "__main__":
+    main()
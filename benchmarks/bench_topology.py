@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: build the acceptance topologies for many sites with the fablib
+``add_node``/``add_component`` call chain and from compiled topology templates, on real
+fablib slices kept alive for the whole run as during a sweep. Building happens under
+``fim_lock``, so the time per slice is also the lock hold time.
+
+Run with ``python -m benchmarks.bench_topology``.
+"""
+import argparse
+import gc
+import statistics
+import time
+
+from tests.topology import ComponentSpec, NetworkSpec, NodeSpec, TopologyTemplate
+from tests.unit.fakes import OfflineManager
+
+TEMPLATES = {
+    "NVMe VM": (TopologyTemplate(nodes=(
+        NodeSpec(name="nvme-node", cores=10, ram=20, disk=50,
+                 components=(ComponentSpec(model="NVME_P4510", name="nvme1"),)),)), {}),
+    "GPU VM": (TopologyTemplate(nodes=(
+        NodeSpec(name="gpu-node", cores=6, ram=16, disk=50, image="default_ubuntu_24",
+                 components=(ComponentSpec(model="{gpu_model}", name="gpu1-{gpu_model}"),)),)),
+               {"gpu_model": "GPU_RTX6000"}),
+    "FABNetv4 Shared NIC": (TopologyTemplate(
+        nodes=(NodeSpec(name="node1", components=(ComponentSpec(model="NIC_Basic", name="nic1", mode="auto"),)),),
+        networks=(NetworkSpec(name="fabnetv4-net1", interfaces=("node1.nic1",), type="IPv4"),)), {}),
+    "L2 bridge, 2 hosts": (TopologyTemplate(
+        nodes=tuple(NodeSpec(name=f"node{i}", host=f"{{site_lower}}-w{i}.fabric-testbed.net",
+                             components=(ComponentSpec(model="NIC_Basic", name=f"sharednic{i}"),))
+                    for i in (1, 2)),
+        networks=(NetworkSpec(name="l2bridge", interfaces=("node1.sharednic1", "node2.sharednic2"), layer="L2"),)),
+        {}),
+}
+
+
+def run(template: TopologyTemplate, fields: dict, sites: int, compiled: bool) -> list[float]:
+    manager = OfflineManager()
+    slices, times = [], []
+    for i in range(sites):
+        site = f"SITE{i:03d}"
+        slice_obj = manager.new_slice(f"bench-{i}")
+        start = time.perf_counter()
+        if compiled:
+            template.instantiate(slice_obj, site=site, site_lower=site.lower(), **fields)
+        else:
+            template.build(slice_obj, site=site, site_lower=site.lower(), **fields)
+        times.append(time.perf_counter() - start)
+        slices.append(slice_obj)
+    # Drop this run's graphs from the shared FIM store before the next run.
+    for slice_obj in slices:
+        model = slice_obj.get_fim_topology().graph_model
+        model.storage.del_graph(model.graph_id)
+    gc.collect()
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=40)
+    args = parser.parse_args()
+
+    print(f"{args.sites} slices per topology; ms per slice (median / last)")
+    print(f"{'topology':<22}{'call chain':>18}{'template':>18}{'speedup':>10}")
+    for name, (template, fields) in TEMPLATES.items():
+        chain = run(template, fields, args.sites, compiled=False)
+        compiled = run(template, fields, args.sites, compiled=True)
+        print(f"{name:<22}{statistics.median(chain) * 1e3:>10.1f} / {chain[-1] * 1e3:<5.1f}"
+              f"{statistics.median(compiled) * 1e3:>10.1f} / {compiled[-1] * 1e3:<5.1f}"
+              f"{sum(chain) / sum(compiled):>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
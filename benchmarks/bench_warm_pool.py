@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Benchmark: run ``--modules`` per-site modules on the simulated testbed, each attaching
+one component to a VM at every site that has it, once with a fresh slice per module and site and
+once through the warm pool (base VM provisioned once, components swapped with one
+modify per module and site).
+
+Run with ``python -m benchmarks.bench_warm_pool``.
+"""
+import argparse
+import io
+import time
+from contextlib import redirect_stderr, redirect_stdout
+
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.simulator import SimulatedFablib, default_sites
+from tests.teardown import delete_slices
+from tests.warm_pool import WarmPool
+
+COMPONENTS = ("NIC_Basic", "NVME_P4510", "NIC_ConnectX_6", "NIC_ConnectX_5")
+
+
+def module_components(module: int) -> dict:
+    model = COMPONENTS[module % len(COMPONENTS)]
+    return {f"m{module}-{model.lower()}": model}
+
+
+def fresh_slice(fablib, site: str, module: int):
+    slice_obj = fablib.new_slice(f"bench-m{module}-{site.lower()}")
+    node = slice_obj.add_node(name="node", site=site, cores=10, ram=20, disk=50)
+    for name, model in module_components(module).items():
+        node.add_component(model=model, name=name)
+    return slice_obj
+
+
+def run(args, pooled: bool) -> dict:
+    specs = default_sites(args.sites, seed=args.seed)
+    fablib = SimulatedFablib(sites=specs, time_scale=args.time_scale, seed=args.seed)
+    poller = SlicePoller.for_fablib(fablib)
+    lifecycle = SliceLifecycle(max_workers=args.sites, timeout=3600, poller=poller, on_event=None)
+    pool = WarmPool(fablib, poller=poller) if pooled else None
+    failed = 0
+    # Failed slices print their tracebacks; keep the table readable.
+    with redirect_stdout(io.StringIO()), redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        for module in range(args.modules):
+            model = COMPONENTS[module % len(COMPONENTS)]
+            sites = [spec.name for spec in specs if spec.components.get(model, 0) > 0]
+            if pooled:
+                outcomes = pool.provision(lifecycle, {site: (site, module_components(module)) for site in sites},
+                                          fallback=lambda site, module=module: fresh_slice(fablib, site, module))
+            else:
+                outcomes = lifecycle.run({site: (lambda site=site, module=module: fresh_slice(fablib, site, module))
+                                          for site in sites})
+            passed = {site: o.slice for site, o in outcomes.items() if o.ok}
+            failed += len(outcomes) - len(passed)
+            if pooled:
+                passed = pool.release(passed)
+            delete_slices(passed, quiet=True)
+        if pooled:
+            pool.close(quiet=True)
+        elapsed = time.perf_counter() - start
+        poller.stop()
+    return {"elapsed": elapsed, "calls": dict(fablib.calls), "failed": failed}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sites", type=int, default=30)
+    parser.add_argument("--modules", type=int, default=8)
+    parser.add_argument("--time-scale", type=float, default=0.002)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.modules} modules on {args.sites} simulated sites, seed {args.seed}")
+    print(f"{'mode':<14}{'submits':>8}{'modifies':>10}{'deletes':>9}{'wall (s)':>10}{'failed':>8}")
+    for mode, pooled in (("fresh slices", False), ("warm pool", True)):
+        result = run(args, pooled)
+        calls = result["calls"]
+        print(f"{mode:<14}{calls.get('submit', 0):>8}{calls.get('modify', 0):>10}{calls.get('delete', 0):>9}"
+              f"{result['elapsed']:>10.2f}{result['failed']:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import pytest
+
+from tests.base_test import fabric_rc, fim_lock
+from tests.fablib_pool import get_fablib
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.warm_pool import WARM_POOL, WarmPool
+
+
+@pytest.fixture(scope="session")
+def warm_pool():
+    """
+    Base VMs per site shared by the modules of the session with FABRIC_WARM_POOL=1, else None.
+    """
+    if not WARM_POOL:
+        yield None
+        return
+    fablib = get_fablib(fabric_rc)
+    pool = WarmPool(fablib, lock=fim_lock, poller=get_poller(fablib),
+                    on_event=provisioning_timer.observer("WarmVM"))
+    yield pool
+    pool.close()
+
+
+def pytest_sessionfinish(session, exitstatus):
+    """
+    Print the provisioning latency percentiles of the slices created during the run.
+    """
+    if provisioning_timer.timings:
+        provisioning_timer.sink.flush()
+        print("\n" + provisioning_timer.report())
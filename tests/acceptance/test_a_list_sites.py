@@ -23,7 +23,7 @@
 # SOFTWARE.
 # Author: Komal Thareja (kthare10@renci.org)
 import pytest
-from fabrictestbed_extensions.fablib.fablib import FablibManager
+from tests.fablib_pool import get_fablib
 from tests.base_test import fabric_rc
 
 
@@ -41,7 +41,7 @@ EXPECTED_SITES_MAP = {
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
@@ -25,11 +25,18 @@
 import traceback
 
 import pytest
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 import time
 
-from tests.utils import error_message, save_results_json, wait_and_configure_slices, wait_and_configure_slice
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.inventory import load_inventory
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock
 
 VM_CONFIG = {
@@ -45,82 +52,54 @@ MAX_PARALLEL_SITES = 5    # Max number of concurrent slice creations
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
 def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active"]
+    return load_capacity_index(fablib).site_list()
 
 
-def create_and_submit_slice(site):
+def create_slice(site):
     """
-    Create and submit a slice at the given site using non-blocking submit.
+    Build the slice topology for the given site; submission is done by the lifecycle.
     Returns the slice object.
     """
-    with fim_lock:
-
-        fablib = FablibManager(fabric_rc=fabric_rc)
-        site_name = site["name"]
-        slice_name = f"test-b-311-varying-size-{site_name.lower()}-{int(time.time())}"
-
-        print(f"[{site_name}] Creating slice: {slice_name}")
-        slice_obj = fablib.new_slice(name=slice_name)
-        site_obj = fablib.get_resources().get_site(site_name)
-        for h in site_obj.get_hosts().values():
-            if h.get_state() != "Active":
-                continue
-            slice_obj.add_node(
-                name=h.get_name(),
-                site=site_name,
-                host=h.get_name(),
-                cores=VM_CONFIG["cores"],
-                ram=VM_CONFIG["ram"],
-                disk=VM_CONFIG["disk"]
-            )
-        slice_obj.submit(wait=False)
-        return slice_obj
-
-
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
+    fablib = get_fablib(fabric_rc)
+    site_name = site["name"]
+    slice_name = f"test-b-311-varying-size-{site_name.lower()}-{int(time.time())}"
+
+    print(f"[{site_name}] Creating slice: {slice_name}")
+    slice_obj = fablib.new_slice(name=slice_name)
+    for host in load_inventory(fablib).active_hosts(site_name):
+        slice_obj.add_node(
+            name=host,
+            site=site_name,
+            host=host,
+            cores=VM_CONFIG["cores"],
+            ram=VM_CONFIG["ram"],
+            disk=VM_CONFIG["disk"]
+        )
+    return slice_obj
 
 
 def test_non_blocking_vm_creation(fablib):
     sites = get_active_sites(fablib)
-    results = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site = {
-            executor.submit(create_and_submit_slice, site): site["name"]
-            for site in sites
-        }
-
-        slice_objects = {}
-        for future in as_completed(future_to_site):
-            site_name = future_to_site[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Error submitting slice: {e}")
-                traceback.print_exc()
-                results[site_name] = {"state": False,
-                                      "error": error_message(slice_obj=slice_obj, exception=e),
-                                      "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"}
-
-    wait_and_configure_slices(slice_objects)
-
-    # Wait for all slices to complete provisioning
+    results = StreamingResults("varying_size_vm_create.json")
+
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("VM"))
+    outcomes = lifecycle.run({site["name"]: partial(create_slice, site) for site in sites})
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name, outcome in failures.items():
+        results[site_name] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
+
+    # Validate the provisioned slices
     for site_name, slice_obj in slice_objects.items():
         try:
-            print(f"[{site_name}] Waiting for slice provisioning...")
-            state = slice_obj.get_state()
+            state = outcomes[site_name].state
             success = state in ["StableOK", "StableError"]
             results[site_name] = {"state": success,
                                   "error": ""}
@@ -142,15 +121,17 @@ def test_non_blocking_vm_creation(fablib):
                                   "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"}
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="varying_size_vm_create.json")
     print("TEST SUMMARY==========================================================================================")
@@ -25,83 +25,77 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from tests.utils import error_message, save_results_json, wait_and_configure_slices
+from functools import partial
+
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock
+from tests.aggregate import AGGREGATE, provision_aggregated
+from tests.topology import ComponentSpec, NodeSpec, TopologyTemplate
 
 
 NVME_MODEL = 'NVME_P4510'
 VM_CONFIG = {"cores": 10, "ram": 20, "disk": 50}
 MAX_PARALLEL_SITES = 5
+TOPOLOGY = TopologyTemplate(nodes=(
+    NodeSpec(name="nvme-node", cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"],
+             components=(ComponentSpec(model=NVME_MODEL, name="nvme1"),)),
+))
 
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
-def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active"]
+def get_nvme_sites(fablib):
+    return load_capacity_index(fablib).site_list(components={NVME_MODEL: 2})
 
 
 def create_nvme_slice(site):
-    with fim_lock:
-        fablib = FablibManager(fabric_rc=fabric_rc)
-        site_name = site["name"]
-        slice_name = f"test-c-312-nvme-{site_name.lower()}-{int(time.time())}"
-        print(f"[{site_name}] Creating NVMe slice: {slice_name}")
-
-        slice_obj = fablib.new_slice(name=slice_name)
-        node = slice_obj.add_node(name="nvme-node", site=site_name,
-                                  cores=VM_CONFIG["cores"],
-                                  ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        node.add_component(model=NVME_MODEL, name="nvme1")
-        slice_obj.submit(wait=False)
-        return slice_obj
-
-
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
-
-
-def test_create_nvme_vms_per_site(fablib):
-    sites = get_active_sites(fablib)
-    results = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site = {}
-        for site in sites:
-            # Check NVME_P4510 availability before submitting
-            if site.get('nvme_capacity', 0) < 2:
-                continue
-            future = executor.submit(create_nvme_slice, site)
-            future_to_site[future] = site["name"]
-
-        slice_objects = {}
-        for future in as_completed(future_to_site):
-            site_name = future_to_site[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Slice submission error: {e}")
-                traceback.print_exc()
-                results[site_name] = {"state": False,
-                                      "error": error_message(slice_obj=slice_obj, exception=e),
-                                      "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"}
-
-    wait_and_configure_slices(slice_objects)
+    fablib = get_fablib(fabric_rc)
+    site_name = site["name"]
+    slice_name = f"test-c-312-nvme-{site_name.lower()}-{int(time.time())}"
+    print(f"[{site_name}] Creating NVMe slice: {slice_name}")
+
+    return TOPOLOGY.new_slice(fablib, slice_name, site=site_name)
+
+
+def test_create_nvme_vms_per_site(fablib, warm_pool):
+    sites = get_nvme_sites(fablib)
+    results = StreamingResults("nvme.json")
+
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("NVMe"))
+    if AGGREGATE:
+        outcomes = provision_aggregated(lifecycle, fablib, TOPOLOGY, {site["name"]: {"site": site["name"]}
+                                                                      for site in sites},
+                                        slice_prefix="test-c-312-nvme")
+    elif warm_pool is not None:
+        site_by_name = {site["name"]: site for site in sites}
+        outcomes = warm_pool.provision(lifecycle, {name: (name, {"nvme1": NVME_MODEL}) for name in site_by_name},
+                                       fallback=lambda name: create_nvme_slice(site_by_name[name]))
+    else:
+        outcomes = lifecycle.run({
+            site["name"]: partial(create_nvme_slice, site)
+            for site in sites
+        })
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name, outcome in failures.items():
+        results[site_name] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
     for site_name, slice_obj in slice_objects.items():
         try:
-            node = slice_obj.get_node("nvme-node")
+            node = slice_obj.get_node(warm_pool.node_name(site_name, "nvme-node") if warm_pool
+                                      else "nvme-node")
 
             # Confirm NVMe devices are visible
             print(f"[{site_name}] Checking NVMe devices via lspci...")
@@ -119,15 +113,19 @@ def test_create_nvme_vms_per_site(fablib):
                                   "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"}
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    if warm_pool is not None:
+        slices_to_delete = warm_pool.release(slices_to_delete)
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="nvme.json")
     print("TEST SUMMARY==========================================================================================")
@@ -25,86 +25,74 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from tests.utils import error_message, save_results_json, wait_and_configure_slices
+from functools import partial
+
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock
+from tests.aggregate import AGGREGATE, provision_aggregated
+from tests.topology import ComponentSpec, NodeSpec, TopologyTemplate
 
 
-SMART_NIC_MODELS = {
-    'NIC_ConnectX_5': 'nic_connectx_5_capacity',
-    'NIC_ConnectX_6': 'nic_connectx_6_capacity'
-}
+SMART_NIC_MODELS = ['NIC_ConnectX_5', 'NIC_ConnectX_6']
 VM_CONFIG = {"cores": 10, "ram": 20, "disk": 50}
 MAX_PARALLEL_SITES = 5
+TOPOLOGY = TopologyTemplate(nodes=(
+    NodeSpec(name="smartnic-node", cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"],
+             components=(ComponentSpec(model="{nic_model}", name="smartnic1"),)),
+))
 
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
-def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active"]
+def get_smartnic_site_models(fablib):
+    """Return (site, NIC model) pairs for sites with at least two cards of the model."""
+    index = load_capacity_index(fablib)
+    return [(index.inventory.get_site(site_name), nic_model)
+            for site_name, nic_model in index.component_pairs(SMART_NIC_MODELS, minimum=2)]
 
 
 def create_smartnic_slice(site, nic_model):
-    with fim_lock:
-        fablib = FablibManager(fabric_rc=fabric_rc)
-
-        site_name = site["name"]
-        slice_name = f"test-e-312-smartnic-{site_name.lower()}-{nic_model.lower()}-{int(time.time())}"
-        print(f"[{site_name}] Creating Smart NIC slice: {slice_name}")
-
-        slice_obj = fablib.new_slice(name=slice_name)
-        node = slice_obj.add_node(name="smartnic-node", site=site_name,
-                                  cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        node.add_component(model=nic_model, name="smartnic1")
-        slice_obj.submit(wait=False)
-        return slice_obj
+    fablib = get_fablib(fabric_rc)
 
+    site_name = site["name"]
+    slice_name = f"test-e-312-smartnic-{site_name.lower()}-{nic_model.lower()}-{int(time.time())}"
+    print(f"[{site_name}] Creating Smart NIC slice: {slice_name}")
 
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
+    return TOPOLOGY.new_slice(fablib, slice_name, site=site_name, nic_model=nic_model)
 
 
 def test_create_smartnic_vms_per_site(fablib):
-    sites = get_active_sites(fablib)
-    results = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site_model = {}
-        for site in sites:
-            for nic_model, capacity_key in SMART_NIC_MODELS.items():
-                if site.get(capacity_key, 0) < 2:
-                    continue
-                future = executor.submit(create_smartnic_slice, site, nic_model)
-                future_to_site_model[future] = (site["name"], nic_model)
-
-        slice_objects = {}
-        for future in as_completed(future_to_site_model):
-            site_name, nic_model = future_to_site_model[future]
-            key = f"{site_name}_{nic_model}"
-            try:
-                slice_obj = future.result()
-                slice_objects[key] = slice_obj
-            except Exception as e:
-                print(f"[{key}] Slice submission error: {e}")
-                traceback.print_exc()
-                results[key] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
+    site_models = get_smartnic_site_models(fablib)
+    results = StreamingResults("smart_nic.json")
+
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("SmartNIC"))
+    if AGGREGATE:
+        outcomes = provision_aggregated(lifecycle, fablib, TOPOLOGY, {
+            f"{site['name']}_{nic_model}": {"site": site["name"], "nic_model": nic_model}
+            for site, nic_model in site_models
+        }, slice_prefix="test-e-312-smartnic")
+    else:
+        outcomes = lifecycle.run({
+            f"{site['name']}_{nic_model}": partial(create_smartnic_slice, site, nic_model)
+            for site, nic_model in site_models
+        })
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for key, outcome in failures.items():
+        results[key] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
     for key, slice_obj in slice_objects.items():
         try:
             node = slice_obj.get_node("smartnic-node")
@@ -135,15 +123,17 @@ def test_create_smartnic_vms_per_site(fablib):
             }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for key, slice_obj in slice_objects.items():
         site_info = results.get(key, {})
         if site_info.get("state", False):
             print(f"{key}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[key] = slice_obj
         else:
             print(f"{key}: {site_info.get('error')}")
             print(f"[{key}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="smart_nic.json")
     print("TEST SUMMARY==========================================================================================")
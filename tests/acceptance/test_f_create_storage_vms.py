@@ -25,82 +25,68 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from tests.utils import error_message, save_results_json, wait_and_configure_slices
+from functools import partial
+
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock, _safe_devname
+from tests.aggregate import AGGREGATE, provision_aggregated
+from tests.topology import NodeSpec, TopologyTemplate
 
 
 VM_CONFIG = {"cores": 10, "ram": 20, "disk": 50}
 STORAGE_NAME = "acceptance-testing"
 WORKER_SUFFIX = "w1.fabric-testbed.net"
 MAX_PARALLEL_SITES = 5
+TOPOLOGY = TopologyTemplate(nodes=(
+    NodeSpec(name="storage-node", host="{host}", cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"],
+             storage=(STORAGE_NAME,)),
+))
 
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
 def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active"]
+    return load_capacity_index(fablib).site_list()
 
 
 def create_storage_slice(site):
-    with fim_lock:
-
-        fablib = FablibManager(fabric_rc=fabric_rc)
-        site_name = site["name"]
-        worker = f"{site_name.lower()}-{WORKER_SUFFIX}"
-        slice_name = f"test-f-313-storage-{site_name.lower()}-{int(time.time())}"
-        print(f"[{site_name}] Creating slice: {slice_name}")
-
-        slice_obj = fablib.new_slice(name=slice_name)
-        node = slice_obj.add_node(name="storage-node", site=site_name,
-                                  host=worker, cores=VM_CONFIG["cores"],
-                                  ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        node.add_storage(name=STORAGE_NAME)
-        slice_obj.submit(wait=False)
-        return slice_obj
+    fablib = get_fablib(fabric_rc)
+    site_name = site["name"]
+    worker = f"{site_name.lower()}-{WORKER_SUFFIX}"
+    slice_name = f"test-f-313-storage-{site_name.lower()}-{int(time.time())}"
+    print(f"[{site_name}] Creating slice: {slice_name}")
 
-
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
+    return TOPOLOGY.new_slice(fablib, slice_name, site=site_name, host=worker)
 
 
 def test_attached_storage_parallel(fablib):
     sites = get_active_sites(fablib)
-    results = {}
-    slice_objects = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site = {
-            executor.submit(create_storage_slice, site): site["name"]
-            for site in sites
-        }
-
-        for future in as_completed(future_to_site):
-            site_name = future_to_site[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Slice submission failed: {e}")
-                traceback.print_exc()
-                results[site_name] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
+    results = StreamingResults("persistent_storage.json")
+
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("Storage"))
+    if AGGREGATE:
+        outcomes = provision_aggregated(lifecycle, fablib, TOPOLOGY, {
+            site["name"]: {"site": site["name"], "host": f"{site['name'].lower()}-{WORKER_SUFFIX}"} for site in sites
+        }, slice_prefix="test-f-313-storage")
+    else:
+        outcomes = lifecycle.run({site["name"]: partial(create_storage_slice, site) for site in sites})
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name, outcome in failures.items():
+        results[site_name] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
 
     for site_name, slice_obj in slice_objects.items():
         try:
@@ -139,15 +125,17 @@ def test_attached_storage_parallel(fablib):
             }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="persistent_storage.json")
     print("TEST SUMMARY==========================================================================================")
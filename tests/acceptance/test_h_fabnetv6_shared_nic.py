@@ -25,92 +25,62 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 
 
-from tests.utils import error_message, save_results_json, make_site_pairs, wait_and_configure_slices
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, make_site_pairs, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock, _validate_ip, _safe_devname
+from tests.topology import ComponentSpec, NetworkSpec, NodeSpec, TopologyTemplate
 
 
 NIC_MODEL = 'NIC_Basic'
-NIC_CAPACITY_FIELD = 'nic_basic_capacity'
 NETWORK_TYPE = 'IPv6'
 MAX_PARALLEL = 2  # FABNetv6 provisioning can be slow
+TOPOLOGY = TopologyTemplate(
+    nodes=(NodeSpec(name="node1", components=(ComponentSpec(model=NIC_MODEL, name="nic1", mode="auto"),)),),
+    networks=(NetworkSpec(name="fabnetv6-net1", interfaces=("node1.nic1",), type=NETWORK_TYPE),),
+)
 
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
 def get_sites_with_workers(fablib) -> list[str]:
     """Return sites with >=1 NIC and workers."""
-    result = []
-    for site in fablib.list_sites(output="list"):
-        if site.get("state") != "Active":
-            continue
-        if site.get(NIC_CAPACITY_FIELD, 0) < 1:
-            continue
-        hosts = site.get("hosts", 0)
-        if hosts >= 1:
-            result.append(site["name"])
-    return result
+    return load_capacity_index(fablib).sites(hosts=1, components={NIC_MODEL: 1})
 
 
 def create_fabnetv6_sharednic_slice(site):
-    with fim_lock:
-        fablib = FablibManager(fabric_rc=fabric_rc)
-        slice_name = f"test-g-324-fabnetv6-{site.lower()}-{int(time.time())}"
-        print(f"[{site}] Creating FABNetv6 slice: {slice_name}")
+    fablib = get_fablib(fabric_rc)
+    slice_name = f"test-g-324-fabnetv6-{site.lower()}-{int(time.time())}"
+    print(f"[{site}] Creating FABNetv6 slice: {slice_name}")
 
-        slice_obj = fablib.new_slice(name=slice_name)
-
-        node1 = slice_obj.add_node(name="node1", site=site)
-        iface1 = node1.add_component(model=NIC_MODEL, name="nic1").get_interfaces()[0]
-        iface1.set_mode("auto")
-        net1 = slice_obj.add_l3network(name="fabnetv6-net1", interfaces=[iface1], type=NETWORK_TYPE)
-
-        slice_obj.submit(wait=False)
-        return slice_obj
-
-
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"Deletion error: {e}")
+    return TOPOLOGY.new_slice(fablib, slice_name, site=site)
 
 
 def test_fabnetv6_sharednic_ping(fablib):
-    results = {}
-    slice_objects = {}
+    results = StreamingResults("fabnetv6_shared.json")
 
     site_names = get_sites_with_workers(fablib)
 
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL) as executor:
-        future_to_pair = {
-            executor.submit(create_fabnetv6_sharednic_slice, site): site
-            for site in site_names
-        }
-
-        for future in as_completed(future_to_pair):
-            site_name = future_to_pair[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Slice creation failed: {e}")
-                traceback.print_exc()
-                results[site_name] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e)
-                }
-
-    wait_and_configure_slices(slice_objects)
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("SharedNIC"))
+    outcomes = lifecycle.run({site: partial(create_fabnetv6_sharednic_slice, site) for site in site_names})
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name, outcome in failures.items():
+        results[site_name] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
     for site_name, slice_obj in slice_objects.items():
         try:
             slice_obj.post_boot_config()
@@ -136,8 +106,8 @@ def test_fabnetv6_sharednic_ping(fablib):
             }
 
     slices_to_keep = []
-    ping_results = {}
-    site_pairs = make_site_pairs(site_names)
+    ping_results = StreamingResults("fabnetv6_shared_ping.json")
+    site_pairs = make_site_pairs(site_names, test="fabnetv6_shared_ping")
     for src, dst in site_pairs:
         if src == dst:
             continue  # Skip same-slice tests
@@ -178,17 +148,19 @@ def test_fabnetv6_sharednic_ping(fablib):
             }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: Create PASS")
             if site_name in slice_objects:
                 continue
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     for key, info in ping_results.items():
         print(f"{key}: {info}")
@@ -25,11 +25,17 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from ipaddress import IPv4Network
 
-from tests.utils import error_message, save_results_json, wait_and_configure_slices
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock, _validate_ip
 
 
@@ -43,80 +49,56 @@ SUBNET = IPv4Network("192.168.1.0/24")
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
-def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active" and
-            "EDC" not in site.get("name")]
+def get_shared_nic_sites(fablib):
+    return [site for site in load_capacity_index(fablib).site_list(components={NIC_MODEL: 2})
+            if "EDC" not in site.get("name")]
 
 
 def create_local_bridge_sharednic_slice(site):
-    with fim_lock:
+    fablib = get_fablib(fabric_rc)
 
-        fablib = FablibManager(fabric_rc=fabric_rc)
+    site_name = site["name"]
+    slice_name = f"test-i-321-sharednic-bridge-{site_name.lower()}-{int(time.time())}"
+    print(f"[{site_name}] Creating slice: {slice_name}")
 
-        site_name = site["name"]
-        slice_name = f"test-i-321-sharednic-bridge-{site_name.lower()}-{int(time.time())}"
-        print(f"[{site_name}] Creating slice: {slice_name}")
+    worker1 = WORKER_TEMPLATE.format(site_name.lower(), 1)
+    worker2 = WORKER_TEMPLATE.format(site_name.lower(), 2)
 
-        worker1 = WORKER_TEMPLATE.format(site_name.lower(), 1)
-        worker2 = WORKER_TEMPLATE.format(site_name.lower(), 2)
+    slice_obj = fablib.new_slice(name=slice_name)
 
-        slice_obj = fablib.new_slice(name=slice_name)
+    node1 = slice_obj.add_node(name="node1", site=site_name, host=worker1,
+                               cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
+    iface1 = node1.add_component(model=NIC_MODEL, name="sharednic1").get_interfaces()[0]
+    iface1.set_mode("auto")
 
-        node1 = slice_obj.add_node(name="node1", site=site_name, host=worker1,
-                                   cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        iface1 = node1.add_component(model=NIC_MODEL, name="sharednic1").get_interfaces()[0]
-        iface1.set_mode("auto")
+    node2 = slice_obj.add_node(name="node2", site=site_name, host=worker2,
+                               cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
+    iface2 = node2.add_component(model=NIC_MODEL, name="sharednic2").get_interfaces()[0]
+    iface2.set_mode("auto")
 
-        node2 = slice_obj.add_node(name="node2", site=site_name, host=worker2,
-                                   cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        iface2 = node2.add_component(model=NIC_MODEL, name="sharednic2").get_interfaces()[0]
-        iface2.set_mode("auto")
+    slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2], subnet=SUBNET)
+    return slice_obj
 
-        slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2], subnet=SUBNET)
-        slice_obj.submit(wait=False)
-        return slice_obj
 
+def test_sharednic_local_bridge_reachability(fablib):
+    sites = get_shared_nic_sites(fablib)
+    results = StreamingResults("l2bridge_shared.json")
 
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
-
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("SharedNIC"))
+    outcomes = lifecycle.run({
+        site["name"]: partial(create_local_bridge_sharednic_slice, site)
+        for site in sites
+    })
 
-def test_sharednic_local_bridge_reachability(fablib):
-    sites = get_active_sites(fablib)
-    results = {}
-    slice_objects = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site = {
-            executor.submit(create_local_bridge_sharednic_slice, site): site["name"]
-            for site in sites
-            if site.get("nic_basic_capacity", 0) >= 2
-        }
-
-        for future in as_completed(future_to_site):
-            site_name = future_to_site[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Slice submission failed: {e}")
-                traceback.print_exc()
-                results[site_name] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name, outcome in failures.items():
+        results[site_name] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
 
     for site_name, slice_obj in slice_objects.items():
         try:
@@ -152,15 +134,17 @@ def test_sharednic_local_bridge_reachability(fablib):
             }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="l2bridge_shared.json")
     print("TEST SUMMARY==========================================================================================")
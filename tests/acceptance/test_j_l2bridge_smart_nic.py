@@ -25,11 +25,17 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from ipaddress import IPv4Network
 
-from tests.utils import error_message, save_results_json, wait_and_configure_slices
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock, _validate_ip
 
 
@@ -42,79 +48,53 @@ SUBNET = IPv4Network("192.168.1.0/24")
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
-def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active" and
-            site.get("nic_connectx_5_available") > 0 and site.get("nic_connectx_6_available") > 0]
+def get_smartnic_sites(fablib):
+    requirement = {nic_model: 1 for nic_model in SMART_NIC_MODELS}
+    return load_capacity_index(fablib).site_list(components=requirement, available=requirement)
 
 
 def create_smartnic_bridge_slice(site, nic_type1, nic_type2):
-    with fim_lock:
+    fablib = get_fablib(fabric_rc)
 
-        fablib = FablibManager(fabric_rc=fabric_rc)
+    site_name = site["name"]
+    slice_name = f"test-j-321-smartnic-{nic_type1.lower()}-{nic_type2.lower()}-{site_name.lower()}-{int(time.time())}"
+    print(f"[{site_name}] Creating slice: {slice_name}")
 
-        site_name = site["name"]
-        slice_name = f"test-j-321-smartnic-{nic_type1.lower()}-{nic_type2.lower()}-{site_name.lower()}-{int(time.time())}"
-        print(f"[{site_name}] Creating slice: {slice_name}")
+    slice_obj = fablib.new_slice(name=slice_name)
 
-        slice_obj = fablib.new_slice(name=slice_name)
+    node1 = slice_obj.add_node(name="node1", site=site_name,
+                               cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
+    iface1 = node1.add_component(model=nic_type1, name="smartnic1").get_interfaces()[0]
+    iface1.set_mode("auto")
 
-        node1 = slice_obj.add_node(name="node1", site=site_name,
-                                   cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        iface1 = node1.add_component(model=nic_type1, name="smartnic1").get_interfaces()[0]
-        iface1.set_mode("auto")
+    node2 = slice_obj.add_node(name="node2", site=site_name,
+                               cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
+    iface2 = node2.add_component(model=nic_type2, name="smartnic2").get_interfaces()[0]
+    iface2.set_mode("auto")
 
-        node2 = slice_obj.add_node(name="node2", site=site_name,
-                                   cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        iface2 = node2.add_component(model=nic_type2, name="smartnic2").get_interfaces()[0]
-        iface2.set_mode("auto")
+    slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2], subnet=SUBNET)
+    return slice_obj
 
-        slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2], subnet=SUBNET)
-        slice_obj.submit(wait=False)
-        return slice_obj
 
+def test_smartnic_local_bridge_reachability(fablib):
+    sites = get_smartnic_sites(fablib)
+    results = StreamingResults("l2bridge_smart_nic.json")
 
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
-
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("SmartNIC"))
+    outcomes = lifecycle.run({
+        site["name"]: partial(create_smartnic_bridge_slice, site, "NIC_ConnectX_5", "NIC_ConnectX_6")
+        for site in sites
+    })
 
-def test_smartnic_local_bridge_reachability(fablib):
-    sites = get_active_sites(fablib)
-    results = {}
-    slice_objects = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site = {}
-        for site in sites:
-            connectx5 = site.get("nic_connectx_5_capacity", 0)
-            connectx6 = site.get("nic_connectx_6_capacity", 0)
-            if connectx5 >= 1 and connectx6 >= 1:
-                future = executor.submit(create_smartnic_bridge_slice, site, "NIC_ConnectX_5", "NIC_ConnectX_6")
-                future_to_site[future] = site["name"]
-
-        for future in as_completed(future_to_site):
-            site_name = future_to_site[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Slice submission failed: {e}")
-                traceback.print_exc()
-                results[site_name] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name, outcome in failures.items():
+        results[site_name] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
 
     for site_name, slice_obj in slice_objects.items():
         try:
@@ -150,15 +130,17 @@ def test_smartnic_local_bridge_reachability(fablib):
             }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="l2bridge_smart_nic.json")
     print("TEST SUMMARY==========================================================================================")
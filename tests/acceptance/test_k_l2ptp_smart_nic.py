@@ -26,19 +26,22 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from ipaddress import IPv4Network
 
-from tests.utils import error_message, save_results_json, make_site_pairs, wait_and_configure_slices
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, make_site_pairs, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock, _validate_ip
 
 
 VM_CONFIG = {"cores": 10, "ram": 20, "disk": 50}
-NIC_MODELS = {
-    'NIC_ConnectX_5': 'nic_connectx_5_capacity',
-    'NIC_ConnectX_6': 'nic_connectx_6_capacity'
-}
+NIC_MODELS = ['NIC_ConnectX_5', 'NIC_ConnectX_6']
 NETWORK_NAME = 'l2-PTP'
 SUBNET = IPv4Network("192.168.1.0/24")
 MAX_PARALLEL_TESTS = 3
@@ -46,91 +49,65 @@ MAX_PARALLEL_TESTS = 3
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
-def get_smartnic_sites(fablib, nic_capacity_field):
-    return [
-        site for site in fablib.list_sites(output="list")
-        if site.get("state") == "Active" and site.get(nic_capacity_field, 0) >= 1
-    ]
+def get_smartnic_sites(fablib, nic_model):
+    return load_capacity_index(fablib).sites(components={nic_model: 1})
 
 
 def create_l2ptp_slice(site1, site2, nic_model):
-    with fim_lock:
+    fablib = get_fablib(fabric_rc)
 
-        fablib = FablibManager(fabric_rc=fabric_rc)
+    slice_name = f"test-k-322-l2ptp-{nic_model.lower()}-{site1.lower()}-{site2.lower()}-{int(time.time())}"
+    print(f"[{site1}/{site2}] Creating L2PTP slice with {nic_model}: {slice_name}")
 
-        slice_name = f"test-k-322-l2ptp-{nic_model.lower()}-{site1.lower()}-{site2.lower()}-{int(time.time())}"
-        print(f"[{site1}/{site2}] Creating L2PTP slice with {nic_model}: {slice_name}")
+    slice_obj = fablib.new_slice(name=slice_name)
 
-        slice_obj = fablib.new_slice(name=slice_name)
+    node1 = slice_obj.add_node(name="node1", site=site1,
+                               cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
+    iface1 = node1.add_component(model=nic_model, name="nic1").get_interfaces()[0]
+    iface1.set_mode("auto")
 
-        node1 = slice_obj.add_node(name="node1", site=site1,
-                                   cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        iface1 = node1.add_component(model=nic_model, name="nic1").get_interfaces()[0]
-        iface1.set_mode("auto")
+    node2 = slice_obj.add_node(name="node2", site=site2,
+                               cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
+    iface2 = node2.add_component(model=nic_model, name="nic2").get_interfaces()[0]
+    iface2.set_mode("auto")
 
-        node2 = slice_obj.add_node(name="node2", site=site2,
-                                   cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"])
-        iface2 = node2.add_component(model=nic_model, name="nic2").get_interfaces()[0]
-        iface2.set_mode("auto")
-
-        slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2], type='L2PTP', subnet=SUBNET)
-        slice_obj.submit(wait=False)
-        return slice_obj
-
-
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
+    slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2], type='L2PTP', subnet=SUBNET)
+    return slice_obj
 
 
 def test_smartnic_l2ptp_across_sites(fablib):
-    results = {}
-    slice_objects = {}
+    results = StreamingResults("l2ptp_smart_nic.json")
 
     test_tasks = []
 
-    for nic_model, capacity_field in NIC_MODELS.items():
-        sites = get_smartnic_sites(fablib, capacity_field)
-        if len(sites) < 2:
-            print(f"Skipping {nic_model}: Not enough sites with {capacity_field}")
+    for nic_model in NIC_MODELS:
+        site_names = get_smartnic_sites(fablib, nic_model)
+        if len(site_names) < 2:
+            print(f"Skipping {nic_model}: Not enough sites with {nic_model}")
             continue
-        site_names = [site["name"] for site in sites]
         site_pairs = make_site_pairs(site_names)
         for site1, site2 in site_pairs:
             if site1 == site2:
                 continue
             test_tasks.append((site1, site2, nic_model))
 
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_TESTS) as executor:
-        future_to_pair = {
-            executor.submit(create_l2ptp_slice, site1, site2, nic_model): (site1, site2, nic_model)
-            for (site1, site2, nic_model) in test_tasks
-        }
-
-        for future in as_completed(future_to_pair):
-            site1, site2, nic_model = future_to_pair[future]
-            key = f"{site1}-{site2}-{nic_model}"
-            try:
-                slice_obj = future.result()
-                slice_objects[key] = slice_obj
-            except Exception as e:
-                print(f"[{key}] Slice submission failed: {e}")
-                traceback.print_exc()
-                results[key] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_TESTS},
+                               poller=get_poller(fablib),
+                               on_event=provisioning_timer.observer("SmartNIC",
+                                                                    site_of=lambda key: key.rsplit("-", 1)[0]))
+    outcomes = lifecycle.run({
+        f"{site1}-{site2}-{nic_model}": partial(create_l2ptp_slice, site1, site2, nic_model)
+        for (site1, site2, nic_model) in test_tasks
+    })
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for key, outcome in failures.items():
+        results[key] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
 
     for key, slice_obj in slice_objects.items():
         try:
@@ -161,15 +138,17 @@ def test_smartnic_l2ptp_across_sites(fablib):
             }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for site_name, slice_obj in slice_objects.items():
         site_info = results.get(site_name, {})
         if site_info.get("state", False):
             print(f"{site_name}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[site_name] = slice_obj
         else:
             print(f"{site_name}: {site_info.get('error')}")
             print(f"[{site_name}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="l2ptp_smart_nic.json")
     print("TEST SUMMARY==========================================================================================")
@@ -26,16 +26,21 @@
 import pytest
 import traceback
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 from ipaddress import IPv4Network
 
-from tests.utils import error_message, save_results_json, make_site_pairs, wait_and_configure_slices
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, make_site_pairs, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock, _validate_ip, _safe_devname
 
 
 NIC_MODEL = 'NIC_Basic'
-NIC_CAPACITY_FIELD = 'nic_basic_capacity'
 NETWORK_NAME = 'l2-STS'
 SUBNET = IPv4Network("192.168.1.0/24")
 MAX_PARALLEL = 2  # L2STS is slow to provision, keep concurrency low
@@ -43,94 +48,61 @@ MAX_PARALLEL = 2  # L2STS is slow to provision, keep concurrency low
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
 def get_sites_with_workers(fablib) -> list[str]:
     """Return sites with >=2 workers and Shared NIC capacity."""
-    result = []
-    for site in fablib.list_sites(output="list"):
-        if site.get("state") != "Active":
-            continue
-        if site.get(NIC_CAPACITY_FIELD, 0) < 1:
-            continue
-        hosts = site.get("hosts", 0)
-        if hosts >= 2:
-            result.append(site["name"])
-
-    return result
+    return load_capacity_index(fablib).sites(hosts=2, components={NIC_MODEL: 1})
 
 
 def create_l2sts_sharednic_slice(site1, site2):
-    with fim_lock:
-
-        fablib = FablibManager(fabric_rc=fabric_rc)
-
-        slice_name = f"test-l-323-l2sts-{site1.lower()}-{site2.lower()}-{int(time.time())}"
-        print(f"[{site1}/{site2}] Creating L2STS slice: {slice_name}")
+    fablib = get_fablib(fabric_rc)
 
-        slice_obj = fablib.new_slice(name=slice_name)
+    slice_name = f"test-l-323-l2sts-{site1.lower()}-{site2.lower()}-{int(time.time())}"
+    print(f"[{site1}/{site2}] Creating L2STS slice: {slice_name}")
 
-        # Node1 on site1 worker1
-        node1 = slice_obj.add_node(name="node1", site=site1, host=f"{site1.lower()}-w1.fabric-testbed.net")
-        iface1 = node1.add_component(model='NIC_Basic', name="nic1").get_interfaces()[0]
-        iface1.set_mode("auto")
+    slice_obj = fablib.new_slice(name=slice_name)
 
-        # Node2 on site1 worker2
-        node2 = slice_obj.add_node(name="node2", site=site2, host=f"{site2.lower()}-w1.fabric-testbed.net")
-        iface2 = node2.add_component(model='NIC_Basic', name="nic2").get_interfaces()[0]
-        iface2.set_mode("auto")
+    # Node1 on site1 worker1
+    node1 = slice_obj.add_node(name="node1", site=site1, host=f"{site1.lower()}-w1.fabric-testbed.net")
+    iface1 = node1.add_component(model='NIC_Basic', name="nic1").get_interfaces()[0]
+    iface1.set_mode("auto")
 
-        # Node3 on site2 worker3
-        node3 = slice_obj.add_node(name="node3", site=site2, host=f"{site2.lower()}-w2.fabric-testbed.net")
-        iface3 = node3.add_component(model='NIC_Basic', name="nic3").get_interfaces()[0]
-        iface3.set_mode("auto")
+    # Node2 on site1 worker2
+    node2 = slice_obj.add_node(name="node2", site=site2, host=f"{site2.lower()}-w1.fabric-testbed.net")
+    iface2 = node2.add_component(model='NIC_Basic', name="nic2").get_interfaces()[0]
+    iface2.set_mode("auto")
 
-        slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2, iface3], type='L2STS', subnet=SUBNET)
-        slice_obj.submit(wait=False)
-        return slice_obj
+    # Node3 on site2 worker3
+    node3 = slice_obj.add_node(name="node3", site=site2, host=f"{site2.lower()}-w2.fabric-testbed.net")
+    iface3 = node3.add_component(model='NIC_Basic', name="nic3").get_interfaces()[0]
+    iface3.set_mode("auto")
 
-
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"Deletion error: {e}")
+    slice_obj.add_l2network(name=NETWORK_NAME, interfaces=[iface1, iface2, iface3], type='L2STS', subnet=SUBNET)
+    return slice_obj
 
 
 def test_l2sts_sharednic_ping(fablib):
-    results = {}
-    slice_objects = {}
+    results = StreamingResults("l2sts_shared.json")
 
     site_names = get_sites_with_workers(fablib)
     site_pairs = make_site_pairs(site_names)
 
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL) as executor:
-        future_to_triplet = {
-            executor.submit(create_l2sts_sharednic_slice, site1, site2): (site1, site2)
-            for site1, site2 in site_pairs
-            if site1 != site2
-        }
-
-        for future in as_completed(future_to_triplet):
-            site1, site2 = future_to_triplet[future]
-            key = f"{site1}-{site2}"
-            try:
-                slice_obj = future.result()
-                slice_objects[key] = slice_obj
-            except Exception as e:
-                print(f"[{key}] Slice creation failed: {e}")
-                traceback.print_exc()
-                results[key] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL},
+                               poller=get_poller(fablib),
+                               on_event=provisioning_timer.observer("SharedNIC", site_of=str))
+    outcomes = lifecycle.run({
+        f"{site1}-{site2}": partial(create_l2sts_sharednic_slice, site1, site2)
+        for site1, site2 in site_pairs
+        if site1 != site2
+    })
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for key, outcome in failures.items():
+        results[key] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
 
     for key, slice_obj in slice_objects.items():
         try:
@@ -175,10 +147,11 @@ def test_l2sts_sharednic_ping(fablib):
                 "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
             }
 
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for key, slice_obj in slice_objects.items():
         if results.get(key, {}).get("state", False):
-            delete_slice(slice_obj)
+            slices_to_delete[key] = slice_obj
         else:
             print(f"[{key}] Skipping deletion because slice failed. Please inspect manually.")
 
@@ -188,10 +161,11 @@ def test_l2sts_sharednic_ping(fablib):
         site_info = results.get(key, {})
         if site_info.get("state", False):
             print(f"{key}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[key] = slice_obj
         else:
             print(f"{key}: {site_info.get('error')}")
             print(f"[{key}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="l2sts_shared.json")
     print("TEST SUMMARY==========================================================================================")
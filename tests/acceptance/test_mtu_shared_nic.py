@@ -22,30 +22,35 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 # Author: Komal Thareja (kthare10@renci.org)
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
 import pytest
-import re
-import time
 import shlex
-from fabrictestbed_extensions.fablib.fablib import FablibManager
+from tests.fablib_pool import get_fablib
 from tests.base_test import fabric_rc, fim_lock, _validate_ip
+from tests.lifecycle import SliceLifecycle, SUBMIT
+from tests.mtu import OVERHEAD, MtuCache, MtuPipeline, discover_source, format_matrix, probe_source
+from tests.poller import get_poller
+from tests.result_sink import StreamingResults
+from tests.teardown import delete_slices
+from tests.timing import provisioning_timer
 
 
 SLICE_PREFIX = 'mtu@'
-SITES_ONLY = ['GATECH', 'CLEM', 'GPN']  # modify if needed
+# Comma-separated override, e.g. FABRIC_MTU_SITES=TACC,STAR,UTAH
+SITES_ONLY = os.getenv('FABRIC_MTU_SITES', 'GATECH,CLEM,GPN').split(',')
 NIC_MODEL = 'NIC_Basic'
 PROBE_MTUS = [8900, 8948, 9000]
-
-RE_LOSS = re.compile(r'(\d+)% packet loss')
-RE_RTT = re.compile(r'rtt.*?=\s*[\d.]+/([\d.]+)/[\d.]+/[\d.]+ ms')
-
-WIDTH_MTU = 4
-WIDTH_RTT = 4
-WIDTH_TD = WIDTH_MTU + WIDTH_RTT
+# "probe" checks PROBE_MTUS; "discover" bisects the exact path MTU, starting from the cached value.
+MTU_MODE = os.getenv('FABRIC_MTU_MODE', 'probe')
+MAX_PARALLEL_SITES = 5
 
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
@@ -54,100 +59,101 @@ def list_mtu_slices(fablib):
     return {s.get_name()[len(SLICE_PREFIX):]: s for s in fablib.get_slices() if s.get_name().startswith(SLICE_PREFIX)}
 
 
-def parse_ping_results(stdout, mtu_list):
-    matches = list(RE_LOSS.finditer(stdout))
-    if len(matches) != len(mtu_list):
-        return 'ERR-RE'.ljust(WIDTH_TD)
-    pass_mtu = 0
-    for mtu, m in zip(mtu_list, matches):
-        if m and m[1] == '0':
-            pass_mtu = mtu
-    rtt_match = RE_RTT.search(stdout)
-    max_avg_rtt = int(float(rtt_match[1])) if rtt_match else -1
-    return str(pass_mtu).ljust(WIDTH_MTU) + str(max_avg_rtt).rjust(WIDTH_RTT)
+def create_mtu_slice(fablib, site):
+    """
+    Build the slice topology for the given site; submission is done by the lifecycle.
+    """
+    slice_obj = fablib.new_slice(name=SLICE_PREFIX + site)
+    node = slice_obj.add_node(name='node', site=site, cores=1, ram=2, disk=10, image='default_ubuntu_22')
+
+    intfs = node.add_component(model=NIC_MODEL, name='nic0').get_interfaces()
+    if len(intfs) < 2:
+        intfs += node.add_component(model=NIC_MODEL, name='nic1').get_interfaces()
+
+    intf4, intf6 = intfs[:2]
+    slice_obj.add_l3network(name='net4', interfaces=[intf4], type='IPv4')
+    slice_obj.add_l3network(name='net6', interfaces=[intf6], type='IPv6')
+    return slice_obj
+
+
+def configure_interfaces(fablib, site, slice_obj):
+    """
+    Address both interfaces and route the whole FABNet range through the site gateway, so a
+    site is configured without knowing the addresses of the others.
+    Returns {address family: address}.
+    """
+    node = slice_obj.get_node('node')
+    addrs = {af: _validate_ip(slice_obj.get_l3network(f'net{af}').get_available_ips()[0]) for af in (4, 6)}
+    print(f"[{site}] IPv4: {addrs[4]} | IPv6: {addrs[6]}")
+
+    cmds = []
+    for af, fabnet in ((4, fablib.FABNETV4_SUBNET), (6, fablib.FABNETV6_SUBNET)):
+        intf = node.get_interface(network_name=f'net{af}')
+        devname = intf.get_device_name()
+        net = intf.get_network()
+        cmds += [
+            f"sudo ip link set {shlex.quote(devname)} up",
+            f"sudo ip link set {shlex.quote(devname)} mtu 9000",
+            f"sudo ip -{af} addr flush dev {shlex.quote(devname)}",
+            f"sudo ip -{af} addr add {shlex.quote(addrs[af])}/{net.get_subnet().prefixlen} dev {shlex.quote(devname)}",
+            f"sudo ip -{af} route replace {fabnet} via {_validate_ip(net.get_gateway())}"
+        ]
+    stdout, stderr = node.execute('\n'.join(cmds))
+    if stderr:
+        print(f"[{site}] Interface config errors:\n{stderr}")
+    return addrs
+
+
+def bring_up(fablib, lifecycle, pipeline, site):
+    """
+    Provision and configure one site, then hand it to the probe pipeline right away.
+    """
+    outcome = lifecycle.provision(site, partial(create_mtu_slice, fablib, site))
+    if not outcome.ok:
+        pipeline.fail(site, outcome.error)
+        return outcome
+    try:
+        addrs = configure_interfaces(fablib, site, outcome.slice)
+    except Exception as e:
+        print(f"[{site}] Interface configuration failed: {e}")
+        outcome.exception = e
+        pipeline.fail(site, str(e))
+        return outcome
+    pipeline.add(site, outcome.slice.get_node('node'), addrs)
+    return outcome
 
 
 def test_mtu_probe(fablib):
-    with fim_lock:
-        existing_slices = list_mtu_slices(fablib)
-        for site, slice_obj in existing_slices.items():
-            print(f"[{site}] Deleting existing MTU slice")
-            slice_obj.delete()
-
-        slices = {}
-        addrs = {}
-
-        for site in SITES_ONLY:
-            slice_obj = fablib.new_slice(name=SLICE_PREFIX + site)
-            node = slice_obj.add_node(name='node', site=site, cores=1, ram=2, disk=10, image='default_ubuntu_22')
-
-            intfs = node.add_component(model=NIC_MODEL, name='nic0').get_interfaces()
-            if len(intfs) < 2:
-                intfs += node.add_component(model=NIC_MODEL, name='nic1').get_interfaces()
-
-            intf4, intf6 = intfs[:2]
-            slice_obj.add_l3network(name='net4', interfaces=[intf4], type='IPv4')
-            slice_obj.add_l3network(name='net6', interfaces=[intf6], type='IPv6')
-
-            print(f"[{site}] Submitting slice")
-            slice_obj.submit(wait=True)
-            slice_obj.wait_ssh(progress=False)
-            slice_obj.post_boot_config()
-            slices[site] = slice_obj
-
-        for site, slice_obj in slices.items():
-            node = slice_obj.get_node('node')
-            ipv4 = _validate_ip(slice_obj.get_l3network('net4').get_available_ips()[0])
-            ipv6 = _validate_ip(slice_obj.get_l3network('net6').get_available_ips()[0])
-            addrs[site] = {4: ipv4, 6: ipv6}
-            print(f"[{site}] IPv4: {ipv4} | IPv6: {ipv6}")
-
-        # Configure interfaces
-        print("\nApplying interface configs...")
-        for site, slice_obj in slices.items():
-            node = slice_obj.get_node('node')
-            cmds = []
-            for af in [4, 6]:
-                intf = node.get_interface(network_name=f'net{af}')
-                devname = intf.get_device_name()
-                addr = addrs[site][af]
-                net = intf.get_network()
-                cmds += [
-                    f"sudo ip link set {shlex.quote(devname)} up",
-                    f"sudo ip link set {shlex.quote(devname)} mtu 9000",
-                    f"sudo ip -{af} addr flush dev {shlex.quote(devname)}",
-                    f"sudo ip -{af} addr add {shlex.quote(addr)}/{net.get_subnet().prefixlen} dev {shlex.quote(devname)}"
-                ]
-                for dst_site in slices:
-                    if dst_site != site:
-                        cmds.append(f"sudo ip -{af} route replace {addrs[dst_site][af]} via {_validate_ip(net.get_gateway())}")
-            stdout, stderr = node.execute('\n'.join(cmds))
-            if stderr:
-                print(f"[{site}] Interface config errors:\n{stderr}")
-
-        # MTU probing
-        results = {}
-        for af, overhead in {4: 28, 6: 48}.items():
-            print(f"\nIPv{af} ping MTU test results:")
-            print("src\\dst".ljust(WIDTH_TD), end='')
-            for dst in slices:
-                print(f" | {dst.center(WIDTH_TD)}", end='')
-            print()
-            print('-' * (WIDTH_TD + 1) + ('|' + '-' * (WIDTH_TD + 2)) * len(slices))
-            for src in slices:
-                node = slices[src].get_node('node')
-                row = src.ljust(WIDTH_TD)
-                for dst in slices:
-                    cmds = [
-                        f"ping -I {addrs[src][af]} -c 4 -i 0.2 -W 0.8 -M do -s {mtu - overhead} {addrs[dst][af]}"
-                        for mtu in PROBE_MTUS
-                    ]
-                    stdout, stderr = node.execute("\n".join(cmds))
-                    row += " | " + parse_ping_results(stdout, PROBE_MTUS)
-                print(row)
-
-        # Cleanup
-        print("\nDeleting all slices...")
-        for site, slice_obj in slices.items():
-            print(f"[{site}] Deleting slice")
-            slice_obj.delete()
+    existing_slices = list_mtu_slices(fablib)
+    delete_slices(existing_slices)
+
+    # Every site is submitted without blocking; each one is configured as soon as it is up
+    # and probed against the sites already up, while the others are still provisioning.
+    cache = MtuCache.load() if MTU_MODE == 'discover' else None
+    if MTU_MODE == 'discover':
+        sweep = partial(discover_source, cache=cache)
+    else:
+        sweep = partial(probe_source, mtus=PROBE_MTUS)
+    pipeline = MtuPipeline(sweep)
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("MTU"))
+    with ThreadPoolExecutor(max_workers=len(SITES_ONLY)) as executor:
+        outcomes = dict(zip(SITES_ONLY, executor.map(partial(bring_up, fablib, lifecycle, pipeline), SITES_ONLY)))
+    matrix = pipeline.result()
+    if cache is not None:
+        cache.save()
+
+    results = StreamingResults("mtu_probe.json")
+    for (src, dst, af), cell in matrix.items():
+        results[f"{src}->{dst}/IPv{af}"] = cell.to_dict()
+    for af in OVERHEAD:
+        print(f"\nIPv{af} ping MTU test results:")
+        print(format_matrix(matrix, SITES_ONLY, af))
+    results.save()
+
+    # Cleanup; sites that failed to come up are kept for inspection until the next run.
+    print("\nDeleting all slices...")
+    for site, outcome in outcomes.items():
+        if not outcome.ok:
+            print(f"[{site}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices({site: outcome.slice for site, outcome in outcomes.items() if outcome.ok})
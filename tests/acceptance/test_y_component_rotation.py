@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+# Author: Komal Thareja (kthare10@renci.org)
+import pytest
+
+from tests.poller import get_poller
+from tests.timing import ATTACH, COMPONENT, DETACH, format_table, provisioning_timer, summarize
+from tests.lifecycle import SliceLifecycle, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import save_results_json
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index
+from tests.base_test import fabric_rc, fim_lock
+from tests.rotation import ROTATION, ComponentRotation, rotation_plan
+from tests.warm_pool import WarmPool
+
+MAX_PARALLEL_SITES = 5
+
+pytestmark = pytest.mark.skipif(not ROTATION, reason="set FABRIC_COMPONENT_ROTATION=1 to rotate components")
+
+
+@pytest.fixture(scope="module")
+def fablib():
+    fablib = get_fablib(fabric_rc)
+    fablib.show_config()
+    return fablib
+
+
+def test_component_rotation_per_site(fablib, warm_pool):
+    plan = rotation_plan(load_capacity_index(fablib))
+    results = StreamingResults("component_rotation.json")
+
+    # Without the session pool the rotation keeps its own VMs for the length of the module.
+    pool = warm_pool or WarmPool(fablib, lock=fim_lock, poller=get_poller(fablib),
+                                 on_event=provisioning_timer.observer("WarmVM"), slice_prefix="test-y-rotation")
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES}, poller=get_poller(fablib))
+    rotation = ComponentRotation(pool, lifecycle)
+    for key, result in rotation.run(plan).items():
+        results[key] = result
+
+    print("TEST SUMMARY==========================================================================================")
+    for key, info in sorted(results.items()):
+        if info.get("skipped"):
+            print(f"{key}: SKIPPED ({info['skipped']})")
+        else:
+            print(f"{key}: PASS" if info["state"] else f"{key}: {info.get('error')}")
+    timings = [t for t in provisioning_timer.timings if t.stage in (ATTACH, DETACH)]
+    if timings:
+        print(format_table(summarize(timings, by=COMPONENT), by=COMPONENT))
+    if warm_pool is None:
+        pool.close()
+
+    save_results_json(results, filename="component_rotation.json")
+    print("TEST SUMMARY==========================================================================================")
+
+    failed = [key for key, info in results.items() if not info["state"]]
+    assert not failed, f"Component rotation failed on: {', '.join(failed)}"
@@ -22,21 +22,22 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 # Author: Komal Thareja (kthare10@renci.org)
-import traceback
 import pytest
 import time
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from concurrent.futures import ThreadPoolExecutor, as_completed
-
-from tests.utils import error_message, save_results_json, wait_and_configure_slices
+from functools import partial
+
+from tests.poller import get_poller
+from tests.timing import provisioning_timer
+from tests.lifecycle import SliceLifecycle, split_outcomes, SUBMIT
+from tests.result_sink import StreamingResults
+from tests.utils import error_message, save_results_json, failure_result
+from tests.fablib_pool import get_fablib
+from tests.capacity import load_capacity_index, GPU_MODELS
+from tests.teardown import delete_slices
 from tests.base_test import fabric_rc, fim_lock
+from tests.aggregate import AGGREGATE, provision_aggregated
+from tests.topology import ComponentSpec, NodeSpec, TopologyTemplate
 
-GPU_MODELS = {
-    'GPU_TeslaT4': 'tesla_t4_capacity',
-    'GPU_RTX6000': 'rtx6000_capacity',
-    'GPU_A30': 'a30_capacity',
-    'GPU_A40': 'a40_capacity'
-}
 
 VM_CONFIG = {
     "cores": 6,
@@ -48,45 +49,37 @@ MAX_PARALLEL_SITES = 5    # Max number of concurrent slice creations
 CUDA_VERSION = '12.6'
 DISTRO = 'ubuntu2204'
 ARCH = 'x86_64'
+TOPOLOGY = TopologyTemplate(nodes=(
+    NodeSpec(name="gpu-node", cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"],
+             image='default_ubuntu_24', components=(ComponentSpec(model="{gpu_model}", name="gpu1-{gpu_model}"),)),
+))
 
 
 @pytest.fixture(scope="module")
 def fablib():
-    fablib = FablibManager(fabric_rc=fabric_rc)
+    fablib = get_fablib(fabric_rc)
     fablib.show_config()
     return fablib
 
 
-def get_active_sites(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active"]
+def get_gpu_site_models(fablib):
+    """Return (site, GPU model) pairs for every site offering the model."""
+    index = load_capacity_index(fablib)
+    return [(index.inventory.get_site(site_name), gpu_model)
+            for site_name, gpu_model in index.component_pairs(GPU_MODELS)]
 
 
-def create_and_submit_slice(site, gpu_model):
+def create_slice(site, gpu_model):
     """
-    Create and submit a slice at the given site using non-blocking submit.
+    Build the slice topology for the given site and GPU model; submission is done by the lifecycle.
     Returns the slice object.
     """
-    with fim_lock:
-        fablib = FablibManager(fabric_rc=fabric_rc)
-        site_name = site["name"]
-        slice_name = f"test-z-312-{site_name.lower()}-{gpu_model.lower()}-{int(time.time())}"
-
-        print(f"[{site_name}] Creating slice: {slice_name}")
-        slice_obj = fablib.new_slice(name=slice_name)
-        node = slice_obj.add_node(name="gpu-node", site=site_name,
-                                  cores=VM_CONFIG["cores"], ram=VM_CONFIG["ram"], disk=VM_CONFIG["disk"],
-                                  image='default_ubuntu_24')
-        node.add_component(model=gpu_model, name=f"gpu1-{gpu_model}")
-        slice_obj.submit(wait=False)
-        return slice_obj
-
+    fablib = get_fablib(fabric_rc)
+    site_name = site["name"]
+    slice_name = f"test-z-312-{site_name.lower()}-{gpu_model.lower()}-{int(time.time())}"
 
-def delete_slice(slice_obj):
-    try:
-        print(f"[{slice_obj.get_name()}] Deleting slice...")
-        slice_obj.delete()
-    except Exception as e:
-        print(f"[{slice_obj.get_name()}] Slice deletion error: {e}")
+    print(f"[{site_name}] Creating slice: {slice_name}")
+    return TOPOLOGY.new_slice(fablib, slice_name, site=site_name, gpu_model=gpu_model)
 
 
 def test_create_gpu_vms_per_site(fablib):
@@ -94,40 +87,30 @@ def test_create_gpu_vms_per_site(fablib):
     version = '12.6'
     architecture = 'x86_64'
 
-    sites = get_active_sites(fablib)
-    results = {}
-
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_SITES) as executor:
-        future_to_site = {}
-        for site in sites:
-            for gpu_model, model_key in GPU_MODELS.items():
-                if site.get(model_key, 0) == 0:
-                    continue
-                future = executor.submit(create_and_submit_slice, site, gpu_model)
-                site_name = site["name"]
-                future_to_site[future] = f"{site_name}_{gpu_model}"
-
-        slice_objects = {}
-        for future in as_completed(future_to_site):
-            site_name_gpu_model = future_to_site[future]
-            try:
-                slice_obj = future.result()
-                slice_objects[site_name_gpu_model] = slice_obj
-            except Exception as e:
-                print(f"[{site_name}] Error submitting slice: {e}")
-                traceback.print_exc()
-                results[site_name_gpu_model] = {
-                    "state": False,
-                    "error": error_message(slice_obj=slice_obj, exception=e),
-                    "slice_id": f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
-                }
-
-    wait_and_configure_slices(slice_objects)
-
-    # Wait for all slices to complete provisioning
+    site_models = get_gpu_site_models(fablib)
+    results = StreamingResults("gpu.json")
+
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES},
+                               poller=get_poller(fablib), on_event=provisioning_timer.observer("GPU"))
+    if AGGREGATE:
+        outcomes = provision_aggregated(lifecycle, fablib, TOPOLOGY, {
+            f"{site['name']}_{gpu_model}": {"site": site["name"], "gpu_model": gpu_model}
+            for site, gpu_model in site_models
+        }, slice_prefix="test-z-312-gpu")
+    else:
+        outcomes = lifecycle.run({
+            f"{site['name']}_{gpu_model}": partial(create_slice, site, gpu_model)
+            for site, gpu_model in site_models
+        })
+
+    slice_objects, failures = split_outcomes(outcomes)
+    for site_name_gpu_model, outcome in failures.items():
+        results[site_name_gpu_model] = failure_result(slice_obj=outcome.slice, exception=outcome.exception)
+
+    # Validate the provisioned slices
     for site_name_gpu_model, slice_obj in slice_objects.items():
-        success = slice_obj.get_state() in ["StableOK", "StableError"]
-        results[site_name] = {
+        success = outcomes[site_name_gpu_model].state in ["StableOK", "StableError"]
+        results[site_name_gpu_model] = {
             "state": success,
             "error": ""
         }
@@ -141,7 +124,7 @@ def test_create_gpu_vms_per_site(fablib):
                 stdout, stderr = node.execute(cmd)
                 if not('NVIDIA' in stdout and '3D controller' in stdout):
                     raise Exception("GPU not detected")
-                results[site_name] = {
+                results[site_name_gpu_model] = {
                     "state": True,
                     "error": ""
                 }
@@ -184,15 +167,17 @@ def test_create_gpu_vms_per_site(fablib):
                 }
 
     print("TEST SUMMARY==========================================================================================")
-    # Cleanup only successful slices
+    # Cleanup only successful slices, all at once
+    slices_to_delete = {}
     for key, slice_obj in slice_objects.items():
         site_info = results.get(key, {})
         if site_info.get("state", False):
             print(f"{key}: PASS")
-            delete_slice(slice_obj)
+            slices_to_delete[key] = slice_obj
         else:
             print(f"{key}: {site_info.get('error')}")
             print(f"[{key}] Skipping deletion because slice failed. Please inspect manually.")
+    delete_slices(slices_to_delete)
 
     save_results_json(results, filename="gpu.json")
     print("TEST SUMMARY==========================================================================================")
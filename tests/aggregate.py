@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Aggregate slices: many independent per-site topologies packed into a few large slices.
+
+Per-site tests submit, poll and delete one slice per site. With ``FABRIC_AGGREGATE=1``
+:func:`provision_aggregated` instead builds ``FABRIC_AGGREGATE_SIZE`` members (sites)
+into each slice, so a 30-site run costs a handful of orchestrator cycles. Every member
+gets a :class:`MemberSlice` view standing in for its per-site slice: node and network
+names are the template's, results stay per site, and a member whose slivers failed
+fails alone. Members at sites that came up are configured node by node when the
+slice as a whole ended in StableError.
+"""
+import os
+import re
+import threading
+import time
+from typing import Hashable
+
+from tests.lifecycle import POST_BOOT_CONFIG, WAIT_SSH, SliceLifecycle, SliceOutcome
+from tests.topology import TopologyTemplate
+
+AGGREGATE = os.getenv("FABRIC_AGGREGATE", "0").lower() in ("1", "true", "yes")
+AGGREGATE_SIZE = int(os.getenv("FABRIC_AGGREGATE_SIZE", "10"))
+
+ACTIVE = "Active"
+FAILED = "Failed"
+STABLE_OK = "StableOK"
+STABLE_ERROR = "StableError"
+
+
+def member_prefix(key: Hashable) -> str:
+    """
+    Node name prefix of a member; FIM names allow word characters, dashes and dots.
+    """
+    return re.sub(r"[^\w.-]+", "-", str(key)).lower()
+
+
+class AggregateSlice:
+    """
+    A slice shared by several members; deleted once every member has released it.
+    """
+    def __init__(self, slice_obj, prefixes: list[str]):
+        self.slice = slice_obj
+        self.pending = set(prefixes)
+        self._lock = threading.Lock()
+
+    def release(self, prefix: str) -> bool:
+        """
+        Release ``prefix``'s share; deletes the slice and returns True for the last member.
+        """
+        with self._lock:
+            self.pending.discard(prefix)
+            last = not self.pending
+        if last:
+            self.slice.delete()
+        else:
+            print(f"[{prefix}] Keeping {self.slice.get_name()} for {len(self.pending)} other member(s)")
+        return last
+
+
+class MemberSlice:
+    """
+    One member's view of an aggregate slice, used like the member's own slice.
+    Anything not overridden is answered by the aggregate slice.
+    """
+    def __init__(self, aggregate: AggregateSlice, prefix: str):
+        self.aggregate = aggregate
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        return getattr(self.aggregate.slice, name)
+
+    def _name(self, name: str) -> str:
+        return f"{self.prefix}-{name}"
+
+    def get_nodes(self):
+        return [node for node in self.aggregate.slice.get_nodes() if node.get_name().startswith(self._name(""))]
+
+    def get_node(self, name: str):
+        return self.aggregate.slice.get_node(self._name(name))
+
+    def get_network(self, name: str):
+        return self.aggregate.slice.get_network(self._name(name))
+
+    def get_l2network(self, name: str):
+        return self.aggregate.slice.get_l2network(self._name(name))
+
+    def get_l3network(self, name: str):
+        return self.aggregate.slice.get_l3network(self._name(name))
+
+    def failed_nodes(self) -> dict[str, str]:
+        """
+        Member nodes whose sliver is not Active, with their error messages.
+        """
+        return {node.get_name(): node.get_error_message() or f"sliver {node.get_reservation_state()}"
+                for node in self.get_nodes() if node.get_reservation_state() != ACTIVE}
+
+    def get_state(self) -> str:
+        state = self.aggregate.slice.get_state()
+        if state == STABLE_ERROR and not self.failed_nodes():
+            return STABLE_OK
+        return state
+
+    def build_error_exception_string(self) -> str:
+        return "\n".join(f"{name}: {error}" for name, error in self.failed_nodes().items())
+
+    def wait_ssh(self, timeout: int = 1800, interval: int = 20, progress: bool = False):
+        """
+        Wait until every member node answers over SSH. ``Slice.wait_ssh`` cannot be used
+        on its own share: it waits for the whole slice, which may be in StableError.
+        """
+        # A simulated testbed runs on a compressed clock (tests/simulator.py).
+        scale = getattr(self.aggregate.slice.get_fablib_manager(), "time_scale", 1)
+        deadline = time.monotonic() + timeout * scale
+        pending = self.get_nodes()
+        while True:
+            pending = [node for node in pending if not node.test_ssh()]
+            if not pending:
+                return True
+            if time.monotonic() >= deadline:
+                raise TimeoutError(f"Timeout exceeded ({timeout} sec) waiting for ssh on "
+                                   f"{', '.join(node.get_name() for node in pending)}")
+            time.sleep(interval * scale)
+
+    def post_boot_config(self):
+        for node in self.get_nodes():
+            node.config()
+
+    def delete(self):
+        self.aggregate.release(self.prefix)
+
+
+def provision_aggregated(lifecycle: SliceLifecycle, fablib, template: TopologyTemplate,
+                         members: dict[Hashable, dict], slice_prefix: str,
+                         per_slice: int = AGGREGATE_SIZE) -> dict[Hashable, SliceOutcome]:
+    """
+    Provision ``template`` once per member, ``per_slice`` members to a slice.
+
+    :param lifecycle: Lifecycle driving the aggregate slices.
+    :param fablib: Fablib manager creating the slices.
+    :param template: Topology of one member.
+    :param members: Member key (e.g. site name) to the template's fields.
+    :param slice_prefix: Aggregate slices are named ``{slice_prefix}-agg{n}-{timestamp}``.
+    :param per_slice: Members per slice.
+    :return: Member key to its outcome; ``slice`` is the member's :class:`MemberSlice`.
+    """
+    groups = [list(members.items())[i:i + per_slice] for i in range(0, len(members), per_slice)]
+    views = {}
+
+    def builder(n: int, group: list):
+        def build():
+            combined = TopologyTemplate.combine(template.member(i) for i in range(len(group)))
+            fields = {}
+            for i, (key, member_fields) in enumerate(group):
+                fields.update({f"{name}_{i}": value for name, value in member_fields.items()})
+                fields[f"member_{i}"] = member_prefix(key)
+            slice_obj = fablib.new_slice(name=f"{slice_prefix}-agg{n}-{int(time.time())}")
+            aggregate = AggregateSlice(slice_obj, [member_prefix(key) for key, _ in group])
+            views[n] = {key: MemberSlice(aggregate, member_prefix(key)) for key, _ in group}
+            return combined.instantiate(slice_obj, **fields)
+        return build
+
+    outcomes = lifecycle.run({f"agg{n}": builder(n, group) for n, group in enumerate(groups)})
+    results = {}
+    for n, group in enumerate(groups):
+        outcome = outcomes[f"agg{n}"]
+        for key, _ in group:
+            member = views.get(n, {}).get(key)
+            results[key] = SliceOutcome(key=key, slice=member, stage=outcome.stage, state=outcome.state,
+                                        submitted=outcome.submitted, exception=outcome.exception,
+                                        elapsed=dict(outcome.elapsed), started=outcome.started)
+        if outcome.submitted and not outcome.ok:
+            _settle_members(outcome, [results[key] for key, _ in group])
+    return results
+
+
+def _settle_members(outcome: SliceOutcome, members: list[SliceOutcome]):
+    """
+    Attribute a failed aggregate slice to its members: members with a failed sliver
+    keep the failure, the others are configured on their own.
+    """
+    try:
+        outcome.slice.update()
+    except Exception as e:
+        print(f"[{outcome.key}] Slice update error: {e}")
+    for member in members:
+        try:
+            failed = member.slice.failed_nodes()
+            if failed:
+                member.exception = Exception(member.slice.build_error_exception_string())
+                continue
+            for stage, run in ((WAIT_SSH, member.slice.wait_ssh), (POST_BOOT_CONFIG, member.slice.post_boot_config)):
+                member.stage = stage
+                start = time.monotonic()
+                try:
+                    run()
+                finally:
+                    member.elapsed[stage] = time.monotonic() - start
+            member.exception = None
+        except Exception as e:
+            member.exception = e
+        finally:
+            member.state = member.slice.get_state()
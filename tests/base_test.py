@@ -29,14 +29,15 @@ import socket
 import time
 import unittest
 
-from fabrictestbed_extensions.fablib.fablib import FablibManager as fablib_manager
 from fabrictestbed_extensions.fablib.node import Node
 
 from threading import Lock
 
+from tests.fablib_pool import get_fablib
+
 fim_lock = Lock()
 
-_DEVNAME_RE = re.compile(r'^[a-zA-Z0-9._-]+$')
+_DEVNAME_RE = re.compile(r'^(/dev/)?[a-zA-Z0-9._-]+$')
 
 
 def _validate_ip(addr_str):
@@ -66,7 +67,7 @@ class BaseTest(unittest.TestCase):
         time_stamp = time.strftime("%Y-%m-%d %H:%M:%S")
         host = socket.gethostname()
         slice_name = f"ST-Slice-{self.prefix}-{time_stamp}-{host}"
-        self._fablib = fablib_manager(fabric_rc=fabric_rc)
+        self._fablib = get_fablib(fabric_rc)
         self._slice = self._fablib.new_slice(name=slice_name)
 
     def check_slice(self, node_cnt: int = 0, network_cnt: int = 0):
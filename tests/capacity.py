@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import weakref
+from bisect import bisect_left
+
+from tests.inventory import Inventory, load_inventory
+
+# Component model -> prefix of the "<prefix>_capacity" / "<prefix>_available" site fields.
+COMPONENT_FIELDS = {
+    "NIC_Basic": "nic_basic",
+    "NIC_ConnectX_5": "nic_connectx_5",
+    "NIC_ConnectX_6": "nic_connectx_6",
+    "NVME_P4510": "nvme",
+    "GPU_TeslaT4": "tesla_t4",
+    "GPU_RTX6000": "rtx6000",
+    "GPU_A30": "a30",
+    "GPU_A40": "a40",
+    "FPGA_Xilinx_U280": "fpga_u280",
+}
+GPU_MODELS = ("GPU_TeslaT4", "GPU_RTX6000", "GPU_A30", "GPU_A40")
+SMART_NIC_MODELS = ("NIC_ConnectX_5", "NIC_ConnectX_6")
+
+_lock = threading.Lock()
+_indexes = weakref.WeakKeyDictionary()
+
+
+def component_field(model: str, available: bool = False) -> str:
+    """
+    Site field holding the total (or, with ``available``, currently free) count of ``model``.
+    """
+    prefix = COMPONENT_FIELDS.get(model, model.lower())
+    return f"{prefix}_available" if available else f"{prefix}_capacity"
+
+
+class CapacityIndex:
+    """
+    Precomputed per-field lookup over an :class:`Inventory` for component-aware site selection.
+
+    Every numeric site field is kept sorted once, so "sites with at least N" is a bisect, and
+    each distinct query is answered once and memoized; repeated queries from different test
+    modules are dictionary lookups. Results keep the inventory's site order.
+
+    Queries are declarative::
+
+        index.sites(hosts=2, available={"NIC_ConnectX_6": 1})
+        index.component_pairs(GPU_MODELS)
+
+    :param inventory: Snapshot to index.
+    :type inventory: Inventory
+    :param state: Only sites in this state are considered; ``None`` keeps all sites.
+    :type state: str
+    """
+    def __init__(self, inventory: Inventory, state: str | None = "Active"):
+        self.inventory = inventory
+        self.order = {site["name"]: i for i, site in enumerate(inventory.site_list(state=state))}
+        # field -> (ascending values, site names in the same order)
+        self.columns = {}
+        for field, values in inventory.site_fields.items():
+            ranked = sorted((value, self.order[name], name) for name, value in values.items() if name in self.order)
+            self.columns[field] = ([value for value, _, _ in ranked], [name for _, _, name in ranked])
+        self._at_least = {}
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def at_least(self, field: str, minimum: float) -> frozenset:
+        """
+        Names of indexed sites whose ``field`` is at least ``minimum``.
+        """
+        key = (field, minimum)
+        result = self._at_least.get(key)
+        if result is None:
+            values, names = self.columns.get(field, ([], []))
+            result = frozenset(names[bisect_left(values, minimum):])
+            self._at_least[key] = result
+        return result
+
+    def sites(self, hosts: int = 0, components: dict = None, available: dict = None,
+              fields: dict = None, exclude=()) -> list[str]:
+        """
+        Names of sites satisfying every requirement.
+
+        :param hosts: Minimum number of worker hosts.
+        :param components: Component model -> minimum total capacity, e.g. ``{"NVME_P4510": 2}``.
+        :param available: Component model -> minimum currently free count.
+        :param fields: Raw site field -> minimum value, for anything not covered above.
+        :param exclude: Site names to leave out.
+        :rtype: list[str]
+        """
+        requirements = dict(fields or {})
+        if hosts:
+            requirements["hosts"] = hosts
+        for model, minimum in (components or {}).items():
+            requirements[component_field(model)] = minimum
+        for model, minimum in (available or {}).items():
+            requirements[component_field(model, available=True)] = minimum
+
+        key = (frozenset(requirements.items()), frozenset(exclude))
+        result = self._queries.get(key)
+        if result is None:
+            with self._lock:
+                matches = set(self.order)
+                for field, minimum in sorted(requirements.items(), key=lambda r: len(self.at_least(*r))):
+                    matches &= self.at_least(field, minimum)
+                    if not matches:
+                        break
+                matches -= key[1]
+                result = tuple(sorted(matches, key=self.order.__getitem__))
+                self._queries[key] = result
+        return list(result)
+
+    def site_list(self, **requirements) -> list[dict]:
+        """
+        Same as :meth:`sites` but returns the site dictionaries.
+        """
+        return [self.inventory.sites[name] for name in self.sites(**requirements)]
+
+    def component_pairs(self, models, minimum: int = 1, available: bool = False, hosts: int = 0) -> list[tuple[str, str]]:
+        """
+        All ``(site, model)`` pairs where the site offers at least ``minimum`` of ``model``.
+        """
+        key = ("pairs", tuple(models), minimum, available, hosts)
+        result = self._queries.get(key)
+        if result is None:
+            pairs = []
+            for model in models:
+                requirement = {model: minimum}
+                if available:
+                    matched = self.sites(hosts=hosts, available=requirement)
+                else:
+                    matched = self.sites(hosts=hosts, components=requirement)
+                pairs.extend((site, model) for site in matched)
+            result = tuple(sorted(pairs, key=lambda pair: self.order[pair[0]]))
+            self._queries[key] = result
+        return list(result)
+
+
+def capacity_index(inventory: Inventory) -> CapacityIndex:
+    """
+    The :class:`CapacityIndex` for ``inventory``, built once per snapshot.
+    """
+    with _lock:
+        index = _indexes.get(inventory)
+        if index is None:
+            index = CapacityIndex(inventory)
+            _indexes[inventory] = index
+        return index
+
+
+def load_capacity_index(fablib, **kwargs) -> CapacityIndex:
+    """
+    Capacity index over the shared inventory snapshot; ``kwargs`` go to :func:`load_inventory`.
+    """
+    return capacity_index(load_inventory(fablib, **kwargs))
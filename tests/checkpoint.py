@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import os
+import threading
+import time
+
+PROVISIONED = "provisioned"
+CONFIGURED = "configured"
+# Slice states worth re-adopting on resume; anything else is rebuilt.
+ADOPTABLE_STATES = ("StableOK", "ModifyOK")
+
+
+class SweepCheckpoint:
+    """
+    Progress of a multi-slice sweep, persisted after every change so a crashed run can
+    resume where it stopped.
+
+    The file records, per slice, the stages it completed (``provisioned``,
+    ``configured``) with its worker and slice ID; the planned measurement pairs; and per
+    pair, the result of each completed check (e.g. ``ping``, ``iperf3``).
+
+    :param path: Checkpoint file.
+    :type path: str
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = self._empty()
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"created": time.time(), "slices": {}, "plan": None, "pairs": {}}
+
+    @classmethod
+    def load(cls, path: str) -> "SweepCheckpoint":
+        checkpoint = cls(path)
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            checkpoint.data.update({key: data[key] for key in checkpoint.data if key in data})
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable checkpoint {path}: {e}")
+        return checkpoint
+
+    def _save_locked(self):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f, indent=2, default=str)
+        os.replace(tmp, self.path)
+
+    def reset(self):
+        with self._lock:
+            self.data = self._empty()
+            self._save_locked()
+
+    def remove(self):
+        with self._lock:
+            self.data = self._empty()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+    # Slices
+    def mark(self, slice_name: str, stage: str, **info):
+        """
+        Record that ``slice_name`` completed ``stage``; ``info`` (e.g. worker, slice_id) is merged in.
+        """
+        with self._lock:
+            entry = self.data["slices"].setdefault(slice_name, {"stages": []})
+            if stage not in entry["stages"]:
+                entry["stages"].append(stage)
+            entry.update(info)
+            self._save_locked()
+
+    def stages(self, slice_name: str) -> set:
+        with self._lock:
+            return set(self.data["slices"].get(slice_name, {}).get("stages", []))
+
+    def slice_info(self, slice_name: str) -> dict:
+        with self._lock:
+            return dict(self.data["slices"].get(slice_name, {}))
+
+    def forget(self, slice_name: str):
+        """
+        Drop a slice and every pair measurement it took part in.
+        """
+        with self._lock:
+            self.data["slices"].pop(slice_name, None)
+            for key in [k for k, v in self.data["pairs"].items() if slice_name in (v.get("src"), v.get("dst"))]:
+                del self.data["pairs"][key]
+            self._save_locked()
+
+    # Pairs
+    def plan(self, available=None) -> list[tuple] | None:
+        """
+        The saved measurement pairs, or None if there is none or it references a slice
+        not in ``available``.
+        """
+        with self._lock:
+            plan = self.data["plan"]
+        if plan is None:
+            return None
+        pairs = [tuple(pair) for pair in plan]
+        if available is not None and any(src not in available or dst not in available for src, dst in pairs):
+            return None
+        return pairs
+
+    def set_plan(self, pairs):
+        with self._lock:
+            self.data["plan"] = [list(pair) for pair in pairs]
+            self._save_locked()
+
+    def record_check(self, src: str, dst: str, check: str, result, **extra):
+        """
+        Record the result of one check of the ``src``->``dst`` pair.
+        """
+        with self._lock:
+            entry = self.data["pairs"].setdefault(f"{src}->{dst}", {"src": src, "dst": dst})
+            entry[check] = result
+            entry.update(extra)
+            self._save_locked()
+
+    def pair(self, src: str, dst: str) -> dict:
+        with self._lock:
+            return dict(self.data["pairs"].get(f"{src}->{dst}", {}))
+
+    def pending(self, pairs, check: str) -> list[tuple]:
+        """
+        Pairs from ``pairs`` whose ``check`` has not been recorded yet.
+        """
+        with self._lock:
+            done = {key for key, entry in self.data["pairs"].items() if check in entry}
+        return [(src, dst) for src, dst in pairs if f"{src}->{dst}" not in done]
+
+
+def adopt_slices(fablib, checkpoint: SweepCheckpoint, prefix: str) -> tuple[dict, list]:
+    """
+    Find the sweep's slices (names starting with ``prefix``) that are still usable.
+
+    Healthy slices are returned for re-use and marked provisioned in the checkpoint.
+    Slices in any other state, and checkpoint entries whose slice is gone, are dropped
+    from the checkpoint so they are rebuilt and re-measured.
+
+    :return: (slice name -> slice for adopted slices, list of unusable slices for deletion)
+    """
+    adopted = {}
+    stale = []
+    for slice_obj in fablib.get_slices():
+        name = slice_obj.get_name()
+        if not name.startswith(prefix):
+            continue
+        if slice_obj.get_state() in ADOPTABLE_STATES:
+            adopted[name] = slice_obj
+            if PROVISIONED not in checkpoint.stages(name):
+                checkpoint.mark(name, PROVISIONED, slice_id=slice_obj.get_slice_id())
+        else:
+            stale.append(slice_obj)
+            checkpoint.forget(name)
+
+    for name in list(checkpoint.data["slices"]):
+        if name not in adopted:
+            checkpoint.forget(name)
+    print(f"Resuming with {len(adopted)} existing slices, {len(stale)} unusable")
+    return adopted, stale
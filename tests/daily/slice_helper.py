@@ -23,113 +23,161 @@
 # SOFTWARE.
 # Author: Komal Thareja (kthare10@renci.org)
 import os
-import random
 import time
-import traceback
-from itertools import combinations
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from fabrictestbed_extensions.fablib.fablib import FablibManager
-from fabrictestbed_extensions.fablib.slice import Slice
+from functools import partial
 
 from tests.base_test import fabric_rc, fim_lock
+from tests.fablib_pool import fablib_pool
+from tests.inventory import load_inventory
+from tests.capacity import load_capacity_index
+from tests.lifecycle import SliceLifecycle, SUBMIT
+from tests.ssh_pool import ssh_pool
+from tests.checkpoint import SweepCheckpoint, adopt_slices, PROVISIONED, CONFIGURED
+from tests.utils import wait_and_configure_slices
+from tests.teardown import delete_slices
+from tests.poller import get_poller
+from tests.pairing import plan_pairs as plan_rotation, recent_failures
 
 SLICE_PREFIX = "iperf"
 DEFAULT_IMAGE = "default_ubuntu_22"
 NIC_MODEL = "NIC_Basic"
 MAX_PARALLEL = 4
+# Results history test of the sweep, whose failed pairs are re-tested.
+IPERF_TEST = "iperf_test_results"
 avoid = os.getenv('FABRIC_AVOID')
 if not avoid or len(avoid) == 0:
     avoid = ["EDUKY"]
 
 
 def get_fablib(fabric_rc=fabric_rc):
-    return FablibManager(fabric_rc=fabric_rc)
+    return fablib_pool.get(fabric_rc)
 
 
 def delete_existing_slices(fablib):
-    for slice_obj in fablib.get_slices():
-        if slice_obj.get_name().startswith(SLICE_PREFIX):
-            print(f"Deleting existing slice: {slice_obj.get_name()}")
-            try:
-                slice_obj.delete()
-            except Exception as e:
-                print(f"Error deleting slice: {e}")
+    existing = [s for s in fablib.get_slices() if s.get_name().startswith(SLICE_PREFIX)]
+    delete_slices(existing)
 
 
 def get_sites_with_workers(fablib):
-    return [site for site in fablib.list_sites(output="list") if site.get("state") == "Active"]
+    return load_capacity_index(fablib).site_list(hosts=1, components={NIC_MODEL: 1})
 
 
-def create_slice(site, worker):
+def create_slice(site, worker, fablib=None):
     site_name = site["name"]
-    try:
-        with fim_lock:
-            fablib = get_fablib()
-
-            slice_name = f"{SLICE_PREFIX}-{worker}-{int(time.time())}"
-            slice_obj = fablib.new_slice(name=slice_name)
-            node = slice_obj.add_node(name="node", site=site_name, cores=4, ram=16, disk=100,
-                                      image="docker_rocky_8",
-                                      host=worker)
-            node.add_fabnet(net_type="IPv4", nic_type='NIC_Basic')
-            node.add_post_boot_upload_directory('../scripts/node_tools', '.')
-            node.add_post_boot_execute('sudo node_tools/host_tune.sh')
-            node.add_post_boot_execute('node_tools/enable_docker.sh {{ _self_.image }} ')
-
-            try:
-                slice_obj.validate()
-            except Exception as e:
-                print(f"Validation failed for {slice_name}: {e}")
-                return f"{slice_name}", str(e)
-
-            print(f"Submitting slice {slice_name}")
-            slice_obj.submit(wait=False)
-            return slice_name, slice_obj
-    except Exception as e:
-        print(f"Failed to create slice for {site_name}@{worker}: {e}")
-        traceback.print_exc()
-        return f"{slice_name}", str(e)
+    fablib = fablib or get_fablib()
+
+    slice_name = f"{SLICE_PREFIX}-{worker}-{int(time.time())}"
+    print(f"Creating slice {slice_name} for {site_name}@{worker}")
+    slice_obj = fablib.new_slice(name=slice_name)
+    node = slice_obj.add_node(name="node", site=site_name, cores=4, ram=16, disk=100,
+                              image="docker_rocky_8",
+                              host=worker)
+    node.add_fabnet(net_type="IPv4", nic_type='NIC_Basic')
+    node.add_post_boot_upload_directory('../scripts/node_tools', '.')
+    node.add_post_boot_execute('sudo node_tools/host_tune.sh')
+    node.add_post_boot_execute('node_tools/enable_docker.sh {{ _self_.image }} ')
+
+    slice_obj.validate()
+    return slice_obj
+
+
+def worker_of(slice_name: str) -> str:
+    """Worker host encoded in a ``{SLICE_PREFIX}-{worker}-{timestamp}`` slice name."""
+    return slice_name[len(SLICE_PREFIX) + 1:].rsplit("-", 1)[0]
+
+
+def create_site_worker_slices(fablib, sites, skip_workers=()):
+    """
+    Build and submit one slice per active worker; waiting and configuration are left to the caller.
+
+    :param skip_workers: Workers that already have a slice.
+    :return: (slice name -> slice, slice name -> error string)
+    """
+    builders = {}
+    for site in sites:
+        if site.get("name") == "EDUKY":
+            continue
+        if site.get("state") != "Active":
+            continue
+        if site.get("state") in avoid:
+            continue
+        for host in load_inventory(fablib).active_hosts(site["name"]):
+            if host in skip_workers:
+                continue
+            builders[host] = partial(create_slice, site, host, fablib=fablib)
 
+    lifecycle = SliceLifecycle(lock=fim_lock, stage_limits={SUBMIT: MAX_PARALLEL}, configure=False)
+    outcomes = lifecycle.run(builders)
 
-def create_site_worker_slices(fablib, sites):
     slices = {}
     failed_slices = {}
+    for worker, outcome in outcomes.items():
+        slice_name = outcome.slice.get_name() if outcome.slice is not None else f"{SLICE_PREFIX}-{worker}"
+        if outcome.ok:
+            slices[slice_name] = outcome.slice
+        else:
+            print(f"Failed to create slice for {worker}: {outcome.error}")
+            failed_slices[slice_name] = outcome.error
+    return slices, failed_slices
 
-    with ThreadPoolExecutor(max_workers=MAX_PARALLEL) as executor:
-        futures = {}
-        for site in sites:
-            if site.get("name") == "EDUKY":
-                continue
-            if site.get("state") != "Active":
-                continue
-            if site.get("state") in avoid:
-                continue
-            site_obj = fablib.get_resources().get_site(site["name"])
-            for h in site_obj.get_hosts().values():
-                if h.get_state() != "Active":
-                    continue
-                f = executor.submit(create_slice, site, h.get_name())
-                futures[f] = (site, h)
-
-        for future in as_completed(futures):
-            site_worker = futures[future]
-            try:
-                slice_name, slice_obj_or_error = future.result()
-                if isinstance(slice_obj_or_error, Slice):
-                    slices[slice_name] = slice_obj_or_error
-                else:
-                    failed_slices[slice_name] = slice_obj_or_error
-            except Exception as e:
-                print(f"Exception for {site_worker}: {e}")
+
+def provision_sweep_slices(fablib, checkpoint: SweepCheckpoint, resume: bool = False):
+    """
+    Make sure every active worker has a configured sweep slice, recording progress in ``checkpoint``.
+
+    A fresh run deletes all existing sweep slices first. With ``resume``, healthy
+    existing slices are re-adopted, unusable ones deleted, and only missing slices are
+    created; only slices not yet configured are waited on and configured.
+
+    :return: (slice name -> slice, slice name -> creation error)
+    """
+    if resume:
+        slices, stale = adopt_slices(fablib, checkpoint, SLICE_PREFIX)
+        delete_slices(stale)
+    else:
+        checkpoint.reset()
+        delete_existing_slices(fablib)
+        slices = {}
+
+    sites = get_sites_with_workers(fablib)
+    existing_workers = {checkpoint.slice_info(name).get("worker") or worker_of(name) for name in slices}
+    new_slices, failed_slices = create_site_worker_slices(fablib, sites, skip_workers=existing_workers)
+    for name, slice_obj in new_slices.items():
+        checkpoint.mark(name, PROVISIONED, worker=worker_of(name), slice_id=slice_obj.get_slice_id())
+    slices.update(new_slices)
+
+    pending = {name: slice_obj for name, slice_obj in slices.items() if CONFIGURED not in checkpoint.stages(name)}
+    print(f"Configuring {len(pending)} of {len(slices)} slices")
+    for name, outcome in wait_and_configure_slices(pending, poller=get_poller(fablib)).items():
+        if outcome.ok:
+            checkpoint.mark(name, CONFIGURED)
     return slices, failed_slices
 
 
-def get_site_pairs(slices):
-    all_pairs = list(combinations(slices.keys(), 2))
-    count = len(slices) // 2  # Automatically use half the number of slices
-    if count > len(all_pairs):
-        raise ValueError(f"Cannot select {count} unique pairs from only {len(all_pairs)} possible combinations.")
-    return random.sample(all_pairs, count)
+def plan_pairs(slices, checkpoint: SweepCheckpoint):
+    """
+    The checkpointed measurement pairs if they are all still available, else today's pairing plan.
+    """
+    pairs = checkpoint.plan(available=slices)
+    if pairs is None:
+        pairs = [(src, dst) for src, dst in get_site_pairs(slices) if src != dst]
+        checkpoint.set_plan(pairs)
+    return pairs
+
+
+def get_site_pairs(slices, day=None):
+    """
+    Today's slice pairs: a rotation over the workers that covers every worker pair within
+    ``coverage_days`` runs, plus re-tests of worker pairs that failed recently.
+    """
+    # Slice names carry a timestamp; history and the rotation are keyed by worker.
+    by_worker = {worker_of(name): name for name in slices}
+    failures = {}
+    for link, weight in recent_failures(IPERF_TEST).items():
+        workers = tuple(sorted(worker_of(name) for name in link))
+        failures[workers] = failures.get(workers, 0) + weight
+    pairs = plan_rotation(by_worker, day=day, failures=failures, salt=IPERF_TEST)
+    return [(by_worker[src], by_worker[dst]) for src, dst in pairs]
 
 
 def collect_node_ips(slices):
@@ -145,19 +193,12 @@ def collect_node_ips(slices):
 
 def run_remote_command(node, cmd):
     try:
-        stdout, stderr = node.execute(cmd)
+        stdout, stderr = ssh_pool.execute(node, cmd)
         return stdout.strip(), stderr.strip()
     except Exception as e:
         return "", str(e)
 
 
 def cleanup_slices(slices, slices_to_keep):
-    for name, slice_obj in slices.items():
-        try:
-            if slice_obj.get_slice_id() in slices_to_keep:
-                continue
-            print(f"Deleting slice {name}")
-            slice_obj.delete()
-        except Exception as e:
-            print(f"Error deleting slice {name}: {e}")
+    return delete_slices(slices, keep=slices_to_keep)
 
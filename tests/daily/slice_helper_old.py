@@ -25,13 +25,18 @@
 import ipaddress
 import json
 import random
-import time
+import threading
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
 
 
 from fabrictestbed_extensions.fablib.fablib import FablibManager
 from fabrictestbed_extensions.fablib.node import Node
 
+from tests.pair_scheduler import run_pairs, run_rounds, print_round
+from tests.iperf import iperf_client_command, parse_iperf_json
+from tests.poller import get_poller
+
 
 class SliceHelper:
     """
@@ -51,7 +56,9 @@ class SliceHelper:
     :type wait: bool
     """
     def __init__(self, fablib_mgr: FablibManager, slice_name_prefix, sites, skip_hosts, docker_image, wait=True):
-        self.go_time = False
+        # Set once every slice is submitted; configure_slice waits on it
+        self.go_time = threading.Event()
+        self.poller = get_poller(fablib_mgr)
         self.fablib_mgr = fablib_mgr
         self.slice_name_prefix = slice_name_prefix
         self.sites = sites
@@ -64,6 +71,8 @@ class SliceHelper:
         self.all_nodes = []
         self.avoid_list = []
         self.details_of_failed_tests = []
+        # Guards summary.txt and the futures map, both written by concurrent run_pair calls.
+        self.summary_lock = threading.Lock()
 
     def configure_slice(self, slice_name=None, slice_id=None):
         """
@@ -76,8 +85,7 @@ class SliceHelper:
         :return: Configured slice object.
         :rtype: Slice
         """
-        while not self.go_time:
-            time.sleep(30)
+        self.go_time.wait()
 
         slice_object = None
         if slice_id or slice_name:
@@ -88,7 +96,7 @@ class SliceHelper:
             print(f"slice_name or slice_id required!")
             return None
 
-        slice_object.wait(progress=False)
+        self.poller.wait(slice_object)
         slice_object.wait_ssh(progress=False)
         slice_object.post_boot_config()
         return slice_object
@@ -141,7 +149,7 @@ class SliceHelper:
                         print(e)
                         continue
 
-            self.go_time = True
+            self.go_time.set()
             for thread in as_completed(self.future_tasks.keys()):
                 slice_object = self.future_tasks[thread]
                 print(f"************ Configure {slice_object.get_name()}, done! **************** ")
@@ -265,6 +273,9 @@ class SliceHelper:
         """
         Run tests between nodes in the slices.
 
+        Pairs run concurrently; with ``run_iperf`` they run in rounds in which each node
+        takes part in at most one pair, so iperf flows never share a node.
+
         :param run_iperf: Whether to run iperf tests.
         :type run_iperf: bool
         :param run_time: Duration for iperf tests, in seconds.
@@ -274,94 +285,28 @@ class SliceHelper:
         """
         if len(self.all_nodes) == 0:
             return False
-        with ThreadPoolExecutor(max_workers=5) as executor:
-            future_tasks = {}
-
-            for i in range(int(len(self.all_nodes)/2)):
-                try:
-                    source = random.choice(self.all_nodes)
-                    target = random.choice(self.all_nodes)
-
-                    if source.get_site() in self.avoid_list or target.get_site() in self.avoid_list:
-                        continue
-
-                    run_name = f"run_{source.get_name()}_{target.get_name()}"
-                    print(f"({i}) Running: {run_name} \t", end="")
-
-                    if run_iperf and source != target:
-                        stdout1, stderr1 = source.execute("docker run -d --rm "
-                                                          "--network host "
-                                                          f"{self.docker_image} "
-                                                          "iperf3 -s -1", quiet=True)
-
-                    target_addr = target.get_interface(network_name=f'FABNET_IPv4_{target.get_site()}').get_ip_addr()
-                    source_addr = source.get_interface(network_name=f'FABNET_IPv4_{source.get_site()}').get_ip_addr()
-
-                    stdout2a, stderr2a = target.execute(f"ping -c 3 {source_addr} > /dev/null ; ping -c 3 {source_addr} > /dev/null ; echo $?", quiet=True)
-                    stdout2a = stdout2a.strip()
-
-                    if stdout2a == '0':
-                        print(f"Success!")
-                    else:
-
-                        slice_object = source.get_slice()
-                        if source == target:
-                            source.get_slice().post_boot_config()
-                            stdout2a, stderr2a = target.execute(f"ping -c 10 {target_addr} > /dev/null ", quiet=False)
-                            print(f"Skip!!, {source} == {target}")
-                            continue
-                        else:
-                            try:
-                                future_tasks[executor.submit(self.configure_slice, slice_id=source.get_slice().get_slice_id())] = slice_object
-                            except Exception as e:
-                                print(f"{slice_object.get_name()} not found")
-                                print(e)
-
-                        '''
-                        slice_object = source.get_slice()
-                        slice_object.show()
-                        slice_object.list_nodes()
-                        slice_object.list_networks()
-                        slice_object.list_interfaces()
-                        '''
-
-                        print(f"Fail!!")
-                        print(f"Source slice: {source.get_slice().get_name()}/{source.get_slice().get_slice_id()} "
-                              f"Target Slice: {target.get_slice().get_name()}/{target.get_slice().get_slice_id()}")
-                        print(f"Source: {source.get_name()}: {source_addr}")
-                        print(f"{source.get_ssh_command()}")
-                        print(f"Target: {target.get_name()}: {target_addr}")
-                        print(f"{target.get_ssh_command()}")
-
-                        self.capture_failure(source=source, source_addr=source_addr, target=target,
-                                             target_addr=target_addr)
-
-                    if not run_iperf:
-                        continue
 
-                    stdout2, stderr2 = target.execute("docker run --rm "
-                                                      "--network host "
-                                                      f"{self.docker_image} "
-                                                      f"iperf3 -c {source_addr} -P 4 -t {run_time} -i 10 -O 10", 
-                                                      quiet=True, output_file=f"../results/{run_name}.log")
+        pairs = []
+        for i in range(int(len(self.all_nodes)/2)):
+            source = random.choice(self.all_nodes)
+            target = random.choice(self.all_nodes)
 
-                    lines = stdout2.splitlines()
-
-                    with open('../results/summary.txt', 'a') as file:
-                        file.write(run_name + "\n")
-                        file.write(str(stdout2a) + "\n")
+            if source.get_site() in self.avoid_list or target.get_site() in self.avoid_list:
+                continue
+            pairs.append((source, target))
 
-                        if len(lines) >= 3:
-                            last_line = lines[-3]
-                            print(last_line)
-                            file.write(last_line + "\n")
-                        else:
-                            print(stdout2)
-                            file.write(str(stdout2) + "\n")
+        self_pairs = [(source, target) for source, target in pairs if source == target]
+        node_pairs = [(source, target) for source, target in pairs if source != target]
 
-                except Exception as e:
-                    print(e)
-                    continue
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            future_tasks = {}
+            run_pair = partial(self.run_pair, run_iperf=run_iperf, run_time=run_time,
+                               executor=executor, future_tasks=future_tasks)
+            run_pairs(self_pairs, run_pair, max_workers=5)
+            if run_iperf:
+                run_rounds(node_pairs, run_pair, max_workers=5, node_key=Node.get_name, on_round=print_round)
+            else:
+                run_pairs(node_pairs, run_pair, max_workers=5)
 
         if len(self.details_of_failed_tests):
             self.dump_failed_tests_to_json()
@@ -369,6 +314,84 @@ class SliceHelper:
 
         return True
 
+    def run_pair(self, source: Node, target: Node, run_iperf: bool, run_time: int,
+                 executor: ThreadPoolExecutor, future_tasks: dict):
+        """
+        Ping (and optionally iperf) from ``target`` to ``source``, re-configuring the
+        source slice in the background on failure.
+        """
+        try:
+            run_name = f"run_{source.get_name()}_{target.get_name()}"
+            print(f"Running: {run_name}")
+
+            if run_iperf and source != target:
+                stdout1, stderr1 = source.execute("docker run -d --rm "
+                                                  "--network host "
+                                                  f"{self.docker_image} "
+                                                  "iperf3 -s -1", quiet=True)
+
+            target_addr = target.get_interface(network_name=f'FABNET_IPv4_{target.get_site()}').get_ip_addr()
+            source_addr = source.get_interface(network_name=f'FABNET_IPv4_{source.get_site()}').get_ip_addr()
+
+            stdout2a, stderr2a = target.execute(f"ping -c 3 {source_addr} > /dev/null ; ping -c 3 {source_addr} > /dev/null ; echo $?", quiet=True)
+            stdout2a = stdout2a.strip()
+
+            if stdout2a == '0':
+                print(f"{run_name}: Success!")
+            else:
+
+                slice_object = source.get_slice()
+                if source == target:
+                    source.get_slice().post_boot_config()
+                    stdout2a, stderr2a = target.execute(f"ping -c 10 {target_addr} > /dev/null ", quiet=False)
+                    print(f"Skip!!, {source} == {target}")
+                    return
+                else:
+                    try:
+                        future = executor.submit(self.configure_slice, slice_id=source.get_slice().get_slice_id())
+                        with self.summary_lock:
+                            future_tasks[future] = slice_object
+                    except Exception as e:
+                        print(f"{slice_object.get_name()} not found")
+                        print(e)
+
+                print(f"{run_name}: Fail!!")
+                print(f"Source slice: {source.get_slice().get_name()}/{source.get_slice().get_slice_id()} "
+                      f"Target Slice: {target.get_slice().get_name()}/{target.get_slice().get_slice_id()}")
+                print(f"Source: {source.get_name()}: {source_addr}")
+                print(f"{source.get_ssh_command()}")
+                print(f"Target: {target.get_name()}: {target_addr}")
+                print(f"{target.get_ssh_command()}")
+
+                self.capture_failure(source=source, source_addr=source_addr, target=target,
+                                     target_addr=target_addr)
+
+            if not run_iperf:
+                return
+
+            stdout2, stderr2 = target.execute("docker run --rm "
+                                              "--network host "
+                                              f"{self.docker_image} "
+                                              f"{iperf_client_command(source_addr, duration=run_time)}",
+                                              quiet=True, output_file=f"../results/{run_name}.log")
+
+            result = parse_iperf_json(stdout2)
+            if result.ok:
+                line = (f"receiver {result.received_gbps:.2f} Gbps, sender {result.sent_bps / 1e9:.2f} Gbps, "
+                        f"retransmits {result.retransmits}, mean rtt {result.mean_rtt_us} us")
+            else:
+                line = f"error: {result.error}"
+            print(f"{run_name}: {line}")
+
+            with self.summary_lock:
+                with open('../results/summary.txt', 'a') as file:
+                    file.write(run_name + "\n")
+                    file.write(str(stdout2a) + "\n")
+                    file.write(line + "\n")
+
+        except Exception as e:
+            print(e)
+
     def run(self, run_iperf: bool = False):
         """
         Run the full workflow: create slices, process slices, and run tests.
@@ -22,15 +22,20 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 # Author: Komal Thareja (kthare10@renci.org)
+import os
+
 import pytest
-from tests.utils import save_results_json, wait_and_configure_slices
+from tests.utils import save_results_json
+from tests.checkpoint import SweepCheckpoint
 from tests.base_test import _validate_ip
+from tests.ssh_pool import ssh_pool
+from tests.pair_scheduler import run_pairs, run_rounds, print_round
+from tests.result_sink import StreamingResults
+from tests.iperf import iperf_client_command, parse_iperf_json, link_class, evaluate
 from tests.daily.slice_helper import (
     get_fablib,
-    delete_existing_slices,
-    get_sites_with_workers,
-    create_site_worker_slices,
-    get_site_pairs,
+    provision_sweep_slices,
+    plan_pairs,
     collect_node_ips,
     run_remote_command,
     cleanup_slices,
@@ -38,6 +43,10 @@ from tests.daily.slice_helper import (
 
 DOCKER_IMAGE = 'pruth/fabric-multitool-rockylinux9:latest'
 RUN_TIME = 10
+MAX_PARALLEL_TESTS = 16
+# Set FABRIC_SWEEP_RESUME=1 to re-adopt the slices of an interrupted run and only run what is missing
+RESUME = os.getenv("FABRIC_SWEEP_RESUME", "").lower() in ("1", "true", "yes")
+CHECKPOINT_FILE = os.getenv("FABRIC_SWEEP_CHECKPOINT", "iperf_sweep_checkpoint.json")
 
 @pytest.fixture(scope="module")
 def fablib():
@@ -45,73 +54,77 @@ def fablib():
 
 
 def test_site_worker_pair_ping_iperf(fablib):
-    results = {}
-
-    # Step 1: Cleanup any old slices
-    delete_existing_slices(fablib)
-
-    # Step 2: Discover all active sites and workers
-    sites = get_sites_with_workers(fablib)
+    results = StreamingResults("iperf_test_results.json")
+    checkpoint = SweepCheckpoint.load(CHECKPOINT_FILE)
 
-    # Step 3: Create slices for each (site, worker) pair
-    slices, failed_slices = create_site_worker_slices(fablib, sites)
-
-    # Step 4: Wait for all slices and configure them
-    wait_and_configure_slices(slices)
+    # Steps 1-4: Cleanup old slices (or re-adopt them when resuming), create one slice per
+    # active worker, wait for the slices and configure them
+    slices, failed_slices = provision_sweep_slices(fablib, checkpoint, resume=RESUME)
 
     # Step 5: Collect IPs and define test pairs
     ip_map = collect_node_ips(slices)
-    pairs = get_site_pairs(slices)
+    pairs = plan_pairs(slices, checkpoint)
 
     print("\nRunning ping and iperf3 tests across all slice pairs...")
     slices_to_keep = []
 
-    for src, dst in pairs:
-        if src == dst:
-            continue  # Skip same-slice tests
-
-        slices[src].post_boot_config()
-        slices[dst].post_boot_config()
-
-        src_node = slices[src].get_node("node")
-        dst_node = slices[dst].get_node("node")
+    def ping(src, dst):
         dst_ip = _validate_ip(ip_map[dst])
-        pair_key = f"{src}->{dst}"
-
-        print(f"Testing {pair_key}...")
-
-        pair_result = {"ping": None, "iperf3": None}
-
-        # Ping test
-        ping_cmd = f"ping -c 4 -W 1 {dst_ip}"
-        ping_out, ping_err = run_remote_command(src_node, ping_cmd)
+        ping_out, ping_err = run_remote_command(slices[src].get_node("node"), f"ping -c 4 -W 1 {dst_ip}")
         if "0% packet loss" in ping_out:
-            pair_result["ping"] = "PASS"
+            status = "PASS"
         else:
-            pair_result["ping"] = f"FAIL: {ping_err or ping_out.strip().splitlines()[-1]}"
-            pair_result[slices[src].get_name()] = slices[src].get_slice_id()
-            pair_result[slices[dst].get_name()] = slices[dst].get_slice_id()
-            slices_to_keep.append(slices[src].get_slice_id())
-            slices_to_keep.append(slices[dst].get_slice_id())
+            status = f"FAIL: {ping_err or ping_out.strip().splitlines()[-1]}"
+        results.record(f"{src}->{dst}", stage="ping", value=status)
+        checkpoint.record_check(src, dst, "ping", status)
+        return status
 
+    def iperf(src, dst):
+        dst_ip = _validate_ip(ip_map[dst])
+        src_node = slices[src].get_node("node")
+        dst_node = slices[dst].get_node("node")
         # Start iperf3 server on destination
         iperf_cmd_server = f"docker run -d --rm --network host {DOCKER_IMAGE} iperf3 -s -1 > /dev/null 2>&1"
         run_remote_command(dst_node, iperf_cmd_server)
 
         # Run iperf3 client on source
         iperf_cmd_client = f"docker run --rm --network host {DOCKER_IMAGE} " \
-                           f"iperf3 -c {dst_ip} -P 4 -t {RUN_TIME} -i 10 -O 10"
+                           f"{iperf_client_command(dst_ip, duration=RUN_TIME)}"
         iperf_out, iperf_err = run_remote_command(src_node, iperf_cmd_client)
+        result = parse_iperf_json(iperf_out)
+        if iperf_err and not result.ok:
+            result.error = f"{result.error}: {iperf_err}"
+        src_site, dst_site = src_node.get_site(), dst_node.get_site()
+        link = link_class(src_site, dst_site)
+        metrics = {"link_class": link, "src_site": src_site, "dst_site": dst_site, **result.summary()}
+        failure = evaluate(result, link)
+        status = "PASS" if failure is None else f"FAIL: {failure}"
+        results.record(f"{src}->{dst}", stage="iperf3", value={"status": status, **metrics})
+        checkpoint.record_check(src, dst, "iperf3", status, iperf3_metrics=metrics)
+        return status
+
+    # Pings do not contend for bandwidth and run all at once; iperf runs in rounds in
+    # which every node is in at most one measurement. Checks already in the checkpoint
+    # are not repeated.
+    ping_results = run_pairs(checkpoint.pending(pairs, "ping"), ping, max_workers=MAX_PARALLEL_TESTS)
+    iperf_results = run_rounds(checkpoint.pending(pairs, "iperf3"), iperf, max_workers=MAX_PARALLEL_TESTS,
+                               on_round=print_round)
 
-        if "receiver" in iperf_out:
-            pair_result["iperf3"] = "PASS"
-        else:
-            pair_result["iperf3"] = f"FAIL: {iperf_err or iperf_out.strip().splitlines()[-1]}"
+    for src, dst in pairs:
+        pair_key = f"{src}->{dst}"
+        measured = checkpoint.pair(src, dst)
+        for test, outcome in (("ping", ping_results.get((src, dst))), ("iperf3", iperf_results.get((src, dst)))):
+            if isinstance(outcome, Exception):
+                measured[test] = f"FAIL: {outcome}"
+        pair_result = {"ping": measured.get("ping", "FAIL: not run"),
+                       "iperf3": measured.get("iperf3", "FAIL: not run"),
+                       "iperf3_metrics": measured.get("iperf3_metrics")}
+        if "FAIL" in pair_result["ping"] or "FAIL" in pair_result["iperf3"]:
             pair_result[slices[src].get_name()] = slices[src].get_slice_id()
             pair_result[slices[dst].get_name()] = slices[dst].get_slice_id()
             slices_to_keep.append(slices[src].get_slice_id())
             slices_to_keep.append(slices[dst].get_slice_id())
-
+        print(f"{pair_key}: ping {pair_result['ping']}, iperf3 {pair_result['iperf3']}")
         results[pair_key] = pair_result
 
     # Step 6: Save results
@@ -144,7 +157,11 @@ def test_site_worker_pair_ping_iperf(fablib):
         print("\nPASS - iPerf3")
 
     failed = {pair: r for pair, r in results.items() if "FAIL" in r["ping"] or "FAIL" in r["iperf3"]}
+    print(f"\nSSH sessions: {ssh_pool.stats.to_dict()}")
+    ssh_pool.close()
     cleanup_slices(slices, slices_to_keep)
+    # The sweep finished; a later run starts from scratch
+    checkpoint.remove()
 
     assert not failed and not failed_slices, (
         f"Some tests failed.\n"
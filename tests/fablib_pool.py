@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import threading
+import time
+from typing import Callable
+
+# How often (seconds) a pooled manager is asked to validate/refresh its tokens on hand-out.
+TOKEN_CHECK_INTERVAL = 300
+# Hand out an in-process simulated testbed (tests/simulator.py) instead of a real manager.
+SIMULATE = os.getenv("FABRIC_SIMULATE", "0") not in ("", "0", "false")
+
+
+def _build_fablib(fabric_rc: str = None):
+    if SIMULATE:
+        from tests.simulator import SimulatedFablib
+        return SimulatedFablib.from_env()
+    from fabrictestbed_extensions.fablib.fablib import FablibManager
+    return FablibManager(fabric_rc=fabric_rc)
+
+
+def _refresh_tokens(fablib):
+    """
+    Ask the underlying FABRIC manager to refresh the id token if it is about to expire.
+    """
+    manager = fablib.get_manager()
+    ensure_valid_id_token = getattr(manager, "ensure_valid_id_token", None)
+    if ensure_valid_id_token is not None:
+        ensure_valid_id_token()
+
+
+class _PoolEntry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fablib = None
+        self.checked = 0.0
+
+
+class FablibPool:
+    """
+    Process-wide pool of ``FablibManager`` instances keyed by ``fabric_rc``.
+
+    Managers are constructed lazily on first use and then shared by every test and
+    worker thread, so configuration loading and authentication happen once per run.
+    Construction and token refresh for a key are serialized; concurrent callers for
+    the same key wait for the first construction instead of building their own.
+
+    :param factory: Callable building a manager from ``fabric_rc``.
+    :type factory: Callable
+    :param token_check_interval: Minimum seconds between token checks per manager;
+                                 None disables token checks.
+    :type token_check_interval: float
+    :param refresh_tokens: Callable refreshing a manager's tokens.
+    :type refresh_tokens: Callable
+    """
+    def __init__(self, factory: Callable = _build_fablib, token_check_interval: float = TOKEN_CHECK_INTERVAL,
+                 refresh_tokens: Callable = _refresh_tokens):
+        self.factory = factory
+        self.token_check_interval = token_check_interval
+        self.refresh_tokens = refresh_tokens
+        self.constructions = 0
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def get(self, fabric_rc: str = None):
+        """
+        Return the shared manager for ``fabric_rc``, constructing it on first use.
+        """
+        with self._lock:
+            entry = self._entries.get(fabric_rc)
+            if entry is None:
+                entry = self._entries[fabric_rc] = _PoolEntry()
+
+        with entry.lock:
+            if entry.fablib is None:
+                entry.fablib = self.factory(fabric_rc)
+                entry.checked = time.monotonic()
+                self.constructions += 1
+            elif self._token_check_due(entry):
+                entry.checked = time.monotonic()
+                try:
+                    self.refresh_tokens(entry.fablib)
+                except Exception as e:
+                    print(f"Token refresh failed for fabric_rc={fabric_rc}: {e}")
+            return entry.fablib
+
+    def discard(self, fabric_rc: str = None):
+        """
+        Drop the manager for ``fabric_rc`` so the next :meth:`get` builds a fresh one.
+        """
+        with self._lock:
+            entry = self._entries.pop(fabric_rc, None)
+        if entry is not None and entry.fablib is not None:
+            self._close(entry.fablib)
+
+    def clear(self):
+        """
+        Drop every pooled manager.
+        """
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            if entry.fablib is not None:
+                self._close(entry.fablib)
+
+    def _token_check_due(self, entry: _PoolEntry) -> bool:
+        if self.token_check_interval is None:
+            return False
+        return time.monotonic() - entry.checked >= self.token_check_interval
+
+    @staticmethod
+    def _close(fablib):
+        close = getattr(fablib, "close", None)
+        if close is not None:
+            try:
+                close()
+            except Exception as e:
+                print(f"Error closing fablib manager: {e}")
+
+
+fablib_pool = FablibPool()
+
+
+def get_fablib(fabric_rc: str = None):
+    """
+    Return the process-wide shared ``FablibManager`` for ``fabric_rc``.
+    """
+    return fablib_pool.get(fabric_rc)
@@ -0,0 +1,418 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Historical results store.
+
+Every record of the result sink (:mod:`tests.result_sink`) is ingested into a local
+SQLite database keyed by run id, date, site, pair and test, with numeric metrics
+(iperf throughput, provisioning stage latency) in their own indexed table so trend
+queries over years of runs only touch the rows they need.
+``python -m tests.history`` ingests result files, shows trends and reports regressions.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+
+from tests.result_sink import DEFAULT_PATH, RESULTS_DIR, RUN_ID, open_sinks, read_records
+from tests.timing import PROVISIONING, percentile
+
+DEFAULT_DB = os.getenv("FABRIC_HISTORY_DB", os.path.join(RESULTS_DIR, "history.sqlite"))
+DAY = 24 * 3600
+
+# Metrics kept from measurement records, by the field carrying them.
+MEASUREMENT_METRICS = ("received_bps", "sent_bps", "retransmits", "mean_rtt_us")
+ELAPSED = "elapsed"
+THROUGHPUT = "received_bps"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    started REAL NOT NULL,
+    day TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY,
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    day TEXT NOT NULL,
+    test TEXT NOT NULL,
+    key TEXT NOT NULL,
+    site TEXT,
+    dst TEXT,
+    stage TEXT NOT NULL,
+    outcome TEXT NOT NULL,
+    error TEXT,
+    slice_id TEXT,
+    data TEXT
+);
+CREATE UNIQUE INDEX IF NOT EXISTS results_record ON results (run_id, test, key, stage, ts);
+CREATE INDEX IF NOT EXISTS results_test_ts ON results (test, ts);
+CREATE INDEX IF NOT EXISTS results_site_ts ON results (site, ts);
+CREATE TABLE IF NOT EXISTS metrics (
+    result_id INTEGER NOT NULL REFERENCES results (id),
+    run_id TEXT NOT NULL,
+    ts REAL NOT NULL,
+    test TEXT NOT NULL,
+    site TEXT,
+    dst TEXT,
+    component TEXT,
+    stage TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS metrics_series ON metrics (metric, test, site, dst, ts);
+CREATE INDEX IF NOT EXISTS metrics_window ON metrics (metric, ts);
+CREATE INDEX IF NOT EXISTS metrics_run ON metrics (run_id);
+"""
+
+
+def _day(ts: float) -> str:
+    return time.strftime("%Y-%m-%d", time.gmtime(ts))
+
+
+def record_location(record: dict) -> tuple[str | None, str | None]:
+    """
+    (site, destination) of a record: explicit ``src_site``/``dst_site`` or ``site`` in
+    its data, else the ``src->dst`` or ``SITE`` form of its key.
+    """
+    data = record.get("data")
+    if isinstance(data, dict):
+        if data.get("src_site"):
+            return data["src_site"], data.get("dst_site")
+        if data.get("site"):
+            return data["site"], None
+    key = record["key"]
+    if "->" in key:
+        src, dst = key.split("->", 1)
+        return src, dst
+    return key, None
+
+
+def record_metrics(record: dict) -> list[tuple[str | None, str, float]]:
+    """
+    Numeric metrics of a record as (component, metric, value).
+    """
+    data = record.get("data")
+    if not isinstance(data, dict):
+        return []
+    if record["test"] == PROVISIONING and isinstance(data.get(ELAPSED), (int, float)):
+        return [(data.get("component"), ELAPSED, float(data[ELAPSED]))]
+    return [(data.get("component"), name, float(data[name])) for name in MEASUREMENT_METRICS
+            if isinstance(data.get(name), (int, float)) and not isinstance(data.get(name), bool)]
+
+
+class HistoryStore:
+    """
+    SQLite store of result records across runs.
+
+    :param path: Database file; ``:memory:`` for a throwaway store.
+    :type path: str
+    """
+    def __init__(self, path: str = DEFAULT_DB):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory and path != ":memory:":
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # Ingestion
+    def ingest(self, records) -> int:
+        """
+        Store ``records``; records already present are skipped, so re-ingesting a file is safe.
+
+        :return: Number of new records.
+        """
+        added = 0
+        with self._lock, self.db:
+            for record in records:
+                site, dst = record_location(record)
+                ts = record["ts"]
+                self.db.execute("INSERT INTO runs (run_id, started, day) VALUES (?, ?, ?) ON CONFLICT (run_id) "
+                                "DO UPDATE SET started = excluded.started, day = excluded.day "
+                                "WHERE excluded.started < runs.started", (record["run_id"], ts, _day(ts)))
+                cursor = self.db.execute(
+                    "INSERT OR IGNORE INTO results (run_id, ts, day, test, key, site, dst, stage, outcome, error, "
+                    "slice_id, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (record["run_id"], ts, _day(ts), record["test"], record["key"], site, dst, record["stage"],
+                     record["outcome"], record.get("error"), record.get("slice_id"),
+                     json.dumps(record.get("data"), default=str)))
+                if not cursor.rowcount:
+                    continue
+                added += 1
+                self.db.executemany(
+                    "INSERT INTO metrics (result_id, run_id, ts, test, site, dst, component, stage, metric, value) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [(cursor.lastrowid, record["run_id"], ts, record["test"], site, dst, component, record["stage"],
+                      metric, value) for component, metric, value in record_metrics(record)])
+        return added
+
+    def ingest_file(self, path: str = DEFAULT_PATH, run_id: str = None) -> int:
+        return self.ingest(read_records(path, run_id=run_id))
+
+    # Queries
+    def runs(self, since: float = None) -> list[dict]:
+        with self._lock:
+            rows = self.db.execute("SELECT run_id, started, day FROM runs WHERE started >= ? ORDER BY started",
+                                   (since or 0,)).fetchall()
+        return [{"run_id": r[0], "started": r[1], "day": r[2]} for r in rows]
+
+    def run(self, run_id: str) -> dict | None:
+        with self._lock:
+            row = self.db.execute("SELECT run_id, started, day FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        return {"run_id": row[0], "started": row[1], "day": row[2]} if row else None
+
+    def latest_run(self) -> str | None:
+        with self._lock:
+            row = self.db.execute("SELECT run_id FROM runs ORDER BY started DESC LIMIT 1").fetchone()
+        return row[0] if row else None
+
+    def results(self, test: str = None, site: str = None, run_id: str = None, since: float = None,
+                until: float = None, stage: str = None) -> list[dict]:
+        """
+        Stored records matching every given filter, oldest first.
+        """
+        clauses, params = self._filters(test=test, site=site, run_id=run_id, stage=stage, since=since, until=until)
+        with self._lock:
+            rows = self.db.execute(
+                "SELECT run_id, ts, day, test, key, site, dst, stage, outcome, error, slice_id, data FROM results"
+                f"{clauses} ORDER BY ts", params).fetchall()
+        names = ("run_id", "ts", "day", "test", "key", "site", "dst", "stage", "outcome", "error", "slice_id", "data")
+        return [{**dict(zip(names, row)), "data": json.loads(row[-1]) if row[-1] else None} for row in rows]
+
+    def pass_rate(self, test: str, since: float = None, until: float = None) -> dict[str, float]:
+        """
+        Fraction of passing final results per site.
+        """
+        clauses, params = self._filters(test=test, stage="result", since=since, until=until)
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT site, AVG(outcome = 'PASS') FROM results{clauses} GROUP BY site ORDER BY site",
+                params).fetchall()
+        return dict(rows)
+
+    def link_failures(self, test: str = None, window_days: float = 14, now: float = None) -> dict[tuple, float]:
+        """
+        Failed final results per (site, dst) link over the last ``window_days``, each
+        failure weighted by its recency (1 today, fading linearly to 0 at the window edge).
+        """
+        now = time.time() if now is None else now
+        clauses, params = self._filters(test=test, stage="result", outcome="FAIL", since=now - window_days * DAY)
+        with self._lock:
+            rows = self.db.execute(
+                f"SELECT site, dst, ts FROM results{clauses} AND site IS NOT NULL AND dst IS NOT NULL",
+                params).fetchall()
+        weights = {}
+        for site, dst, ts in rows:
+            link = tuple(sorted((site, dst)))
+            weights[link] = weights.get(link, 0) + max(0.0, 1 - (now - ts) / (window_days * DAY))
+        return {link: weight for link, weight in weights.items() if weight > 0}
+
+    def series(self, metric: str, test: str = None, site: str = None, dst: str = None, stage: str = None,
+               component: str = None, run_id: str = None, since: float = None,
+               until: float = None) -> list[tuple[float, float]]:
+        """
+        (ts, value) samples of ``metric``, oldest first.
+        """
+        clauses, params = self._filters(metric=metric, test=test, site=site, dst=dst, stage=stage,
+                                        component=component, run_id=run_id, since=since, until=until)
+        with self._lock:
+            return self.db.execute(f"SELECT ts, value FROM metrics{clauses} ORDER BY ts", params).fetchall()
+
+    def grouped(self, metric: str, test: str = None, run_id: str = None, since: float = None,
+                until: float = None) -> dict[tuple, list[float]]:
+        """
+        Values of ``metric`` per (test, site, dst, component, stage), in one query.
+        """
+        clauses, params = self._filters(metric=metric, test=test, run_id=run_id, since=since, until=until)
+        groups = {}
+        with self._lock:
+            rows = self.db.execute(f"SELECT test, site, dst, component, stage, value FROM metrics{clauses}", params)
+            for *group, value in rows:
+                groups.setdefault(tuple(group), []).append(value)
+        return groups
+
+    def daily(self, metric: str, pct: float = 50, **filters) -> list[tuple[str, float, int]]:
+        """
+        (day, percentile, samples) of ``metric`` per UTC day, for trend plots.
+        """
+        by_day = {}
+        for ts, value in self.series(metric, **filters):
+            by_day.setdefault(_day(ts), []).append(value)
+        return [(day, percentile(values, pct), len(values)) for day, values in by_day.items()]
+
+    @staticmethod
+    def _filters(since: float = None, until: float = None, **equal) -> tuple[str, list]:
+        clauses, params = [], []
+        for column, value in equal.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        if since is not None:
+            clauses.append("ts >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("ts < ?")
+            params.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+@dataclass(frozen=True)
+class Regression:
+    """
+    A metric of a run that moved past its threshold relative to the preceding window.
+    """
+    test: str
+    metric: str
+    site: str | None
+    dst: str | None
+    component: str | None
+    stage: str
+    current: float
+    baseline: float
+    message: str
+
+    @property
+    def change(self) -> float:
+        return self.current / self.baseline - 1 if self.baseline else float("inf")
+
+
+def _gbps(bps: float) -> str:
+    return f"{bps / 1e9:.2f} Gbps"
+
+
+def detect_regressions(store: HistoryStore, run_id: str = None, window_days: float = 7,
+                       throughput_drop: float = 0.3, latency_factor: float = 2.0,
+                       min_samples: int = 3) -> list[Regression]:
+    """
+    Compare ``run_id`` (default the latest run) with the ``window_days`` before it.
+
+    Flags site pairs whose median throughput fell more than ``throughput_drop`` below
+    the window median, and provisioning stages whose p90 latency per site and
+    component grew by ``latency_factor`` or more over the window p90. Groups with
+    fewer than ``min_samples`` samples in the window are skipped.
+    """
+    run = store.run(run_id or store.latest_run())
+    if run is None:
+        return []
+    run_id = run["run_id"]
+    since = run["started"] - window_days * DAY
+    regressions = []
+
+    def compare(metric: str, test: str = None):
+        window = store.grouped(metric, test=test, since=since, until=run["started"])
+        for group, current in store.grouped(metric, test=test, run_id=run_id).items():
+            if len(window.get(group, ())) >= min_samples:
+                yield group, current, window[group]
+
+    for (test, site, dst, component, stage), current, window in compare(THROUGHPUT):
+        now, baseline = statistics.median(current), statistics.median(window)
+        if baseline > 0 and now < (1 - throughput_drop) * baseline:
+            regressions.append(Regression(
+                test=test, metric=THROUGHPUT, site=site, dst=dst, component=component, stage=stage,
+                current=now, baseline=baseline,
+                message=f"{site}→{dst} throughput dropped {1 - now / baseline:.0%} vs {window_days:g}-day "
+                        f"median ({_gbps(now)} vs {_gbps(baseline)})"))
+
+    for (test, site, dst, component, stage), current, window in compare(ELAPSED, test=PROVISIONING):
+        now, baseline = percentile(current, 90), percentile(window, 90)
+        if baseline > 0 and now >= latency_factor * baseline:
+            growth = "doubled" if latency_factor == 2 else f"grew {now / baseline:.1f}x"
+            regressions.append(Regression(
+                test=test, metric=ELAPSED, site=site, dst=dst, component=component, stage=stage,
+                current=now, baseline=baseline,
+                message=f"{component} provisioning p90 {growth} at {site} ({stage}: {now:.0f}s vs "
+                        f"{baseline:.0f}s {window_days:g}-day p90)"))
+    return regressions
+
+
+def record_run(db: str = DEFAULT_DB) -> int:
+    """
+    Ingest this process's records from every result sink it wrote to; meant for the end of a test session.
+
+    :return: Number of new records.
+    """
+    records = []
+    for sink in open_sinks():
+        sink.flush()
+        records += read_records(sink.path, run_id=RUN_ID, offset=sink.run_offset)
+    if not records:
+        return 0
+    with HistoryStore(db) as store:
+        return store.ingest(records)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Historical FABRIC test results.")
+    parser.add_argument("--db", default=DEFAULT_DB)
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="Ingest result JSON Lines files")
+    ingest.add_argument("paths", nargs="*", default=[DEFAULT_PATH])
+    regressions = commands.add_parser("regressions", help="Report regressions of a run")
+    regressions.add_argument("--run-id")
+    regressions.add_argument("--window-days", type=float, default=7)
+    trend = commands.add_parser("trend", help="Daily median of a metric")
+    trend.add_argument("metric", choices=MEASUREMENT_METRICS + (ELAPSED,))
+    trend.add_argument("--test")
+    trend.add_argument("--site")
+    trend.add_argument("--dst")
+    trend.add_argument("--stage")
+    trend.add_argument("--component")
+    args = parser.parse_args()
+
+    with HistoryStore(args.db) as store:
+        if args.command == "ingest":
+            for path in args.paths:
+                print(f"{path}: {store.ingest_file(path)} new records")
+        elif args.command == "regressions":
+            found = detect_regressions(store, run_id=args.run_id, window_days=args.window_days)
+            for regression in found:
+                print(regression.message)
+            print(f"{len(found)} regressions")
+        else:
+            for day, value, count in store.daily(args.metric, test=args.test, site=args.site, dst=args.dst,
+                                                 stage=args.stage, component=args.component):
+                print(f"{day}  {value:>14.2f}  ({count})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+# Seconds an inventory snapshot (in memory or on disk) is reused before re-fetching.
+DEFAULT_TTL = int(os.getenv("FABRIC_INVENTORY_TTL", 900))
+DEFAULT_CACHE_DIR = os.getenv("FABRIC_INVENTORY_CACHE_DIR",
+                              os.path.join(tempfile.gettempdir(), "fabric-system-tests"))
+
+_lock = threading.Lock()
+_snapshots = {}
+
+
+class Inventory:
+    """
+    Point-in-time snapshot of sites, hosts and their component capacities.
+
+    Sites and hosts are kept as the plain dictionaries fablib returns from
+    ``list_sites(output="list")`` and ``Host.to_dict()``, plus a ``site`` key on each host,
+    and indexed by site, by host and by numeric field so filters are dictionary lookups.
+
+    :param sites: Site dictionaries.
+    :type sites: list[dict]
+    :param hosts: Host dictionaries, each carrying its ``site``.
+    :type hosts: list[dict]
+    :param fetched_at: Wall clock time the snapshot was taken.
+    :type fetched_at: float
+    """
+    def __init__(self, sites: list[dict], hosts: list[dict], fetched_at: float = None):
+        self.fetched_at = fetched_at if fetched_at is not None else time.time()
+        self.sites = {site["name"]: site for site in sites if "name" in site}
+        self.hosts = {host["name"]: host for host in hosts if "name" in host}
+        self.hosts_by_site = defaultdict(list)
+        for host in self.hosts.values():
+            self.hosts_by_site[host.get("site")].append(host)
+        # field -> {site name: value}, e.g. "nvme_capacity" -> {"TACC": 12, ...}
+        self.site_fields = defaultdict(dict)
+        for name, site in self.sites.items():
+            for key, value in site.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self.site_fields[key][name] = value
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+    def get_site(self, name: str) -> dict | None:
+        return self.sites.get(name)
+
+    def site_list(self, state: str | None = None) -> list[dict]:
+        """
+        Site dictionaries in the same shape as ``fablib.list_sites(output="list")``,
+        optionally restricted to sites in ``state``.
+        """
+        return [site for site in self.sites.values() if state is None or site.get("state") == state]
+
+    def get_hosts(self, site: str, state: str | None = None) -> list[dict]:
+        return [host for host in self.hosts_by_site.get(site, []) if state is None or host.get("state") == state]
+
+    def active_hosts(self, site: str) -> list[str]:
+        return [host["name"] for host in self.get_hosts(site, state="Active")]
+
+    def get_field(self, site: str, field: str, default=0):
+        return self.site_fields.get(field, {}).get(site, default)
+
+    def sites_with(self, field: str, minimum: float = 1) -> list[str]:
+        """
+        Names of sites whose numeric ``field`` is at least ``minimum``.
+        """
+        return [name for name, value in self.site_fields.get(field, {}).items() if value >= minimum]
+
+    def to_dict(self) -> dict:
+        return {
+            "fetched_at": self.fetched_at,
+            "sites": list(self.sites.values()),
+            "hosts": list(self.hosts.values()),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Inventory":
+        return cls(sites=data.get("sites", []), hosts=data.get("hosts", []), fetched_at=data.get("fetched_at"))
+
+    @classmethod
+    def fetch(cls, fablib) -> "Inventory":
+        """
+        Take a fresh snapshot using a single resources query.
+        """
+        resources = fablib.get_resources(update=True)
+        sites = fablib.list_sites(output="list", quiet=True)
+        hosts = []
+        for site in sites:
+            if "name" not in site:
+                continue
+            try:
+                site_obj = resources.get_site(site["name"])
+                for host in site_obj.get_hosts().values():
+                    hosts.append(_host_to_dict(host, site["name"]))
+            except Exception as e:
+                print(f"[{site['name']}] Failed to read hosts: {e}")
+        return cls(sites=sites, hosts=hosts)
+
+
+def _host_to_dict(host, site_name: str) -> dict:
+    to_dict = getattr(host, "to_dict", None)
+    data = to_dict() if to_dict is not None else {}
+    data["name"] = host.get_name()
+    data["state"] = host.get_state()
+    data["site"] = site_name
+    return data
+
+
+def cache_path(fablib, cache_dir: str = DEFAULT_CACHE_DIR) -> str:
+    """
+    Per-deployment cache file, so production and test orchestrators do not share snapshots.
+    """
+    host = fablib.get_orchestrator_host() or "default"
+    return os.path.join(cache_dir, f"inventory-{host}.json")
+
+
+def _read_cache(path: str, ttl: float) -> Inventory | None:
+    try:
+        with open(path) as f:
+            inventory = Inventory.from_dict(json.load(f))
+    except (OSError, ValueError):
+        return None
+    return inventory if inventory.age() < ttl else None
+
+
+def _write_cache(path: str, inventory: Inventory):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(inventory.to_dict(), f, default=str)
+    os.replace(tmp_path, path)
+
+
+def load_inventory(fablib, ttl: float = DEFAULT_TTL, refresh: bool = False,
+                   cache_dir: str = DEFAULT_CACHE_DIR) -> Inventory:
+    """
+    Return the shared inventory snapshot, fetching it at most once per ``ttl`` seconds.
+
+    The snapshot is memoized in-process and persisted under ``cache_dir`` so separate
+    pytest invocations within the TTL reuse it as well.
+
+    :param fablib: Manager used to fetch a new snapshot when needed.
+    :param ttl: Maximum snapshot age in seconds.
+    :param refresh: Ignore cached snapshots and fetch a new one.
+    :param cache_dir: Directory for the on-disk cache.
+    :rtype: Inventory
+    """
+    path = cache_path(fablib, cache_dir=cache_dir)
+    with _lock:
+        inventory = _snapshots.get(path)
+        if refresh or inventory is None or inventory.age() >= ttl:
+            inventory = None if refresh else _read_cache(path, ttl)
+            if inventory is None:
+                inventory = Inventory.fetch(fablib)
+                try:
+                    _write_cache(path, inventory)
+                except OSError as e:
+                    print(f"Failed to write inventory cache {path}: {e}")
+            _snapshots[path] = inventory
+        return inventory
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import os
+from dataclasses import dataclass, field, asdict
+
+INTRA_SITE = "intra-site"
+INTER_SITE = "inter-site"
+
+# Minimum receiver throughput (bits/s) per link class before a measurement counts as a failure.
+# The defaults are conservative floors for the sweep's 4-stream runs between worker VMs, not
+# measured baselines: pairs within a site stay on the site switch, while pairs between sites
+# cross the shared WAN, whose throughput depends on path length and load. Override them in
+# Gbps with FABRIC_IPERF_MIN_INTRA_GBPS / FABRIC_IPERF_MIN_INTER_GBPS; 0 disables the check.
+THROUGHPUT_THRESHOLDS = {
+    INTRA_SITE: float(os.getenv("FABRIC_IPERF_MIN_INTRA_GBPS", "5")) * 1e9,
+    INTER_SITE: float(os.getenv("FABRIC_IPERF_MIN_INTER_GBPS", "1")) * 1e9,
+}
+
+
+@dataclass(frozen=True)
+class IntervalSample:
+    start: float
+    end: float
+    bits_per_second: float
+    retransmits: int | None = None
+    rtt_us: int | None = None
+    omitted: bool = False
+
+
+@dataclass
+class StreamResult:
+    """Per-socket totals from the ``end.streams`` section."""
+    socket: int
+    sent_bps: float
+    received_bps: float
+    retransmits: int | None = None
+    min_rtt_us: int | None = None
+    mean_rtt_us: int | None = None
+    max_rtt_us: int | None = None
+    intervals: list[IntervalSample] = field(default_factory=list)
+
+
+@dataclass
+class IperfResult:
+    """
+    Typed view of an ``iperf3 --json`` client report.
+
+    Throughput is in bits per second and RTT in microseconds, as iperf3 reports them;
+    ``intervals`` is the aggregate (sum over streams) series.
+    """
+    protocol: str = "TCP"
+    duration: float = 0.0
+    sent_bps: float = 0.0
+    received_bps: float = 0.0
+    retransmits: int | None = None
+    mean_rtt_us: float | None = None
+    cpu_local: float | None = None
+    cpu_remote: float | None = None
+    streams: list[StreamResult] = field(default_factory=list)
+    intervals: list[IntervalSample] = field(default_factory=list)
+    error: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def received_gbps(self) -> float:
+        return self.received_bps / 1e9
+
+    def summary(self) -> dict:
+        """
+        Aggregate metrics without the per-stream and interval series, for result files.
+        """
+        return {
+            "protocol": self.protocol,
+            "duration": self.duration,
+            "sent_bps": self.sent_bps,
+            "received_bps": self.received_bps,
+            "retransmits": self.retransmits,
+            "mean_rtt_us": self.mean_rtt_us,
+            "cpu_local": self.cpu_local,
+            "cpu_remote": self.cpu_remote,
+            "streams": len(self.streams),
+            "error": self.error,
+        }
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _interval(data: dict) -> IntervalSample:
+    return IntervalSample(start=data.get("start", 0.0), end=data.get("end", 0.0),
+                          bits_per_second=data.get("bits_per_second", 0.0),
+                          retransmits=data.get("retransmits"), rtt_us=data.get("rtt"),
+                          omitted=data.get("omitted", False))
+
+
+def parse_iperf_json(text: str) -> IperfResult:
+    """
+    Parse the output of ``iperf3 -c ... --json``.
+
+    iperf3 reports its own failures (server busy, connection refused, ...) in an
+    ``error`` field; these come back as a result with ``error`` set. Output that is not
+    JSON at all (e.g. docker or SSH errors) also yields a result with ``error`` set.
+
+    :param text: Client stdout.
+    :rtype: IperfResult
+    """
+    try:
+        report = json.loads(text)
+    except (TypeError, ValueError):
+        lines = (text or "").strip().splitlines()
+        return IperfResult(error=f"invalid iperf3 JSON output: {lines[-1] if lines else 'empty'}")
+    if not isinstance(report, dict):
+        return IperfResult(error=f"iperf3 JSON output is not a report: {text.strip()[:80]}")
+
+    test_start = report.get("start", {}).get("test_start", {})
+    end = report.get("end", {})
+    result = IperfResult(protocol=test_start.get("protocol", "TCP"), error=report.get("error"))
+
+    per_socket = {}
+    for interval in report.get("intervals", []):
+        for stream in interval.get("streams", []):
+            per_socket.setdefault(stream.get("socket"), []).append(_interval(stream))
+        if "sum" in interval:
+            result.intervals.append(_interval(interval["sum"]))
+
+    for stream in end.get("streams", []):
+        sender = stream.get("sender", {})
+        receiver = stream.get("receiver", {})
+        socket = sender.get("socket", receiver.get("socket"))
+        result.streams.append(StreamResult(
+            socket=socket,
+            sent_bps=sender.get("bits_per_second", 0.0),
+            received_bps=receiver.get("bits_per_second", 0.0),
+            retransmits=sender.get("retransmits"),
+            min_rtt_us=sender.get("min_rtt"),
+            mean_rtt_us=sender.get("mean_rtt"),
+            max_rtt_us=sender.get("max_rtt"),
+            intervals=per_socket.get(socket, []),
+        ))
+
+    sum_sent = end.get("sum_sent", end.get("sum", {}))
+    sum_received = end.get("sum_received", end.get("sum", {}))
+    result.duration = sum_received.get("seconds", sum_sent.get("seconds", 0.0))
+    result.sent_bps = sum_sent.get("bits_per_second", 0.0)
+    result.received_bps = sum_received.get("bits_per_second", 0.0)
+    result.retransmits = sum_sent.get("retransmits")
+
+    rtts = [s.mean_rtt_us for s in result.streams if s.mean_rtt_us is not None]
+    if rtts:
+        result.mean_rtt_us = sum(rtts) / len(rtts)
+
+    cpu = end.get("cpu_utilization_percent", {})
+    result.cpu_local = cpu.get("host_total")
+    result.cpu_remote = cpu.get("remote_total")
+
+    if result.error is None and not end:
+        result.error = "iperf3 report has no end section"
+    return result
+
+
+def iperf_client_command(server_ip: str, parallel: int = 4, duration: int = 10, interval: int = 10,
+                         omit: int = 10) -> str:
+    return f"iperf3 -c {server_ip} -P {parallel} -t {duration} -i {interval} -O {omit} --json"
+
+
+def link_class(src_site: str, dst_site: str) -> str:
+    return INTRA_SITE if src_site == dst_site else INTER_SITE
+
+
+def evaluate(result: IperfResult, link: str, thresholds: dict = None) -> str | None:
+    """
+    Check a measurement against the throughput threshold of its link class.
+
+    :return: None if it passes, otherwise the failure reason.
+    """
+    if not result.ok:
+        return result.error
+    thresholds = THROUGHPUT_THRESHOLDS if thresholds is None else thresholds
+    minimum = thresholds.get(link, 0)
+    if result.received_bps < minimum:
+        return f"{result.received_gbps:.2f} Gbps below {minimum / 1e9:.2f} Gbps for {link}"
+    return None
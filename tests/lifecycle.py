@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+BUILD = "build"
+SUBMIT = "submit"
+WAIT = "wait"
+WAIT_SSH = "wait_ssh"
+POST_BOOT_CONFIG = "post_boot_config"
+
+STAGES = (BUILD, SUBMIT, WAIT, WAIT_SSH, POST_BOOT_CONFIG)
+
+# Maximum number of slices allowed in a stage at the same time; None is unbounded.
+# BUILD mutates the FIM topology and is additionally serialized by the lifecycle lock.
+DEFAULT_STAGE_LIMITS = {
+    BUILD: 1,
+    SUBMIT: 4,
+    WAIT: None,
+    WAIT_SSH: 16,
+    POST_BOOT_CONFIG: 8,
+}
+
+# Slices in flight mostly sleep in wait/wait_ssh, so allow a whole sweep to overlap.
+DEFAULT_MAX_WORKERS = 64
+
+
+STARTED = "started"
+COMPLETED = "completed"
+FAILED = "failed"
+
+
+@dataclass(frozen=True)
+class LifecycleEvent:
+    """
+    Progress event emitted on every stage transition of a slice.
+
+    ``elapsed`` is the time spent in ``stage`` (0 when it has just started) and ``total``
+    the time since the slice entered the lifecycle, both in seconds. ``timestamp`` is the
+    ``time.monotonic()`` value of the transition.
+    """
+    key: Hashable
+    stage: str
+    status: str
+    elapsed: float
+    total: float
+    timestamp: float = field(default_factory=time.monotonic)
+
+
+def print_event(event: LifecycleEvent):
+    if event.status == STARTED:
+        print(f"[{event.key}] {event.stage} started ({event.total:.0f}s)")
+    else:
+        print(f"[{event.key}] {event.stage} {event.status} in {event.elapsed:.1f}s ({event.total:.0f}s)")
+
+
+@dataclass
+class SliceOutcome:
+    """
+    Result of driving a single slice through the lifecycle.
+
+    ``stage`` is the last stage the slice entered; when ``exception`` is set, that is
+    the stage which failed. ``state`` is the slice state observed once the lifecycle
+    finished with the slice, so callers do not need to query it again.
+    """
+    key: Hashable
+    slice: Any = None
+    stage: str | None = None
+    state: str | None = None
+    submitted: bool = False
+    exception: Exception | None = None
+    elapsed: dict[str, float] = field(default_factory=dict)
+    started: float = field(default_factory=time.monotonic, repr=False)
+
+    @property
+    def ok(self) -> bool:
+        return self.exception is None
+
+    @property
+    def error(self) -> str:
+        return str(self.exception) if self.exception else ""
+
+
+class SliceLifecycle:
+    """
+    Pipelined build/submit/wait/configure engine for many independent slices.
+
+    Only the ``build`` stage (FIM topology mutation, which is not thread safe) runs under
+    ``lock``; ``submit(wait=False)``, ``wait``, ``wait_ssh`` and ``post_boot_config`` of
+    different slices overlap, each bounded by its own concurrency limit.
+
+    :param lock: Lock serializing the locked stages, typically ``tests.base_test.fim_lock``.
+    :type lock: threading.Lock
+    :param max_workers: Maximum number of slices in flight.
+    :type max_workers: int
+    :param stage_limits: Per-stage concurrency overrides merged over ``DEFAULT_STAGE_LIMITS``.
+    :type stage_limits: dict
+    :param locked_stages: Stages executed while holding ``lock``.
+    :type locked_stages: tuple
+    :param configure: Run ``wait``, ``wait_ssh`` and ``post_boot_config`` after submitting.
+    :type configure: bool
+    :param timeout: Per-slice budget in seconds for ``wait`` and ``wait_ssh`` together;
+                    None keeps the fablib defaults.
+    :type timeout: float
+    :param on_event: Callback receiving a :class:`LifecycleEvent` per stage transition;
+                     None disables progress reporting.
+    :type on_event: Callable
+    :param poller: Shared state poller (``tests.poller.SlicePoller``) used for the ``wait``
+                   stage instead of each slice polling the orchestrator on its own.
+    :type poller: SlicePoller
+    """
+    def __init__(self, lock=None, max_workers: int = DEFAULT_MAX_WORKERS, stage_limits: dict = None,
+                 locked_stages: tuple = (BUILD,), configure: bool = True, timeout: float = None,
+                 on_event: Callable[[LifecycleEvent], None] = print_event, poller=None):
+        self.lock = lock if lock is not None else threading.Lock()
+        self.max_workers = max_workers
+        self.stage_limits = {**DEFAULT_STAGE_LIMITS, **(stage_limits or {})}
+        self.locked_stages = set(locked_stages)
+        self.configure = configure
+        self.timeout = timeout
+        self.on_event = on_event
+        self.poller = poller
+        self._semaphores = {stage: threading.BoundedSemaphore(limit)
+                            for stage, limit in self.stage_limits.items() if limit}
+
+    def run(self, builders: dict[Hashable, Callable[[], Any]]) -> dict[Hashable, SliceOutcome]:
+        """
+        Build, submit and (optionally) configure one slice per builder concurrently.
+
+        :param builders: Mapping of key to a zero-argument callable that creates the slice
+                         topology and returns the (unsubmitted) slice object.
+        :type builders: dict
+        :return: Mapping of key to its outcome.
+        :rtype: dict[Hashable, SliceOutcome]
+        """
+        return self._fan_out(self.provision, builders)
+
+    def configure_slices(self, slices: dict[Hashable, Any]) -> dict[Hashable, SliceOutcome]:
+        """
+        Wait for and configure already submitted slices concurrently.
+
+        :param slices: Mapping of key to submitted slice object.
+        :type slices: dict
+        :return: Mapping of key to its outcome.
+        :rtype: dict[Hashable, SliceOutcome]
+        """
+        return self._fan_out(self.configure_slice, slices)
+
+    def provision(self, key: Hashable, build: Callable[[], Any]) -> SliceOutcome:
+        """
+        Drive a single slice through every stage in the calling thread.
+        """
+        outcome = SliceOutcome(key=key)
+        try:
+            outcome.slice = self._run_stage(outcome, BUILD, build)
+            self._run_stage(outcome, SUBMIT, lambda: outcome.slice.submit(wait=False))
+            outcome.submitted = True
+            outcome.state = self._slice_state(outcome.slice)
+            if self.configure:
+                self._configure(outcome)
+        except Exception as e:
+            self._fail(outcome, e)
+        return outcome
+
+    def configure_slice(self, key: Hashable, slice_obj) -> SliceOutcome:
+        """
+        Run the post-submit stages for a single slice in the calling thread.
+        """
+        outcome = SliceOutcome(key=key, slice=slice_obj, submitted=True)
+        if slice_obj is None:
+            return outcome
+        try:
+            self._configure(outcome)
+        except Exception as e:
+            self._fail(outcome, e)
+        return outcome
+
+    def _fan_out(self, func, items: dict) -> dict[Hashable, SliceOutcome]:
+        outcomes = {}
+        if not items:
+            return outcomes
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            futures = [executor.submit(func, key, item) for key, item in items.items()]
+            for future in as_completed(futures):
+                outcome = future.result()
+                outcomes[outcome.key] = outcome
+        return outcomes
+
+    def _configure(self, outcome: SliceOutcome):
+        slice_obj = outcome.slice
+        deadline = time.monotonic() + self.timeout if self.timeout is not None else None
+
+        def budget() -> dict:
+            if deadline is None:
+                return {}
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"Timeout exceeded ({self.timeout} sec) before {outcome.stage}")
+            return {"timeout": int(max(remaining, 1))}
+
+        if self.poller is not None:
+            self._run_stage(outcome, WAIT, lambda: self.poller.wait(slice_obj, **budget()))
+        else:
+            self._run_stage(outcome, WAIT, lambda: slice_obj.wait(progress=False, **budget()))
+        self._run_stage(outcome, WAIT_SSH, lambda: slice_obj.wait_ssh(progress=False, **budget()))
+        self._run_stage(outcome, POST_BOOT_CONFIG, slice_obj.post_boot_config)
+        outcome.state = self._slice_state(slice_obj)
+
+    def _run_stage(self, outcome: SliceOutcome, stage: str, func: Callable[[], Any]):
+        outcome.stage = stage
+        with ExitStack() as stack:
+            semaphore = self._semaphores.get(stage)
+            if semaphore is not None:
+                stack.enter_context(semaphore)
+            if stage in self.locked_stages:
+                stack.enter_context(self.lock)
+            start = time.monotonic()
+            self._emit(outcome, STARTED, 0.0)
+            try:
+                result = func()
+            except Exception:
+                outcome.elapsed[stage] = time.monotonic() - start
+                self._emit(outcome, FAILED, outcome.elapsed[stage])
+                raise
+            outcome.elapsed[stage] = time.monotonic() - start
+            self._emit(outcome, COMPLETED, outcome.elapsed[stage])
+            return result
+
+    def _emit(self, outcome: SliceOutcome, status: str, elapsed: float):
+        if self.on_event is None:
+            return
+        now = time.monotonic()
+        event = LifecycleEvent(key=outcome.key, stage=outcome.stage, status=status, elapsed=elapsed,
+                               total=now - outcome.started, timestamp=now)
+        try:
+            self.on_event(event)
+        except Exception as e:
+            print(f"[{outcome.key}] Progress callback error: {e}")
+
+    def _fail(self, outcome: SliceOutcome, exception: Exception):
+        outcome.exception = exception
+        if outcome.slice is not None:
+            outcome.state = self._slice_state(outcome.slice)
+        print(f"[{outcome.key}] Slice {outcome.stage} error: {exception}")
+        traceback.print_exc()
+
+    @staticmethod
+    def _slice_state(slice_obj) -> str | None:
+        try:
+            return slice_obj.get_state()
+        except Exception:
+            return None
+
+
+def split_outcomes(outcomes: dict[Hashable, SliceOutcome]) -> tuple[dict, dict]:
+    """
+    Split lifecycle outcomes into submitted slices and submission failures.
+
+    Slices that were submitted but failed later stay in the first mapping so that the
+    per-test validation reports on them and leaves them in place for inspection.
+
+    :return: (key -> slice object, key -> failed SliceOutcome)
+    :rtype: tuple[dict, dict]
+    """
+    slices = {}
+    failures = {}
+    for key, outcome in outcomes.items():
+        if outcome.submitted:
+            slices[key] = outcome.slice
+        else:
+            failures[key] = outcome
+    return slices, failures
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Path MTU probing: one remote sweep per source node covering every destination, address
+family and probe size, run concurrently across sources.
+
+Two modes: :func:`probe_matrix` checks a fixed list of MTUs, :func:`discover_matrix`
+bisects the exact largest passing MTU of every path, starting from the value cached by
+the previous run.
+"""
+import json
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from tests.remote import execute_batch
+
+# ICMP echo + IP header bytes per address family; payload = MTU - overhead.
+OVERHEAD = {4: 28, 6: 48}
+PING_COUNT = 4
+# Pings in flight at once on a source node.
+DEFAULT_PARALLEL = 32
+# Discovery range: the IPv6 minimum link MTU up to the MTU the test interfaces are set to.
+MIN_MTU = 1280
+MAX_MTU = 9000
+# Pings per discovery probe; a single lost reply only costs an extra round.
+DISCOVERY_PING_COUNT = 2
+DEFAULT_CACHE = os.getenv("FABRIC_MTU_CACHE",
+                          os.path.join(tempfile.gettempdir(), "fabric-system-tests", "path-mtu.json"))
+
+WIDTH_MTU = 4
+WIDTH_RTT = 4
+WIDTH_TD = WIDTH_MTU + WIDTH_RTT
+
+RE_PING = re.compile(r"(\d+) received.*?(\d+)% packet loss(?:.*?rtt [^=]*= [\d.]+/([\d.]+)/)?", re.DOTALL)
+
+
+@dataclass(frozen=True)
+class MtuCell:
+    """
+    One (source, destination, address family) entry of the MTU matrix.
+
+    ``mtu`` is the largest probed MTU that passed without loss (0 when none did) and
+    ``rtt_ms`` the highest average RTT among the passing probes (-1 when none did).
+    ``error`` is set when the probes could not be run or parsed. ``probes`` counts the
+    probe sizes tried in discovery mode.
+    """
+    src: str
+    dst: str
+    af: int
+    mtu: int = 0
+    rtt_ms: float = -1
+    error: str | None = None
+    probes: int = 0
+
+    def to_dict(self) -> dict:
+        return {"src": self.src, "dst": self.dst, "af": self.af, "mtu": self.mtu, "rtt_ms": self.rtt_ms,
+                "error": self.error, "probes": self.probes}
+
+
+def ping_command(src_addr: str, dst_addr: str, mtu: int, af: int, count: int = PING_COUNT) -> str:
+    return f"ping -I {src_addr} -c {count} -i 0.2 -W 0.8 -M do -s {mtu - OVERHEAD[af]} {dst_addr}"
+
+
+def parse_pings(outputs: list[str]) -> list[tuple[bool, float | None]]:
+    """
+    (passed without loss, average RTT in ms) per ping output; unparsable output counts as failed.
+    """
+    parsed = []
+    for match in map(RE_PING.search, outputs):
+        if match is None:
+            parsed.append((False, None))
+        else:
+            parsed.append((match[2] == "0" and match[1] != "0", float(match[3]) if match[3] else None))
+    return parsed
+
+
+def probe_source(node, src: str, addrs: dict, mtus: list[int], parallel: int = DEFAULT_PARALLEL,
+                 dsts: list = None, **kwargs) -> dict[tuple, MtuCell]:
+    """
+    Probe every destination in ``addrs`` from ``src`` at every size in ``mtus`` with one
+    remote script.
+
+    :param node: Source node.
+    :param src: Source key in ``addrs``.
+    :param addrs: Key -> {address family: address}; every entry is a destination.
+    :param mtus: MTUs to probe.
+    :param parallel: Pings in flight at once on the node.
+    :param dsts: Destinations to probe, by default every entry of ``addrs``.
+    :param kwargs: Extra arguments for :func:`tests.remote.execute_batch`.
+    :return: (src, dst, af) -> cell
+    """
+    probes = [(dst, af, mtu) for dst in (addrs if dsts is None else dsts) for af in sorted(addrs[src]) if af in addrs[dst] for mtu in mtus]
+    commands = [ping_command(addrs[src][af], addrs[dst][af], mtu, af) for dst, af, mtu in probes]
+    results = execute_batch(node, commands, parallel=parallel, **kwargs)
+
+    cells = {}
+    for (dst, af, mtu), (passed, rtt) in zip(probes, parse_pings([r.stdout for r in results])):
+        cell = cells.setdefault((src, dst, af), {"mtu": 0, "rtt_ms": -1})
+        if passed:
+            cell["mtu"] = max(cell["mtu"], mtu)
+            cell["rtt_ms"] = max(cell["rtt_ms"], rtt if rtt is not None else -1)
+    return {key: MtuCell(*key, **cell) for key, cell in cells.items()}
+
+
+def probe_matrix(nodes: dict, addrs: dict, mtus: list[int], max_workers: int = None,
+                 parallel: int = DEFAULT_PARALLEL) -> dict[tuple, MtuCell]:
+    """
+    Run :func:`probe_source` for every source concurrently.
+
+    :param nodes: Key -> source node.
+    :param addrs: Key -> {address family: address}.
+    :return: (src, dst, af) -> cell for every pair and address family; a source whose
+             sweep failed gets cells carrying the error.
+    """
+    matrix = {}
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(nodes), 1)) as executor:
+        futures = {src: executor.submit(probe_source, node, src, addrs, mtus, parallel=parallel)
+                   for src, node in nodes.items()}
+        for src, future in futures.items():
+            try:
+                matrix.update(future.result())
+            except Exception as e:
+                print(f"[{src}] MTU sweep failed: {e}")
+                matrix.update({(src, dst, af): MtuCell(src, dst, af, error=str(e))
+                               for dst in addrs for af in addrs[src] if af in addrs[dst]})
+    return matrix
+
+
+def format_matrix(matrix: dict[tuple, MtuCell], sites: list[str], af: int) -> str:
+    """
+    Source x destination table of passing MTU and RTT for one address family.
+    """
+    lines = ["src\\dst".ljust(WIDTH_TD) + "".join(f" | {dst.center(WIDTH_TD)}" for dst in sites),
+             "-" * (WIDTH_TD + 1) + ("|" + "-" * (WIDTH_TD + 2)) * len(sites)]
+    for src in sites:
+        row = src.ljust(WIDTH_TD)
+        for dst in sites:
+            cell = matrix.get((src, dst, af))
+            if cell is None or cell.error:
+                row += " | " + "ERR".ljust(WIDTH_TD)
+            else:
+                row += " | " + str(cell.mtu).ljust(WIDTH_MTU) + str(int(cell.rtt_ms)).rjust(WIDTH_RTT)
+        lines.append(row)
+    return "\n".join(lines)
+
+
+def path_key(src: str, dst: str, af: int) -> str:
+    return f"{src}->{dst}/IPv{af}"
+
+
+class MtuCache:
+    """
+    Last discovered MTU per path, persisted as JSON between runs.
+
+    :param path: Cache file.
+    :type path: str
+    """
+    def __init__(self, path: str = DEFAULT_CACHE):
+        self.path = path
+        self.mtus = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CACHE) -> "MtuCache":
+        cache = cls(path)
+        try:
+            with open(path) as f:
+                cache.mtus = {key: int(mtu) for key, mtu in json.load(f).items()}
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, AttributeError) as e:
+            print(f"Ignoring unreadable MTU cache {path}: {e}")
+        return cache
+
+    def get(self, src: str, dst: str, af: int) -> int | None:
+        return self.mtus.get(path_key(src, dst, af))
+
+    def put(self, src: str, dst: str, af: int, mtu: int):
+        with self._lock:
+            self.mtus[path_key(src, dst, af)] = mtu
+
+    def save(self):
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.mtus, f, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+
+
+class _Bisection:
+    """
+    Search state of one path: ``good`` is the largest MTU known to pass, ``bad`` the
+    smallest known to fail, with sentinels just outside [low, high].
+    """
+    def __init__(self, low: int, high: int, known: int = None):
+        self.low = low
+        self.good = low - 1
+        self.bad = high + 1
+        self.known = known if known is not None and low <= known <= high else None
+        self.rtt_ms = -1
+        self.probes = 0
+
+    def next_sizes(self) -> list[int]:
+        if self.done:
+            return []
+        if self.probes == 0:
+            # Confirm the cached boundary (it and one above), else try both ends first:
+            # most paths either pass at the top or fail altogether.
+            if self.known is not None:
+                return [size for size in (self.known, self.known + 1) if size < self.bad]
+            return sorted({self.low, self.bad - 1})
+        return [(self.good + self.bad) // 2]
+
+    def record(self, size: int, passed: bool, rtt: float | None):
+        self.probes += 1
+        if passed:
+            self.good = max(self.good, size)
+            self.rtt_ms = max(self.rtt_ms, rtt if rtt is not None else -1)
+        else:
+            self.bad = min(self.bad, size)
+        # A loss above a success can also be a dropped reply; keep the bounds consistent.
+        if self.bad <= self.good:
+            self.bad = self.good + 1
+
+    @property
+    def done(self) -> bool:
+        return self.bad - self.good <= 1
+
+    @property
+    def mtu(self) -> int:
+        return self.good if self.good >= self.low else 0
+
+
+def discover_source(node, src: str, addrs: dict, cache: MtuCache = None, low: int = MIN_MTU,
+                    high: int = MAX_MTU, parallel: int = DEFAULT_PARALLEL, dsts: list = None,
+                    **kwargs) -> dict[tuple, MtuCell]:
+    """
+    Bisect the largest passing MTU from ``src`` to every destination in ``addrs``.
+
+    Every round sends the next probe of every unfinished path in one remote batch, so a
+    source needs O(log(high - low)) round-trips however many destinations it has; a path
+    whose cached MTU still holds finishes in the first round.
+
+    :param cache: Previous results to start from; updated with the new ones.
+    :param low: Smallest MTU probed; paths failing at it report 0.
+    :param high: Largest MTU probed.
+    :param dsts: Destinations to probe, by default every entry of ``addrs``.
+    :return: (src, dst, af) -> cell
+    """
+    searches = {}
+    for dst in (addrs if dsts is None else dsts):
+        for af in sorted(addrs[src]):
+            if af in addrs[dst]:
+                known = cache.get(src, dst, af) if cache is not None else None
+                searches[(src, dst, af)] = _Bisection(low, high, known)
+
+    while True:
+        probes = [(key, size) for key, search in searches.items() for size in search.next_sizes()]
+        if not probes:
+            break
+        commands = [ping_command(addrs[src][af], addrs[dst][af], size, af, count=DISCOVERY_PING_COUNT)
+                    for (_, dst, af), size in probes]
+        results = execute_batch(node, commands, parallel=parallel, **kwargs)
+        for (key, size), (passed, rtt) in zip(probes, parse_pings([r.stdout for r in results])):
+            searches[key].record(size, passed, rtt)
+
+    cells = {}
+    for key, search in searches.items():
+        cells[key] = MtuCell(*key, mtu=search.mtu, rtt_ms=search.rtt_ms, probes=search.probes)
+        if cache is not None:
+            cache.put(*key, search.mtu)
+    return cells
+
+
+def discover_matrix(nodes: dict, addrs: dict, cache: MtuCache = None, max_workers: int = None,
+                    **kwargs) -> dict[tuple, MtuCell]:
+    """
+    Run :func:`discover_source` for every source concurrently; see :func:`probe_matrix`.
+    """
+    matrix = {}
+    with ThreadPoolExecutor(max_workers=max_workers or max(len(nodes), 1)) as executor:
+        futures = {src: executor.submit(discover_source, node, src, addrs, cache=cache, **kwargs)
+                   for src, node in nodes.items()}
+        for src, future in futures.items():
+            try:
+                matrix.update(future.result())
+            except Exception as e:
+                print(f"[{src}] MTU discovery failed: {e}")
+                matrix.update({(src, dst, af): MtuCell(src, dst, af, error=str(e))
+                               for dst in addrs for af in addrs[src] if af in addrs[dst]})
+    return matrix
+
+
+class MtuPipeline:
+    """
+    Path MTU matrix filled in as sites come up, without waiting for the slowest one.
+
+    Every :meth:`add` makes the new site's paths to and from the sites already added
+    probeable at once: one sweep from the new site to all of them (and itself), and one
+    sweep to the new site from each earlier one. Sweeps from the same source run one at
+    a time, so a node never has more than one sweep's ``parallel`` pings in flight, the
+    same load :func:`probe_matrix` puts on it; its RTTs still include that in-sweep
+    concurrency. Different sources overlap.
+
+    :param sweep: ``sweep(node, src, addrs, dsts=...)`` returning cells, e.g. :func:`probe_source`
+                  or :func:`discover_source` with their options bound.
+    :type sweep: Callable
+    :param max_workers: Sweeps in flight at once.
+    :type max_workers: int
+    """
+    def __init__(self, sweep, max_workers: int = 16):
+        self.sweep = sweep
+        self.nodes = {}
+        self.addrs = {}
+        self.failed = {}
+        self.matrix = {}
+        self._sources = {}
+        self._futures = []
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def add(self, site: str, node, addrs: dict):
+        """
+        Start probing ``site`` (configured, reachable at ``addrs``) against every site added so far.
+        """
+        with self._lock:
+            earlier = list(self.nodes)
+            self.nodes[site] = node
+            self.addrs[site] = addrs
+            self._sources[site] = threading.Lock()
+            snapshot = dict(self.addrs)
+            self._futures.append(self._executor.submit(self._run, site, earlier + [site], snapshot))
+            for src in earlier:
+                self._futures.append(self._executor.submit(self._run, src, [site], snapshot))
+
+    def fail(self, site: str, error: str):
+        """
+        Record that ``site`` never came up; its paths get cells carrying ``error``.
+        """
+        with self._lock:
+            self.failed[site] = error
+
+    def _run(self, src: str, dsts: list, addrs: dict):
+        with self._sources[src]:
+            try:
+                cells = self.sweep(self.nodes[src], src, addrs, dsts=dsts)
+            except Exception as e:
+                print(f"[{src}] MTU sweep to {', '.join(dsts)} failed: {e}")
+                cells = {(src, dst, af): MtuCell(src, dst, af, error=str(e))
+                         for dst in dsts for af in addrs[src] if af in addrs[dst]}
+        with self._lock:
+            self.matrix.update(cells)
+
+    def result(self) -> dict[tuple, MtuCell]:
+        """
+        Wait for every sweep; paths of failed sites are filled with their errors.
+        """
+        with self._lock:
+            futures = list(self._futures)
+        for future in futures:
+            future.result()
+        self._executor.shutdown()
+        sites = list(self.nodes) + list(self.failed)
+        for site, error in self.failed.items():
+            for other in sites:
+                for af in OVERHEAD:
+                    for src, dst in ((site, other), (other, site)):
+                        self.matrix.setdefault((src, dst, af), MtuCell(src, dst, af, error=error))
+        return self.matrix
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import time
+import traceback
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Hashable, Iterable
+
+DEFAULT_MAX_WORKERS = 16
+
+
+def _node_of(endpoint, node_key: Callable | None):
+    return node_key(endpoint) if node_key is not None else endpoint
+
+
+def schedule_rounds(pairs: Iterable[tuple], node_key: Callable = None) -> list[list[tuple]]:
+    """
+    Partition ``pairs`` into rounds in which every node appears in at most one pair.
+
+    Each round is a matching of the pair graph; the rounds are the colour classes of a
+    Misra-Gries edge colouring, so a sweep needs at most ``max_degree + 1`` rounds.
+    Self pairs are dropped and a pair is kept once even if listed in both directions.
+
+    :param pairs: (source, destination) pairs.
+    :param node_key: Maps an endpoint to its node identity; defaults to the endpoint itself.
+    :return: Rounds, each a list of pairs in input order.
+    """
+    unique = {}
+    for src, dst in pairs:
+        a, b = _node_of(src, node_key), _node_of(dst, node_key)
+        if a != b and frozenset((a, b)) not in unique:
+            unique[frozenset((a, b))] = (src, dst, a, b)
+
+    colours = _edge_colouring([(a, b) for _, _, a, b in unique.values()])
+    rounds = defaultdict(list)
+    for key, (src, dst, _, _) in unique.items():
+        rounds[colours[key]].append((src, dst))
+    return [rounds[colour] for colour in sorted(rounds)]
+
+
+def _edge_colouring(edges: list[tuple[Hashable, Hashable]]) -> dict[frozenset, int]:
+    """
+    Misra-Gries edge colouring with at most ``max_degree + 1`` colours.
+    """
+    neighbours = defaultdict(list)
+    for a, b in edges:
+        neighbours[a].append(b)
+        neighbours[b].append(a)
+    palette = range(max((len(n) for n in neighbours.values()), default=0) + 1)
+    # node -> {colour: neighbour joined by an edge of that colour}
+    at = defaultdict(dict)
+    colour_of = {}
+
+    def free(x):
+        return next(c for c in palette if c not in at[x])
+
+    def set_colour(x, y, c):
+        at[x][c] = y
+        at[y][c] = x
+        colour_of[frozenset((x, y))] = c
+
+    def clear(x, y):
+        c = colour_of.pop(frozenset((x, y)))
+        del at[x][c]
+        del at[y][c]
+        return c
+
+    for u, v in edges:
+        # Maximal fan of u starting at v
+        fan = [v]
+        in_fan = {v}
+        extended = True
+        while extended:
+            extended = False
+            for w in neighbours[u]:
+                c = colour_of.get(frozenset((u, w)))
+                if w not in in_fan and c is not None and c not in at[fan[-1]]:
+                    fan.append(w)
+                    in_fan.add(w)
+                    extended = True
+                    break
+
+        c, d = free(u), free(fan[-1])
+
+        # Invert the cd-path starting at u
+        path = []
+        x, want = u, d
+        while want in at[x]:
+            y = at[x][want]
+            path.append((x, y, want))
+            x, want = y, (c if want == d else d)
+        for x, y, _ in path:
+            clear(x, y)
+        for x, y, old in path:
+            set_colour(x, y, c if old == d else d)
+
+        # Shortest fan prefix ending at a node where d is free, then rotate it
+        end = 0
+        for i, w in enumerate(fan):
+            if i and colour_of[frozenset((u, w))] in at[fan[i - 1]]:
+                break
+            if d not in at[w]:
+                end = i
+                break
+        shifted = [colour_of[frozenset((u, fan[i + 1]))] for i in range(end)]
+        for i in range(1, end + 1):
+            clear(u, fan[i])
+        for i, colour in enumerate(shifted):
+            set_colour(u, fan[i], colour)
+        set_colour(u, fan[end], d)
+
+    return colour_of
+
+
+def run_pairs(pairs: Iterable[tuple], measure: Callable, max_workers: int = DEFAULT_MAX_WORKERS) -> dict:
+    """
+    Run ``measure(src, dst)`` for every pair concurrently, without node constraints
+    (e.g. for ping, which does not contend for bandwidth).
+
+    :return: pair -> return value, or the exception it raised.
+    """
+    pairs = list(pairs)
+    results = {}
+    if not pairs:
+        return results
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {pair: executor.submit(_guarded, measure, pair) for pair in pairs}
+        for pair, future in futures.items():
+            results[pair] = future.result()
+    return results
+
+
+def run_rounds(pairs: Iterable[tuple], measure: Callable, max_workers: int = DEFAULT_MAX_WORKERS,
+               node_key: Callable = None, on_round: Callable = None) -> dict:
+    """
+    Run ``measure(src, dst)`` for every pair, round by round, so that no node takes part
+    in two measurements at the same time (e.g. iperf, where overlapping flows on one
+    node would skew the bandwidth numbers). Pairs within a round run concurrently.
+
+    :param pairs: (source, destination) pairs.
+    :param measure: Callable run per pair.
+    :param max_workers: Maximum concurrent measurements.
+    :param node_key: Maps an endpoint to its node identity.
+    :param on_round: Called with (round index, round count, pairs) before each round.
+    :return: pair -> return value, or the exception it raised.
+    """
+    results = {}
+    rounds = schedule_rounds(pairs, node_key=node_key)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for i, round_pairs in enumerate(rounds):
+            if on_round is not None:
+                on_round(i, len(rounds), round_pairs)
+            futures = {pair: executor.submit(_guarded, measure, pair) for pair in round_pairs}
+            for pair, future in futures.items():
+                results[pair] = future.result()
+    return results
+
+
+def print_round(index: int, count: int, pairs: list):
+    print(f"Round {index + 1}/{count}: {len(pairs)} pairs")
+
+
+def _guarded(measure: Callable, pair: tuple):
+    src, dst = pair
+    start = time.monotonic()
+    try:
+        return measure(src, dst)
+    except Exception as e:
+        print(f"{src}->{dst} failed after {time.monotonic() - start:.1f}s: {e}")
+        traceback.print_exc()
+        return e
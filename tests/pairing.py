@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Deterministic, coverage-aware choice of measurement pairs.
+
+Instead of sampling a few random pairs per run, :func:`plan_pairs` walks a fixed
+pseudo-random order of all links, one slice of it per day, so every link is measured
+once every :func:`coverage_days` days. Links that failed recently are measured again
+on top of the rotation. Everything is derived from the date, so a run's plan can be
+recomputed later, and pairs are computed from their index without materializing the
+combinations, so thousands of endpoints cost no more than a handful.
+
+:func:`iter_pairs` and :func:`sample_pairs` draw unique pairs lazily in the same way,
+subject to constraints (distinct sites, each worker in at most one pair, sites to
+avoid), in memory that does not grow with the number of endpoints.
+"""
+import datetime
+import math
+import os
+import random
+from collections.abc import Callable, Hashable, Iterable, Iterator, Sequence
+from itertools import islice
+
+# Day 0 of the rotation.
+EPOCH = datetime.date(2024, 1, 1)
+# Share of the daily pairs reserved for re-measuring recently failed links.
+RETEST_SHARE = 0.25
+# Days of history considered when weighting links.
+FAILURE_WINDOW_DAYS = 14
+
+
+def pair_count(n: int) -> int:
+    return n * (n - 1) // 2
+
+
+def unrank_pair(index: int, n: int) -> tuple[int, int]:
+    """
+    The ``index``-th (i, j), i < j, of ``itertools.combinations(range(n), 2)``, in O(1).
+    """
+    k = pair_count(n) - 1 - index
+    row = n - 2 - (math.isqrt(8 * k + 1) - 1) // 2
+    return row, index - row * (2 * n - row - 1) // 2 + row + 1
+
+
+def coverage_days(endpoints: int, per_day: int) -> int:
+    """
+    Days the rotation takes to cover every link once with ``per_day`` pairs a day.
+    """
+    return max(1, math.ceil(pair_count(endpoints) / max(per_day, 1)))
+
+
+class _Rotation:
+    """
+    Fixed pseudo-random order of the ``total`` link indexes: i -> (a * i + b) mod total
+    with a coprime to total, a permutation that needs no table.
+    """
+    def __init__(self, total: int, salt=""):
+        rng = random.Random(f"rotation:{salt}:{total}")
+        self.total = total
+        self.a = 1
+        if total > 2:
+            self.a = rng.randrange(1, total)
+            while math.gcd(self.a, total) != 1:
+                self.a = rng.randrange(1, total)
+        self.b = rng.randrange(total) if total else 0
+
+    def __getitem__(self, position: int) -> int:
+        return (self.a * (position % self.total) + self.b) % self.total
+
+
+def _day_index(day) -> int:
+    if day is None:
+        day = datetime.date.today()
+    elif isinstance(day, str):
+        day = datetime.date.fromisoformat(day)
+    return (day - EPOCH).days
+
+
+def plan_pairs(endpoints: Sequence[Hashable], per_day: int = None, day=None, days: int = None,
+               failures: dict[tuple, float] = None, retest: int = None,
+               site_of: Callable[[Hashable], Hashable] = None, salt: str = "") -> list[tuple]:
+    """
+    Pairs to measure on ``day``.
+
+    :param endpoints: Sites, workers or slices; their sorted order defines the link indexes.
+    :param per_day: Rotation pairs per day; defaults to ``len(endpoints) // 2``.
+    :param day: ``datetime.date`` or ISO date string; defaults to today.
+    :param days: Cover every link within this many days; raises ``per_day`` as needed.
+    :param failures: (site, site) -> failure weight from recent runs (see :func:`recent_failures`).
+    :param retest: Extra pairs for failed links; defaults to ``RETEST_SHARE`` of ``per_day``.
+    :param site_of: Maps an endpoint to the site ``failures`` is keyed by; identity by default.
+    :param salt: Distinguishes rotations of different tests over the same endpoints.
+    :return: Unordered (a, b) pairs, each link at most once.
+    """
+    ordered = sorted(set(endpoints), key=str)
+    n = len(ordered)
+    total = pair_count(n)
+    if total == 0:
+        return []
+    if per_day is None:
+        per_day = max(n // 2, 1)
+    if days is not None:
+        per_day = max(per_day, math.ceil(total / days))
+    per_day = min(per_day, total)
+
+    # The rotation: slot ``d % period`` of the permuted link order.
+    index = _day_index(day)
+    period = coverage_days(n, per_day)
+    rotation = _Rotation(total, salt)
+    start = (index % period) * per_day
+    pairs = [unrank_pair(rotation[start + i], n) for i in range(per_day)]
+    planned = [(ordered[i], ordered[j]) for i, j in pairs]
+
+    if failures:
+        site_of = site_of or (lambda endpoint: endpoint)
+        if retest is None:
+            retest = max(1, round(per_day * RETEST_SHARE))
+        planned += _retest_pairs(ordered, failures, retest, set(planned), site_of,
+                                 random.Random(f"retest:{salt}:{index}"))
+    return planned
+
+
+def _identity(endpoint):
+    return endpoint
+
+
+def iter_pairs(endpoints: Sequence[Hashable], seed=None, site_of: Callable[[Hashable], Hashable] = None,
+               worker_of: Callable[[Hashable], Hashable] = None, distinct_sites: bool = False,
+               distinct_workers: bool = False, avoid: Iterable = ()) -> Iterator[tuple]:
+    """
+    Unique unordered pairs of ``endpoints`` in a pseudo-random order, generated lazily.
+
+    Pairs are unranked from a permuted index, so no combination is materialized and
+    the generator holds O(1) state, plus the workers already used with ``distinct_workers``.
+
+    :param endpoints: Indexable endpoints (sites, workers, slices).
+    :param seed: Seed of the order; the same seed and endpoints give the same pairs.
+    :param site_of: Site of an endpoint; identity by default.
+    :param worker_of: Worker of an endpoint; identity by default.
+    :param distinct_sites: Skip pairs within one site.
+    :param distinct_workers: Use every worker in at most one pair.
+    :param avoid: Sites whose endpoints are never paired.
+    """
+    site_of = site_of or _identity
+    worker_of = worker_of or _identity
+    avoid = set(avoid)
+    n = len(endpoints)
+    total = pair_count(n)
+    if total == 0:
+        return
+    rotation = _Rotation(total, "random" if seed is None else seed)
+    # Without a seed the walk starts anywhere in the fixed order.
+    start = random.randrange(total) if seed is None else 0
+    used = set()
+    for position in range(start, start + total):
+        i, j = unrank_pair(rotation[position], n)
+        a, b = endpoints[i], endpoints[j]
+        if avoid and (site_of(a) in avoid or site_of(b) in avoid):
+            continue
+        if distinct_sites and site_of(a) == site_of(b):
+            continue
+        if distinct_workers:
+            workers = worker_of(a), worker_of(b)
+            if workers[0] == workers[1] or workers[0] in used or workers[1] in used:
+                continue
+            used.update(workers)
+        yield a, b
+
+
+def sample_pairs(endpoints: Sequence[Hashable], count: int, **constraints) -> list[tuple]:
+    """
+    Up to ``count`` pairs from :func:`iter_pairs`; fewer when the constraints leave fewer.
+    """
+    return list(islice(iter_pairs(endpoints, **constraints), count))
+
+
+def _retest_pairs(ordered: list, failures: dict[tuple, float], count: int, planned: set,
+                  site_of: Callable, rng: random.Random) -> list[tuple]:
+    by_site = {}
+    for endpoint in ordered:
+        by_site.setdefault(site_of(endpoint), []).append(endpoint)
+    # Weighted sampling without replacement: the largest rng^(1/weight) keys win.
+    keyed = sorted(((rng.random() ** (1 / weight), link) for link, weight in sorted(failures.items(), key=str)
+                    if weight > 0 and all(site in by_site for site in link)), reverse=True)
+    extra = []
+    for _, (site1, site2) in keyed:
+        if len(extra) >= count:
+            break
+        members = by_site[site1] + (by_site[site2] if site2 != site1 else [])
+        for a, b in iter_pairs(members, seed=rng.random(), site_of=site_of, distinct_sites=site1 != site2):
+            pair = (a, b) if str(a) <= str(b) else (b, a)
+            if pair not in planned:
+                planned.add(pair)
+                extra.append(pair)
+                break
+    return extra
+
+
+def recent_failures(test: str, days: float = FAILURE_WINDOW_DAYS, db: str = None) -> dict[tuple, float]:
+    """
+    Failure weights per (site, site) link from the results history, newer failures
+    weighing more; empty when there is no history yet.
+    """
+    from tests.history import DEFAULT_DB, HistoryStore
+    db = db or DEFAULT_DB
+    if not os.path.exists(db):
+        return {}
+    with HistoryStore(db) as store:
+        return store.link_failures(test, window_days=days)
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable
+
+READY_STATES = ("StableOK", "ModifyOK")
+FAILED_STATES = ("StableError", "ModifyError", "Closing", "Dead")
+
+# Delay in seconds before re-polling a slice first seen in a state. While the state does
+# not change the delay grows by ``backoff`` up to ``max_interval``; a state change
+# resets it. Nascent slices wait for the orchestrator to pick them up and change
+# slowly; Configuring slices are closest to finishing.
+DEFAULT_INTERVALS = {
+    "Nascent": 10.0,
+    "Configuring": 5.0,
+    "Modifying": 5.0,
+}
+DEFAULT_INTERVAL = 5.0
+DEFAULT_BACKOFF = 1.5
+DEFAULT_MAX_INTERVAL = 60.0
+# Consecutive rounds a slice may be missing from the listing before it is declared gone.
+MISSING_ROUNDS = 3
+
+
+class SliceStateError(Exception):
+    """
+    Raised when a watched slice reaches a failed state.
+    """
+    def __init__(self, message: str, slice_id: str = None, state: str = None):
+        super().__init__(message)
+        self.slice_id = slice_id
+        self.state = state
+
+
+def query_slice_states(fablib, slice_ids: list[str]) -> dict[str, str]:
+    """
+    State of every live slice of the user in one orchestrator request.
+
+    Dead and Closing slices are excluded so the listing stays bounded; callers treat
+    a slice that stays missing as gone. The listing covers all of the user's live
+    slices (failed ones are kept for inspection), so it is read page by page until
+    every requested slice was seen or the listing ends.
+
+    :return: slice ID -> state for the requested slices that were listed
+    """
+    wanted = set(slice_ids)
+    page = max(200, 2 * len(wanted))
+    states = {}
+    offset = 0
+    while True:
+        listed = list(fablib.get_manager().list_slices(as_self=True, graph_format="NONE", return_fmt="dto",
+                                                       exclude_states=["Dead", "Closing"],
+                                                       limit=page, offset=offset))
+        for item in listed:
+            if isinstance(item, dict):
+                slice_id, state = item.get("slice_id"), item.get("state")
+            else:
+                slice_id, state = item.slice_id, item.state
+            if slice_id in wanted:
+                states[slice_id] = state
+        if len(listed) < page or wanted <= states.keys():
+            return states
+        offset += page
+
+
+@dataclass
+class _Watch:
+    slice_id: str
+    until: tuple
+    deadline: float | None
+    timeout: float | None
+    interval: float
+    next_poll: float
+    future: Future = field(default_factory=Future)
+    state: str | None = None
+    missing: int = 0
+
+
+class SlicePoller:
+    """
+    One background thread polling the state of every watched slice with a single
+    batched query per round, so orchestrator load grows with rounds rather than with
+    slices x rounds.
+
+    Each watch gets a :class:`concurrent.futures.Future` that resolves with the state
+    once the slice reaches one of the ``until`` states, or fails with
+    :class:`SliceStateError` / :class:`TimeoutError`. A round runs when the earliest
+    watch is due; every outstanding watch is updated from it.
+
+    :param query: Callable taking a list of slice IDs and returning slice ID -> state in one request.
+    :type query: Callable
+    :param intervals: Per-state initial poll delays merged over ``DEFAULT_INTERVALS``.
+    :type intervals: dict
+    :param backoff: Growth factor of a watch's delay while its state is unchanged.
+    :type backoff: float
+    :param max_interval: Upper bound on a watch's delay, in seconds.
+    :type max_interval: float
+    :param default_interval: Delay for states without an entry in ``intervals``.
+    :type default_interval: float
+    """
+    def __init__(self, query: Callable[[list[str]], dict[str, str]], intervals: dict = None,
+                 backoff: float = DEFAULT_BACKOFF, max_interval: float = DEFAULT_MAX_INTERVAL,
+                 default_interval: float = DEFAULT_INTERVAL):
+        self.query = query
+        self.intervals = {**DEFAULT_INTERVALS, **(intervals or {})}
+        self.backoff = backoff
+        self.max_interval = max_interval
+        self.default_interval = default_interval
+        self.rounds = 0
+        self._cond = threading.Condition()
+        self._watches: list[_Watch] = []
+        self._thread = None
+        self._stopped = False
+
+    @classmethod
+    def for_fablib(cls, fablib, **kwargs) -> "SlicePoller":
+        # A simulated testbed (tests/simulator.py) runs on a compressed clock; poll on the same clock.
+        scale = getattr(fablib, "time_scale", None)
+        if scale is not None:
+            kwargs.setdefault("intervals", {state: delay * scale for state, delay in DEFAULT_INTERVALS.items()})
+            kwargs.setdefault("default_interval", DEFAULT_INTERVAL * scale)
+            kwargs.setdefault("max_interval", DEFAULT_MAX_INTERVAL * scale)
+        return cls(partial(query_slice_states, fablib), **kwargs)
+
+    def watch(self, slice_id: str, until: tuple = READY_STATES, timeout: float = None) -> Future:
+        """
+        Start watching ``slice_id``; the first poll happens within ``default_interval``.
+
+        :param until: States that resolve the returned future.
+        :param timeout: Seconds before the future fails with TimeoutError; None waits indefinitely.
+        :return: Future resolving to the state reached.
+        """
+        now = time.monotonic()
+        watch = _Watch(slice_id=slice_id, until=tuple(until), timeout=timeout,
+                       deadline=now + timeout if timeout is not None else None,
+                       interval=self.default_interval, next_poll=now)
+        with self._cond:
+            if self._stopped:
+                raise RuntimeError("Slice poller is stopped")
+            self._watches.append(watch)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="slice-poller", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return watch.future
+
+    def wait(self, slice_obj, timeout: float = None, update: bool = True) -> str:
+        """
+        Drop-in for ``Slice.wait()``: block until the slice is StableOK/ModifyOK.
+
+        :param update: Refresh the slice topology afterwards, as ``Slice.wait()`` does.
+        :raises SliceStateError: If the slice reaches a failed state.
+        :raises TimeoutError: If ``timeout`` expires first.
+        :return: The state reached.
+        """
+        try:
+            state = self.watch(slice_obj.get_slice_id(), timeout=timeout).result()
+        except SliceStateError as e:
+            try:
+                message = slice_obj.build_error_exception_string()
+            except Exception:
+                message = ""
+            raise SliceStateError(message or str(e), slice_id=e.slice_id, state=e.state) from e
+        if update:
+            slice_obj.update()
+        return state
+
+    def outstanding(self) -> int:
+        with self._cond:
+            return len(self._watches)
+
+    def stop(self):
+        """
+        Stop the polling thread; outstanding watches fail with RuntimeError.
+        """
+        with self._cond:
+            self._stopped = True
+            pending, self._watches = self._watches, []
+            self._cond.notify()
+        for watch in pending:
+            watch.future.set_exception(RuntimeError("Slice poller stopped"))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    now = time.monotonic()
+                    due = min((self._due(w) for w in self._watches), default=None)
+                    if due is not None and due <= now:
+                        break
+                    self._cond.wait(None if due is None else due - now)
+                if self._stopped:
+                    return
+                slice_ids = list(dict.fromkeys(w.slice_id for w in self._watches))
+
+            try:
+                states = self.query(slice_ids)
+            except Exception as e:
+                print(f"Slice state query failed: {e}")
+                states = None
+
+            with self._cond:
+                self.rounds += 1
+                done = self._update(states, time.monotonic())
+            for watch, state, exception in done:
+                if exception is None:
+                    watch.future.set_result(state)
+                else:
+                    watch.future.set_exception(exception)
+
+    @staticmethod
+    def _due(watch: _Watch) -> float:
+        return watch.next_poll if watch.deadline is None else min(watch.next_poll, watch.deadline)
+
+    def _update(self, states: dict | None, now: float) -> list[tuple]:
+        done = []
+        remaining = []
+        for watch in self._watches:
+            result = self._advance(watch, states, now)
+            if result is None:
+                remaining.append(watch)
+            else:
+                done.append((watch, *result))
+        self._watches = remaining
+        return done
+
+    def _advance(self, watch: _Watch, states: dict | None, now: float) -> tuple | None:
+        """
+        Apply one round to ``watch``; returns (state, exception) once it is finished.
+        """
+        if states is not None:
+            state = states.get(watch.slice_id)
+            if state is None:
+                watch.missing += 1
+                if watch.missing >= MISSING_ROUNDS:
+                    return None, SliceStateError(f"Slice {watch.slice_id} is no longer listed (Dead or Closing)",
+                                                 slice_id=watch.slice_id, state="Dead")
+            else:
+                watch.missing = 0
+                if state in watch.until:
+                    return state, None
+                if state in FAILED_STATES:
+                    return None, SliceStateError(f"Slice {watch.slice_id} is {state}",
+                                                 slice_id=watch.slice_id, state=state)
+                if state != watch.state:
+                    watch.state = state
+                    watch.interval = self.intervals.get(state, self.default_interval)
+                    watch.next_poll = now + watch.interval
+        if watch.deadline is not None and now >= watch.deadline:
+            return None, TimeoutError(f"Timeout exceeded ({watch.timeout} sec). "
+                                      f"Slice: {watch.slice_id} ({watch.state})")
+        if now >= watch.next_poll:
+            watch.interval = min(watch.interval * self.backoff, self.max_interval)
+            watch.next_poll = now + watch.interval
+        return None
+
+
+_pollers = {}
+_pollers_lock = threading.Lock()
+
+
+def get_poller(fablib) -> SlicePoller:
+    """
+    The process-wide poller for ``fablib``'s orchestrator.
+    """
+    with _pollers_lock:
+        poller = _pollers.get(fablib)
+        if poller is None:
+            poller = _pollers[fablib] = SlicePoller.for_fablib(fablib)
+        return poller
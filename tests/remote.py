@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import re
+import shlex
+import uuid
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class CommandResult:
+    """
+    Outcome of one command from a batch.
+
+    ``exit_code`` is ``None`` when the command never ran because an earlier one failed
+    with ``stop_on_error`` set.
+    """
+    command: str
+    exit_code: int | None
+    stdout: str
+    stderr: str
+
+    @property
+    def ok(self) -> bool:
+        return self.exit_code == 0
+
+
+def build_batch_script(commands: list[str], marker: str, stop_on_error: bool = False, parallel: int = 1) -> str:
+    """
+    Compose one shell invocation that runs ``commands`` in order and frames each
+    command's stdout and stderr between ``marker`` lines carrying its index and exit code.
+
+    Each command runs in its own subshell with stdin closed, as it would in a separate
+    SSH session. With ``parallel`` > 1, up to that many commands run at once; their
+    output is buffered in a temporary directory and framed in order once all finished.
+    """
+    if parallel > 1:
+        if stop_on_error:
+            raise ValueError("stop_on_error requires sequential execution")
+        return _build_parallel_script(commands, marker, parallel)
+    lines = []
+    for i, command in enumerate(commands):
+        lines.append(f"printf '\\n{marker} BEGIN {i}\\n'; printf '\\n{marker} BEGIN {i}\\n' >&2")
+        lines.append(f"( {command}\n) </dev/null; rc=$?")
+        lines.append(f"printf '\\n{marker} END {i} %d\\n' $rc; printf '\\n{marker} END {i} %d\\n' $rc >&2")
+        if stop_on_error:
+            lines.append("[ $rc -eq 0 ] || exit $rc")
+    return "bash -c " + shlex.quote("\n".join(lines))
+
+
+def _build_parallel_script(commands: list[str], marker: str, parallel: int) -> str:
+    lines = ['out=$(mktemp -d)']
+    for i, command in enumerate(commands):
+        lines.append(f'{{ ( {command}\n) </dev/null >"$out/{i}" 2>"$out/{i}.err"; echo $? >"$out/{i}.rc"; }} &')
+        if (i + 1) % parallel == 0:
+            lines.append("wait")
+    lines.append("wait")
+    for i in range(len(commands)):
+        lines.append(f"printf '\\n{marker} BEGIN {i}\\n'; printf '\\n{marker} BEGIN {i}\\n' >&2")
+        lines.append(f'cat "$out/{i}"; cat "$out/{i}.err" >&2; rc=$(cat "$out/{i}.rc")')
+        lines.append(f"printf '\\n{marker} END {i} %d\\n' $rc; printf '\\n{marker} END {i} %d\\n' $rc >&2")
+    lines.append('rm -rf "$out"')
+    return "bash -c " + shlex.quote("\n".join(lines))
+
+
+def _split_stream(output: str, marker: str) -> dict[int, tuple[str, int]]:
+    pattern = re.compile(rf"\n{re.escape(marker)} BEGIN (\d+)\n(.*?)\n{re.escape(marker)} END \1 (-?\d+)\n",
+                         re.DOTALL)
+    return {int(m.group(1)): (m.group(2), int(m.group(3))) for m in pattern.finditer(output or "")}
+
+
+def parse_batch_output(commands: list[str], stdout: str, stderr: str, marker: str) -> list[CommandResult]:
+    """
+    Demultiplex the framed output of :func:`build_batch_script` back into one
+    :class:`CommandResult` per command.
+    """
+    out = _split_stream(stdout, marker)
+    err = _split_stream(stderr, marker)
+    results = []
+    for i, command in enumerate(commands):
+        if i not in out:
+            results.append(CommandResult(command=command, exit_code=None, stdout="", stderr=""))
+            continue
+        text, exit_code = out[i]
+        results.append(CommandResult(command=command, exit_code=exit_code, stdout=text,
+                                     stderr=err.get(i, ("", exit_code))[0]))
+    return results
+
+
+def execute_batch(node, commands: list[str], stop_on_error: bool = False, quiet: bool = True,
+                  pool=None, parallel: int = 1, **kwargs) -> list[CommandResult]:
+    """
+    Run ``commands`` on ``node`` over a single ``node.execute`` call (one SSH round-trip)
+    and return per-command exit codes, stdout and stderr.
+
+    :param node: fablib Node (or anything with a compatible ``execute``).
+    :param commands: Shell commands, run sequentially in order.
+    :param stop_on_error: Skip the remaining commands after the first non-zero exit code.
+    :param quiet: Passed to ``node.execute``.
+    :param pool: Optional :class:`tests.ssh_pool.SSHPool` to run the batch over a pooled session.
+    :param parallel: Maximum number of commands running at once on the node.
+    :param kwargs: Extra arguments for ``node.execute``, e.g. ``timeout``.
+    :rtype: list[CommandResult]
+    """
+    if not commands:
+        return []
+    marker = f"__batch_{uuid.uuid4().hex}__"
+    script = build_batch_script(commands, marker, stop_on_error=stop_on_error, parallel=parallel)
+    if pool is not None:
+        stdout, stderr = pool.execute(node, script, timeout=kwargs.get("timeout"))
+    else:
+        stdout, stderr = node.execute(script, quiet=quiet, **kwargs)
+    return parse_batch_output(commands, stdout, stderr, marker)
@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Append-only JSON Lines result sink.
+
+Every result is appended to ``results.jsonl`` as soon as it is known, and the
+per-test summary files (``nvme.json``, ``iperf_test_results.json``, ...) are produced
+from it by :func:`compact`. A run that dies half way leaves every record written so far
+on disk; ``python -m tests.result_sink <results.jsonl>`` rebuilds its summaries.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+
+SCHEMA_VERSION = 1
+RESULTS_DIR = os.getenv("FABRIC_RESULTS_DIR", ".")
+DEFAULT_PATH = os.path.join(RESULTS_DIR, "results.jsonl")
+# Stage of the record carrying a key's final outcome; only these end up in summary files.
+RESULT = "result"
+PASS = "PASS"
+FAIL = "FAIL"
+
+# Identifies the records of this process in a shared results file.
+RUN_ID = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+
+# field -> accepted types; None is accepted for optional fields
+RECORD_SCHEMA = {
+    "schema": (int,),
+    "run_id": (str,),
+    "ts": (float,),
+    "test": (str,),
+    "key": (str,),
+    "stage": (str,),
+    "outcome": (str,),
+    "error": (str, type(None)),
+    "slice_id": (str, type(None)),
+    "timings": (dict,),
+    "data": (dict, list, str, int, float, bool, type(None)),
+}
+
+
+def validate_record(record: dict):
+    """
+    :raises ValueError: if a field is missing, unknown or of the wrong type.
+    """
+    missing = RECORD_SCHEMA.keys() - record.keys()
+    unknown = record.keys() - RECORD_SCHEMA.keys()
+    if missing or unknown:
+        raise ValueError(f"Invalid result record: missing {sorted(missing)}, unknown {sorted(unknown)}")
+    for name, types in RECORD_SCHEMA.items():
+        if not isinstance(record[name], types):
+            raise ValueError(f"Invalid result record: {name}={record[name]!r}")
+    if record["outcome"] not in (PASS, FAIL):
+        raise ValueError(f"Invalid result record: outcome={record['outcome']!r}")
+
+
+def outcome_of(value) -> str:
+    """
+    PASS/FAIL for the result values the tests already produce: ``{"state": bool, ...}``
+    dictionaries, or dictionaries of per-check "PASS"/"FAIL: ..." strings.
+    """
+    if isinstance(value, dict):
+        if "state" in value:
+            return PASS if value["state"] else FAIL
+        checks = [v for v in value.values() if isinstance(v, str)]
+        return FAIL if any(v.startswith(FAIL) for v in checks) else PASS
+    if isinstance(value, str):
+        return PASS if value == PASS else FAIL
+    return PASS if value else FAIL
+
+
+def make_record(test: str, key, value=None, stage: str = RESULT, outcome: str = None, error: str = None,
+                slice_id: str = None, timings: dict = None) -> dict:
+    """
+    Build a schema-conforming record; ``value`` is kept verbatim under ``data`` and the
+    outcome, error and slice id default to what it carries.
+    """
+    if isinstance(value, dict):
+        error = error if error is not None else (value.get("error") or None)
+        slice_id = slice_id if slice_id is not None else value.get("slice_id")
+    record = {
+        "schema": SCHEMA_VERSION,
+        "run_id": RUN_ID,
+        "ts": time.time(),
+        "test": test,
+        "key": str(key),
+        "stage": stage,
+        "outcome": outcome or outcome_of(value),
+        "error": None if error is None else str(error),
+        "slice_id": slice_id,
+        "timings": timings or {},
+        "data": value,
+    }
+    validate_record(record)
+    return record
+
+
+class ResultSink:
+    """
+    Thread-safe JSON Lines writer that fsyncs once per batch.
+
+    Records are buffered and written when ``batch_size`` records are pending or
+    ``flush_interval`` seconds have passed since the last write, and on :meth:`flush`
+    and :meth:`close`.
+
+    :param path: JSON Lines file, appended to.
+    :type path: str
+    :param batch_size: Records per write/fsync.
+    :type batch_size: int
+    :param flush_interval: Maximum seconds a record stays buffered while others arrive.
+    :type flush_interval: float
+
+    ``run_offset`` is the size ``path`` had when this process first opened a sink on it;
+    every record of this run lies after it, so readers of the run can skip older runs.
+    """
+    def __init__(self, path: str = DEFAULT_PATH, batch_size: int = 20, flush_interval: float = 2.0):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.run_offset = _run_offset(path)
+        self._lock = threading.Lock()
+        self._pending = []
+        self._last_flush = time.monotonic()
+
+    def write(self, record: dict):
+        validate_record(record)
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._pending.append(line)
+            if len(self._pending) >= self.batch_size or \
+                    time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as f:
+            f.write("\n".join(self._pending) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.written += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_records(path: str = DEFAULT_PATH, test: str = None, run_id: str = None, offset: int = 0):
+    """
+    Yield records from ``path``, skipping a torn last line left by a crash.
+
+    :param offset: Byte offset to start reading at, e.g. a sink's ``run_offset``.
+    """
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return
+    with f:
+        f.seek(offset)
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if (test is None or record.get("test") == test) and (run_id is None or record.get("run_id") == run_id):
+                yield record
+
+
+def latest_run_id(path: str = DEFAULT_PATH, test: str = None) -> str | None:
+    run_id = None
+    for record in read_records(path, test=test):
+        run_id = record.get("run_id")
+    return run_id
+
+
+def compact(path: str, test: str, filename: str, run_id: str = None, offset: int = 0) -> dict:
+    """
+    Write the summary file for ``test`` in the format the tests always produced
+    (key -> result value), keeping the last final-outcome record per key.
+
+    :param run_id: Run to summarize; defaults to the most recent run of ``test``.
+    :param offset: Byte offset the run starts after; see :class:`ResultSink`.
+    :return: The summary written.
+    """
+    run_id = run_id or latest_run_id(path, test=test)
+    summary = {}
+    for record in read_records(path, test=test, run_id=run_id, offset=offset):
+        if record["stage"] == RESULT:
+            summary[record["key"]] = record["data"]
+    tmp = f"{filename}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(summary, f, indent=2)
+    os.replace(tmp, filename)
+    return summary
+
+
+_sinks = {}
+_sinks_lock = threading.Lock()
+# path -> size of the file before this process wrote to it
+_run_offsets = {}
+_run_offsets_lock = threading.Lock()
+
+
+def _run_offset(path: str) -> int:
+    with _run_offsets_lock:
+        key = os.path.abspath(path)
+        if key not in _run_offsets:
+            try:
+                _run_offsets[key] = os.path.getsize(path)
+            except FileNotFoundError:
+                _run_offsets[key] = 0
+        return _run_offsets[key]
+
+
+def get_sink(path: str = DEFAULT_PATH) -> ResultSink:
+    """
+    Process-wide sink for ``path``.
+    """
+    with _sinks_lock:
+        sink = _sinks.get(path)
+        if sink is None:
+            sink = _sinks[path] = ResultSink(path)
+        return sink
+
+
+def open_sinks() -> list[ResultSink]:
+    """
+    The process-wide sinks created so far.
+    """
+    with _sinks_lock:
+        return list(_sinks.values())
+
+
+def _test_of(filename: str) -> str:
+    return os.path.splitext(os.path.basename(filename))[0]
+
+
+class StreamingResults(dict):
+    """
+    Results dictionary that appends a record to the sink every time a key is set, so
+    partial results survive a crash. :meth:`save` compacts the run into ``filename``.
+
+    :param filename: Summary file; its stem names the test in the records.
+    :type filename: str
+    :param sink: Defaults to the process-wide sink.
+    :type sink: ResultSink
+    """
+    def __init__(self, filename: str, sink: ResultSink = None):
+        super().__init__()
+        self.filename = filename
+        self.test = _test_of(filename)
+        self.sink = sink or get_sink()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.sink.write(make_record(self.test, key, value))
+
+    def record(self, key, stage: str, value=None, **kwargs):
+        """
+        Append an intermediate record (e.g. one check of a pair) without changing the result.
+        """
+        self.sink.write(make_record(self.test, key, value, stage=stage, **kwargs))
+
+    def save(self, filename: str = None) -> dict:
+        self.sink.flush()
+        return compact(self.sink.path, self.test, filename or self.filename, run_id=RUN_ID,
+                       offset=self.sink.run_offset)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild summary files from a results JSON Lines file.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--run-id", help="Run to compact (default: latest run per test)")
+    parser.add_argument("--output-dir", default=".")
+    args = parser.parse_args()
+
+    tests = sorted({record["test"] for record in read_records(args.path, run_id=args.run_id)
+                    if record["stage"] == RESULT})
+    for test in tests:
+        filename = os.path.join(args.output_dir, f"{test}.json")
+        summary = compact(args.path, test, filename, run_id=args.run_id)
+        print(f"{filename}: {len(summary)} results")
+
+
+if __name__ == "__main__":
+    main()
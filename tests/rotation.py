@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Component rotation: one long-lived VM per site, components swapped through slice modify.
+
+The component modules (GPU, NVMe, SmartNIC, FPGA) boot a fresh VM per site and model.
+With ``FABRIC_COMPONENT_ROTATION=1`` :class:`ComponentRotation` instead keeps the warm
+pool's base VM at every site and, model by model, attaches the component through slice
+modify, checks it shows up in ``lspci``, detaches it again and checks it is gone. Each
+attach and detach is recorded as an ``attach``/``detach`` stage in the provisioning
+timings, so the per-component modify latency shows up in the latency tables.
+
+Slice modify can only attach components free on the worker hosting the VM, so each
+site's models are narrowed to those its host has available; the others are recorded as
+skipped rather than failed.
+
+A failed step is retried as a plain detach to get the VM back to its base shape; only
+a VM that cannot be restored leaves the rotation (and the pool) for inspection.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tests.capacity import GPU_MODELS, SMART_NIC_MODELS, CapacityIndex, component_field
+from tests.inventory import Inventory, load_inventory
+from tests.lifecycle import SliceLifecycle, SliceOutcome
+from tests.timing import ATTACH, DETACH, ProvisioningTimer, StageTiming, provisioning_timer
+from tests.utils import failure_result
+from tests.warm_pool import BASE_NODE, WarmPool
+
+ROTATION = os.getenv("FABRIC_COMPONENT_ROTATION", "0").lower() in ("1", "true", "yes")
+
+NVME_MODELS = ("NVME_P4510",)
+FPGA_MODELS = ("FPGA_Xilinx_U280",)
+ROTATION_MODELS = GPU_MODELS + NVME_MODELS + SMART_NIC_MODELS + FPGA_MODELS
+
+LSPCI_COMMAND = "sudo dnf install -y -q pciutils && lspci"
+# lspci text identifying each model; the base VM's Shared NIC is listed as a
+# "[ConnectX-6 Virtual Function]", hence the brackets for the SmartNICs.
+LSPCI_SIGNATURES = {
+    "GPU": "NVIDIA",
+    "NVME": "Non-Volatile memory controller",
+    "NIC_ConnectX_5": "[ConnectX-5]",
+    "NIC_ConnectX_6": "[ConnectX-6]",
+    "FPGA": "Xilinx",
+}
+
+
+def lspci_signature(model: str) -> str:
+    return LSPCI_SIGNATURES.get(model) or LSPCI_SIGNATURES[model.split("_", 1)[0]]
+
+
+def skipped_result(reason: str) -> dict:
+    return {"state": True, "error": "", "skipped": reason}
+
+
+def rotation_plan(index: CapacityIndex, models=ROTATION_MODELS) -> dict[str, list[str]]:
+    """
+    Models to rotate through per site: every model in ``models`` the site offers.
+    :meth:`ComponentRotation.rotate` narrows them to what the VM's host has free.
+    """
+    plan = {}
+    for site, model in index.component_pairs(models):
+        plan.setdefault(site, []).append(model)
+    return plan
+
+
+class ComponentRotation:
+    """
+    Attach, validate and detach components one model at a time on warm per-site VMs.
+
+    Sites rotate concurrently, each through its own models in order; the modify
+    submissions and waits go through ``lifecycle``, whose build lock and stage limits
+    apply across sites.
+
+    :param pool: Warm pool holding (or provisioning) the long-lived VM of every site.
+    :type pool: WarmPool
+    :param lifecycle: Lifecycle driving each modify: build, submit, wait, wait_ssh, post_boot_config.
+    :type lifecycle: SliceLifecycle
+    :param timer: Receives one ``attach`` and one ``detach`` timing per site and model.
+    :type timer: ProvisioningTimer
+    :param inventory: Host inventory to check component availability against; loaded
+        with :func:`load_inventory` once the VMs are up when not given.
+    :type inventory: Inventory
+    """
+    def __init__(self, pool: WarmPool, lifecycle: SliceLifecycle, timer: ProvisioningTimer = provisioning_timer,
+                 inventory: Inventory = None):
+        self.pool = pool
+        self.lifecycle = lifecycle
+        self.timer = timer
+        self.inventory = inventory
+
+    def run(self, plan: dict[str, list[str]]) -> dict[str, dict]:
+        """
+        Rotate every site of ``plan`` through its models.
+
+        :param plan: Mapping of site to the models to rotate through, in order.
+        :type plan: dict
+        :return: Mapping of ``SITE_model`` to its result, with ``attach``/``detach`` seconds when it passed.
+        :rtype: dict[str, dict]
+        """
+        self.pool.warm(list(plan))
+        if self.inventory is None:
+            self.inventory = load_inventory(self.pool.fablib)
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(1, min(self.lifecycle.max_workers, len(plan)))) as executor:
+            futures = [executor.submit(self.rotate, site, models, self.pool.failed.get(site))
+                       for site, models in plan.items()]
+            for future in as_completed(futures):
+                results.update(future.result())
+        return results
+
+    def rotate(self, site: str, models: list[str], provisioned: SliceOutcome = None) -> dict[str, dict]:
+        """
+        Rotate one site's VM through ``models`` in the calling thread.
+        """
+        slice_obj = self.pool.slices.get(site)
+        if slice_obj is None:
+            error = provisioned.exception if provisioned is not None else Exception(f"No VM at {site}")
+            return {f"{site}_{model}": failure_result(slice_obj=provisioned and provisioned.slice, exception=error)
+                    for model in models}
+        results = {}
+        models, skipped = self._host_scope(site, slice_obj, models)
+        for model, reason in skipped.items():
+            print(f"[{site}_{model}] Skipped: {reason}")
+            results[f"{site}_{model}"] = skipped_result(reason)
+        if not models:
+            return results
+        leftover = self.pool.attached.pop(site, {})
+        if leftover and not self._modify(f"{site}_reset", slice_obj, detach=list(leftover)).ok:
+            self.pool.retire(site)
+            results.update({f"{site}_{model}": failure_result(slice_obj, Exception(
+                f"Could not detach the components left on the VM: {', '.join(leftover)}")) for model in models})
+            return results
+        self.pool.attached[site] = {}
+
+        for i, model in enumerate(models):
+            key = f"{site}_{model}"
+            name = f"rot-{model.lower()}"
+            signature = lspci_signature(model)
+            try:
+                before = self._count(slice_obj, signature)
+                outcome = self._timed(key, site, model, ATTACH, slice_obj, attach={name: model})
+                if not outcome.ok:
+                    raise outcome.exception
+                if self._count(slice_obj, signature) <= before:
+                    raise Exception(f"{model} not visible in lspci after attach")
+                attached = outcome.elapsed
+                outcome = self._timed(key, site, model, DETACH, slice_obj, detach=[name])
+                if not outcome.ok:
+                    raise outcome.exception
+                if self._count(slice_obj, signature) != before:
+                    raise Exception(f"{model} still visible in lspci after detach")
+                results[key] = {"state": True, "error": "", "attach": sum(attached.values()),
+                                "detach": sum(outcome.elapsed.values())}
+                print(f"[{key}] attach {results[key]['attach']:.1f}s, detach {results[key]['detach']:.1f}s")
+            except Exception as e:
+                print(f"[{key}] Component rotation error: {e}")
+                results[key] = failure_result(slice_obj=slice_obj, exception=e)
+                if not self._restore(key, slice_obj, name):
+                    for skipped in models[i + 1:]:
+                        results[f"{site}_{skipped}"] = failure_result(
+                            slice_obj, Exception(f"Not run: the VM could not be restored after {model}"))
+                    self.pool.retire(site)
+                    break
+        return results
+
+    def _host_scope(self, site: str, slice_obj, models: list[str]) -> tuple[list[str], dict[str, str]]:
+        """
+        Split ``models`` into those free on the host of the site's VM and the skipped
+        ones with the reason. Without an inventory entry for the host every model is kept.
+        """
+        host = slice_obj.get_node(BASE_NODE).get_host()
+        entry = self.inventory.hosts.get(host) if host and self.inventory is not None else None
+        if entry is None:
+            print(f"[{site}] Host {host} of the rotation VM not in the inventory; not checking availability")
+            return list(models), {}
+        in_scope, skipped = [], {}
+        for model in models:
+            if entry.get(component_field(model, available=True), 0) >= 1:
+                in_scope.append(model)
+            elif entry.get(component_field(model), 0) >= 1:
+                skipped[model] = f"no {model} available on {host}"
+            else:
+                skipped[model] = f"no {model} on {host}"
+        return in_scope, skipped
+
+    def _timed(self, key: str, site: str, model: str, stage: str, slice_obj, **changes) -> SliceOutcome:
+        started = time.monotonic()
+        outcome = self._modify(key, slice_obj, **changes)
+        if self.timer is not None:
+            self.timer.add(StageTiming(key=key, site=site, component=model, stage=stage, ok=outcome.ok,
+                                       started=started, finished=time.monotonic()))
+        return outcome
+
+    def _modify(self, key: str, slice_obj, attach: dict = None, detach: list = None) -> SliceOutcome:
+        def build():
+            node = slice_obj.get_node(BASE_NODE)
+            for name in detach or ():
+                node.get_component(name=name).delete()
+            for name, model in (attach or {}).items():
+                node.add_component(model=model, name=name)
+            return slice_obj
+        return self.lifecycle.provision(key, build)
+
+    def _restore(self, key: str, slice_obj, name: str) -> bool:
+        """
+        Detach ``name`` if it is still part of the topology; True when the VM is back to its base shape.
+        """
+        names = [component.get_name() for component in slice_obj.get_node(BASE_NODE).get_components()]
+        if name not in names:
+            return slice_obj.get_state() in ("StableOK", "ModifyOK")
+        return self._modify(f"{key}_restore", slice_obj, detach=[name]).ok
+
+    @staticmethod
+    def _count(slice_obj, signature: str) -> int:
+        stdout, _ = slice_obj.get_node(BASE_NODE).execute(LSPCI_COMMAND, quiet=True)
+        return stdout.count(signature)
@@ -0,0 +1,1238 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#
+# Author: Komal Thareja (kthare10@renci.org)
+"""
+In-process simulated FABRIC testbed.
+
+:class:`SimulatedFablib` implements the subset of the ``FablibManager`` / ``Slice`` /
+``Node`` API the tests use (``new_slice``, ``add_node``, ``add_component``,
+``add_l2network``/``add_l3network``, ``submit``, ``wait``, ``execute``, ``list_sites``,
+``get_resources``, ``delete`` and their helpers), so orchestration logic can run and be
+benchmarked without the network. Every operation sleeps for a latency drawn from a
+configurable distribution (scaled by ``time_scale``) and fails with a configurable
+probability; draws come from per-subject seeded generators, so a run with the same seed
+sees the same latencies and failures regardless of thread scheduling.
+
+Set ``FABRIC_SIMULATE=1`` to make :func:`tests.fablib_pool.get_fablib` return one.
+"""
+import hashlib
+import ipaddress
+import itertools
+import json
+import math
+import os
+import random
+import re
+import shlex
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from tests.capacity import COMPONENT_FIELDS, GPU_MODELS, SMART_NIC_MODELS, component_field
+
+SITE_NAMES = ("TACC", "STAR", "UTAH", "MASS", "MICH", "WASH", "DALL", "SALT", "NCSA", "GATECH", "CLEM", "GPN",
+              "UCSD", "LOSA", "KANS", "MAX", "FIU", "PSC", "INDI", "SRI", "BRIST", "CERN", "AMST", "TOKY",
+              "HAWI", "RUTG", "PRIN", "NEWY", "ATLA", "SEAT")
+NASCENT = "Nascent"
+CONFIGURING = "Configuring"
+MODIFYING = "Modifying"
+STABLE_OK = "StableOK"
+STABLE_ERROR = "StableError"
+MODIFY_OK = "ModifyOK"
+CLOSING = "Closing"
+DEAD = "Dead"
+
+# Reservation (sliver) states of nodes.
+TICKETED = "Ticketed"
+ACTIVE = "Active"
+FAILED = "Failed"
+
+
+class Constant:
+    def __init__(self, value: float):
+        self.value = value
+
+    def sample(self, rng: random.Random) -> float:
+        return self.value
+
+
+class Uniform:
+    def __init__(self, low: float, high: float):
+        self.low = low
+        self.high = high
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.uniform(self.low, self.high)
+
+
+class LogNormal:
+    """
+    Long-tailed latency with the given median; ``sigma`` widens the tail.
+    """
+    def __init__(self, median: float, sigma: float = 0.3):
+        self.median = median
+        self.sigma = sigma
+
+    def sample(self, rng: random.Random) -> float:
+        return rng.lognormvariate(math.log(self.median), self.sigma)
+
+
+def as_distribution(spec):
+    """
+    A number is a constant, a (low, high) tuple uniform; anything with ``sample(rng)`` is used as is.
+    """
+    if hasattr(spec, "sample"):
+        return spec
+    if isinstance(spec, tuple):
+        return Uniform(*spec)
+    return Constant(float(spec))
+
+
+# Seconds per operation on the real testbed; multiplied by ``time_scale``.
+# "provision" is the time a submitted slice spends Configuring before it is StableOK.
+DEFAULT_LATENCY = {
+    "list_sites": Constant(2.0),
+    "get_resources": Constant(3.0),
+    "list_slices": Constant(0.5),
+    "submit": LogNormal(8.0),
+    "provision": LogNormal(240.0, 0.4),
+    "modify": LogNormal(120.0, 0.4),
+    "wait_ssh": LogNormal(30.0, 0.5),
+    "post_boot_config": LogNormal(20.0),
+    "execute": LogNormal(0.5),
+    "delete": LogNormal(5.0),
+}
+
+# Default: compress an hour of testbed time into 3.6 seconds.
+DEFAULT_TIME_SCALE = 0.001
+
+
+class SimulatedError(Exception):
+    """
+    Injected failure of a simulated operation.
+    """
+
+
+@dataclass
+class SimSiteSpec:
+    """
+    One simulated site: its workers, component capacity per model and path MTU.
+    """
+    name: str
+    hosts: int = 2
+    components: dict = field(default_factory=dict)
+    state: str = "Active"
+    mtu: int = 9000
+    cores: int = 256
+    ram: int = 1024
+    disk: int = 10000
+
+
+def default_sites(count: int = 8, seed: int = 0) -> list[SimSiteSpec]:
+    """
+    ``count`` sites with a deterministic mix of NICs, NVMe, GPUs and FPGAs.
+
+    Sites either lack a model or have enough of it for every slice the acceptance
+    suite places there at once; pass tighter :class:`SimSiteSpec` lists to exercise contention.
+    """
+    rng = random.Random(f"sites:{seed}")
+    sites = []
+    for i in range(count):
+        name = SITE_NAMES[i] if i < len(SITE_NAMES) else f"SITE{i}"
+        hosts = rng.randint(2, 4)
+        components = {"NIC_Basic": 64 * hosts, "NVME_P4510": rng.choice([0, 4, 8]) * hosts}
+        for model in SMART_NIC_MODELS:
+            components[model] = rng.choice([0, 0, 64])
+        for model in GPU_MODELS:
+            components[model] = rng.choice([0, 0, 2, 4])
+        components["FPGA_Xilinx_U280"] = rng.choice([0, 0, 1])
+        sites.append(SimSiteSpec(name=name, hosts=hosts, components=components, mtu=rng.choice([9000, 9000, 1500])))
+    return sites
+
+
+# lspci lines per component model, as the tests look for them.
+LSPCI = {
+    "NIC_Basic": "Ethernet controller: Mellanox Technologies MT28908 Family [ConnectX-6 Virtual Function]",
+    "NIC_ConnectX_5": "Ethernet controller: Mellanox Technologies MT27800 Family [ConnectX-5]",
+    "NIC_ConnectX_6": "Ethernet controller: Mellanox Technologies MT28908 Family [ConnectX-6]",
+    "NVME_P4510": "Non-Volatile memory controller: Intel Corporation NVMe Datacenter SSD [3DNAND, Beta Rock Controller]",
+    "GPU_TeslaT4": "3D controller: NVIDIA Corporation TU104GL [Tesla T4] (rev a1)",
+    "GPU_RTX6000": "3D controller: NVIDIA Corporation TU102GL [Quadro RTX 6000/8000] (rev a1)",
+    "GPU_A30": "3D controller: NVIDIA Corporation GA100GL [A30 PCIe] (rev a1)",
+    "GPU_A40": "3D controller: NVIDIA Corporation GA102GL [A40] (rev a1)",
+    "FPGA_Xilinx_U280": "Processing accelerators: Xilinx Corporation Device 500c",
+}
+INTERFACES_PER_MODEL = {"NIC_Basic": 1, "NIC_ConnectX_5": 2, "NIC_ConnectX_6": 2}
+
+
+class SimInterface:
+    def __init__(self, component, name: str, device: str):
+        self.component = component
+        self.name = name
+        self.device = device
+        self.network = None
+        self.mode = None
+        self.ip_addr = None
+
+    def get_name(self):
+        return self.name
+
+    def get_node(self):
+        return self.component.node
+
+    def get_device_name(self):
+        return self.device
+
+    def get_network(self):
+        return self.network
+
+    def set_mode(self, mode: str = "config"):
+        self.mode = mode
+
+    def get_ip_addr(self):
+        return self.ip_addr
+
+    def ip_addr_add(self, addr, subnet):
+        self.ip_addr = str(addr)
+        self.component.node.slice.testbed.register_ip(self.ip_addr, self)
+
+    def get_site(self):
+        return self.component.node.site
+
+
+class SimComponent:
+    def __init__(self, node, model: str, name: str):
+        self.node = node
+        self.model = model
+        self.name = name
+        self.interfaces = [node.new_interface(self, f"{node.name}-{name}-p{i + 1}")
+                           for i in range(INTERFACES_PER_MODEL.get(model, 0))]
+
+    def get_name(self):
+        return self.name
+
+    def get_model(self):
+        return self.model
+
+    def get_interfaces(self):
+        return list(self.interfaces)
+
+    def get_device_name(self):
+        return f"/dev/nvme{self.node.components.index(self)}n1" if self.model.startswith("NVME") else None
+
+    def delete(self):
+        self.node.components.remove(self)
+        self.node.slice.dirty = True
+
+
+class SimStorage:
+    def __init__(self, node, name: str):
+        self.node = node
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+    def get_device_name(self):
+        return f"/dev/vd{chr(ord('b') + list(self.node.storage).index(self.name))}"
+
+
+class SimNode:
+    def __init__(self, slice_obj, name: str, site: str, host: str = None, cores: int = 2, ram: int = 8,
+                 disk: int = 10, image: str = "default_rocky_8", **kwargs):
+        self.slice = slice_obj
+        self.name = name
+        self.site = site
+        self.host = host
+        self.cores = cores
+        self.ram = ram
+        self.disk = disk
+        self.image = image
+        self.components = []
+        self.storage = {}
+        self.post_boot = []
+        self.files = set()
+        self.management_ip = None
+        self.reservation_state = None
+        self.error_message = None
+        self._devices = itertools.count(1)
+
+    # Topology
+    def new_interface(self, component, name: str) -> SimInterface:
+        return SimInterface(component, name, f"eth{next(self._devices)}")
+
+    def add_component(self, model: str = None, name: str = None) -> SimComponent:
+        component = SimComponent(self, model, name or f"{model.lower()}{len(self.components)}")
+        self.components.append(component)
+        self.slice.dirty = True
+        return component
+
+    def add_fabnet(self, name: str = "FABNET", net_type: str = "IPv4", nic_type: str = "NIC_Basic", routes=None):
+        interface = self.add_component(model=nic_type, name=f"{name}_nic").get_interfaces()[0]
+        interface.set_mode("auto")
+        network_name = f"FABNET_{net_type}_{self.site}"
+        network = self.slice.networks.get(network_name)
+        if network is None:
+            self.slice.add_l3network(name=network_name, interfaces=[interface], type=net_type)
+        else:
+            network.add_interface(interface)
+
+    def add_storage(self, name: str, auto_mount: bool = False):
+        self.storage[name] = SimStorage(self, name)
+        return self.storage[name]
+
+    def add_post_boot_upload_directory(self, local_directory_path, remote_directory_path="."):
+        self.post_boot.append(("upload", local_directory_path, remote_directory_path))
+
+    def add_post_boot_execute(self, command):
+        self.post_boot.append(("execute", command))
+
+    # Accessors
+    @property
+    def subject(self) -> str:
+        return f"{self.slice.name}/{self.name}"
+
+    def get_name(self):
+        return self.name
+
+    def get_site(self):
+        return self.site
+
+    def get_host(self):
+        return self.host
+
+    def get_slice(self):
+        return self.slice
+
+    def get_fablib_manager(self):
+        return self.slice.testbed
+
+    def get_image(self):
+        return self.image
+
+    def get_components(self):
+        return list(self.components)
+
+    def get_component(self, name: str):
+        for component in self.components:
+            if component.name == name:
+                return component
+        raise Exception(f"Component not found: {name}")
+
+    def get_storage(self, name: str):
+        return self.storage[name]
+
+    def get_interfaces(self):
+        return [i for c in self.components for i in c.interfaces]
+
+    def get_interface(self, name: str = None, network_name: str = None):
+        for interface in self.get_interfaces():
+            if name is not None and interface.name == name:
+                return interface
+            if network_name is not None and interface.network is not None and \
+                    interface.network.name == network_name:
+                return interface
+        raise Exception(f"Interface not found: name={name}, network_name={network_name}")
+
+    def get_management_ip(self):
+        return self.management_ip
+
+    def get_reservation_state(self):
+        if self.slice.state in (CONFIGURING, MODIFYING) and self.reservation_state != ACTIVE:
+            return TICKETED
+        return self.reservation_state
+
+    def get_error_message(self):
+        return self.error_message
+
+    @property
+    def reachable(self) -> bool:
+        return self.slice.state not in (CONFIGURING, MODIFYING, CLOSING, DEAD) and \
+            self.reservation_state == ACTIVE
+
+    def get_username(self):
+        return "rocky" if "rocky" in self.image else "ubuntu"
+
+    def get_ssh_command(self):
+        return f"ssh {self.get_username()}@{self.management_ip}"
+
+    # Operations
+    def execute(self, command: str, retry: int = 3, retry_interval: int = 10, username: str = None,
+                private_key_file: str = None, private_key_passphrase: str = None, quiet: bool = False,
+                read_timeout: int = 10, timeout: int = None, output_file: str = None, display: bool = False):
+        testbed = self.slice.testbed
+        testbed.call("execute", self.subject, site=self.site)
+        if not self.reachable:
+            raise Exception(f"{self.name}: node is not reachable (slice {self.slice.state}, "
+                            f"sliver {self.get_reservation_state()})")
+        stdout, stderr = testbed.shell.run(self, command)
+        if not quiet:
+            print(stdout, end="")
+        return stdout, stderr
+
+    def test_ssh(self) -> bool:
+        self.slice.testbed.call("wait_ssh", self.subject, site=self.site)
+        return self.reachable
+
+    def config(self, log_dir: str = ".", refresh: bool = False):
+        """
+        Post-boot configuration of this node alone, as fablib's ``Node.config``.
+        """
+        self.slice.testbed.call("post_boot_config", self.subject, site=self.site)
+        if not self.reachable:
+            raise Exception(f"{self.name}: node is not reachable (sliver {self.get_reservation_state()})")
+
+    def ip_route_add(self, subnet, gateway):
+        self.slice.testbed.call("execute", self.subject, site=self.site)
+
+    def ip_addr_add(self, addr, subnet, interface):
+        interface.ip_addr_add(addr, subnet)
+
+    def upload_file(self, local_file_path, remote_file_path="."):
+        self.slice.testbed.call("execute", self.subject, site=self.site)
+        self.files.add(remote_file_path)
+
+    def upload_directory(self, local_directory_path, remote_directory_path="."):
+        self.slice.testbed.call("execute", self.subject, site=self.site)
+        self.files.add(remote_directory_path)
+
+
+class SimNetwork:
+    def __init__(self, slice_obj, name: str, layer: str, type: str = None, subnet=None, gateway=None):
+        self.slice = slice_obj
+        self.name = name
+        self.layer = layer
+        self.type = type
+        self.subnet = ipaddress.ip_network(subnet) if subnet is not None else None
+        self.gateway = ipaddress.ip_address(gateway) if gateway is not None else None
+        self.interfaces = []
+
+    def add_interface(self, interface: SimInterface):
+        interface.network = self
+        self.interfaces.append(interface)
+
+    def get_name(self):
+        return self.name
+
+    def get_type(self):
+        return self.type
+
+    def get_layer(self):
+        return self.layer
+
+    def get_interfaces(self):
+        return list(self.interfaces)
+
+    def get_subnet(self):
+        return self.subnet
+
+    def get_gateway(self):
+        return self.gateway
+
+    def get_available_ips(self, count: int = 256):
+        if self.subnet is None:
+            return []
+        used = {i.ip_addr for i in self.interfaces if i.ip_addr}
+        hosts = (ip for ip in self.subnet.hosts() if ip != self.gateway and str(ip) not in used)
+        return list(itertools.islice(hosts, count))
+
+    def assign(self):
+        """
+        Give every "auto" interface an address from the subnet, as the orchestrator does.
+        """
+        if self.subnet is None:
+            return
+        available = iter(self.get_available_ips(len(self.interfaces) + 1))
+        for interface in self.interfaces:
+            if interface.mode == "auto" and interface.ip_addr is None:
+                interface.ip_addr_add(next(available), self.subnet)
+
+
+@dataclass
+class SimSliceDTO:
+    """
+    What the orchestrator's slice listing returns per slice.
+    """
+    slice_id: str
+    name: str
+    state: str
+
+
+class SimSlice:
+    """
+    Simulated slice. After ``submit`` it stays Configuring for a "provision" latency
+    and then turns StableOK, or StableError when provisioning fails or a site lacks capacity.
+    Failures are drawn per site: in a multi-site slice only the nodes at the failing
+    sites end up Failed, the others Active, as the slivers of a real slice do.
+    """
+    def __init__(self, testbed, name: str):
+        self.testbed = testbed
+        self.name = name
+        self.slice_id = None
+        self._state = None
+        self.ready_at = None
+        self.final_state = None
+        self.errors = []
+        self.nodes = {}
+        self.networks = {}
+        self.dirty = False
+        self.lease_end = None
+
+    # Accessors
+    def get_name(self):
+        return self.name
+
+    def get_slice_id(self):
+        return self.slice_id
+
+    @property
+    def state(self):
+        with self.testbed.lock:
+            if self._state in (CONFIGURING, MODIFYING) and time.monotonic() >= self.ready_at:
+                self._state = self.final_state
+                if self._state == STABLE_ERROR and not any(node.reservation_state == ACTIVE
+                                                           for node in self.nodes.values()):
+                    self.testbed.release(self)
+            return self._state
+
+    def get_state(self):
+        return self.state
+
+    @property
+    def site(self) -> str | None:
+        """
+        Site of the first node; failure rates of a slice operation are taken from it.
+        """
+        return next(iter(self.nodes.values())).site if self.nodes else None
+
+    def get_fablib_manager(self):
+        return self.testbed
+
+    def get_nodes(self):
+        return list(self.nodes.values())
+
+    def get_node(self, name: str):
+        try:
+            return self.nodes[name]
+        except KeyError:
+            raise Exception(f"Node not found: {name}")
+
+    def get_networks(self):
+        return list(self.networks.values())
+
+    def get_network(self, name: str):
+        try:
+            return self.networks[name]
+        except KeyError:
+            raise Exception(f"Network not found: {name}")
+
+    get_l2network = get_network
+    get_l3network = get_network
+
+    def get_interfaces(self):
+        return [i for node in self.nodes.values() for i in node.get_interfaces()]
+
+    def get_error_messages(self):
+        return [{"notice": error, "sliver": None} for error in self.errors]
+
+    def build_error_exception_string(self):
+        return "\n".join(self.errors)
+
+    def get_lease_end(self):
+        return self.lease_end
+
+    # Topology
+    def add_node(self, name: str, site: str = None, host: str = None, **kwargs) -> SimNode:
+        if site is None:
+            site = self.testbed.site_names()[0]
+        node = SimNode(self, name, site, host=host, **kwargs)
+        self.nodes[name] = node
+        self.dirty = True
+        return node
+
+    def add_l2network(self, name: str, interfaces: list = None, type: str = None, subnet=None, gateway=None):
+        network = SimNetwork(self, name, "L2", type=type or "L2Bridge", subnet=subnet, gateway=gateway)
+        for interface in interfaces or []:
+            network.add_interface(interface)
+        self.networks[name] = network
+        self.dirty = True
+        return network
+
+    def add_l3network(self, name: str, interfaces: list = None, type: str = "IPv4", technology: str = None,
+                      subnet=None):
+        sites = sorted({i.get_site() for i in interfaces or []})
+        site = sites[0] if sites else self.testbed.site_names()[0]
+        subnet, gateway = self.testbed.fabnet_subnet(site, type)
+        network = SimNetwork(self, name, "L3", type=type, subnet=subnet, gateway=gateway)
+        for interface in interfaces or []:
+            network.add_interface(interface)
+        self.networks[name] = network
+        self.dirty = True
+        return network
+
+    def validate(self):
+        for node in self.nodes.values():
+            if node.site not in self.testbed.sites:
+                raise Exception(f"Node {node.name}: unknown site {node.site}")
+            hosts = self.testbed.host_names(node.site)
+            if node.host is not None and node.host not in hosts:
+                raise Exception(f"Node {node.name}: unknown host {node.host}")
+        return True, None
+
+    # Lifecycle
+    def submit(self, wait: bool = True, wait_timeout: int = 1800, wait_interval: int = 20, progress: bool = True,
+               wait_jupyter: str = "text", post_boot_config: bool = True, wait_ssh: bool = True, **kwargs):
+        testbed = self.testbed
+        if self.slice_id is None:
+            testbed.call("submit", self.name, site=self.site)
+            self.slice_id = str(uuid.UUID(int=testbed.rng("slice_id", self.name).getrandbits(128)))
+            with testbed.lock:
+                testbed.slices[self.slice_id] = self
+            self._provision("provision", CONFIGURING)
+        else:
+            # The modify request returns like a submit; the "modify" latency is the reconfiguration.
+            testbed.call("modify", self.name, site=self.site, latency_of="submit")
+            self._provision("modify", MODIFYING)
+        self.dirty = False
+        if wait:
+            self.wait(timeout=wait_timeout, interval=wait_interval, progress=progress)
+            if wait_ssh:
+                self.wait_ssh(timeout=wait_timeout, interval=wait_interval, progress=progress)
+            if post_boot_config:
+                self.post_boot_config()
+        return self.slice_id
+
+    def modify(self, wait: bool = True, **kwargs):
+        return self.submit(wait=wait, **kwargs)
+
+    def _provision(self, operation: str, transitional: str):
+        testbed = self.testbed
+        delay = testbed.latency(operation, self.name)
+        errors = testbed.reserve(self)
+        sites = list(dict.fromkeys(node.site for node in self.nodes.values()))
+        for site in sites:
+            # Single-site slices draw per slice, multi-site slices per site.
+            subject = self.name if len(sites) == 1 else f"{self.name}@{site}"
+            if site not in errors and testbed.fails(operation, subject, site=site):
+                errors[site] = f"Simulated {operation} failure at {site}"
+        with testbed.lock:
+            self._state = transitional
+            self.ready_at = time.monotonic() + delay
+            if not errors:
+                self.final_state = STABLE_OK if operation == "provision" else MODIFY_OK
+            else:
+                self.final_state = STABLE_ERROR
+                self.errors.extend(errors.values())
+            for node in self.nodes.values():
+                if node.reservation_state != ACTIVE:
+                    node.reservation_state = FAILED if node.site in errors else ACTIVE
+                    node.error_message = errors.get(node.site)
+        for node in self.nodes.values():
+            if node.reservation_state == ACTIVE and node.host is None:
+                # Nodes not pinned to a worker land on the site's first one.
+                node.host = testbed.host_names(node.site)[0]
+            if node.reservation_state == ACTIVE and node.management_ip is None:
+                node.management_ip = testbed.next_management_ip()
+                testbed.register_ip(node.management_ip, node)
+        if len(errors) < len(sites):
+            for network in self.networks.values():
+                network.assign()
+
+    def wait(self, timeout: int = 360, interval: int = 10, progress: bool = False):
+        """
+        Poll the orchestrator every ``interval`` seconds (testbed time) like ``Slice.wait``.
+        """
+        testbed = self.testbed
+        deadline = time.monotonic() + timeout * testbed.time_scale
+        while True:
+            testbed.call("list_slices", "orchestrator")
+            state = self.state
+            if state in (STABLE_OK, MODIFY_OK):
+                return self
+            if state in (STABLE_ERROR, DEAD, CLOSING):
+                raise Exception(self.build_error_exception_string() or f"Slice {self.name} is {state}")
+            now = time.monotonic()
+            if now >= deadline:
+                raise Exception(f"Timeout exceeded ({timeout} sec). Slice: {self.name} ({state})")
+            time.sleep(max(0.0, min(interval * testbed.time_scale, deadline - now)))
+
+    def wait_ssh(self, timeout: int = 1800, interval: int = 20, progress: bool = False):
+        if self.state not in (STABLE_OK, MODIFY_OK):
+            raise Exception(f"Slice {self.name} is {self.state}; nodes are not reachable")
+        self.testbed.call("wait_ssh", self.name, site=self.site, limit=timeout)
+        return True
+
+    def test_ssh(self):
+        return self.wait_ssh()
+
+    def post_boot_config(self):
+        self.testbed.call("post_boot_config", self.name, site=self.site)
+
+    def update(self):
+        self.testbed.call("list_slices", self.name)
+
+    def renew(self, end_date: str = None, **kwargs):
+        self.lease_end = end_date
+
+    def delete(self):
+        self.testbed.call("delete", self.name, site=self.site)
+        with self.testbed.lock:
+            if self._state == DEAD:
+                raise Exception(f"Slice {self.name} not found")
+            self._state = DEAD
+        self.testbed.release(self)
+
+    # Display helpers used when debugging failed slices
+    def show(self, **kwargs):
+        print(f"{self.name} {self.slice_id} {self.state}")
+
+    def list_nodes(self, **kwargs):
+        for node in self.nodes.values():
+            print(f"{node.name:<16} {node.site:<8} {node.host or '':<32} {node.management_ip or ''}")
+
+    def list_networks(self, **kwargs):
+        for network in self.networks.values():
+            print(f"{network.name:<24} {network.layer} {network.type} {network.subnet or ''}")
+
+    def list_interfaces(self, **kwargs):
+        for interface in self.get_interfaces():
+            print(f"{interface.name:<32} {interface.device} {interface.ip_addr or ''}")
+
+
+class SimHost:
+    def __init__(self, name: str, state: str = "Active", components: dict = None, testbed=None):
+        self.name = name
+        self.state = state
+        self.components = components or {}
+        self.testbed = testbed
+
+    def get_name(self):
+        return self.name
+
+    def get_state(self):
+        return self.state
+
+    def to_dict(self):
+        data = {"name": self.name, "state": self.state}
+        allocated = self.testbed.host_allocated(self.name) if self.testbed is not None else {}
+        for model, count in self.components.items():
+            data[component_field(model)] = count
+            data[component_field(model, available=True)] = count - allocated.get(model, 0)
+        return data
+
+
+class SimSite:
+    def __init__(self, hosts: dict):
+        self.hosts = hosts
+
+    def get_hosts(self):
+        return dict(self.hosts)
+
+
+class SimResources:
+    def __init__(self, testbed):
+        self.testbed = testbed
+
+    def get_site(self, name: str):
+        return SimSite(self.testbed.hosts[name])
+
+    def get_host_capacity(self, site: str) -> int:
+        return len(self.testbed.hosts[site])
+
+
+class SimManager:
+    """
+    The orchestrator client behind ``fablib.get_manager()``.
+    """
+    def __init__(self, testbed):
+        self.testbed = testbed
+
+    def list_slices(self, slice_id: str = None, states: list = None, exclude_states: list = None, name: str = None,
+                    limit: int = 200, offset: int = 0, **kwargs) -> list[SimSliceDTO]:
+        testbed = self.testbed
+        testbed.call("list_slices", "orchestrator")
+        listed = []
+        for slice_obj in testbed.submitted():
+            dto = SimSliceDTO(slice_id=slice_obj.slice_id, name=slice_obj.name, state=slice_obj.state)
+            if slice_id is not None and dto.slice_id != slice_id:
+                continue
+            if name is not None and dto.name != name:
+                continue
+            if states is not None and dto.state not in states:
+                continue
+            if exclude_states is not None and dto.state in exclude_states:
+                continue
+            listed.append(dto)
+        return listed[offset:offset + limit]
+
+
+def split_pipeline(command: str) -> list[str]:
+    """
+    Split ``command`` at the pipes outside quotes; ``||`` is left alone.
+    """
+    parts, current, quote = [], [], None
+    i = 0
+    while i < len(command):
+        char = command[i]
+        if quote:
+            quote = None if char == quote else quote
+        elif char in "'\"":
+            quote = char
+        elif char == "|":
+            if command[i + 1:i + 2] == "|":
+                current.append("||")
+                i += 2
+                continue
+            parts.append("".join(current).strip())
+            current = []
+            i += 1
+            continue
+        current.append(char)
+        i += 1
+    parts.append("".join(current).strip())
+    return parts
+
+
+class SimShell:
+    """
+    Answers the commands the tests run on nodes from the simulated topology.
+
+    Unknown commands succeed silently; ``| grep`` filters apply to the answer, with the
+    pattern matched as a Python (extended) regular expression.
+    """
+    RE_PING = re.compile(r"\bping6?\b(?P<args>[^\n;&|]*)")
+    RE_IPERF_CLIENT = re.compile(r"\biperf3\s+-c\s+(?P<server>\S+)(?P<args>[^\n;&|]*)")
+    RE_ADDR_ADD = re.compile(r"\bip (?:-[46] )?addr add (?P<addr>[^\s/]+)(?:/\d+)? dev (?P<dev>\S+)")
+    RE_BATCH_MARKER = re.compile(r"printf '\\n(__batch_\w+__) BEGIN 0\\n'")
+    RE_BATCH_COMMAND = re.compile(r"\( (.*?)\n\) </dev/null", re.DOTALL)
+
+    def __init__(self, testbed):
+        self.testbed = testbed
+
+    def run(self, node: SimNode, command: str) -> tuple[str, str]:
+        if command.startswith("bash -c "):
+            script = shlex.split(command)[2]
+            marker = self.RE_BATCH_MARKER.search(script)
+            if marker:
+                return self._batch(node, script, marker.group(1))
+        stdout, stderr = [], []
+        for line in command.splitlines() or [""]:
+            out, err, _ = self.run_one(node, line)
+            stdout.append(out)
+            stderr.append(err)
+        return "".join(stdout), "".join(stderr)
+
+    def _batch(self, node: SimNode, script: str, marker: str) -> tuple[str, str]:
+        stdout, stderr = [], []
+        stop_on_error = "[ $rc -eq 0 ] || exit $rc" in script
+        for i, command in enumerate(self.RE_BATCH_COMMAND.findall(script)):
+            out, err, rc = self.run_one(node, command)
+            stdout.append(f"\n{marker} BEGIN {i}\n{out}\n{marker} END {i} {rc}\n")
+            stderr.append(f"\n{marker} BEGIN {i}\n{err}\n{marker} END {i} {rc}\n")
+            if stop_on_error and rc:
+                break
+        return "".join(stdout), "".join(stderr)
+
+    def run_one(self, node: SimNode, command: str) -> tuple[str, str, int]:
+        """
+        :return: (stdout, stderr, exit code)
+        """
+        command, *filters = split_pipeline(command)
+        out, err, rc = self.answer(node, command)
+        for pipe in filters:
+            args = shlex.split(pipe)
+            if not args or args[0] != "grep":
+                continue
+            flags = "".join(a[1:] for a in args[1:] if a.startswith("-"))
+            pattern = next(a for a in args[1:] if not a.startswith("-"))
+            matched = [line for line in out.splitlines()
+                       if re.search(pattern, line, re.IGNORECASE if "i" in flags else 0)]
+            out = f"{len(matched)}\n" if "c" in flags else "".join(f"{line}\n" for line in matched)
+            out = "" if "q" in flags else out
+            rc = 0 if matched else 1
+        return out, err, rc
+
+    def answer(self, node: SimNode, command: str) -> tuple[str, str, int]:
+        if command in ("true", "false"):
+            return "", "", int(command == "false")
+        if self.RE_IPERF_CLIENT.search(command):
+            return self.iperf(node, self.RE_IPERF_CLIENT.search(command))
+        if self.RE_PING.search(command):
+            return self.ping(node, command)
+        if "lspci" in command:
+            # One PCI function per NIC port
+            return "".join(f"{LSPCI[c.model]}\n" * max(len(c.interfaces), 1)
+                           for c in node.components if c.model in LSPCI), "", 0
+        if command.startswith("nvidia-smi"):
+            if any(c.model in GPU_MODELS for c in node.components):
+                return "NVIDIA-SMI 550.54.15    Driver Version: 550.54.15    CUDA Version: 12.4\n", "", 0
+            return "", "nvidia-smi: command not found\n", 127
+        if command.startswith("echo "):
+            return shlex.split(command[5:].split("`")[0] or "''")[0] + "\n", "", 0
+        assigned = self.RE_ADDR_ADD.search(command)
+        if assigned:
+            for interface in node.get_interfaces():
+                if interface.device == assigned.group("dev"):
+                    interface.ip_addr_add(assigned.group("addr"), None)
+            return "", "", 0
+        if command.startswith("hostname"):
+            return f"{node.name}\n", "", 0
+        written = re.search(r"\bof=(\S+)", command)
+        if written:
+            node.files.add(written.group(1))
+        listed = re.search(r"\bls\b[^\n]*?(\S+)$", command)
+        if listed and command.startswith("ls"):
+            directory = listed.group(1).rstrip("/")
+            names = sorted(os.path.basename(f) for f in node.files if os.path.dirname(f) == directory)
+            return "".join(f"-rw-r--r-- 1 root root 1.0M {name}\n" for name in names), "", 0
+        return "", "", 0
+
+    def _target(self, args: list[str]):
+        for arg in reversed(args):
+            try:
+                return str(ipaddress.ip_address(arg))
+            except ValueError:
+                continue
+        return None
+
+    def ping(self, node: SimNode, command: str) -> tuple[str, str, int]:
+        args = shlex.split(command.replace("sudo ", ""))
+        target = self._target(args)
+        count = int(args[args.index("-c") + 1]) if "-c" in args else 4
+        size = int(args[args.index("-s") + 1]) if "-s" in args else 56
+        testbed = self.testbed
+        peer = testbed.lookup(target)
+        family = 6 if target and ":" in target else 4
+        overhead = 48 if family == 6 else 28
+        received = count
+        if peer is None:
+            received = 0
+        else:
+            peer_site = peer.get_site()
+            mtu = min(testbed.sites[node.site].mtu, testbed.sites[peer_site].mtu)
+            if "-M" in args and size + overhead > mtu:
+                received = 0
+            elif testbed.fails("ping", f"{node.subject}->{peer.get_name()}", site=node.site):
+                received = 0
+        loss = 100 - 100 * received // count
+        rtt = testbed.rtt_ms(node.site, peer.get_site() if peer else node.site)
+        out = (f"PING {target} ({target}) {size}({size + overhead}) bytes of data.\n\n"
+               f"--- {target} ping statistics ---\n"
+               f"{count} packets transmitted, {received} received, {loss}% packet loss, time {count * 200}ms\n")
+        if received:
+            out += f"rtt min/avg/max/mdev = {rtt * 0.9:.3f}/{rtt:.3f}/{rtt * 1.2:.3f}/{rtt * 0.05:.3f} ms\n"
+        return out, "", 0 if received else 1
+
+    def iperf(self, node: SimNode, match) -> tuple[str, str, int]:
+        args = shlex.split(match.group("args"))
+        testbed = self.testbed
+        peer = testbed.lookup(match.group("server"))
+        if peer is None:
+            return json.dumps({"start": {}, "intervals": [], "end": {},
+                               "error": "unable to connect to server: No route to host"}), "", 1
+        peer_site = peer.get_site()
+        streams = int(args[args.index("-P") + 1]) if "-P" in args else 1
+        seconds = float(args[args.index("-t") + 1]) if "-t" in args else 10.0
+        bps = testbed.throughput_bps(node.site, peer_site, subject=f"{node.subject}->{peer.get_name()}")
+        rtt_us = testbed.rtt_ms(node.site, peer_site) * 1000
+        per_stream = bps / streams
+        report = {
+            "start": {"test_start": {"protocol": "TCP", "num_streams": streams, "duration": seconds}},
+            "intervals": [],
+            "end": {
+                "streams": [{"sender": {"socket": 5 + i, "bits_per_second": per_stream, "retransmits": 0,
+                                        "min_rtt": rtt_us * 0.9, "mean_rtt": rtt_us, "max_rtt": rtt_us * 1.2},
+                             "receiver": {"socket": 5 + i, "bits_per_second": per_stream * 0.999}}
+                            for i in range(streams)],
+                "sum_sent": {"seconds": seconds, "bits_per_second": bps, "retransmits": 0},
+                "sum_received": {"seconds": seconds, "bits_per_second": bps * 0.999},
+                "cpu_utilization_percent": {"host_total": 12.5, "remote_total": 9.5},
+            },
+        }
+        return json.dumps(report), "", 0
+
+
+class SimulatedFablib:
+    """
+    Simulated ``FablibManager`` over an in-memory testbed.
+
+    :param sites: Site specifications; defaults to :func:`default_sites`.
+    :type sites: list[SimSiteSpec]
+    :param latency: Per-operation latency distributions (seconds of testbed time) merged
+                    over ``DEFAULT_LATENCY``; numbers are constants, tuples uniform ranges.
+    :type latency: dict
+    :param failures: Per-operation failure probability (0..1) for ``submit``, ``provision``,
+                     ``modify``, ``wait_ssh``, ``post_boot_config``, ``execute``, ``delete``
+                     and ``ping``.
+    :type failures: dict
+    :param site_failures: Per-site overrides of ``failures``, e.g. ``{"STAR": {"provision": 1.0}}``.
+    :type site_failures: dict
+    :param time_scale: Real seconds slept per second of testbed time.
+    :type time_scale: float
+    :param seed: Seed of every latency and failure draw.
+    :type seed: int
+    """
+    FABNETV4_SUBNET = ipaddress.ip_network("10.128.0.0/10")
+    FABNETV6_SUBNET = ipaddress.ip_network("2602:fcfb:00::/40")
+
+    def __init__(self, sites: list[SimSiteSpec] = None, latency: dict = None, failures: dict = None,
+                 site_failures: dict = None, time_scale: float = DEFAULT_TIME_SCALE, seed: int = 0):
+        self.seed = seed
+        self.time_scale = time_scale
+        self.latency_model = {op: as_distribution(spec) for op, spec in {**DEFAULT_LATENCY, **(latency or {})}.items()}
+        self.failures = failures or {}
+        self.site_failures = site_failures or {}
+        self.sites = {site.name: site for site in (sites if sites is not None else default_sites(seed=seed))}
+        self.hosts = {name: {host: SimHost(host, components=self._host_components(site, i), testbed=self)
+                             for i, host in enumerate(self.host_names(name))}
+                      for name, site in self.sites.items()}
+        self.lock = threading.RLock()
+        self.slices = {}
+        self.allocated = {name: {} for name in self.sites}
+        self.ips = {}
+        self.calls = {}
+        self.shell = SimShell(self)
+        self._draws = {}
+        self._management_ips = (ipaddress.ip_address("10.0.0.0") + i for i in itertools.count(2))
+
+    @classmethod
+    def from_env(cls) -> "SimulatedFablib":
+        """
+        Testbed configured by ``FABRIC_SIM_SEED``, ``FABRIC_SIM_SITES``, ``FABRIC_SIM_TIME_SCALE``
+        and ``FABRIC_SIM_FAILURE_RATE`` (applied to provisioning).
+        """
+        seed = int(os.getenv("FABRIC_SIM_SEED", "0"))
+        sites = int(os.getenv("FABRIC_SIM_SITES", str(len(SITE_NAMES))))
+        failure_rate = float(os.getenv("FABRIC_SIM_FAILURE_RATE", "0"))
+        return cls(sites=default_sites(sites, seed=seed),
+                   failures={"provision": failure_rate} if failure_rate else None,
+                   time_scale=float(os.getenv("FABRIC_SIM_TIME_SCALE", str(DEFAULT_TIME_SCALE))), seed=seed)
+
+    # Simulation
+    def rng(self, operation: str, subject: str) -> random.Random:
+        """
+        Generator for the next draw of ``operation`` on ``subject``; the n-th draw for a
+        given (operation, subject) is the same in every run with the same seed.
+        """
+        with self.lock:
+            n = self._draws[(operation, subject)] = self._draws.get((operation, subject), -1) + 1
+        return random.Random(f"{self.seed}:{operation}:{subject}:{n}")
+
+    def latency(self, operation: str, subject: str) -> float:
+        """
+        Real seconds ``operation`` takes on ``subject`` this time.
+        """
+        distribution = self.latency_model.get(operation)
+        if distribution is None:
+            return 0.0
+        return max(0.0, distribution.sample(self.rng(f"latency:{operation}", subject))) * self.time_scale
+
+    def fails(self, operation: str, subject: str, site: str = None) -> bool:
+        """
+        Whether this ``operation`` on ``subject`` fails, at the rate configured for ``site``.
+        """
+        probability = self.site_failures.get(site, {}).get(operation, self.failures.get(operation, 0.0))
+        return probability > 0 and self.rng(f"failure:{operation}", subject).random() < probability
+
+    def call(self, operation: str, subject: str, site: str = None, limit: float = None, latency_of: str = None):
+        """
+        Account for, sleep through and possibly fail one ``operation`` call.
+
+        :param subject: What the call acts on (slice or node name); each subject draws from
+                        its own sequence, so concurrency does not reorder draws.
+        :param site: Site whose failure rates apply.
+        :param limit: Upper bound on the latency, in seconds of testbed time.
+        :param latency_of: Operation whose latency the call takes, by default ``operation``.
+        """
+        with self.lock:
+            self.calls[operation] = self.calls.get(operation, 0) + 1
+        delay = self.latency(latency_of or operation, subject)
+        if limit is not None:
+            delay = min(delay, limit * self.time_scale)
+        if delay:
+            time.sleep(delay)
+        if self.fails(operation, subject, site=site):
+            raise SimulatedError(f"Simulated {operation} failure at {site or subject}")
+
+    def rtt_ms(self, src: str, dst: str) -> float:
+        if src == dst:
+            return 0.2
+        return 5 + random.Random(f"rtt:{min(src, dst)}:{max(src, dst)}").random() * 75
+
+    def throughput_bps(self, src: str, dst: str, subject: str = None) -> float:
+        base = 20e9 if src == dst else 8e9
+        return base * self.rng("throughput", subject or f"{src}->{dst}").uniform(0.6, 1.0)
+
+    # Addressing
+    def fabnet_subnet(self, site: str, net_type: str):
+        index = list(self.sites).index(site)
+        if net_type == "IPv6":
+            subnet = ipaddress.ip_network(f"2602:fcfb:{index:x}::/64")
+        else:
+            subnet = ipaddress.ip_network(f"10.{128 + index // 256}.{index % 256}.0/24")
+        return subnet, next(subnet.hosts())
+
+    def next_management_ip(self) -> str:
+        with self.lock:
+            return str(next(self._management_ips))
+
+    def register_ip(self, ip: str, owner):
+        with self.lock:
+            self.ips[str(ip)] = owner
+
+    def lookup(self, ip: str):
+        """
+        The node or interface owning ``ip`` in a live slice, if any.
+        """
+        with self.lock:
+            owner = self.ips.get(str(ip)) if ip else None
+        if owner is None:
+            return None
+        node = owner if isinstance(owner, SimNode) else owner.component.node
+        return owner if node.reachable else None
+
+    # Capacity
+    def _host_components(self, site: SimSiteSpec, index: int) -> dict:
+        return {model: count // site.hosts + (1 if index < count % site.hosts else 0)
+                for model, count in site.components.items()}
+
+    def reserve(self, slice_obj: SimSlice) -> dict[str, str]:
+        """
+        Allocate the slice's components at the sites that have them free; returns an
+        error per site that is short.
+        """
+        wanted = {}
+        for node in slice_obj.nodes.values():
+            for component in node.components:
+                wanted.setdefault(node.site, {}).setdefault(component.model, 0)
+                wanted[node.site][component.model] += 1
+        errors = {}
+        with self.lock:
+            previous = getattr(slice_obj, "_reserved", {})
+            for site, models in wanted.items():
+                for model, count in models.items():
+                    free = self.sites[site].components.get(model, 0) - self.allocated[site].get(model, 0) + \
+                           previous.get(site, {}).get(model, 0)
+                    if count > free and site not in errors:
+                        errors[site] = f"Insufficient resources: {model} at {site} ({count} requested, " \
+                                       f"{free} available)"
+            # Sites that are short keep what they had.
+            reserved = {site: previous.get(site, {}) if site in errors else models for site, models in wanted.items()}
+            self._release_locked(slice_obj)
+            for site, models in reserved.items():
+                for model, count in models.items():
+                    self.allocated[site][model] = self.allocated[site].get(model, 0) + count
+            slice_obj._reserved = reserved
+        return errors
+
+    def host_allocated(self, host: str) -> dict[str, int]:
+        """
+        Components per model held by the live nodes on ``host``.
+        """
+        allocated = {}
+        with self.lock:
+            for slice_obj in self.slices.values():
+                if slice_obj._state == DEAD:
+                    continue
+                for node in slice_obj.nodes.values():
+                    if node.host == host and node.reservation_state == ACTIVE:
+                        for component in node.components:
+                            allocated[component.model] = allocated.get(component.model, 0) + 1
+        return allocated
+
+    def release(self, slice_obj: SimSlice):
+        with self.lock:
+            self._release_locked(slice_obj)
+
+    def _release_locked(self, slice_obj: SimSlice):
+        for site, models in getattr(slice_obj, "_reserved", {}).items():
+            for model, count in models.items():
+                self.allocated[site][model] -= count
+        slice_obj._reserved = {}
+
+    # FablibManager API
+    def site_names(self) -> list[str]:
+        return list(self.sites)
+
+    def host_names(self, site: str) -> list[str]:
+        return [f"{site.lower()}-w{i + 1}.fabric-testbed.net" for i in range(self.sites[site].hosts)]
+
+    def show_config(self, **kwargs):
+        print(f"Simulated FABRIC testbed: {len(self.sites)} sites, seed {self.seed}, time scale {self.time_scale}")
+
+    def get_orchestrator_host(self):
+        # Distinct per site layout, so cached inventories (tests/inventory.py) never mix layouts.
+        layout = hashlib.sha1(repr(sorted(self.sites.items())).encode()).hexdigest()[:8]
+        return f"sim-{self.seed}-{layout}.fabric-testbed.invalid"
+
+    def get_config(self) -> dict:
+        host = self.get_orchestrator_host()
+        return {"orchestrator_host": host, "credmgr_host": host, "core_api_host": host}
+
+    def get_manager(self):
+        return SimManager(self)
+
+    def get_resources(self, update: bool = False, **kwargs):
+        self.call("get_resources", "orchestrator")
+        return SimResources(self)
+
+    def list_sites(self, output: str = None, quiet: bool = False, **kwargs) -> list[dict]:
+        self.call("list_sites", "orchestrator")
+        sites = []
+        with self.lock:
+            for name, site in self.sites.items():
+                data = {"name": name, "state": site.state, "hosts": site.hosts, "cores_capacity": site.cores,
+                        "ram_capacity": site.ram, "disk_capacity": site.disk}
+                for model in COMPONENT_FIELDS:
+                    capacity = site.components.get(model, 0)
+                    data[component_field(model)] = capacity
+                    data[component_field(model, available=True)] = capacity - self.allocated[name].get(model, 0)
+                sites.append(data)
+        return sites
+
+    def new_slice(self, name: str) -> SimSlice:
+        return SimSlice(self, name)
+
+    def submitted(self) -> list[SimSlice]:
+        with self.lock:
+            return list(self.slices.values())
+
+    def get_slices(self, excludes: list = None, slice_name: str = None, slice_id: str = None, **kwargs):
+        self.call("list_slices", "orchestrator")
+        excludes = [str(getattr(e, "name", e)) for e in ([DEAD, CLOSING] if excludes is None else excludes)]
+        return [s for s in self.submitted() if s.state not in excludes
+                and (slice_name is None or s.name == slice_name) and (slice_id is None or s.slice_id == slice_id)]
+
+    def get_slice(self, name: str = None, slice_id: str = None):
+        for slice_obj in self.get_slices(slice_name=name, slice_id=slice_id):
+            return slice_obj
+        raise Exception(f"Slice not found: name={name}, slice_id={slice_id}")
+
+    def delete_slice(self, slice_name: str = None):
+        self.get_slice(name=slice_name).delete()
+
+    def close(self):
+        pass
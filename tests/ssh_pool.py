@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import os
+import select
+import threading
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable
+
+from tests.fablib_pool import SIMULATE
+
+# Seconds a pooled connection may sit unused before it is closed.
+IDLE_TIMEOUT = float(os.getenv("FABRIC_SSH_IDLE_TIMEOUT", 600))
+# Minimum seconds between liveness checks of a pooled connection.
+HEALTH_CHECK_INTERVAL = 60.0
+
+
+class ParamikoTransport:
+    """
+    Opens and drives SSH connections with paramiko.
+
+    A connection handle is a ``(bastion, client)`` pair; ``bastion`` is ``None`` for
+    direct connections. Subclasses only decide how to open the pair.
+    """
+    def open(self, node):
+        raise NotImplementedError
+
+    @staticmethod
+    def _client():
+        import paramiko
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        return client
+
+    def is_alive(self, handle) -> bool:
+        for conn in handle:
+            if conn is None:
+                continue
+            transport = conn.get_transport()
+            if transport is None or not transport.is_active():
+                return False
+        return True
+
+    def run(self, handle, command: str, timeout: float = None) -> tuple[str, str]:
+        """
+        :raises TimeoutError: when the command is still running after ``timeout`` seconds;
+                              its channel is closed, the connection stays usable.
+        """
+        _, client = handle
+        stdin, stdout, stderr = client.exec_command(command, timeout=timeout)
+        stdin.close()
+        channel = stdout.channel
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        out, err = [], []
+        while True:
+            if channel.recv_ready():
+                out.append(channel.recv(65536))
+            elif channel.recv_stderr_ready():
+                err.append(channel.recv_stderr(65536))
+            elif channel.exit_status_ready():
+                break
+            else:
+                # The channel timeout only applies to recv, which is never called while idle.
+                wait = 1.0
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        channel.close()
+                        raise TimeoutError(f"Command did not finish within {timeout} sec: {command[:80]}")
+                    wait = min(wait, remaining)
+                select.select([channel], [], [], wait)
+        channel.close()
+        return b"".join(out).decode(), b"".join(err).decode()
+
+    def close(self, handle):
+        for conn in reversed(handle):
+            if conn is not None:
+                try:
+                    conn.close()
+                except Exception as e:
+                    print(f"Exception closing SSH connection: {e}")
+
+
+class BastionTransport(ParamikoTransport):
+    """
+    Connects to FABRIC VMs through the bastion host configured in the node's fablib manager.
+    """
+    def open(self, node):
+        fablib = node.get_fablib_manager()
+        bastion = self._client()
+        bastion.connect(fablib.get_bastion_host(),
+                        username=fablib.get_bastion_username(),
+                        key_filename=fablib.get_bastion_key_location(),
+                        passphrase=fablib.get_bastion_key_passphrase())
+        try:
+            management_ip = str(node.get_management_ip())
+            src_addr = ("::", 22) if ":" in management_ip else ("0.0.0.0", 22)
+            channel = bastion.get_transport().open_channel("direct-tcpip", (management_ip, 22), src_addr)
+            key = node.get_paramiko_key(private_key_file=node.get_private_key_file(),
+                                        get_private_key_passphrase=node.get_private_key_passphrase())
+            client = self._client()
+            client.connect(management_ip, username=node.get_username(), pkey=key, sock=channel)
+        except Exception:
+            bastion.close()
+            raise
+        return bastion, client
+
+
+class DirectTransport(ParamikoTransport):
+    """
+    Connects straight to one SSH server, e.g. a local sshd when exercising the pool.
+    """
+    def __init__(self, hostname: str, port: int = 22, username: str = None, key_filename: str = None):
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.key_filename = key_filename
+
+    def open(self, node):
+        client = self._client()
+        client.connect(self.hostname, port=self.port, username=self.username, key_filename=self.key_filename)
+        return None, client
+
+
+class NodeTransport:
+    """
+    Runs commands through ``node.execute``; used against the simulated testbed, whose
+    nodes answer in-process.
+    """
+    def open(self, node):
+        return node
+
+    def is_alive(self, handle) -> bool:
+        return True
+
+    def run(self, handle, command: str, timeout: float = None) -> tuple[str, str]:
+        return handle.execute(command, quiet=True, timeout=timeout)
+
+    def close(self, handle):
+        pass
+
+
+@dataclass
+class PoolStats:
+    opened: int = 0
+    reused: int = 0
+    executes: int = 0
+    failures: int = 0
+    health_failures: int = 0
+    evicted: int = 0
+
+    @property
+    def reuse_ratio(self) -> float:
+        total = self.opened + self.reused
+        return self.reused / total if total else 0.0
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data["reuse_ratio"] = round(self.reuse_ratio, 4)
+        return data
+
+
+class _Connection:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.handle = None
+        self.last_used = 0.0
+        self.last_checked = 0.0
+        self.uses = 0
+
+
+class SSHPool:
+    """
+    Keeps one SSH session per (slice, node) alive across test phases.
+
+    fablib caches a connection on each ``Node`` object, but ``slice.get_node()`` and
+    ``slice.update()`` hand out new ``Node`` objects, so ping, iperf and configuration
+    steps in a sweep each pay a fresh bastion and node handshake. The pool keys sessions
+    by slice ID and node name instead, checks liveness at most every
+    ``health_check_interval`` seconds, reconnects once when a command fails on a dead
+    session and closes sessions idle for ``idle_timeout`` seconds.
+
+    Commands from several threads may share a session; paramiko opens a channel per command.
+
+    :param transport: Opens, checks, runs on and closes connections; defaults to
+                      :class:`BastionTransport`.
+    :param idle_timeout: Seconds of inactivity before a session is closed.
+    :type idle_timeout: float
+    :param health_check_interval: Minimum seconds between liveness checks per session.
+    :type health_check_interval: float
+    :param clock: Monotonic time source.
+    :type clock: Callable
+    """
+    def __init__(self, transport=None, idle_timeout: float = IDLE_TIMEOUT,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL, clock: Callable = time.monotonic):
+        self.transport = transport if transport is not None else BastionTransport()
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.clock = clock
+        self.stats = PoolStats()
+        self._lock = threading.Lock()
+        self._connections = {}
+        self._last_sweep = clock()
+
+    @staticmethod
+    def key_for(node) -> tuple[str, str]:
+        slice_obj = node.get_slice()
+        return slice_obj.get_slice_id() or slice_obj.get_name(), node.get_name()
+
+    def execute(self, node, command: str, timeout: float = None) -> tuple[str, str]:
+        """
+        Run ``command`` on ``node`` over its pooled session.
+
+        :return: (stdout, stderr)
+        :raises TimeoutError: when the command exceeds ``timeout``; the session is kept.
+        """
+        self.evict_idle(only_if_due=True)
+        key = self.key_for(node)
+        for attempt in range(2):
+            handle = self._acquire(key, node)
+            try:
+                result = self.transport.run(handle, command, timeout=timeout)
+            except TimeoutError:
+                raise
+            except Exception as e:
+                self._count("failures")
+                self._drop(key, handle)
+                if attempt:
+                    raise
+                print(f"[{key[0]}/{key[1]}] SSH command failed ({e}); reconnecting")
+                continue
+            self._count("executes")
+            return result
+
+    def _count(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self.stats, name, getattr(self.stats, name) + value)
+
+    def _acquire(self, key, node):
+        with self._lock:
+            conn = self._connections.setdefault(key, _Connection())
+        with conn.lock:
+            now = self.clock()
+            if conn.handle is not None and now - conn.last_checked >= self.health_check_interval:
+                conn.last_checked = now
+                if not self.transport.is_alive(conn.handle):
+                    self._count("health_failures")
+                    self.transport.close(conn.handle)
+                    conn.handle = None
+            if conn.handle is None:
+                conn.handle = self.transport.open(node)
+                conn.last_checked = now
+                self._count("opened")
+            else:
+                self._count("reused")
+            conn.last_used = now
+            conn.uses += 1
+            return conn.handle
+
+    def _drop(self, key, handle):
+        with self._lock:
+            conn = self._connections.get(key)
+        if conn is None:
+            return
+        with conn.lock:
+            if conn.handle is handle:
+                self.transport.close(handle)
+                conn.handle = None
+
+    def evict_idle(self, only_if_due: bool = False) -> int:
+        """
+        Close sessions unused for ``idle_timeout`` seconds.
+
+        :param only_if_due: Skip the sweep if one ran within the last quarter of ``idle_timeout``.
+        :return: Number of sessions closed.
+        """
+        now = self.clock()
+        with self._lock:
+            if only_if_due and now - self._last_sweep < self.idle_timeout / 4:
+                return 0
+            self._last_sweep = now
+            connections = list(self._connections.values())
+        evicted = 0
+        for conn in connections:
+            if not conn.lock.acquire(blocking=False):
+                continue
+            try:
+                if conn.handle is not None and now - conn.last_used >= self.idle_timeout:
+                    self.transport.close(conn.handle)
+                    conn.handle = None
+                    evicted += 1
+            finally:
+                conn.lock.release()
+        if evicted:
+            self._count("evicted", evicted)
+        return evicted
+
+    def close(self, slice_key: str = None):
+        """
+        Close all sessions, or only those of one slice (by slice ID or name).
+        """
+        with self._lock:
+            items = [(key, conn) for key, conn in self._connections.items()
+                     if slice_key is None or key[0] == slice_key]
+            for key, _ in items:
+                del self._connections[key]
+        for _, conn in items:
+            with conn.lock:
+                if conn.handle is not None:
+                    self.transport.close(conn.handle)
+                    conn.handle = None
+
+    def size(self) -> int:
+        with self._lock:
+            return sum(1 for conn in self._connections.values() if conn.handle is not None)
+
+
+ssh_pool = SSHPool(NodeTransport() if SIMULATE else None)
@@ -25,6 +25,7 @@
 import shlex
 from datetime import datetime
 from tests.base_test import BaseTest, _validate_ip, _safe_devname
+from tests.remote import execute_batch
 
 
 class FabNetv4ExtRenewSliceTest(BaseTest):
@@ -99,14 +100,12 @@ class FabNetv4ExtRenewSliceTest(BaseTest):
         node1_iface.ip_addr_add(addr=node1_addr, subnet=network1.get_subnet())
 
         # Add route to external network Google DNS server in this case
-        stdout, stderr = node1.execute(f'sudo ip route add 8.8.8.0/24 via {_validate_ip(network1.get_gateway())}')
-        self.assertEqual("", stderr)
-
-        stdout, stderr = node1.execute(f'ip addr show {_safe_devname(node1_iface.get_device_name())}')
-        self.assertEqual("", stderr)
-
-        stdout, stderr = node1.execute(f'ip route list')
-        self.assertEqual("", stderr)
+        for result in execute_batch(node1, [
+            f'sudo ip route add 8.8.8.0/24 via {_validate_ip(network1.get_gateway())}',
+            f'ip addr show {_safe_devname(node1_iface.get_device_name())}',
+            'ip route list',
+        ]):
+            self.assertEqual("", result.stderr, result.command)
 
         # Configure Node2
         node2 = self._slice.get_node(name=node2_name)
@@ -115,14 +114,12 @@ class FabNetv4ExtRenewSliceTest(BaseTest):
         node2_iface.ip_addr_add(addr=node2_addr, subnet=network2.get_subnet())
 
         # Add route to external network Google DNS server in this case
-        stdout, stderr = node2.execute(f'sudo ip route add 8.8.8.0/24 via {_validate_ip(network2.get_gateway())}')
-        self.assertEqual("", stderr)
-
-        stdout, stderr = node2.execute(f'ip addr show {_safe_devname(node2_iface.get_device_name())}')
-        self.assertEqual("", stderr)
-
-        stdout, stderr = node2.execute(f'ip route list')
-        self.assertEqual("", stderr)
+        for result in execute_batch(node2, [
+            f'sudo ip route add 8.8.8.0/24 via {_validate_ip(network2.get_gateway())}',
+            f'ip addr show {_safe_devname(node2_iface.get_device_name())}',
+            'ip route list',
+        ]):
+            self.assertEqual("", result.stderr, result.command)
 
         # VERIFICATION
         # Ping Google's DNS server from Node1 via the FabNetv4Ext network
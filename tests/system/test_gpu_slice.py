@@ -24,6 +24,7 @@
 # Author: Komal Thareja (kthare10@renci.org)
 import re
 from tests.base_test import BaseTest
+from tests.remote import execute_batch
 
 
 class GpuSliceTest(BaseTest):
@@ -76,27 +77,23 @@ class GpuSliceTest(BaseTest):
             raise ValueError(f"Invalid CUDA version string: {version!r}")
 
         # install prerequisites
-        commands = [
+        prerequisites = [
             'sudo DEBIAN_FRONTEND=noninteractive apt-get -q update',
             'sudo DEBIAN_FRONTEND=noninteractive apt-get -q install -y linux-headers-$(uname -r) gcc',
         ]
 
-        print("Installing Prerequisites...")
-        for command in commands:
-            print(f"++++ {command}")
-            stdout, stderr = node.execute(command)
-
-        print(f"Installing CUDA {version}")
-        commands = [
+        cuda = [
             f'wget https://developer.download.nvidia.com/compute/cuda/repos/{distro}/{architecture}/cuda-keyring_1.1-1_all.deb',
             f'sudo DEBIAN_FRONTEND=noninteractive dpkg -i cuda-keyring_1.1-1_all.deb',
             f'sudo DEBIAN_FRONTEND=noninteractive apt-get -q update',
             f'sudo apt-get -q install -y cuda-{version.replace(".", "-")}'
         ]
-        print("Installing CUDA...")
-        for command in commands:
-            print(f"++++ {command}")
-            stdout, stderr = node.execute(command)
+
+        # Single SSH round-trip for the prerequisites and CUDA install
+        print(f"Installing Prerequisites and CUDA {version}...")
+        results = execute_batch(node, prerequisites + cuda)
+        for result in results:
+            print(f"++++ {result.command} (exit {result.exit_code})")
 
         print("Done installing CUDA")
 
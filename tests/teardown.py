@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+# Deletes are single orchestrator calls that mostly wait on the control framework; cap
+# them so a large teardown does not flood the orchestrator.
+DEFAULT_MAX_PARALLEL = 16
+DEFAULT_RETRIES = 3
+DEFAULT_BASE_DELAY = 2.0
+DEFAULT_MAX_DELAY = 30.0
+
+# Errors meaning the slice is already gone; these count as a successful delete.
+GONE_MARKERS = ("not found", "does not exist", "no slice", "already deleted")
+
+DELETED = "deleted"
+KEPT = "kept"
+FAILED = "failed"
+
+
+@dataclass
+class DeleteResult:
+    """
+    Outcome of deleting one slice.
+
+    ``elapsed`` covers every attempt including backoff sleeps, in seconds.
+    """
+    name: str
+    slice_id: str | None
+    status: str
+    attempts: int = 0
+    elapsed: float = 0.0
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return self.status != FAILED
+
+
+def backoff_delay(attempt: int, base_delay: float = DEFAULT_BASE_DELAY,
+                  max_delay: float = DEFAULT_MAX_DELAY, rng=random) -> float:
+    """
+    Jittered exponential backoff before retry ``attempt`` (1-based): a random delay
+    between half and all of ``base_delay * 2 ** (attempt - 1)``, capped at ``max_delay``.
+    """
+    delay = min(max_delay, base_delay * 2 ** (attempt - 1))
+    return rng.uniform(delay / 2, delay)
+
+
+def is_gone(exception: Exception) -> bool:
+    message = str(exception).lower()
+    return any(marker in message for marker in GONE_MARKERS)
+
+
+def _name_and_id(slice_obj) -> tuple[str, str | None]:
+    try:
+        return slice_obj.get_name(), slice_obj.get_slice_id()
+    except Exception:
+        return str(slice_obj), None
+
+
+class SliceTeardown:
+    """
+    Deletes many slices in parallel, retrying transient failures with jittered backoff.
+
+    End-of-run cleanup then takes about as long as the slowest delete rather than the
+    sum of all of them.
+
+    :param max_parallel: Maximum number of deletes in flight.
+    :type max_parallel: int
+    :param retries: Retries after the first failed attempt.
+    :type retries: int
+    :param base_delay: Backoff before the first retry, in seconds; doubled for every further retry.
+    :type base_delay: float
+    :param max_delay: Upper bound on a single backoff, in seconds.
+    :type max_delay: float
+    :param sleep: Sleep function, replaceable in tests.
+    :type sleep: Callable[[float], None]
+    :param quiet: Do not print per-slice progress.
+    :type quiet: bool
+    """
+    def __init__(self, max_parallel: int = DEFAULT_MAX_PARALLEL, retries: int = DEFAULT_RETRIES,
+                 base_delay: float = DEFAULT_BASE_DELAY, max_delay: float = DEFAULT_MAX_DELAY,
+                 sleep: Callable[[float], None] = time.sleep, quiet: bool = False):
+        self.max_parallel = max_parallel
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.quiet = quiet
+
+    def _log(self, message: str):
+        if not self.quiet:
+            print(message)
+
+    def delete(self, slice_obj) -> DeleteResult:
+        name, slice_id = _name_and_id(slice_obj)
+        result = DeleteResult(name=name, slice_id=slice_id, status=FAILED)
+        start = time.monotonic()
+        for attempt in range(1, self.retries + 2):
+            result.attempts = attempt
+            try:
+                slice_obj.delete()
+                result.status = DELETED
+                break
+            except Exception as e:
+                if is_gone(e):
+                    result.status = DELETED
+                    break
+                result.error = str(e)
+                if attempt > self.retries:
+                    break
+                delay = backoff_delay(attempt, self.base_delay, self.max_delay)
+                self._log(f"[{name}] Delete attempt {attempt} failed: {e}; retrying in {delay:.1f}s")
+                self.sleep(delay)
+        result.elapsed = time.monotonic() - start
+        if result.ok:
+            result.error = ""
+            self._log(f"[{name}] Deleted in {result.elapsed:.1f}s")
+        else:
+            self._log(f"[{name}] Slice deletion error after {result.attempts} attempts: {result.error}")
+        return result
+
+    def run(self, slices, keep=()) -> dict[Hashable, DeleteResult]:
+        """
+        Delete ``slices`` except those whose name or slice ID is in ``keep``.
+
+        :param slices: Slice objects, or a mapping whose values are slice objects. Pass a
+            mapping when several slices share a name, as the members of an aggregate slice do.
+        :param keep: Slice names or IDs to leave running, e.g. for manual inspection.
+        :return: mapping key (slice name for a sequence) -> DeleteResult, in input order
+        """
+        if isinstance(slices, dict):
+            items = list(slices.items())
+        else:
+            items = [(_name_and_id(slice_obj)[0], slice_obj) for slice_obj in slices]
+        keep = set(keep)
+        results = {}
+        to_delete = []
+        for key, slice_obj in items:
+            name, slice_id = _name_and_id(slice_obj)
+            if name in keep or (slice_id is not None and slice_id in keep):
+                self._log(f"[{name}] Keeping slice {slice_id}")
+                results[key] = DeleteResult(name=name, slice_id=slice_id, status=KEPT)
+            else:
+                results[key] = None
+                to_delete.append((key, slice_obj))
+
+        if to_delete:
+            self._log(f"Deleting {len(to_delete)} slices, {self.max_parallel} at a time")
+            keys = [key for key, _ in to_delete]
+            with ThreadPoolExecutor(max_workers=min(self.max_parallel, len(to_delete))) as executor:
+                for key, result in zip(keys, executor.map(self.delete, [s for _, s in to_delete])):
+                    results[key] = result
+        return results
+
+
+def delete_slices(slices, keep=(), max_parallel: int = DEFAULT_MAX_PARALLEL,
+                  **kwargs) -> dict[Hashable, DeleteResult]:
+    """
+    Delete ``slices`` in parallel, leaving those named (by name or slice ID) in ``keep``.
+
+    See ``SliceTeardown`` for the remaining keyword arguments.
+
+    :return: mapping key (slice name for a sequence) -> DeleteResult
+    """
+    results = SliceTeardown(max_parallel=max_parallel, **kwargs).run(slices, keep=keep)
+    print_teardown_summary(results)
+    return results
+
+
+def print_teardown_summary(results: dict[Hashable, DeleteResult]):
+    deleted = [r for r in results.values() if r.status == DELETED]
+    failed = [r for r in results.values() if r.status == FAILED]
+    kept = len(results) - len(deleted) - len(failed)
+    if not deleted and not failed:
+        return
+    slowest = max((r.elapsed for r in deleted + failed), default=0.0)
+    print(f"Teardown: {len(deleted)} deleted, {len(failed)} failed, {kept} kept; slowest delete {slowest:.1f}s")
+    for key, r in results.items():
+        if r.status == FAILED:
+            print(f" - {key}: {r.name} ({r.slice_id}): {r.error}")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Per-stage provisioning latency.
+
+:class:`ProvisioningTimer` observes :class:`tests.lifecycle.SliceLifecycle` events and
+records the monotonic start/finish of every stage (build, submit, wait, wait_ssh,
+post_boot_config) per slice, site and component type. Each sample is appended to the
+result sink under the ``provisioning`` test, and :meth:`ProvisioningTimer.report`
+renders p50/p90/p99 tables so a slow site can be told apart from a slow orchestrator.
+``python -m tests.timing results.jsonl`` rebuilds the tables from the sink.
+"""
+import argparse
+import math
+import threading
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+from tests.lifecycle import STAGES, STARTED, COMPLETED, LifecycleEvent, print_event
+from tests.result_sink import DEFAULT_PATH, FAIL, PASS, ResultSink, get_sink, latest_run_id, make_record, \
+    read_records
+
+PROVISIONING = "provisioning"
+# Component attach/detach on a running VM through slice modify (tests.rotation, tests.warm_pool).
+ATTACH = "attach"
+DETACH = "detach"
+MODIFY_STAGES = (ATTACH, DETACH)
+PERCENTILES = (50, 90, 99)
+SITE = "site"
+COMPONENT = "component"
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    """
+    One stage of one slice; ``started`` and ``finished`` are ``time.monotonic()`` values.
+    """
+    key: str
+    site: str
+    component: str
+    stage: str
+    ok: bool
+    started: float
+    finished: float
+
+    @property
+    def elapsed(self) -> float:
+        return self.finished - self.started
+
+    def to_dict(self) -> dict:
+        return {"site": self.site, "component": self.component, "ok": self.ok, "started": self.started,
+                "finished": self.finished, "elapsed": self.elapsed}
+
+
+def percentile(values, pct: float) -> float:
+    """
+    Linearly interpolated percentile of ``values`` (``pct`` in 0..100).
+    """
+    ordered = sorted(values)
+    if not ordered:
+        return math.nan
+    rank = (len(ordered) - 1) * pct / 100
+    low = math.floor(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def site_of_key(key: Hashable) -> str:
+    """
+    Site of the lifecycle keys the acceptance tests use: ``SITE`` or ``SITE_<model>``.
+    """
+    return str(key).split("_", 1)[0]
+
+
+class ProvisioningTimer:
+    """
+    Collects :class:`StageTiming` samples from lifecycle events.
+
+    :param sink: Sink receiving one record per completed stage; defaults to the process-wide sink.
+    :type sink: ResultSink
+    """
+    def __init__(self, sink: ResultSink = None):
+        self._sink = sink
+        self._lock = threading.Lock()
+        self.timings: list[StageTiming] = []
+
+    @property
+    def sink(self) -> ResultSink:
+        return self._sink or get_sink()
+
+    def observer(self, component: str, site_of: Callable[[Hashable], str] = site_of_key,
+                 forward: Callable[[LifecycleEvent], None] = print_event) -> Callable[[LifecycleEvent], None]:
+        """
+        Lifecycle ``on_event`` callback recording every finished stage.
+
+        :param component: Component type of the slices, e.g. ``NVMe``, ``GPU``, ``SmartNIC``.
+        :param site_of: Maps a lifecycle key to the site it is attributed to.
+        :param forward: Callback also receiving every event, by default the progress printer.
+        """
+        def on_event(event: LifecycleEvent):
+            if event.status != STARTED:
+                self.add(StageTiming(key=str(event.key), site=site_of(event.key), component=component,
+                                     stage=event.stage, ok=event.status == COMPLETED,
+                                     started=event.timestamp - event.elapsed, finished=event.timestamp))
+            if forward is not None:
+                forward(event)
+        return on_event
+
+    def add(self, timing: StageTiming):
+        with self._lock:
+            self.timings.append(timing)
+        self.sink.write(make_record(PROVISIONING, timing.key, timing.to_dict(), stage=timing.stage,
+                                    outcome=PASS if timing.ok else FAIL, timings={timing.stage: timing.elapsed}))
+
+    def reset(self):
+        with self._lock:
+            self.timings = []
+
+    def report(self, percentiles=PERCENTILES) -> str:
+        with self._lock:
+            timings = list(self.timings)
+        return format_report(timings, percentiles)
+
+
+def summarize(timings: list[StageTiming], by: str = SITE, percentiles=PERCENTILES) -> dict:
+    """
+    :param by: ``site`` or ``component``.
+    :return: group -> stage -> {"n": samples, "p50": ..., ...}, failed stages included
+    """
+    samples = defaultdict(lambda: defaultdict(list))
+    for timing in timings:
+        samples[getattr(timing, by)][timing.stage].append(timing.elapsed)
+    return {group: {stage: {"n": len(values), **{f"p{p}": percentile(values, p) for p in percentiles}}
+                    for stage, values in stages.items()}
+            for group, stages in sorted(samples.items())}
+
+
+def format_table(summary: dict, by: str, percentiles=PERCENTILES) -> str:
+    stages = [s for s in STAGES + MODIFY_STAGES if any(s in row for row in summary.values())]
+    columns = "/".join(f"p{p}" for p in percentiles) + " (n)"
+    lines = [by.ljust(16) + "".join(f" | {s:>22}" for s in stages),
+             " " * 16 + "".join(f" | {columns:>22}" for _ in stages)]
+    lines.append("-" * len(lines[0]))
+    for group, row in summary.items():
+        cells = []
+        for stage in stages:
+            stats = row.get(stage)
+            if stats is None:
+                cells.append(f" | {'-':>22}")
+            else:
+                values = "/".join(f"{stats[f'p{p}']:.1f}" for p in percentiles) + f" ({stats['n']})"
+                cells.append(f" | {values:>22}")
+        lines.append(str(group).ljust(16) + "".join(cells))
+    return "\n".join(lines)
+
+
+def format_report(timings: list[StageTiming], percentiles=PERCENTILES) -> str:
+    if not timings:
+        return "No provisioning timings recorded"
+    return "\n\n".join(
+        f"Provisioning latency (s) per {by}\n" + format_table(summarize(timings, by, percentiles), by, percentiles)
+        for by in (SITE, COMPONENT))
+
+
+def timings_from_records(records) -> list[StageTiming]:
+    """
+    Rebuild timings from ``provisioning`` records of the result sink.
+    """
+    timings = []
+    for record in records:
+        data = record.get("data") or {}
+        if record.get("test") != PROVISIONING or not isinstance(data, dict):
+            continue
+        timings.append(StageTiming(key=record["key"], site=data.get("site", ""), component=data.get("component", ""),
+                                   stage=record["stage"], ok=record["outcome"] == PASS,
+                                   started=data["started"], finished=data["finished"]))
+    return timings
+
+
+provisioning_timer = ProvisioningTimer()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provisioning latency percentiles from a results JSON Lines file.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_PATH)
+    parser.add_argument("--run-id", help="Run to report (default: latest run)")
+    args = parser.parse_args()
+
+    run_id = args.run_id or latest_run_id(args.path, test=PROVISIONING)
+    print(format_report(timings_from_records(read_records(args.path, test=PROVISIONING, run_id=run_id))))
+
+
+if __name__ == "__main__":
+    main()
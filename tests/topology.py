@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Declarative slice topologies.
+
+A :class:`TopologyTemplate` describes the nodes, components and networks of a slice
+once, with ``{field}`` placeholders for what differs per slice (site, host, names).
+:meth:`TopologyTemplate.instantiate` adds it to a new slice.
+
+Building a FIM graph through ``add_node``/``add_component`` searches the process-wide
+graph store on every call, so it gets slower with every slice built and holds
+``fim_lock`` throughout. The first instantiation of a template therefore builds it once
+with placeholders in place of the fields and keeps the resulting graph as a skeleton; later
+instantiations copy the skeleton, give it fresh node ids, substitute the placeholders
+and insert it into the slice's graph in one step. Slices without a FIM topology (the
+simulated testbed) are built through the call chain.
+"""
+import re
+import string
+import threading
+import uuid
+from dataclasses import dataclass, field, replace
+from ipaddress import IPv4Network, IPv6Network
+from typing import Any
+
+from fabrictestbed_extensions.fablib.slice import Slice
+from fim.graph.abc_property_graph import ABCPropertyGraph
+
+
+@dataclass(frozen=True)
+class ComponentSpec:
+    """
+    A component of a node; ``mode`` is set on its first interface (e.g. ``"auto"``).
+    """
+    model: str
+    name: str
+    mode: str = None
+
+
+@dataclass(frozen=True)
+class NodeSpec:
+    """
+    A VM; unset sizes and image keep the fablib defaults.
+    """
+    name: str
+    site: str = "{site}"
+    host: str = None
+    cores: int = None
+    ram: int = None
+    disk: int = None
+    image: str = None
+    components: tuple[ComponentSpec, ...] = ()
+    storage: tuple[str, ...] = ()
+    fabnet: str = None
+
+
+@dataclass(frozen=True)
+class NetworkSpec:
+    """
+    A network over the first interface of each ``"node.component"`` in ``interfaces``.
+    """
+    name: str
+    interfaces: tuple[str, ...]
+    layer: str = "L3"
+    type: str = None
+    subnet: IPv4Network | IPv6Network = None
+
+
+@dataclass(frozen=True)
+class TopologyTemplate:
+    """
+    Nodes and networks of a slice. String values may contain ``{field}`` placeholders,
+    filled from the keyword arguments of :meth:`build` and :meth:`instantiate`.
+    Placeholders in component models select the skeleton; all others are substituted
+    into it.
+    """
+    nodes: tuple[NodeSpec, ...]
+    networks: tuple[NetworkSpec, ...] = ()
+
+    def fields(self) -> set[str]:
+        return {name for value in _strings(self) for name in _placeholders(value)}
+
+    def structural_fields(self) -> set[str]:
+        return {name for node in self.nodes for component in node.components
+                for name in _placeholders(component.model)}
+
+    def member(self, index: int) -> "TopologyTemplate":
+        """
+        This topology as member ``index`` of a larger slice: node and network names get a
+        ``{member_<index>}-`` prefix and every field ``{x}`` becomes ``{x_<index>}``.
+        """
+        def rename(value):
+            return _FIELD.sub(lambda match: f"{{{match.group(1)}_{index}}}", value) if value else value
+
+        prefix = f"{{member_{index}}}-"
+        nodes = tuple(replace(node, name=prefix + rename(node.name), site=rename(node.site), host=rename(node.host),
+                              image=rename(node.image),
+                              components=tuple(replace(c, model=rename(c.model), name=rename(c.name))
+                                               for c in node.components))
+                      for node in self.nodes)
+        networks = tuple(replace(network, name=prefix + rename(network.name),
+                                 interfaces=tuple(prefix + rename(ref) for ref in network.interfaces))
+                         for network in self.networks)
+        return TopologyTemplate(nodes, networks)
+
+    @staticmethod
+    def combine(templates) -> "TopologyTemplate":
+        """
+        One topology holding the nodes and networks of all ``templates``.
+        """
+        templates = list(templates)
+        return TopologyTemplate(tuple(node for template in templates for node in template.nodes),
+                                tuple(network for template in templates for network in template.networks))
+
+    def build(self, slice_obj, **fields):
+        """
+        Add the topology to ``slice_obj`` through the fablib call chain.
+
+        :return: ``slice_obj``
+        """
+        def fmt(value):
+            return value.format(**fields) if isinstance(value, str) else value
+
+        interfaces = {}
+        for spec in self.nodes:
+            kwargs = {key: fmt(getattr(spec, key)) for key in ("host", "cores", "ram", "disk", "image")
+                      if getattr(spec, key) is not None}
+            node = slice_obj.add_node(name=fmt(spec.name), site=fmt(spec.site), **kwargs)
+            for component in spec.components:
+                iface = next(iter(node.add_component(model=fmt(component.model),
+                                                     name=fmt(component.name)).get_interfaces()), None)
+                if component.mode:
+                    iface.set_mode(component.mode)
+                interfaces[f"{spec.name}.{component.name}"] = iface
+            for storage in spec.storage:
+                node.add_storage(name=fmt(storage))
+            if spec.fabnet:
+                node.add_fabnet(net_type=spec.fabnet)
+        for spec in self.networks:
+            kwargs = {key: getattr(spec, key) for key in ("type", "subnet") if getattr(spec, key) is not None}
+            add_network = slice_obj.add_l2network if spec.layer == "L2" else slice_obj.add_l3network
+            add_network(name=fmt(spec.name), interfaces=[interfaces[ref] for ref in spec.interfaces], **kwargs)
+        return slice_obj
+
+    def instantiate(self, slice_obj, **fields):
+        """
+        Add the topology to ``slice_obj``, a new slice, from the cached skeleton when
+        the slice has a FIM topology.
+
+        :return: ``slice_obj``
+        """
+        missing = self.fields() - fields.keys()
+        if missing:
+            raise KeyError(f"Topology fields not given: {', '.join(sorted(missing))}")
+        if not hasattr(slice_obj, "get_fim_topology"):
+            return self.build(slice_obj, **fields)
+        structural = {name: fields[name] for name in sorted(self.structural_fields())}
+        skeleton = compile_template(self, slice_obj.get_fablib_manager(), **structural)
+        skeleton.instantiate(slice_obj, **fields)
+        return slice_obj
+
+    def new_slice(self, fablib, name: str, **fields):
+        """
+        ``fablib.new_slice(name)`` with this topology.
+        """
+        return self.instantiate(fablib.new_slice(name=name), **fields)
+
+
+@dataclass
+class CompiledTopology:
+    """
+    FIM graph of a template with its placeholders left in, and where they occur.
+    """
+    graph: Any
+    patches: list[tuple[Any, str, str]] = field(default_factory=list)
+
+    def instantiate(self, slice_obj, **fields):
+        model = slice_obj.get_fim_topology().graph_model
+        graph = self.graph.copy()
+        for node_id, data in graph.nodes(data=True):
+            data[ABCPropertyGraph.GRAPH_ID] = model.graph_id
+            data[ABCPropertyGraph.NODE_ID] = str(uuid.uuid4())
+        for node_id, key, value in self.patches:
+            graph.nodes[node_id][key] = _PLACEHOLDER.sub(
+                lambda match: str(fields.get(match.group(1), match.group(0))), value)
+        model.storage.add_graph_direct(graph_id=model.graph_id, graph=graph)
+
+
+# Placeholders stand in for fields while a skeleton is built; FIM only accepts names
+# made of word characters, dashes and dots.
+_PLACEHOLDER = re.compile(r"__tpl_(\w+?)__")
+_FIELD = re.compile(r"\{(\w+)\}")
+_lock = threading.Lock()
+_compiled: dict[tuple, CompiledTopology] = {}
+
+
+def compile_template(template: TopologyTemplate, fablib_manager, **structural) -> CompiledTopology:
+    """
+    The skeleton of ``template`` for the given structural field values, built on first use.
+    """
+    key = (template, tuple(sorted(structural.items())))
+    with _lock:
+        if key not in _compiled:
+            placeholders = {name: f"__tpl_{name}__" for name in template.fields()}
+            scratch = Slice(fablib_manager=fablib_manager, name="topology-template")
+            template.build(scratch, **{**placeholders, **structural})
+            model = scratch.get_fim_topology().graph_model
+            graph = model.storage.extract_graph(model.graph_id)
+            model.storage.del_graph(model.graph_id)
+            patches = [(node_id, key, value) for node_id, data in graph.nodes(data=True)
+                       for key, value in data.items()
+                       if isinstance(value, str) and key not in (ABCPropertyGraph.GRAPH_ID, ABCPropertyGraph.NODE_ID)
+                       and any(match.group(1) in placeholders for match in _PLACEHOLDER.finditer(value))]
+            _compiled[key] = CompiledTopology(graph, patches)
+        return _compiled[key]
+
+
+def _placeholders(value: str) -> list[str]:
+    return [name for _, name, _, _ in string.Formatter().parse(value) if name]
+
+
+def _strings(value):
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, tuple):
+        for item in value:
+            yield from _strings(item)
+    elif hasattr(value, "__dataclass_fields__"):
+        for name in value.__dataclass_fields__:
+            yield from _strings(getattr(value, name))
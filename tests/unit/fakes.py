@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+import uuid
+from collections import defaultdict
+from ipaddress import IPv4Network, IPv6Network
+
+
+class ConcurrencyProbe:
+    """
+    Records how many callers are inside each named section at once.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = defaultdict(int)
+        self.peak = defaultdict(int)
+        self.calls = defaultdict(int)
+
+    def enter(self, name: str):
+        with self._lock:
+            self.current[name] += 1
+            self.calls[name] += 1
+            self.peak[name] = max(self.peak[name], self.current[name])
+
+    def exit(self, name: str):
+        with self._lock:
+            self.current[name] -= 1
+
+    def section(self, name: str, latency: float = 0.0):
+        probe = self
+
+        class _Section:
+            def __enter__(self):
+                probe.enter(name)
+
+            def __exit__(self, *exc):
+                if latency:
+                    time.sleep(latency)
+                probe.exit(name)
+
+        return _Section()
+
+
+class FakeNode:
+    def __init__(self, slice_obj, name, site=None, host=None, **kwargs):
+        self.slice = slice_obj
+        self.name = name
+        self.site = site
+        self.host = host
+        self.components = {}
+
+    def get_name(self):
+        return self.name
+
+    def get_site(self):
+        return self.site
+
+    def get_slice(self):
+        return self.slice
+
+    def add_component(self, model=None, name=None):
+        self.components[name] = model
+
+
+class FakeTransport:
+    """
+    In-process stand-in for an SSH transport: handles are dictionaries that can be
+    marked dead, and ``run`` echoes the command.
+    """
+    def __init__(self, open_latency: float = 0.0, fail_commands: set = None):
+        self.open_latency = open_latency
+        self.fail_commands = fail_commands or set()
+        self.opened = []
+        self.closed = []
+
+    def open(self, node):
+        time.sleep(self.open_latency)
+        handle = {"node": node.get_name(), "alive": True, "id": len(self.opened)}
+        self.opened.append(handle)
+        return handle
+
+    def is_alive(self, handle):
+        return handle["alive"]
+
+    def run(self, handle, command, timeout=None):
+        if not handle["alive"] or command in self.fail_commands:
+            raise ConnectionError(f"connection {handle['id']} lost")
+        return f"{handle['node']}: {command}", ""
+
+    def close(self, handle):
+        handle["alive"] = False
+        self.closed.append(handle)
+
+
+class FakeSlice:
+    """
+    Minimal stand-in for ``fablib.slice.Slice`` that sleeps for the configured latency
+    in each lifecycle call and records concurrency on the shared probe.
+    """
+    def __init__(self, fablib, name):
+        self.fablib = fablib
+        self.name = name
+        self.slice_id = None
+        self.state = None
+        self.nodes = {}
+
+    def _call(self, stage):
+        failure = self.fablib.failures.get((self.name, stage)) or self.fablib.failures.get(stage)
+        with self.fablib.probe.section(stage, self.fablib.latency.get(stage, 0.0)):
+            pass
+        if failure:
+            raise failure
+
+    def get_name(self):
+        return self.name
+
+    def get_slice_id(self):
+        return self.slice_id
+
+    def get_state(self):
+        return self.state
+
+    def get_nodes(self):
+        return list(self.nodes.values())
+
+    def get_node(self, name):
+        return self.nodes[name]
+
+    def add_node(self, name, site=None, host=None, **kwargs):
+        with self.fablib.probe.section("add_node", self.fablib.latency.get("add_node", 0.0)):
+            node = FakeNode(self, name, site=site, host=host, **kwargs)
+            self.nodes[name] = node
+            return node
+
+    def submit(self, wait=True, **kwargs):
+        self._call("submit")
+        self.slice_id = str(uuid.uuid4())
+        self.state = "Configuring"
+        return self.slice_id
+
+    def wait(self, timeout=360, interval=10, progress=False):
+        self._call("wait")
+        self.state = "StableOK"
+
+    def wait_ssh(self, timeout=1800, interval=20, progress=False):
+        self._call("wait_ssh")
+        return True
+
+    def post_boot_config(self):
+        self._call("post_boot_config")
+
+    def update(self):
+        self._call("update")
+
+    def delete(self):
+        self._call("delete")
+        self.state = "Dead"
+
+
+class FakeHost:
+    def __init__(self, name, state="Active"):
+        self.name = name
+        self.state = state
+
+    def get_name(self):
+        return self.name
+
+    def get_state(self):
+        return self.state
+
+    def to_dict(self):
+        return {"name": self.name, "state": self.state}
+
+
+class FakeSite:
+    def __init__(self, hosts):
+        self.hosts = hosts
+
+    def get_hosts(self):
+        return {host.get_name(): host for host in self.hosts}
+
+
+class FakeResources:
+    def __init__(self, fablib):
+        self.fablib = fablib
+
+    def get_site(self, name):
+        return FakeSite(self.fablib.hosts.get(name, []))
+
+
+class FakeFablib:
+    """
+    Minimal stand-in for ``FablibManager`` creating :class:`FakeSlice` objects.
+
+    :param latency: Seconds to sleep per call, keyed by method name.
+    :type latency: dict
+    :param failures: Exceptions to raise, keyed by method name or (slice name, method name).
+    :type failures: dict
+    :param sites: Site dictionaries returned by ``list_sites(output="list")``.
+    :type sites: list[dict]
+    :param hosts: Site name to list of :class:`FakeHost`.
+    :type hosts: dict
+    """
+    def __init__(self, latency: dict = None, failures: dict = None, sites: list = None, hosts: dict = None):
+        self.latency = latency or {}
+        self.failures = failures or {}
+        self.probe = ConcurrencyProbe()
+        self.slices = {}
+        self.sites = sites or []
+        self.hosts = hosts or {}
+
+    def get_orchestrator_host(self):
+        return "orchestrator.fake"
+
+    def get_resources(self, update=False, **kwargs):
+        with self.probe.section("get_resources", self.latency.get("get_resources", 0.0)):
+            return FakeResources(self)
+
+    def list_sites(self, output=None, quiet=False, **kwargs):
+        with self.probe.section("list_sites", self.latency.get("list_sites", 0.0)):
+            return [dict(site) for site in self.sites]
+
+    def new_slice(self, name):
+        slice_obj = FakeSlice(self, name)
+        self.slices[name] = slice_obj
+        return slice_obj
+
+    def get_slices(self):
+        """Registry view: submitted slices that have not been deleted."""
+        with self.probe.section("get_slices", self.latency.get("get_slices", 0.0)):
+            return [s for s in self.slices.values() if s.slice_id is not None and s.state != "Dead"]
+
+
+class OfflineManager:
+    """
+    The few ``FablibManager`` attributes real fablib slices read while a topology is
+    built locally, without a FABRIC configuration.
+    """
+    FABNETV4_SUBNET = IPv4Network("10.128.0.0/10")
+    FABNETV6_SUBNET = IPv6Network("2602:fcfb::/40")
+    raise_on_not_found = False
+
+    def get_os_images(self):
+        return {}
+
+    def new_slice(self, name):
+        from fabrictestbed_extensions.fablib.slice import Slice
+        return Slice(fablib_manager=self, name=name)
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.aggregate import provision_aggregated
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.simulator import SimSiteSpec, SimulatedFablib
+from tests.teardown import delete_slices
+from tests.topology import ComponentSpec, NodeSpec, TopologyTemplate
+
+SITES = [SimSiteSpec(name=name, components={"NIC_Basic": 2}) for name in ("TACC", "STAR", "UTAH", "MASS", "MICH")]
+TEMPLATE = TopologyTemplate(nodes=(
+    NodeSpec(name="nic-node", components=(ComponentSpec(model="NIC_Basic", name="nic1"),)),
+))
+
+
+def test_members_share_slices_and_fail_alone():
+    fablib = SimulatedFablib(sites=SITES, site_failures={"UTAH": {"provision": 1.0}}, seed=1)
+    lifecycle = SliceLifecycle(poller=SlicePoller.for_fablib(fablib), on_event=None)
+    outcomes = provision_aggregated(lifecycle, fablib, TEMPLATE, {site.name: {"site": site.name} for site in SITES},
+                                    slice_prefix="test-agg", per_slice=2)
+
+    assert fablib.calls["submit"] == 3
+    assert {key for key, outcome in outcomes.items() if not outcome.ok} == {"UTAH"}
+    assert "Simulated provision failure at UTAH" in outcomes["UTAH"].error
+    # UTAH's slice partner MASS still came up and is usable under its own node name.
+    assert outcomes["MASS"].slice.get_name() == outcomes["UTAH"].slice.get_name()
+    assert outcomes["MASS"].state == "StableOK" and outcomes["UTAH"].state == "StableError"
+    assert "wait_ssh" in outcomes["MASS"].elapsed and "post_boot_config" in outcomes["MASS"].elapsed
+    node = outcomes["MASS"].slice.get_node("nic-node")
+    assert node.get_site() == "MASS" and node.execute("hostname", quiet=True)[0].strip()
+
+    # Deleting the passing members removes every slice but the one UTAH still holds.
+    passed = {key: o.slice for key, o in outcomes.items() if o.ok}
+    results = delete_slices(passed, quiet=True)
+    # Members sharing a slice name still get one result each.
+    assert list(results) == list(passed) and all(r.ok for r in results.values())
+    assert [s.get_name() for s in fablib.get_slices()] == [outcomes["UTAH"].slice.get_name()]
+    delete_slices({"UTAH": outcomes["UTAH"].slice}, quiet=True)
+    assert fablib.get_slices() == []
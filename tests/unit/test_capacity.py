@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.capacity import CapacityIndex, GPU_MODELS, capacity_index, component_field
+from tests.inventory import Inventory
+
+SITES = [
+    {"name": "TACC", "state": "Active", "hosts": 3, "nic_basic_capacity": 300, "nic_connectx_6_capacity": 4,
+     "nic_connectx_6_available": 0, "a30_capacity": 2, "tesla_t4_capacity": 4},
+    {"name": "STAR", "state": "Active", "hosts": 2, "nic_basic_capacity": 100, "nic_connectx_6_capacity": 2,
+     "nic_connectx_6_available": 2, "rtx6000_capacity": 1},
+    {"name": "EDUKY", "state": "Maint", "hosts": 2, "nic_basic_capacity": 50, "a30_capacity": 2},
+    {"name": "MICH", "state": "Active", "hosts": 1, "nic_basic_capacity": 50, "nvme_capacity": 4},
+]
+
+
+def make_index():
+    return CapacityIndex(Inventory(sites=SITES, hosts=[]))
+
+
+def test_component_field_names():
+    assert component_field("NVME_P4510") == "nvme_capacity"
+    assert component_field("NIC_ConnectX_6", available=True) == "nic_connectx_6_available"
+
+
+def test_sites_combines_requirements_and_skips_inactive_sites():
+    index = make_index()
+
+    assert index.sites() == ["TACC", "STAR", "MICH"]
+    assert index.sites(hosts=2, components={"NIC_Basic": 1}) == ["TACC", "STAR"]
+    assert index.sites(hosts=2, available={"NIC_ConnectX_6": 1}) == ["STAR"]
+    assert index.sites(components={"NVME_P4510": 2}) == ["MICH"]
+    assert index.sites(fields={"hosts": 2}, exclude=("TACC",)) == ["STAR"]
+    assert index.sites(components={"FPGA_Xilinx_U280": 1}) == []
+    assert [site["name"] for site in index.site_list(hosts=3)] == ["TACC"]
+
+
+def test_component_pairs_follow_site_order():
+    index = make_index()
+
+    assert index.component_pairs(GPU_MODELS) == [
+        ("TACC", "GPU_TeslaT4"), ("TACC", "GPU_A30"), ("STAR", "GPU_RTX6000"),
+    ]
+    assert index.component_pairs(["NIC_ConnectX_6"], minimum=2, available=True) == [("STAR", "NIC_ConnectX_6")]
+
+
+def test_queries_are_memoized_and_results_are_copies():
+    index = make_index()
+
+    first = index.sites(hosts=2)
+    first.append("BOGUS")
+    assert index.sites(hosts=2) == ["TACC", "STAR"]
+    assert len(index._queries) == 1
+
+
+def test_index_is_built_once_per_inventory():
+    inventory = Inventory(sites=SITES, hosts=[])
+
+    assert capacity_index(inventory) is capacity_index(inventory)
+    assert capacity_index(Inventory(sites=SITES, hosts=[])) is not capacity_index(inventory)
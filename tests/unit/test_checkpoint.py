@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.checkpoint import CONFIGURED, PROVISIONED, SweepCheckpoint, adopt_slices
+from tests.unit.fakes import FakeFablib
+
+
+def _submitted(fablib, name, state="StableOK"):
+    slice_obj = fablib.new_slice(name)
+    slice_obj.submit()
+    slice_obj.state = state
+    return slice_obj
+
+
+def test_checkpoint_persists_every_change(tmp_path):
+    path = str(tmp_path / "sweep.json")
+    checkpoint = SweepCheckpoint.load(path)
+    checkpoint.mark("iperf-w1-1", PROVISIONED, worker="w1", slice_id="a")
+    checkpoint.mark("iperf-w1-1", CONFIGURED)
+    checkpoint.set_plan([("iperf-w1-1", "iperf-w2-1"), ("iperf-w2-1", "iperf-w3-1")])
+    checkpoint.record_check("iperf-w1-1", "iperf-w2-1", "ping", "PASS")
+
+    reloaded = SweepCheckpoint.load(path)
+    assert reloaded.stages("iperf-w1-1") == {PROVISIONED, CONFIGURED}
+    assert reloaded.slice_info("iperf-w1-1")["worker"] == "w1"
+    pairs = reloaded.plan()
+    assert pairs == [("iperf-w1-1", "iperf-w2-1"), ("iperf-w2-1", "iperf-w3-1")]
+    assert reloaded.pending(pairs, "ping") == [("iperf-w2-1", "iperf-w3-1")]
+    assert reloaded.pending(pairs, "iperf3") == pairs
+    assert reloaded.plan(available={"iperf-w1-1", "iperf-w2-1"}) is None
+
+    reloaded.remove()
+    assert SweepCheckpoint.load(path).plan() is None
+
+
+def test_unreadable_checkpoint_starts_empty(tmp_path):
+    path = tmp_path / "sweep.json"
+    path.write_text('{"slices": {"iperf-w1')
+    checkpoint = SweepCheckpoint.load(str(path))
+    assert checkpoint.stages("iperf-w1-1") == set()
+    assert checkpoint.plan() is None
+
+
+def test_resume_adopts_healthy_slices_and_forgets_the_rest(tmp_path):
+    fablib = FakeFablib()
+    healthy = _submitted(fablib, "iperf-w1-1")
+    _submitted(fablib, "iperf-w2-1")
+    broken = _submitted(fablib, "iperf-w3-1", state="StableError")
+    _submitted(fablib, "mtu-w1-1")
+    _submitted(fablib, "iperf-w4-1").delete()
+
+    checkpoint = SweepCheckpoint.load(str(tmp_path / "sweep.json"))
+    checkpoint.mark("iperf-w1-1", PROVISIONED, worker="w1", slice_id=healthy.get_slice_id())
+    checkpoint.mark("iperf-w1-1", CONFIGURED)
+    checkpoint.mark("iperf-w3-1", PROVISIONED, worker="w3")
+    checkpoint.mark("iperf-w4-1", CONFIGURED, worker="w4")
+    checkpoint.record_check("iperf-w1-1", "iperf-w2-1", "ping", "PASS")
+    checkpoint.record_check("iperf-w1-1", "iperf-w3-1", "ping", "PASS")
+    checkpoint.record_check("iperf-w4-1", "iperf-w1-1", "ping", "PASS")
+
+    adopted, stale = adopt_slices(fablib, checkpoint, "iperf")
+
+    assert sorted(adopted) == ["iperf-w1-1", "iperf-w2-1"]
+    assert stale == [broken]
+    assert checkpoint.stages("iperf-w1-1") == {PROVISIONED, CONFIGURED}
+    assert checkpoint.stages("iperf-w2-1") == {PROVISIONED}
+    assert checkpoint.stages("iperf-w3-1") == checkpoint.stages("iperf-w4-1") == set()
+    pairs = [("iperf-w1-1", "iperf-w2-1"), ("iperf-w1-1", "iperf-w3-1"), ("iperf-w4-1", "iperf-w1-1")]
+    assert checkpoint.pending(pairs, "ping") == pairs[1:]
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from tests.fablib_pool import FablibPool
+
+
+class StandInFablib:
+    def __init__(self, fabric_rc):
+        time.sleep(0.05)
+        self.fabric_rc = fabric_rc
+        self.refreshes = 0
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_one_construction_per_fabric_rc_across_threads():
+    pool = FablibPool(factory=StandInFablib)
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        managers = list(executor.map(lambda i: pool.get("rc-a" if i % 2 else "rc-b"), range(64)))
+
+    assert pool.constructions == 2
+    assert len({id(m) for m in managers}) == 2
+    assert pool.get("rc-a").fabric_rc == "rc-a"
+
+
+def test_tokens_are_checked_after_interval():
+    refreshed = []
+    pool = FablibPool(factory=StandInFablib, token_check_interval=0.05, refresh_tokens=refreshed.append)
+
+    manager = pool.get()
+    pool.get()
+    assert refreshed == []
+
+    time.sleep(0.06)
+    assert pool.get() is manager
+    assert refreshed == [manager]
+
+
+def test_refresh_failure_keeps_manager():
+    def fail(fablib):
+        raise RuntimeError("credmgr unreachable")
+
+    pool = FablibPool(factory=StandInFablib, token_check_interval=0, refresh_tokens=fail)
+    manager = pool.get()
+
+    assert pool.get() is manager
+
+
+def test_discard_and_clear_close_managers():
+    pool = FablibPool(factory=StandInFablib)
+    first = pool.get("rc")
+    pool.discard("rc")
+    second = pool.get("rc")
+    pool.clear()
+
+    assert first.closed and second.closed
+    assert first is not second
+    assert pool.constructions == 2
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.history import DAY, ELAPSED, THROUGHPUT, HistoryStore, detect_regressions
+from tests.result_sink import ResultSink, make_record
+from tests.timing import PROVISIONING
+
+NOW = 1_760_000_000.0
+
+
+def iperf_record(run_id, ts, src, dst, gbps):
+    record = make_record("iperf_test_results", f"iperf-{src.lower()}-w1-{int(ts)}->iperf-{dst.lower()}-w1-{int(ts)}",
+                         {"status": "PASS", "src_site": src, "dst_site": dst, "received_bps": gbps * 1e9},
+                         stage="iperf3")
+    return {**record, "run_id": run_id, "ts": ts}
+
+
+def wait_record(run_id, ts, site, component, seconds):
+    record = make_record(PROVISIONING, site, {"site": site, "component": component, "ok": True, "started": 0.0,
+                                              "finished": seconds, ELAPSED: seconds}, stage="wait")
+    return {**record, "run_id": run_id, "ts": ts}
+
+
+def history(days=8):
+    """A week of steady daily runs followed by a run where TACC->STAR and NVMe at MICH got worse."""
+    records = []
+    for day in range(days):
+        run_id, ts = f"run{day}", NOW - (days - day) * DAY
+        records += [iperf_record(run_id, ts + i, "TACC", "STAR", 9 + i * 0.1) for i in range(3)]
+        records += [iperf_record(run_id, ts + i, "UTAH", "MASS", 4 + i * 0.1) for i in range(3)]
+        records += [wait_record(run_id, ts + i, "MICH", "NVMe", 100 + i) for i in range(3)]
+        records += [wait_record(run_id, ts + i, "TACC", "GPU", 200 + i) for i in range(3)]
+    records += [iperf_record("latest", NOW + i, "TACC", "STAR", 5.46) for i in range(3)]
+    records += [iperf_record("latest", NOW + i, "UTAH", "MASS", 3.9) for i in range(3)]
+    records += [wait_record("latest", NOW + i, "MICH", "NVMe", 230) for i in range(3)]
+    records += [wait_record("latest", NOW + i, "TACC", "GPU", 250) for i in range(3)]
+    return records
+
+
+def test_ingest_is_idempotent_and_queryable(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with ResultSink(path) as sink:
+        for record in history():
+            sink.write(record)
+
+    with HistoryStore(str(tmp_path / "history.sqlite")) as store:
+        assert store.ingest_file(path) == 108
+        assert store.ingest_file(path) == 0
+        assert [r["run_id"] for r in store.runs()][-2:] == ["run7", "latest"]
+        assert store.latest_run() == "latest"
+
+        series = store.series(THROUGHPUT, site="TACC", dst="STAR", since=NOW - DAY)
+        assert [round(v / 1e9, 1) for _, v in series] == [9.0, 9.1, 9.2, 5.5, 5.5, 5.5]
+        assert len(store.results(test=PROVISIONING, site="MICH", run_id="latest")) == 3
+        days = store.daily(ELAPSED, test=PROVISIONING, site="MICH", component="NVMe")
+        assert len(days) == 9 and days[0][1:] == (101, 3)
+
+
+def test_regressions_against_the_previous_week():
+    with HistoryStore(":memory:") as store:
+        store.ingest(history())
+        regressions = detect_regressions(store)
+
+    messages = sorted(r.message for r in regressions)
+    assert len(messages) == 2
+    assert messages[0].startswith("NVMe provisioning p90 doubled at MICH (wait: 230s vs 102s")
+    assert messages[1].startswith("TACC→STAR throughput dropped 40% vs 7-day median (5.46 Gbps vs 9.10 Gbps)")
+
+
+def test_no_regressions_without_enough_history():
+    with HistoryStore(":memory:") as store:
+        store.ingest(history(days=0))
+        assert detect_regressions(store) == []
+        assert detect_regressions(store, run_id="missing") == []
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+import os
+
+from tests.inventory import Inventory, load_inventory, cache_path
+from tests.unit.fakes import FakeFablib, FakeHost
+
+SITES = [
+    {"name": "TACC", "state": "Active", "hosts": 2, "nvme_capacity": 12, "nic_basic_capacity": 300},
+    {"name": "STAR", "state": "Active", "hosts": 1, "nvme_capacity": 0, "nic_basic_capacity": 100},
+    {"name": "EDUKY", "state": "Maint", "hosts": 1, "nvme_capacity": 4, "nic_basic_capacity": 50},
+]
+HOSTS = {
+    "TACC": [FakeHost("tacc-w1.fabric-testbed.net"), FakeHost("tacc-w2.fabric-testbed.net", state="Maint")],
+    "STAR": [FakeHost("star-w1.fabric-testbed.net")],
+}
+
+
+def make_fablib():
+    return FakeFablib(sites=SITES, hosts=HOSTS)
+
+
+def test_indexes_sites_hosts_and_fields():
+    inventory = Inventory.fetch(make_fablib())
+
+    assert [s["name"] for s in inventory.site_list(state="Active")] == ["TACC", "STAR"]
+    assert inventory.active_hosts("TACC") == ["tacc-w1.fabric-testbed.net"]
+    assert inventory.hosts["star-w1.fabric-testbed.net"]["site"] == "STAR"
+    assert sorted(inventory.sites_with("nvme_capacity", 2)) == ["EDUKY", "TACC"]
+    assert inventory.get_field("STAR", "nic_basic_capacity") == 100
+    assert inventory.get_field("STAR", "a30_capacity") == 0
+
+
+def test_snapshot_is_fetched_once_and_cached_on_disk(tmp_path):
+    fablib = make_fablib()
+
+    first = load_inventory(fablib, cache_dir=str(tmp_path), refresh=True)
+    second = load_inventory(fablib, cache_dir=str(tmp_path))
+
+    assert first is second
+    assert fablib.probe.calls["list_sites"] == 1
+    with open(cache_path(fablib, cache_dir=str(tmp_path))) as f:
+        assert len(json.load(f)["sites"]) == 3
+
+
+def test_disk_cache_is_reused_until_ttl_expires(tmp_path):
+    fablib = make_fablib()
+    inventory = Inventory.fetch(fablib)
+    inventory.fetched_at -= 100
+    path = cache_path(fablib, cache_dir=str(tmp_path))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(inventory.to_dict(), f)
+
+    fresh = FakeFablib(sites=SITES[:1], hosts=HOSTS)
+    cached = load_inventory(fresh, ttl=1000, cache_dir=str(tmp_path))
+    assert len(cached.sites) == 3
+    assert fresh.probe.calls["list_sites"] == 0
+
+    expired = load_inventory(fresh, ttl=50, cache_dir=str(tmp_path))
+    assert list(expired.sites) == ["TACC"]
+    assert fresh.probe.calls["list_sites"] == 1
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+
+from tests.iperf import INTER_SITE, INTRA_SITE, evaluate, iperf_client_command, link_class, parse_iperf_json
+
+
+def stream_interval(socket, start, bps, rtt):
+    return {"socket": socket, "start": start, "end": start + 1, "seconds": 1, "bytes": bps / 8,
+            "bits_per_second": bps, "retransmits": 1, "rtt": rtt, "omitted": False}
+
+
+def report(bps_per_stream=(3e9, 2e9), error=None):
+    sockets = [5 + i for i in range(len(bps_per_stream))]
+    intervals = []
+    for start in range(2):
+        streams = [stream_interval(s, start, bps, 900 + s) for s, bps in zip(sockets, bps_per_stream)]
+        intervals.append({"streams": streams, "sum": {"start": start, "end": start + 1, "seconds": 1,
+                                                      "bits_per_second": sum(bps_per_stream),
+                                                      "retransmits": len(streams), "omitted": False}})
+    data = {
+        "start": {"test_start": {"protocol": "TCP", "num_streams": len(sockets)}},
+        "intervals": intervals,
+        "end": {
+            "streams": [{"sender": {"socket": s, "bits_per_second": bps * 1.01, "retransmits": 2,
+                                    "min_rtt": 800, "mean_rtt": 1000 + 100 * i, "max_rtt": 1500},
+                         "receiver": {"socket": s, "bits_per_second": bps}}
+                        for i, (s, bps) in enumerate(zip(sockets, bps_per_stream))],
+            "sum_sent": {"seconds": 2.0, "bits_per_second": sum(bps_per_stream) * 1.01, "retransmits": 4},
+            "sum_received": {"seconds": 2.0, "bits_per_second": sum(bps_per_stream)},
+            "cpu_utilization_percent": {"host_total": 35.5, "remote_total": 20.25},
+        },
+    }
+    if error:
+        data = {"start": {}, "intervals": [], "end": {}, "error": error}
+    return json.dumps(data)
+
+
+def test_parses_aggregate_stream_and_interval_metrics():
+    result = parse_iperf_json(report())
+
+    assert result.ok
+    assert result.received_bps == 5e9 and result.sent_bps == 5.05e9
+    assert result.retransmits == 4 and result.duration == 2.0
+    assert result.cpu_local == 35.5 and result.cpu_remote == 20.25
+    assert result.mean_rtt_us == 1050
+    assert [s.socket for s in result.streams] == [5, 6]
+    assert result.streams[1].received_bps == 2e9 and result.streams[1].max_rtt_us == 1500
+    assert [i.rtt_us for i in result.streams[0].intervals] == [905, 905]
+    assert [i.bits_per_second for i in result.intervals] == [5e9, 5e9]
+    assert result.summary()["streams"] == 2
+
+
+def test_iperf_and_transport_errors_are_reported():
+    assert parse_iperf_json(report(error="the server is busy running a test")).error == \
+        "the server is busy running a test"
+    assert "Cannot connect" in parse_iperf_json("docker: Cannot connect to the Docker daemon").error
+    assert parse_iperf_json("").error == "invalid iperf3 JSON output: empty"
+    for text in ("null", "42", '["wrapped"]'):
+        assert parse_iperf_json(text).error == f"iperf3 JSON output is not a report: {text}"
+
+
+def test_thresholds_per_link_class():
+    result = parse_iperf_json(report(bps_per_stream=(1e9, 1e9)))
+
+    assert link_class("TACC", "TACC") == INTRA_SITE and link_class("TACC", "STAR") == INTER_SITE
+    assert evaluate(result, INTER_SITE) is None
+    assert evaluate(result, INTRA_SITE) == "2.00 Gbps below 5.00 Gbps for intra-site"
+    assert evaluate(result, INTRA_SITE, thresholds={INTRA_SITE: 1e9}) is None
+    assert evaluate(parse_iperf_json("{}"), INTER_SITE) == "iperf3 report has no end section"
+
+
+def test_client_command_requests_json():
+    assert iperf_client_command("10.0.0.1", duration=30).endswith("-t 30 -i 10 -O 10 --json")
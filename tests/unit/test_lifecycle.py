@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+
+from tests.lifecycle import SliceLifecycle, split_outcomes, BUILD, SUBMIT, WAIT, WAIT_SSH, POST_BOOT_CONFIG, COMPLETED
+from tests.unit.fakes import FakeFablib
+
+LATENCY = {SUBMIT: 0.02, WAIT: 0.2, WAIT_SSH: 0.05, POST_BOOT_CONFIG: 0.05}
+
+
+def make_builders(fablib, count, build_latency=0.01):
+    def builder(name):
+        def build():
+            with fablib.probe.section(BUILD, build_latency):
+                slice_obj = fablib.new_slice(name=name)
+                slice_obj.add_node(name="node1", site="SITE")
+                return slice_obj
+        return build
+
+    return {f"site{i}": builder(f"slice{i}") for i in range(count)}
+
+
+def test_only_build_is_serialized():
+    fablib = FakeFablib(latency=LATENCY)
+    lifecycle = SliceLifecycle(lock=threading.Lock(), max_workers=8)
+
+    start = time.monotonic()
+    outcomes = lifecycle.run(make_builders(fablib, 8))
+    elapsed = time.monotonic() - start
+
+    assert all(o.ok for o in outcomes.values())
+    assert all(o.slice.get_state() == "StableOK" for o in outcomes.values())
+    assert fablib.probe.peak[BUILD] == 1
+    assert fablib.probe.peak[WAIT] > 1
+    serial = 8 * (sum(LATENCY.values()) + 0.01)
+    assert elapsed < serial / 2
+
+
+def test_stage_limits_are_respected():
+    fablib = FakeFablib(latency=LATENCY)
+    lifecycle = SliceLifecycle(max_workers=8, stage_limits={WAIT: 2, SUBMIT: 1})
+
+    outcomes = lifecycle.run(make_builders(fablib, 6))
+
+    assert len(outcomes) == 6
+    assert fablib.probe.peak[WAIT] <= 2
+    assert fablib.probe.peak[SUBMIT] == 1
+
+
+def test_failures_are_isolated_per_slice():
+    fablib = FakeFablib(latency=LATENCY, failures={("slice1", SUBMIT): RuntimeError("no capacity"),
+                                                   ("slice2", WAIT): RuntimeError("StableError")})
+    lifecycle = SliceLifecycle(max_workers=4)
+
+    outcomes = lifecycle.run(make_builders(fablib, 4))
+    slices, failures = split_outcomes(outcomes)
+
+    assert outcomes["site1"].stage == SUBMIT and not outcomes["site1"].ok
+    assert outcomes["site2"].stage == WAIT and outcomes["site2"].error == "StableError"
+    assert set(failures) == {"site1"}
+    assert set(slices) == {"site0", "site2", "site3"}
+
+
+def test_configure_disabled_stops_after_submit():
+    fablib = FakeFablib(latency=LATENCY)
+    lifecycle = SliceLifecycle(configure=False)
+
+    outcomes = lifecycle.run(make_builders(fablib, 3))
+
+    assert all(o.stage == SUBMIT and o.submitted for o in outcomes.values())
+    assert fablib.probe.calls[WAIT] == 0
+
+
+def test_configure_slices_reports_events_and_state():
+    fablib = FakeFablib(latency=LATENCY)
+    slices = {}
+    for i in range(4):
+        slices[f"site{i}"] = fablib.new_slice(name=f"slice{i}")
+        slices[f"site{i}"].submit(wait=False)
+    events = []
+    lifecycle = SliceLifecycle(max_workers=4, on_event=events.append)
+
+    start = time.monotonic()
+    outcomes = lifecycle.configure_slices(slices)
+    elapsed = time.monotonic() - start
+
+    assert {o.state for o in outcomes.values()} == {"StableOK"}
+    assert elapsed < 2 * (LATENCY[WAIT] + LATENCY[WAIT_SSH] + LATENCY[POST_BOOT_CONFIG])
+    completed = [(e.key, e.stage) for e in events if e.status == COMPLETED]
+    assert len(completed) == 4 * 3
+    assert all(e.total >= e.elapsed for e in events)
+
+
+def test_configure_timeout_is_per_slice():
+    fablib = FakeFablib(latency={WAIT: 0.3})
+    slice_obj = fablib.new_slice(name="slow")
+    slice_obj.submit(wait=False)
+    lifecycle = SliceLifecycle(timeout=0.1, on_event=None)
+
+    outcome = lifecycle.configure_slice("slow", slice_obj)
+
+    assert isinstance(outcome.exception, TimeoutError)
+    assert outcome.stage == WAIT_SSH
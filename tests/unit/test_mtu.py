@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from functools import partial
+
+from tests.mtu import MtuCache, MtuPipeline, discover_matrix, format_matrix, parse_pings, probe_matrix, probe_source
+from tests.simulator import Constant, SimSiteSpec, SimulatedFablib
+
+PASS = """4 packets transmitted, 4 received, 0% packet loss, time 601ms
+rtt min/avg/max/mdev = 41.9/42.4/43.0/0.4 ms
+"""
+LOSS = "4 packets transmitted, 0 received, +4 errors, 100% packet loss, time 3054ms\n"
+
+
+def test_parse_pings_reads_loss_and_rtt_per_output():
+    assert parse_pings([PASS, LOSS, "ping: connect: Network is unreachable\n", ""]) == \
+        [(True, 42.4), (False, None), (False, None), (False, None)]
+
+
+def fabnet_nodes(mtus: dict):
+    sites = [SimSiteSpec(name=name, mtu=mtu, components={"NIC_Basic": 2}) for name, mtu in mtus.items()]
+    fablib = SimulatedFablib(sites=sites, latency={"execute": Constant(0)})
+    nodes, addrs = {}, {}
+    for site in fablib.site_names():
+        slice_obj = fablib.new_slice(f"mtu@{site}")
+        node = slice_obj.add_node(name="node", site=site)
+        node.add_fabnet(net_type="IPv4")
+        node.add_fabnet(net_type="IPv6")
+        slice_obj.submit()
+        nodes[site] = node
+        addrs[site] = {af: node.get_interface(network_name=f"FABNET_IPv{af}_{site}").get_ip_addr() for af in (4, 6)}
+    return fablib, nodes, addrs
+
+
+def test_probe_matrix_sweeps_each_source_once():
+    fablib, nodes, addrs = fabnet_nodes({"TACC": 9000, "STAR": 9000, "GPN": 1500})
+
+    matrix = probe_matrix(nodes, addrs, [1500, 8948, 9000])
+
+    assert fablib.calls["execute"] == 3
+    assert len(matrix) == 3 * 3 * 2
+    assert matrix[("TACC", "STAR", 4)].mtu == 9000 and matrix[("TACC", "STAR", 6)].rtt_ms > 0
+    assert matrix[("STAR", "GPN", 6)].mtu == 1500
+    table = format_matrix(matrix, ["TACC", "STAR", "GPN"], 4).splitlines()
+    assert table[2].startswith("TACC     | 9000   0 | 9000 ")
+    assert table[4].startswith("GPN      | 1500 ")
+
+
+def test_discovery_bisects_exact_mtus_and_confirms_cached_ones(tmp_path):
+    fablib, nodes, addrs = fabnet_nodes({"TACC": 9000, "STAR": 8948, "GPN": 1500})
+    cache = MtuCache(str(tmp_path / "mtu.json"))
+
+    matrix = discover_matrix(nodes, addrs, cache=cache)
+    cache.save()
+
+    assert {key: cell.mtu for key, cell in matrix.items() if key[2] == 4} == {
+        (src, dst, 4): min(mtu for site, mtu in (("TACC", 9000), ("STAR", 8948), ("GPN", 1500)) if site in (src, dst))
+        for src in nodes for dst in nodes}
+    # Both ends first, then bisection over 1281..8999
+    assert max(cell.probes for cell in matrix.values()) <= 2 + 13
+    assert fablib.calls["execute"] <= 3 * (1 + 13)
+
+    calls = fablib.calls["execute"]
+    rerun = discover_matrix(nodes, addrs, cache=MtuCache.load(cache.path))
+    assert {key: cell.mtu for key, cell in rerun.items()} == {key: cell.mtu for key, cell in matrix.items()}
+    assert fablib.calls["execute"] - calls == 3
+    assert all(cell.probes <= 2 for cell in rerun.values())
+
+    # A path whose MTU changed since the cached run is searched again
+    fablib.sites["STAR"].mtu = 9000
+    changed = discover_matrix(nodes, addrs, cache=MtuCache.load(cache.path))
+    assert changed[("TACC", "STAR", 6)].mtu == 9000 and changed[("GPN", "STAR", 6)].mtu == 1500
+
+
+def test_pipeline_probes_each_path_once_as_sites_arrive():
+    fablib, nodes, addrs = fabnet_nodes({"TACC": 9000, "STAR": 8948, "GPN": 1500})
+    pipeline = MtuPipeline(partial(probe_source, mtus=[1500, 8948, 9000]))
+
+    # Sites come up one after the other; the third never does.
+    pipeline.add("TACC", nodes["TACC"], addrs["TACC"])
+    pipeline.add("STAR", nodes["STAR"], addrs["STAR"])
+    pipeline.fail("GPN", "Insufficient resources")
+    matrix = pipeline.result()
+
+    # TACC->{TACC}, then STAR->{TACC, STAR} and TACC->{STAR}
+    assert fablib.calls["execute"] == 3
+    assert len(matrix) == 3 * 3 * 2
+    assert matrix[("TACC", "TACC", 4)].mtu == 9000 and matrix[("STAR", "TACC", 6)].mtu == 8948
+    assert matrix[("TACC", "STAR", 4)].mtu == 8948
+    assert matrix[("GPN", "TACC", 4)].error == matrix[("STAR", "GPN", 6)].error == "Insufficient resources"
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import itertools
+import random
+import threading
+import time
+from collections import defaultdict
+
+from tests.pair_scheduler import run_pairs, run_rounds, schedule_rounds
+
+
+def max_degree(pairs):
+    degree = defaultdict(int)
+    for a, b in pairs:
+        degree[a] += 1
+        degree[b] += 1
+    return max(degree.values(), default=0)
+
+
+def assert_matchings(rounds):
+    for round_pairs in rounds:
+        nodes = [node for pair in round_pairs for node in pair]
+        assert len(nodes) == len(set(nodes))
+
+
+def test_complete_graph_needs_at_most_max_degree_plus_one_rounds():
+    pairs = list(itertools.combinations(range(12), 2))
+    rounds = schedule_rounds(pairs)
+
+    assert_matchings(rounds)
+    assert sorted(p for r in rounds for p in r) == pairs
+    assert len(rounds) <= max_degree(pairs) + 1
+
+
+def test_random_graphs_are_coloured_with_max_degree_plus_one_rounds():
+    rng = random.Random(7)
+    for _ in range(200):
+        nodes = range(rng.randint(2, 30))
+        pairs = [pair for pair in itertools.combinations(nodes, 2) if rng.random() < 0.3]
+        rounds = schedule_rounds(pairs)
+        assert_matchings(rounds)
+        assert sum(len(r) for r in rounds) == len(pairs)
+        assert len(rounds) <= max_degree(pairs) + 1
+
+
+def test_self_duplicate_and_reverse_pairs_are_dropped():
+    rounds = schedule_rounds([("a", "b"), ("b", "a"), ("a", "a"), ("a", "b"), ("b", "c")])
+    assert sorted(p for r in rounds for p in r) == [("a", "b"), ("b", "c")]
+
+
+def test_node_key_maps_endpoints_to_nodes():
+    pairs = [("x1", "y1"), ("x2", "z1")]
+    rounds = schedule_rounds(pairs, node_key=lambda endpoint: endpoint[0])
+    assert len(rounds) == 2
+
+
+def test_run_rounds_never_overlaps_a_node_and_runs_rounds_concurrently():
+    pairs = list(itertools.combinations("abcdef", 2))
+    lock = threading.Lock()
+    active = defaultdict(int)
+    overlap = []
+    peak = [0, 0]
+
+    def measure(src, dst):
+        with lock:
+            for node in (src, dst):
+                active[node] += 1
+                if active[node] > 1:
+                    overlap.append(node)
+            peak[0] += 1
+            peak[1] = max(peak)
+        time.sleep(0.02)
+        with lock:
+            active[src] -= 1
+            active[dst] -= 1
+            peak[0] -= 1
+        if (src, dst) == ("a", "b"):
+            raise RuntimeError("boom")
+        return f"{src}->{dst}"
+
+    results = run_rounds(pairs, measure, max_workers=8)
+
+    assert not overlap
+    assert peak[1] == 3
+    assert isinstance(results[("a", "b")], RuntimeError)
+    assert results[("e", "f")] == "e->f"
+
+
+def test_run_pairs_runs_everything_concurrently():
+    start = time.monotonic()
+    results = run_pairs([(i, i + 1) for i in range(10)], lambda a, b: time.sleep(0.1) or a + b, max_workers=10)
+    assert time.monotonic() - start < 0.5
+    assert results[(3, 4)] == 7
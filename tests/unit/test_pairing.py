@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import datetime
+from itertools import combinations
+
+from tests.history import DAY, HistoryStore
+from tests.pairing import coverage_days, iter_pairs, pair_count, plan_pairs, sample_pairs, unrank_pair
+from tests.result_sink import make_record
+
+DAY0 = datetime.date(2026, 3, 2)
+SITES = [f"SITE{i:02d}" for i in range(13)]
+
+
+def test_unrank_matches_combinations():
+    for n in (2, 3, 7, 40):
+        assert [unrank_pair(i, n) for i in range(pair_count(n))] == list(combinations(range(n), 2))
+
+
+def test_rotation_covers_every_link_within_its_period():
+    period = coverage_days(len(SITES), len(SITES) // 2)
+    seen = set()
+    for day in range(period):
+        pairs = plan_pairs(SITES, day=DAY0 + datetime.timedelta(days=day))
+        assert len(pairs) == len(SITES) // 2 and len(set(pairs)) == len(pairs)
+        seen.update(pairs)
+    assert seen == set(combinations(SITES, 2))
+
+    # A coverage target raises the daily count.
+    assert len(plan_pairs(SITES, day=DAY0, days=7)) == 12
+
+
+def test_plan_is_reproducible_from_the_date():
+    assert plan_pairs(SITES, day="2026-03-02") == plan_pairs(list(reversed(SITES)), day=DAY0)
+    assert plan_pairs(SITES, day=DAY0) != plan_pairs(SITES, day=DAY0 + datetime.timedelta(days=1))
+    assert plan_pairs(SITES, day=DAY0, salt="v4") != plan_pairs(SITES, day=DAY0, salt="v6")
+
+
+def test_large_endpoint_sets_are_cheap():
+    workers = [f"w{i:05d}" for i in range(5000)]
+    pairs = plan_pairs(workers, day=DAY0)
+    assert len(pairs) == 2500 and all(a < b for a, b in pairs)
+
+
+def test_recent_failures_are_retested(tmp_path):
+    now = 1_760_000_000.0
+    with HistoryStore(str(tmp_path / "history.sqlite")) as store:
+        records = [make_record("ping", "SITE00->SITE01", "FAIL: 100% loss"),
+                   make_record("ping", "SITE00->SITE01", "FAIL: 100% loss"),
+                   make_record("ping", "SITE03->SITE02", "FAIL: 100% loss"),
+                   make_record("ping", "SITE04->SITE05", "PASS")]
+        ages = (0, 1, 20, 0)
+        store.ingest([{**record, "ts": now - age * DAY} for record, age in zip(records, ages)])
+        failures = store.link_failures("ping", now=now)
+    assert set(failures) == {("SITE00", "SITE01")}
+    assert 1.9 < failures[("SITE00", "SITE01")] < 2
+
+    pairs = plan_pairs(SITES, day=DAY0, failures=failures)
+    assert ("SITE00", "SITE01") in pairs and len(pairs) == len(set(pairs)) == len(SITES) // 2 + 1
+
+    # Failures keyed by site map onto that site's workers.
+    workers = [f"{site}-w{i}" for site in SITES[:4] for i in (1, 2)]
+    pairs = plan_pairs(workers, per_day=1, day=DAY0, failures={("SITE02", "SITE03"): 1.0, ("SITE00", "SITE01"): 0.5},
+                       retest=2,
+                       site_of=lambda worker: worker.split("-")[0])
+    assert len(pairs) == 3
+    assert {frozenset(endpoint.split("-")[0] for endpoint in pair) for pair in pairs[1:]} == \
+        {frozenset(("SITE00", "SITE01")), frozenset(("SITE02", "SITE03"))}
+
+
+def test_lazy_sampling_honors_constraints():
+    assert sorted(iter_pairs(SITES, seed=1)) == list(combinations(SITES, 2))
+    assert sample_pairs(SITES, 5, seed=1) == sample_pairs(SITES, 5, seed=1) != sample_pairs(SITES, 5, seed=2)
+
+    workers = [f"{site}-w{i}" for site in SITES for i in range(3)]
+    pairs = sample_pairs(workers, 100, seed=3, site_of=lambda worker: worker.split("-")[0],
+                         distinct_sites=True, distinct_workers=True, avoid=["SITE00"])
+    used = [worker for pair in pairs for worker in pair]
+    # A greedy matching of the 36 workers left: at most 18 pairs, never fewer than half.
+    assert 9 <= len(pairs) <= 18 and len(used) == len(set(used))
+    assert all(a.split("-")[0] != b.split("-")[0] for a, b in pairs)
+    assert not any(worker.startswith("SITE00") for worker in used)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+
+import pytest
+
+from tests.lifecycle import SliceLifecycle, WAIT
+from tests.poller import SlicePoller, SliceStateError, query_slice_states
+from tests.simulator import Constant, SimSiteSpec, SimulatedFablib
+from tests.unit.fakes import FakeFablib
+
+FAST = {"Nascent": 0.02, "Configuring": 0.01}
+
+
+class Orchestrator:
+    """
+    Batched state query whose slices move through ``states`` one step per query
+    (the last state sticks); counts the queries it serves.
+    """
+    def __init__(self, states: dict[str, list[str]]):
+        self.states = {slice_id: list(path) for slice_id, path in states.items()}
+        self.queries = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, slice_ids):
+        with self.lock:
+            self.queries += 1
+            result = {}
+            for slice_id in slice_ids:
+                path = self.states.get(slice_id)
+                if path:
+                    result[slice_id] = path.pop(0) if len(path) > 1 else path[0]
+            return result
+
+
+def make_poller(query, **kwargs):
+    return SlicePoller(query, intervals=FAST, default_interval=0.01, max_interval=0.05, **kwargs)
+
+
+def test_one_query_per_round_for_all_slices():
+    path = ["Nascent", "Configuring", "Configuring", "Configuring", "StableOK"]
+    query = Orchestrator({f"s{i}": path for i in range(50)})
+    poller = make_poller(query)
+
+    futures = [poller.watch(f"s{i}", timeout=10) for i in range(50)]
+    assert [f.result(timeout=10) for f in futures] == ["StableOK"] * 50
+    assert query.queries == poller.rounds
+    assert poller.rounds < 3 * len(path)
+    assert poller.outstanding() == 0
+    poller.stop()
+
+
+def test_failed_missing_and_timed_out_slices():
+    query = Orchestrator({"bad": ["Configuring", "StableError"], "slow": ["Configuring"], "ok": ["StableOK"]})
+    poller = make_poller(query)
+
+    bad = poller.watch("bad")
+    gone = poller.watch("gone")
+    slow = poller.watch("slow", timeout=0.2)
+    ok = poller.watch("ok")
+
+    assert ok.result(timeout=5) == "StableOK"
+    with pytest.raises(SliceStateError) as e:
+        bad.result(timeout=5)
+    assert e.value.state == "StableError"
+    with pytest.raises(SliceStateError) as e:
+        gone.result(timeout=5)
+    assert e.value.state == "Dead"
+    with pytest.raises(TimeoutError):
+        slow.result(timeout=5)
+    poller.stop()
+
+
+def test_intervals_back_off_while_state_is_unchanged():
+    query = Orchestrator({"s": ["Configuring"]})
+    poller = SlicePoller(query, intervals={"Configuring": 0.01}, backoff=2.0, max_interval=10.0)
+
+    future = poller.watch("s", timeout=0.5)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=5)
+    # 0.01 doubling: polls at roughly 0, .01, .03, .07, .15, .31 and one at the deadline
+    assert poller.rounds <= 8
+    poller.stop()
+
+
+def test_timeout_fires_on_the_round_a_state_change_is_seen():
+    query = Orchestrator({"s": ["Nascent", "Configuring"] * 100})
+    poller = SlicePoller(query, intervals={"Nascent": 10.0, "Configuring": 10.0})
+
+    future = poller.watch("s", timeout=0.2)
+    with pytest.raises(TimeoutError):
+        future.result(timeout=5)
+    # one round at the start and one at the deadline, although the state changed in both
+    assert poller.rounds == 2
+    poller.stop()
+
+
+def test_lifecycle_waits_through_shared_poller():
+    fablib = FakeFablib()
+    query = Orchestrator({})
+
+    def build(name):
+        def builder():
+            slice_obj = fablib.new_slice(name=name)
+            slice_obj.add_node(name="node1", site="SITE")
+            return slice_obj
+        return builder
+
+    def states(slice_ids):
+        for slice_id in slice_ids:
+            query.states.setdefault(slice_id, ["Configuring", "Configuring", "StableOK"])
+        return query(slice_ids)
+
+    poller = make_poller(states)
+    lifecycle = SliceLifecycle(lock=threading.Lock(), poller=poller, on_event=None)
+    start = time.monotonic()
+    outcomes = lifecycle.run({f"site{i}": build(f"slice{i}") for i in range(20)})
+
+    assert all(o.ok for o in outcomes.values())
+    assert all(WAIT in o.elapsed for o in outcomes.values())
+    assert fablib.probe.calls["wait"] == 0
+    assert fablib.probe.calls["update"] == 20
+    assert query.queries == poller.rounds < 20
+    assert time.monotonic() - start < 5
+    poller.stop()
+
+
+def test_query_pages_until_every_wanted_slice_is_seen():
+    fablib = SimulatedFablib(sites=[SimSiteSpec(name="TACC", components={"NIC_Basic": 500})],
+                             latency={"list_slices": Constant(0), "submit": Constant(0)}, seed=0)
+    slice_ids = []
+    for i in range(450):
+        slice_obj = fablib.new_slice(f"page-{i}")
+        slice_obj.add_node(name="node", site="TACC")
+        slice_ids.append(slice_obj.submit(wait=False))
+
+    # Two slices on the third page of 200
+    states = query_slice_states(fablib, slice_ids[-2:])
+    assert set(states) == set(slice_ids[-2:])
+    assert fablib.calls["list_slices"] == 3
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import subprocess
+import time
+
+from tests.remote import execute_batch
+from tests.ssh_pool import SSHPool
+from tests.unit.fakes import FakeFablib, FakeTransport
+
+
+class LocalNode:
+    """Runs commands in a local shell, counting round-trips."""
+    def __init__(self):
+        self.calls = 0
+
+    def execute(self, command, quiet=False, **kwargs):
+        self.calls += 1
+        proc = subprocess.run(command, shell=True, capture_output=True, text=True)
+        return proc.stdout, proc.stderr
+
+
+def test_batch_demultiplexes_output_per_command_in_one_call():
+    node = LocalNode()
+    results = execute_batch(node, [
+        "echo hello",
+        "echo oops >&2; exit 3",
+        "printf 'no newline'",
+        "echo 'quoted \"$HOME\"' | tr a-z A-Z",
+    ])
+
+    assert node.calls == 1
+    assert [r.exit_code for r in results] == [0, 3, 0, 0]
+    assert results[0].stdout == "hello\n" and results[0].stderr == ""
+    assert results[1].stderr == "oops\n" and not results[1].ok
+    assert results[2].stdout == "no newline"
+    assert results[3].stdout.startswith("QUOTED ")
+
+
+def test_stop_on_error_skips_remaining_commands():
+    node = LocalNode()
+    results = execute_batch(node, ["true", "false", "echo never"], stop_on_error=True)
+
+    assert [r.exit_code for r in results] == [0, 1, None]
+    assert results[2].stdout == ""
+
+
+def test_commands_do_not_share_shell_state():
+    results = execute_batch(LocalNode(), ["cd / && X=1 && pwd", "echo ${X:-unset}", "cat"])
+
+    assert results[0].stdout == "/\n"
+    assert results[1].stdout == "unset\n"
+    assert results[2].ok and results[2].stdout == ""
+
+
+def test_empty_batch_does_not_contact_node():
+    node = LocalNode()
+    assert execute_batch(node, []) == []
+    assert node.calls == 0
+
+
+class LocalShellTransport(FakeTransport):
+    def run(self, handle, command, timeout=None):
+        proc = subprocess.run(command, shell=True, capture_output=True, text=True, timeout=timeout)
+        return proc.stdout, proc.stderr
+
+
+def test_batches_reuse_a_pooled_session():
+    transport = LocalShellTransport()
+    pool = SSHPool(transport=transport)
+    slice_obj = FakeFablib().new_slice("batch")
+    node = slice_obj.add_node("node")
+
+    first = execute_batch(node, ["echo one"], pool=pool)
+    second = execute_batch(node, ["echo two", "exit 4"], pool=pool)
+
+    assert first[0].stdout == "one\n"
+    assert [r.exit_code for r in second] == [0, 4]
+    assert len(transport.opened) == 1 and pool.stats.reused == 1
+
+
+def test_parallel_batch_overlaps_commands_and_keeps_order():
+    node = LocalNode()
+    start = time.monotonic()
+    results = execute_batch(node, ["sleep 0.3; echo a", "sleep 0.3; echo b >&2; exit 2", "echo c"] * 2, parallel=6)
+    elapsed = time.monotonic() - start
+
+    assert node.calls == 1 and elapsed < 0.9
+    assert [r.stdout for r in results] == ["a\n", "", "c\n"] * 2
+    assert [r.exit_code for r in results] == [0, 2, 0] * 2
+    assert results[1].stderr == "b\n"
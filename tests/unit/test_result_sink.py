@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from tests.result_sink import (FAIL, PASS, ResultSink, StreamingResults, compact, make_record, read_records,
+                               validate_record)
+from tests.utils import save_results_json
+
+
+def test_records_carry_outcome_error_and_slice_id():
+    record = make_record("nvme", "TACC", {"state": False, "error": "no NVMe", "slice_id": "s/123"})
+    assert (record["outcome"], record["error"], record["slice_id"]) == (FAIL, "no NVMe", "s/123")
+
+    assert make_record("iperf", "a->b", {"ping": "PASS", "iperf3": "FAIL: slow"})["outcome"] == FAIL
+    assert make_record("iperf", "a->b", "PASS", stage="ping", timings={"ping": 1.5})["outcome"] == PASS
+
+
+def test_invalid_records_are_rejected():
+    record = make_record("nvme", "TACC", {"state": True})
+    with pytest.raises(ValueError):
+        validate_record({**record, "outcome": "MAYBE"})
+    with pytest.raises(ValueError):
+        validate_record({k: v for k, v in record.items() if k != "test"})
+    with pytest.raises(ValueError):
+        validate_record({**record, "extra": 1})
+
+
+def test_records_are_written_in_batches(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.jsonl"), batch_size=3, flush_interval=3600)
+    for i in range(4):
+        sink.write(make_record("t", i, {"state": True}))
+
+    assert sink.written == 3
+    assert len(list(read_records(sink.path))) == 3
+    sink.close()
+    assert [r["key"] for r in read_records(sink.path)] == ["0", "1", "2", "3"]
+
+
+def test_concurrent_writers_and_torn_last_line(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.jsonl"), batch_size=7)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda i: sink.write(make_record("t", i, {"state": True})), range(100)))
+    sink.close()
+    with open(sink.path, "a") as f:
+        f.write('{"schema": 1, "test": "t", "ke')
+
+    assert sorted(int(r["key"]) for r in read_records(sink.path)) == list(range(100))
+
+
+def test_streaming_results_compact_to_the_summary_format(tmp_path):
+    sink = ResultSink(str(tmp_path / "results.jsonl"), batch_size=1)
+    results = StreamingResults(str(tmp_path / "nvme.json"), sink=sink)
+    results["TACC"] = {"state": True, "error": ""}
+    results["STAR"] = {"state": True, "error": ""}
+    results.record("STAR", stage="validate", value="lspci ok")
+    results["STAR"] = {"state": False, "error": "NVME not detected", "slice_id": "x/1"}
+
+    # Streamed before save(): a crash here still leaves the records on disk
+    assert len(list(read_records(sink.path, test="nvme"))) == 4
+
+    summary = results.save()
+    with open(tmp_path / "nvme.json") as f:
+        assert json.load(f) == summary == dict(results)
+
+
+def test_compaction_uses_latest_run(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    with ResultSink(path) as sink:
+        sink.write({**make_record("gpu", "TACC", {"state": False}), "run_id": "old"})
+        sink.write({**make_record("gpu", "STAR", {"state": True}), "run_id": "new"})
+
+    assert compact(path, "gpu", str(tmp_path / "gpu.json")) == {"STAR": {"state": True}}
+    assert compact(path, "gpu", str(tmp_path / "gpu.json"), run_id="old") == {"TACC": {"state": False}}
+
+
+def test_save_reads_only_records_after_the_run_offset(tmp_path):
+    path = tmp_path / "results.jsonl"
+    # same run id, so only the offset keeps this record out of the summary
+    path.write_text(json.dumps(make_record("nvme", "OLD", {"state": True})) + "\n")
+    sink = ResultSink(str(path))
+    assert sink.run_offset == path.stat().st_size
+
+    results = StreamingResults(str(tmp_path / "nvme.json"), sink=sink)
+    results["TACC"] = {"state": True}
+    assert results.save() == {"TACC": {"state": True}}
+    assert [r["key"] for r in read_records(str(path))] == ["OLD", "TACC"]
+
+
+def test_save_results_json_streams_plain_dicts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    save_results_json({"iperf-a": "Insufficient resources"}, "slice_creation_failures.json")
+
+    with open(tmp_path / "slice_creation_failures.json") as f:
+        assert json.load(f) == {"iperf-a": "Insufficient resources"}
+    assert [r["test"] for r in read_records(str(tmp_path / "results.jsonl"))] == ["slice_creation_failures"]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.inventory import Inventory
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.result_sink import ResultSink
+from tests.rotation import ComponentRotation, skipped_result
+from tests.simulator import SimSiteSpec, SimulatedFablib
+from tests.timing import ATTACH, DETACH, ProvisioningTimer
+from tests.warm_pool import BASE_NODE, WarmPool
+
+SITES = [SimSiteSpec(name="TACC", components={"NIC_Basic": 2, "GPU_RTX6000": 1, "NVME_P4510": 1}),
+         SimSiteSpec(name="STAR", components={"NIC_Basic": 2, "NVME_P4510": 1})]
+
+
+def test_rotation_swaps_components_on_long_lived_vms(tmp_path):
+    fablib = SimulatedFablib(sites=SITES, seed=5)
+    poller = SlicePoller.for_fablib(fablib)
+    pool = WarmPool(fablib, poller=poller)
+    timer = ProvisioningTimer(sink=ResultSink(str(tmp_path / "results.jsonl")))
+    rotation = ComponentRotation(pool, SliceLifecycle(poller=poller, on_event=None), timer=timer,
+                                 inventory=Inventory.fetch(fablib))
+    # STAR's only NVMe is taken after the inventory snapshot.
+    hog = fablib.new_slice("hog")
+    hog.add_node(name="hog", site="STAR").add_component(model="NVME_P4510", name="nvme1")
+    hog.submit()
+
+    # STAR has no GPU and is skipped; its NVMe attach fails, the VM is restored and the rotation carries on.
+    results = rotation.run({"TACC": ["GPU_RTX6000", "NVME_P4510"], "STAR": ["GPU_RTX6000", "NVME_P4510"]})
+
+    assert fablib.calls["submit"] == 3
+    assert {key for key, info in results.items() if info["state"]} == {"TACC_GPU_RTX6000", "TACC_NVME_P4510",
+                                                                       "STAR_GPU_RTX6000"}
+    assert results["STAR_GPU_RTX6000"] == skipped_result("no GPU_RTX6000 on star-w1.fabric-testbed.net")
+    assert "NVME_P4510 at STAR" in results["STAR_NVME_P4510"]["error"]
+    assert results["TACC_GPU_RTX6000"]["attach"] > 0 and results["TACC_GPU_RTX6000"]["detach"] > 0
+    stages = sorted((t.key, t.stage, t.ok) for t in timer.timings)
+    assert ("TACC_NVME_P4510", ATTACH, True) in stages and ("TACC_NVME_P4510", DETACH, True) in stages
+    assert ("STAR_NVME_P4510", ATTACH, False) in stages and len(stages) == 5
+    # Both VMs are back to their base shape and stay in the pool.
+    for site in ("TACC", "STAR"):
+        node = pool.slices[site].get_node(BASE_NODE)
+        assert [c.get_name() for c in node.get_components()] == ["sharednic1"]
+    # With the NVMe held, a fresh snapshot skips it instead of failing.
+    rotation.inventory = Inventory.fetch(fablib)
+    results = rotation.rotate("STAR", ["NVME_P4510"])
+    assert results == {"STAR_NVME_P4510": skipped_result("no NVME_P4510 available on star-w1.fabric-testbed.net")}
+    hog.delete()
+    pool.close(quiet=True)
+    assert fablib.get_slices() == []
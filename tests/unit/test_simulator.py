@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import json
+
+import pytest
+
+from tests.iperf import iperf_client_command, parse_iperf_json
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.remote import execute_batch
+from tests.simulator import Constant, SimSiteSpec, SimulatedFablib
+from tests.teardown import DELETED, delete_slices
+
+SITES = [SimSiteSpec(name="TACC", components={"NIC_Basic": 4, "GPU_A30": 1}),
+         SimSiteSpec(name="STAR", components={"NIC_Basic": 4}, mtu=1500)]
+
+
+def fabnet_slice(fablib, site, model=None):
+    slice_obj = fablib.new_slice(f"sim-{site.lower()}")
+    node = slice_obj.add_node(name="node", site=site)
+    if model:
+        node.add_component(model=model, name="dev")
+    node.add_fabnet()
+    return slice_obj
+
+
+def provision(fablib, builders):
+    lifecycle = SliceLifecycle(poller=SlicePoller.for_fablib(fablib), on_event=None)
+    return lifecycle.run(builders)
+
+
+def test_lifecycle_and_teardown_run_against_the_simulator():
+    fablib = SimulatedFablib(sites=SITES, seed=3)
+    outcomes = provision(fablib, {site: lambda site=site: fabnet_slice(fablib, site) for site in ("TACC", "STAR")})
+
+    assert {key: o.state for key, o in outcomes.items()} == {"TACC": "StableOK", "STAR": "StableOK"}
+    assert fablib.list_sites()[0]["nic_basic_available"] == 3
+
+    results = delete_slices({k: o.slice for k, o in outcomes.items()}, quiet=True)
+    assert all(r.status == DELETED for r in results.values())
+    assert fablib.list_sites()[0]["nic_basic_available"] == 4
+    assert fablib.get_slices() == []
+
+
+def test_same_seed_draws_the_same_latencies_and_failures():
+    def draws(seed):
+        fablib = SimulatedFablib(sites=SITES, failures={"provision": 0.5}, time_scale=0.0001, seed=seed)
+        return [(fablib.latency("provision", site), fablib.fails("provision", site))
+                for site in ("TACC", "STAR") for _ in range(10)]
+
+    assert draws(1) == draws(1)
+    assert draws(1) != draws(2)
+    assert {failed for _, failed in draws(1)} == {True, False}
+
+
+def test_failures_and_capacity_shortfalls_end_in_stable_error():
+    fablib = SimulatedFablib(sites=SITES, site_failures={"STAR": {"provision": 1.0}}, seed=3)
+    outcomes = provision(fablib, {
+        "STAR": lambda: fabnet_slice(fablib, "STAR"),
+        "GPU": lambda: fabnet_slice(fablib, "STAR", model="GPU_A30"),
+    })
+
+    assert outcomes["STAR"].state == "StableError"
+    assert "Simulated provision failure at STAR" in outcomes["STAR"].error
+    assert "Insufficient resources: GPU_A30 at STAR" in outcomes["GPU"].error
+    with pytest.raises(Exception, match="not reachable"):
+        outcomes["STAR"].slice.get_node("node").execute("hostname", quiet=True)
+
+
+def test_nodes_answer_ping_iperf_lspci_and_batches():
+    fablib = SimulatedFablib(sites=SITES, latency={"execute": Constant(0)}, seed=3)
+    outcomes = provision(fablib, {"TACC": lambda: fabnet_slice(fablib, "TACC", model="GPU_A30"),
+                                  "STAR": lambda: fabnet_slice(fablib, "STAR")})
+    tacc = outcomes["TACC"].slice.get_node("node")
+    star_ip = outcomes["STAR"].slice.get_node("node").get_interface(network_name="FABNET_IPv4_STAR").get_ip_addr()
+
+    stdout, _ = tacc.execute(f"ping -c 3 {star_ip}", quiet=True)
+    assert "3 received, 0% packet loss" in stdout
+    # STAR's path MTU is 1500
+    stdout, _ = tacc.execute(f"ping -M do -s 1472 -c 1 {star_ip}\nping -M do -s 1473 -c 1 {star_ip}", quiet=True)
+    assert [line.split(", ")[2] for line in stdout.splitlines() if "packet loss" in line] == \
+        ["0% packet loss", "100% packet loss"]
+
+    result = parse_iperf_json(tacc.execute(iperf_client_command(star_ip), quiet=True)[0])
+    assert result.ok and 4.7 <= result.received_gbps <= 8
+    assert "unable to connect" in json.loads(tacc.execute("iperf3 -c 10.9.9.9 --json", quiet=True)[0])["error"]
+
+    results = execute_batch(tacc, ["lspci | grep -i 'nvidia|3D controller'", "false", "hostname"],
+                            stop_on_error=True)
+    assert "3D controller: NVIDIA" in results[0].stdout and results[0].exit_code == 0
+    assert [r.exit_code for r in results] == [0, 1, None]
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from tests.ssh_pool import ParamikoTransport, SSHPool
+from tests.unit.fakes import FakeFablib, FakeTransport
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_slice(name="iperf-a"):
+    slice_obj = FakeFablib().new_slice(name)
+    slice_obj.submit()
+    slice_obj.add_node("node")
+    return slice_obj
+
+
+def test_session_is_reused_across_node_objects_and_threads():
+    transport = FakeTransport(open_latency=0.05)
+    pool = SSHPool(transport=transport)
+    slice_obj = make_slice()
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        outputs = list(executor.map(lambda i: pool.execute(slice_obj.get_node("node"), f"echo {i}"), range(40)))
+
+    assert outputs[3] == ("node: echo 3", "")
+    assert len(transport.opened) == 1
+    assert pool.stats.opened == 1 and pool.stats.reused == 39
+    assert pool.stats.to_dict()["reuse_ratio"] == 0.975
+
+
+def test_sessions_are_keyed_by_slice_and_node():
+    transport = FakeTransport()
+    pool = SSHPool(transport=transport)
+    first, second = make_slice("a"), make_slice("b")
+
+    pool.execute(first.get_node("node"), "true")
+    pool.execute(second.get_node("node"), "true")
+    pool.execute(first.get_node("node"), "true")
+
+    assert len(transport.opened) == 2
+    pool.close(first.get_slice_id())
+    assert pool.size() == 1
+    pool.close()
+    assert pool.size() == 0 and len(transport.closed) == 2
+
+
+def test_dead_session_is_replaced_by_health_check_or_on_failure():
+    clock = Clock()
+    transport = FakeTransport()
+    pool = SSHPool(transport=transport, health_check_interval=10, clock=clock)
+    node = make_slice().get_node("node")
+
+    pool.execute(node, "true")
+    transport.opened[0]["alive"] = False
+    assert pool.execute(node, "true") == ("node: true", "")
+    assert pool.stats.failures == 1 and len(transport.opened) == 2
+
+    transport.opened[1]["alive"] = False
+    clock.now = 11
+    pool.execute(node, "true")
+    assert pool.stats.health_failures == 1 and len(transport.opened) == 3
+
+
+def test_persistent_failure_is_raised_after_one_reconnect():
+    transport = FakeTransport(fail_commands={"boom"})
+    pool = SSHPool(transport=transport)
+
+    with pytest.raises(ConnectionError):
+        pool.execute(make_slice().get_node("node"), "boom")
+    assert len(transport.opened) == 2 and pool.size() == 0
+
+
+def test_idle_sessions_are_evicted():
+    clock = Clock()
+    transport = FakeTransport()
+    pool = SSHPool(transport=transport, idle_timeout=100, clock=clock)
+    busy, idle = make_slice("busy").get_node("node"), make_slice("idle").get_node("node")
+
+    pool.execute(busy, "true")
+    pool.execute(idle, "true")
+    clock.now = 80
+    pool.execute(busy, "true")
+    clock.now = 150
+
+    assert pool.evict_idle() == 1
+    assert pool.size() == 1 and transport.closed[0]["id"] == 1
+    pool.execute(idle, "true")
+    assert pool.stats.opened == 3 and pool.stats.evicted == 1
+
+
+class HungChannel:
+    """
+    Channel of a command that never exits and never prints; selectable through a socket pair.
+    """
+    def __init__(self):
+        self.sock, self.peer = socket.socketpair()
+        self.closed = False
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv_ready(self):
+        return False
+
+    def recv_stderr_ready(self):
+        return False
+
+    def exit_status_ready(self):
+        return False
+
+    def close(self):
+        self.closed = True
+        self.sock.close()
+        self.peer.close()
+
+
+class HungClient:
+    def __init__(self):
+        self.channel = HungChannel()
+
+    def exec_command(self, command, timeout=None):
+        stream = SimpleNamespace(channel=self.channel, close=lambda: None)
+        return stream, stream, stream
+
+
+def test_hung_command_times_out_and_closes_its_channel():
+    client = HungClient()
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        ParamikoTransport().run((None, client), "iperf3 -c 10.0.0.1", timeout=0.3)
+    assert time.monotonic() - start < 2 and client.channel.closed
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import random
+import time
+
+from tests.teardown import DELETED, FAILED, KEPT, SliceTeardown, backoff_delay
+from tests.unit.fakes import FakeFablib
+
+
+def submitted(fablib, count):
+    slices = {}
+    for i in range(count):
+        slice_obj = fablib.new_slice(f"slice{i}")
+        slice_obj.submit()
+        slices[slice_obj.get_name()] = slice_obj
+    return slices
+
+
+class FlakySlice:
+    """Slice whose delete raises ``errors`` in turn before succeeding."""
+    def __init__(self, name, errors):
+        self.name = name
+        self.errors = list(errors)
+        self.deletes = 0
+
+    def get_name(self):
+        return self.name
+
+    def get_slice_id(self):
+        return f"id-{self.name}"
+
+    def delete(self):
+        self.deletes += 1
+        if self.errors:
+            raise self.errors.pop(0)
+
+
+def test_deletes_run_in_parallel_under_the_cap():
+    fablib = FakeFablib(latency={"delete": 0.1})
+    slices = submitted(fablib, 24)
+
+    start = time.monotonic()
+    results = SliceTeardown(max_parallel=8, quiet=True).run(slices)
+    elapsed = time.monotonic() - start
+
+    assert all(r.status == DELETED for r in results.values())
+    assert all(s.get_state() == "Dead" for s in slices.values())
+    assert fablib.probe.peak["delete"] == 8
+    assert elapsed < 24 * 0.1 / 3
+    assert all(r.elapsed >= 0.1 for r in results.values())
+
+
+def test_keep_list_matches_slice_ids_and_names():
+    fablib = FakeFablib()
+    slices = submitted(fablib, 4)
+    keep = [slices["slice0"].get_slice_id(), "slice1"]
+
+    results = SliceTeardown(quiet=True).run(slices, keep=keep)
+
+    assert [r.status for r in results.values()] == [KEPT, KEPT, DELETED, DELETED]
+    assert slices["slice0"].get_state() != "Dead"
+    assert fablib.probe.calls["delete"] == 2
+
+
+def test_transient_failures_are_retried_with_backoff():
+    sleeps = []
+    flaky = FlakySlice("flaky", [Exception("timeout"), Exception("503 busy")])
+    broken = FlakySlice("broken", [Exception("timeout")] * 10)
+    gone = FlakySlice("gone", [Exception("Slice not found")])
+
+    teardown = SliceTeardown(retries=3, base_delay=1.0, max_delay=3.0, sleep=sleeps.append, quiet=True)
+    results = teardown.run([flaky, broken, gone])
+
+    assert (results["flaky"].status, results["flaky"].attempts, results["flaky"].error) == (DELETED, 3, "")
+    assert (results["broken"].status, results["broken"].attempts) == (FAILED, 4)
+    assert results["broken"].error == "timeout" and not results["broken"].ok
+    assert (results["gone"].status, gone.deletes) == (DELETED, 1)
+    assert len(sleeps) == 2 + 3
+    assert all(0.5 <= s <= 3.0 for s in sleeps)
+
+
+def test_backoff_is_jittered_exponential_and_capped():
+    rng = random.Random(7)
+    for attempt, (low, high) in enumerate([(1, 2), (2, 4), (4, 8), (5, 10), (5, 10)], start=1):
+        delays = {backoff_delay(attempt, base_delay=2.0, max_delay=10.0, rng=rng) for _ in range(20)}
+        assert all(low <= d <= high for d in delays)
+        assert len(delays) > 1
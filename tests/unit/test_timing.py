@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import math
+import threading
+
+from tests.lifecycle import SliceLifecycle, STAGES, SUBMIT, WAIT
+from tests.result_sink import ResultSink, read_records
+from tests.timing import PROVISIONING, ProvisioningTimer, percentile, summarize, timings_from_records
+from tests.unit.fakes import FakeFablib
+
+
+def test_percentile_interpolates():
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50.5
+    assert math.isclose(percentile(values, 90), 90.1)
+    assert math.isclose(percentile(values, 99), 99.01)
+    assert percentile([7.0], 99) == 7.0
+    assert math.isnan(percentile([], 50))
+
+
+def test_lifecycle_stages_are_timed_per_site_and_component(tmp_path):
+    fablib = FakeFablib(latency={SUBMIT: 0.01, WAIT: 0.03}, failures={("slice-STAR_GPU", WAIT): Exception("boom")})
+    sink = ResultSink(str(tmp_path / "results.jsonl"))
+    timer = ProvisioningTimer(sink=sink)
+
+    def builder(name):
+        return lambda: fablib.new_slice(name=name)
+
+    lifecycle = SliceLifecycle(lock=threading.Lock(), on_event=timer.observer("GPU", forward=None))
+    lifecycle.run({key: builder(f"slice-{key}") for key in ("TACC_GPU", "STAR_GPU", "UTAH_GPU")})
+
+    by_site = {(t.site, t.stage): t for t in timer.timings}
+    assert len(timer.timings) == 3 * len(STAGES) - 2
+    assert by_site[("TACC", WAIT)].ok and by_site[("TACC", WAIT)].elapsed >= 0.03
+    assert not by_site[("STAR", WAIT)].ok
+    assert all(t.started <= t.finished and t.component == "GPU" for t in timer.timings)
+
+    summary = summarize(timer.timings, by="component")
+    assert summary["GPU"][WAIT]["n"] == 3
+    assert summary["GPU"][WAIT]["p50"] <= summary["GPU"][WAIT]["p90"] <= summary["GPU"][WAIT]["p99"]
+
+    sink.close()
+    records = list(read_records(sink.path, test=PROVISIONING))
+    assert len(records) == len(timer.timings)
+    assert sorted(timings_from_records(records), key=repr) == sorted(timer.timings, key=repr)
+
+    report = timer.report()
+    assert "per site" in report and "per component" in report
+    assert all(site in report for site in ("TACC", "STAR", "UTAH", "GPU"))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.topology import ComponentSpec, NetworkSpec, NodeSpec, TopologyTemplate, compile_template
+from tests.simulator import SimulatedFablib, default_sites
+from tests.unit.fakes import OfflineManager
+
+TEMPLATE = TopologyTemplate(
+    nodes=(NodeSpec(name="node1", host="{host}", cores=4, ram=16, disk=50, fabnet="IPv4",
+                    components=(ComponentSpec(model="NIC_Basic", name="nic1", mode="auto"),
+                                ComponentSpec(model="{gpu_model}", name="gpu1"))),),
+    networks=(NetworkSpec(name="net-{site}", interfaces=("node1.nic1",), type="IPv4"),),
+)
+
+
+def names(slice_obj) -> dict:
+    topology = slice_obj.get_fim_topology()
+    return {
+        "nodes": {name: (node.site, node.get_property("labels").instance_parent,
+                         sorted(node.components)) for name, node in topology.nodes.items()},
+        "networks": sorted(topology.network_services),
+    }
+
+
+def test_instantiated_skeleton_matches_call_chain():
+    manager = OfflineManager()
+    fields = {"site": "TACC", "host": "tacc-w2.fabric-testbed.net", "gpu_model": "GPU_RTX6000"}
+    built = TEMPLATE.build(manager.new_slice("built"), **fields)
+    first = TEMPLATE.instantiate(manager.new_slice("first"), **fields)
+    second = TEMPLATE.instantiate(manager.new_slice("second"), **{**fields, "site": "STAR",
+                                                                   "host": "star-w1.fabric-testbed.net"})
+
+    assert names(first) == names(built)
+    assert names(first)["nodes"]["node1"][:2] == ("TACC", "tacc-w2.fabric-testbed.net")
+    assert {"net-TACC", "FABNET_IPv4_TACC"} <= set(names(first)["networks"])
+    star = names(second)
+    assert star["nodes"]["node1"][:2] == ("STAR", "star-w1.fabric-testbed.net")
+    assert "net-STAR" in star["networks"] and "FABNET_IPv4_STAR" in star["networks"]
+    assert first.get_node("node1").get_interface(network_name="net-TACC").get_mode() == "auto"
+    # Node ids are unique per slice; the skeleton is compiled once per GPU model.
+    ids = {node.node_id for node in first.get_fim_topology().nodes.values()}
+    assert not ids & {node.node_id for node in second.get_fim_topology().nodes.values()}
+    assert compile_template(TEMPLATE, manager, gpu_model="GPU_RTX6000") is \
+        compile_template(TEMPLATE, manager, gpu_model="GPU_RTX6000")
+
+
+def test_slices_without_fim_use_the_call_chain():
+    fablib = SimulatedFablib(sites=default_sites(2))
+    site = fablib.site_names()[0]
+    slice_obj = TEMPLATE.new_slice(fablib, "sim", site=site, host=f"{site.lower()}-w1", gpu_model="GPU_A30")
+    node = slice_obj.get_node("node1")
+    assert node.get_site() == site and node.get_interface(network_name=f"net-{site}") is not None
+
+    try:
+        TEMPLATE.instantiate(fablib.new_slice("sim2"), site=site)
+    except KeyError as e:
+        assert "gpu_model, host" in str(e)
+    else:
+        raise AssertionError("missing fields accepted")
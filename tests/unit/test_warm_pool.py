@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from tests.lifecycle import SliceLifecycle
+from tests.poller import SlicePoller
+from tests.result_sink import ResultSink
+from tests.simulator import SimSiteSpec, SimulatedFablib
+from tests.timing import ATTACH, DETACH, ProvisioningTimer
+from tests.warm_pool import BASE_NODE, WarmPool
+
+SITES = [SimSiteSpec(name="TACC", components={"NIC_Basic": 4, "NVME_P4510": 2}),
+         SimSiteSpec(name="STAR", components={"NIC_Basic": 4}),
+         SimSiteSpec(name="MASS", components={"NIC_Basic": 4, "NVME_P4510": 2})]
+
+
+def fresh_slice(fablib, site):
+    slice_obj = fablib.new_slice(f"fresh-{site.lower()}")
+    slice_obj.add_node(name="nvme-node", site=site).add_component(model="NVME_P4510", name="nvme1")
+    return slice_obj
+
+
+def test_modules_reuse_warm_vms_through_modify(tmp_path):
+    fablib = SimulatedFablib(sites=SITES, seed=3)
+    timer = ProvisioningTimer(sink=ResultSink(str(tmp_path / "results.jsonl")))
+    lifecycle = SliceLifecycle(poller=SlicePoller.for_fablib(fablib), on_event=timer.observer("NVMe", forward=None))
+    pool = WarmPool(fablib, poller=lifecycle.poller, timer=timer)
+    sites = [site.name for site in SITES]
+
+    # A Shared NIC module needs nothing beyond the base VM.
+    outcomes = pool.provision(lifecycle, {site: (site, {}) for site in sites}, fallback=None)
+    assert all(outcome.ok for outcome in outcomes.values()) and fablib.calls["submit"] == 3
+    assert (pool.provisioned, pool.reused) == (3, 0)
+    assert pool.release({site: o.slice for site, o in outcomes.items()}) == {}
+
+    # An NVMe module reuses the VMs; STAR has no NVMe and falls back to a fresh slice.
+    outcomes = pool.provision(lifecycle, {site: (site, {"nvme1": "NVME_P4510"}) for site in sites},
+                              fallback=lambda site: fresh_slice(fablib, site))
+    assert fablib.calls["submit"] == 4 and fablib.calls["modify"] == 3
+    assert pool.reused == 2
+    # The modifies are timed as attaches, not as the module's provisioning stages.
+    assert sorted((t.key, t.stage, t.component) for t in timer.timings if t.key != "STAR") == [
+        ("MASS", ATTACH, "NVME_P4510"), ("TACC", ATTACH, "NVME_P4510")]
+    assert pool.node_name("TACC", "nvme-node") == BASE_NODE and pool.node_name("STAR", "nvme-node") == "nvme-node"
+    assert outcomes["TACC"].ok and outcomes["MASS"].ok and not outcomes["STAR"].ok
+    stdout, _ = outcomes["TACC"].slice.get_node(BASE_NODE).execute("lspci", quiet=True)
+    assert "Non-Volatile memory controller" in stdout
+    assert sorted(pool.slices) == ["MASS", "TACC"]
+
+    # MASS failed validation and leaves the pool; TACC stays warm with its NVMe until the
+    # next module, whose modify detaches it.
+    remaining = pool.release({"TACC": outcomes["TACC"].slice})
+    assert remaining == {} and sorted(pool.slices) == ["TACC"]
+    node = pool.slices["TACC"].get_node(BASE_NODE)
+    assert [c.get_name() for c in node.get_components()] == ["sharednic1", "nvme1"]
+    outcomes_next = pool.provision(lifecycle, {"TACC": ("TACC", {})}, fallback=None)
+    assert outcomes_next["TACC"].ok and fablib.calls["modify"] == 4 and fablib.calls["submit"] == 4
+    assert [c.get_name() for c in node.get_components()] == ["sharednic1"]
+    assert timer.timings[-1].stage == DETACH and timer.timings[-1].key == "TACC"
+    pool.release({"TACC": outcomes_next["TACC"].slice})
+
+    pool.close(quiet=True)
+    assert sorted(s.get_name() for s in fablib.get_slices()) == sorted(
+        [outcomes["MASS"].slice.get_name(), outcomes["STAR"].slice.get_name()])
+
+
+def test_failed_base_vm_is_kept_and_fails_its_members():
+    fablib = SimulatedFablib(sites=SITES, site_failures={"STAR": {"provision": 1.0}}, seed=3)
+    lifecycle = SliceLifecycle(poller=SlicePoller.for_fablib(fablib), on_event=None)
+    pool = WarmPool(fablib, poller=lifecycle.poller, timer=None)
+
+    outcomes = pool.provision(lifecycle, {site.name: (site.name, {}) for site in SITES}, fallback=None)
+    assert outcomes["TACC"].ok and outcomes["MASS"].ok
+    assert "Simulated provision failure at STAR" in outcomes["STAR"].error
+    assert outcomes["STAR"].slice is pool.failed["STAR"].slice
+    assert pool.release({site: o.slice for site, o in outcomes.items() if o.ok}) == {}
+
+    # The site is not retried by later modules, which see the same failure.
+    outcomes = pool.provision(lifecycle, {"STAR": ("STAR", {})}, fallback=None)
+    assert not outcomes["STAR"].ok and fablib.calls["submit"] == 3
+
+    # Closing deletes the warm VMs and keeps the failed one for inspection.
+    pool.close(quiet=True)
+    assert [s.get_name() for s in fablib.get_slices()] == [pool.failed["STAR"].slice.get_name()]
@@ -1,10 +1,11 @@
-import json
-import random
 import traceback
-from itertools import combinations
 
 from fabrictestbed_extensions.fablib.slice import Slice
 
+from tests.lifecycle import SliceLifecycle, SliceOutcome, print_event
+from tests.pairing import plan_pairs, recent_failures
+from tests.result_sink import StreamingResults
+
 
 def error_message(slice_obj: Slice, exception: Exception = None):
     if exception and "Slice Exception" not in str(exception):
@@ -28,32 +29,45 @@ def error_message(slice_obj: Slice, exception: Exception = None):
             return "Fail"
 
 
+def failure_result(slice_obj: Slice, exception: Exception = None):
+    result = {"state": False,
+              "error": error_message(slice_obj=slice_obj, exception=exception)}
+    if slice_obj is not None:
+        result["slice_id"] = f"{slice_obj.get_name()}/{slice_obj.get_slice_id()}"
+    return result
+
+
 def save_results_json(results, filename="iperf_test_results.json"):
-    with open(filename, "w") as f:
-        json.dump(results, f, indent=2)
+    """
+    Write the summary file for ``results`` from the result sink.
+
+    :class:`StreamingResults` have streamed each entry as it was set; a plain
+    dictionary is streamed now.
+    """
+    if not isinstance(results, StreamingResults):
+        streamed = StreamingResults(filename)
+        for key, value in results.items():
+            streamed[key] = value
+        results = streamed
+    return results.save(filename)
 
 
-def make_site_pairs(sites: list[str]):
+def make_site_pairs(sites: list[str], test: str = None, day=None):
     """
-    Randomly select unique (site1, site2, worker1, worker2) pairs.
+    Select today's unique (site1, site2) pairs from the rotating pairing plan.
 
     Constraints:
     - site1 != site2
     - No duplicate pairs (e.g., both (a, b) and (b, a))
-    - Each site must have at least one worker
-    - Number of pairs is len(sites) // 2
-    """
-    # Generate all valid (site1, site2) combinations
-    valid_pairs = [
-        (site1, site2)
-        for site1, site2 in combinations(sites, 2)
-    ]
-
-    count = len(sites) // 2
-    if count > len(valid_pairs):
-        raise ValueError(f"Cannot select {count} unique pairs from only {len(valid_pairs)} valid combinations.")
+    - len(sites) // 2 rotation pairs, covering every pair within ``coverage_days`` runs,
+      plus re-tests of pairs of ``test`` that failed recently
 
-    return random.sample(valid_pairs, count)
+    :param sites: Candidate sites.
+    :param test: Results history test whose recent failures are re-tested, e.g. ``fabnetv4_shared_ping``.
+    :param day: Run date the plan is derived from; defaults to today.
+    """
+    failures = recent_failures(test) if test else None
+    return plan_pairs(sites, day=day, failures=failures, salt=test or "")
 
 
 def wait_and_configure_slice(slice_object: Slice):
@@ -68,7 +82,17 @@ def wait_and_configure_slice(slice_object: Slice):
         traceback.print_exc()
 
 
-def wait_and_configure_slices(slices):
-    for key, slice_obj in slices.items():
-        print(f"Waiting on slice {key}")
-        wait_and_configure_slice(slice_object=slice_obj)
+def wait_and_configure_slices(slices, max_workers: int = 16, timeout: float = None,
+                              on_event=print_event, poller=None) -> dict[str, SliceOutcome]:
+    """
+    Wait for and configure submitted slices concurrently.
+
+    :param slices: Mapping of key to submitted slice object.
+    :param max_workers: Number of slices waited on/configured at the same time.
+    :param timeout: Per-slice budget in seconds for wait and wait_ssh; None keeps fablib defaults.
+    :param on_event: Progress callback receiving a LifecycleEvent per stage transition.
+    :param poller: Shared SlicePoller batching the state queries of all slices.
+    :return: Mapping of key to SliceOutcome, carrying the final slice state and any error.
+    """
+    lifecycle = SliceLifecycle(max_workers=max_workers, timeout=timeout, on_event=on_event, poller=poller)
+    return lifecycle.configure_slices({key: slice_obj for key, slice_obj in slices.items() if slice_obj})
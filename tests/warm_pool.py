@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+#
+# MIT License
+#
+# Copyright (c) 2023 FABRIC Testbed
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+"""
+Warm pool of base VMs shared by the acceptance modules of one pytest session.
+
+Most per-site modules only need "a VM at site X" plus one component. With
+``FABRIC_WARM_POOL=1`` the session-scoped ``warm_pool`` fixture provisions one base VM
+(with a Shared NIC) per site the first time a module asks for that site, and every
+later module gets the same VM with its components attached through slice modify.
+When the module is done the VM goes back to the pool as is: the next module's modify
+detaches the components it does not need in the same step as attaching its own, so a
+module costs at most one modify per site. Everything left in the pool is deleted at the
+end of the session.
+
+A site whose attach modify fails (e.g. the VM's host has no free component of that
+model) falls back to the module's own fresh slice. VMs whose validation failed leave
+the pool and are kept for inspection like any other failed slice. So are base VMs
+that failed to provision: the site is not retried for the rest of the session and its
+members fail with that error.
+"""
+import os
+import threading
+import time
+from functools import partial
+from typing import Any, Callable, Hashable
+
+from tests.lifecycle import SUBMIT, SliceLifecycle, SliceOutcome
+from tests.teardown import delete_slices
+from tests.timing import ATTACH, DETACH, ProvisioningTimer, StageTiming, provisioning_timer
+from tests.topology import ComponentSpec, NodeSpec, TopologyTemplate
+
+WARM_POOL = os.getenv("FABRIC_WARM_POOL", "0").lower() in ("1", "true", "yes")
+
+BASE_NODE = "warm-node"
+BASE_NIC = "sharednic1"
+BASE_TOPOLOGY = TopologyTemplate(nodes=(
+    NodeSpec(name=BASE_NODE, cores=10, ram=20, disk=50,
+             components=(ComponentSpec(model="NIC_Basic", name=BASE_NIC),)),
+))
+MAX_PARALLEL_SITES = 5
+
+
+class WarmPool:
+    """
+    Base VMs per site, provisioned once and handed to modules one at a time.
+
+    :param fablib: Fablib manager (or simulated testbed) creating the base slices.
+    :param lock: Lock serializing topology builds, typically ``tests.base_test.fim_lock``.
+    :type lock: threading.Lock
+    :param poller: Shared state poller used while waiting for provisioning and modify.
+    :type poller: SlicePoller
+    :param on_event: Lifecycle progress callback for the base VM provisioning.
+    :type on_event: Callable
+    :param slice_prefix: Name prefix of the base slices.
+    :type slice_prefix: str
+    :param timer: Receives one ``attach`` (or ``detach``) timing per site modified for a module.
+    :type timer: ProvisioningTimer
+    """
+    def __init__(self, fablib, lock=None, poller=None, on_event=None, slice_prefix: str = "test-warm-pool",
+                 timer: ProvisioningTimer = provisioning_timer):
+        self.fablib = fablib
+        self.slice_prefix = slice_prefix
+        self.timer = timer
+        self.lifecycle = SliceLifecycle(lock=lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES}, poller=poller,
+                                        on_event=on_event)
+        # Modifies are timed as a whole by the pool, not per stage under the module's label.
+        self.modify_lifecycle = SliceLifecycle(lock=lock, stage_limits={SUBMIT: MAX_PARALLEL_SITES}, poller=poller,
+                                               on_event=None)
+        self.slices = {}
+        self.failed = {}
+        self.leases = {}
+        self.attached = {}
+        self.provisioned = 0
+        self.reused = 0
+        self._lock = threading.Lock()
+
+    def node_name(self, key: Hashable, default: str) -> str:
+        """
+        Name of the node to validate for ``key``: the base node if it leased a warm VM.
+        """
+        return BASE_NODE if key in self.leases else default
+
+    def _build(self, site: str):
+        slice_name = f"{self.slice_prefix}-{site.lower()}-{int(time.time())}"
+        print(f"[{site}] Creating warm pool slice: {slice_name}")
+        return BASE_TOPOLOGY.new_slice(self.fablib, slice_name, site=site)
+
+    def warm(self, sites: list[str]) -> dict[str, SliceOutcome]:
+        """
+        Provision base VMs at the ``sites`` not yet in the pool, concurrently.
+
+        Failed base VMs are kept for inspection and recorded in ``failed``; those sites
+        are not retried.
+
+        :return: Mapping of site to provisioning outcome, for the newly provisioned sites.
+        :rtype: dict[str, SliceOutcome]
+        """
+        with self._lock:
+            missing = [site for site in dict.fromkeys(sites) if site not in self.slices and site not in self.failed]
+        outcomes = self.lifecycle.run({site: partial(self._build, site) for site in missing})
+        with self._lock:
+            for site, outcome in outcomes.items():
+                if outcome.ok:
+                    self.slices[site] = outcome.slice
+                    self.attached[site] = {}
+                    self.provisioned += 1
+                else:
+                    self.failed[site] = outcome
+                    print(f"[{site}] Warm VM provisioning failed: {outcome.error}")
+                    if outcome.submitted:
+                        print(f"[{site}] Keeping slice {outcome.slice.get_name()} for inspection.")
+        return outcomes
+
+    def provision(self, lifecycle: SliceLifecycle, members: dict[Hashable, tuple[str, dict]],
+                  fallback: Callable[[Hashable], Any]) -> dict[Hashable, SliceOutcome]:
+        """
+        Lease warm VMs to ``members`` with their components attached through slice modify.
+
+        Members at the same site share that site's VM and its single modify, which also
+        detaches the components left by the previous module; a VM that already carries
+        exactly the requested components is not modified at all. Members without a warm
+        VM, or whose modify failed, get ``fallback(key)`` built and provisioned as a fresh
+        slice by ``lifecycle``; members at a site whose base VM failed get its outcome.
+
+        :param lifecycle: The module's lifecycle, driving the fallbacks.
+        :type lifecycle: SliceLifecycle
+        :param members: Mapping of key to (site, {component name: model}).
+        :type members: dict
+        :param fallback: Builds the module's own slice for a key.
+        :type fallback: Callable
+        :return: Mapping of key to outcome, like ``SliceLifecycle.run``.
+        :rtype: dict[Hashable, SliceOutcome]
+        """
+        # Only VMs that were warm before this call count as reused.
+        warm_before = set(self.slices)
+        self.warm([site for site, _ in members.values()])
+        by_site = {}
+        for key, (site, components) in members.items():
+            if site in self.slices:
+                by_site.setdefault(site, {}).update(components)
+        attached = self.modify_lifecycle.run({site: partial(self._modify, site, components)
+                                              for site, components in by_site.items()
+                                              if components != self.attached[site]})
+        for site, outcome in attached.items():
+            self._record(site, outcome, by_site[site])
+        for site in by_site.keys() - attached.keys():
+            slice_obj = self.slices[site]
+            attached[site] = SliceOutcome(key=site, slice=slice_obj, state=slice_obj.get_state(), submitted=True)
+        outcomes, fresh = {}, {}
+        for key, (site, _) in members.items():
+            outcome = attached.get(site)
+            failed = self.failed.get(site)
+            if failed is not None:
+                outcomes[key] = SliceOutcome(key=key, slice=failed.slice, stage=failed.stage, state=failed.state,
+                                             submitted=failed.submitted, exception=failed.exception,
+                                             elapsed=dict(failed.elapsed))
+            elif outcome is not None and outcome.ok:
+                outcomes[key] = SliceOutcome(key=key, slice=outcome.slice, stage=outcome.stage, state=outcome.state,
+                                             submitted=True, elapsed=dict(outcome.elapsed))
+                self.leases[key] = site
+            else:
+                fresh[key] = partial(fallback, key)
+        for site, outcome in attached.items():
+            if outcome.ok:
+                self.attached[site] = by_site[site]
+                if site in warm_before:
+                    self.reused += 1
+            else:
+                print(f"[{site}] Attach through modify failed, provisioning fresh slices: {outcome.error}")
+                self._discard(site)
+        outcomes.update(lifecycle.run(fresh))
+        return outcomes
+
+    def _record(self, site: str, outcome: SliceOutcome, components: dict):
+        if self.timer is None:
+            return
+        stage, models = ATTACH, components.values()
+        if not components:
+            stage, models = DETACH, self.attached[site].values()
+        self.timer.add(StageTiming(key=site, site=site, component="+".join(sorted(set(models))), stage=stage,
+                                   ok=outcome.ok, started=outcome.started,
+                                   finished=outcome.started + sum(outcome.elapsed.values())))
+
+    def _modify(self, site: str, components: dict):
+        slice_obj = self.slices[site]
+        node = slice_obj.get_node(BASE_NODE)
+        current = self.attached[site]
+        for name, model in current.items():
+            if components.get(name) != model:
+                node.get_component(name=name).delete()
+        for name, model in components.items():
+            if current.get(name) != model:
+                node.add_component(model=model, name=name)
+        return slice_obj
+
+    def _discard(self, site: str):
+        """
+        Take a site's VM out of the pool, deleting it; it only failed on pool-specific steps.
+        """
+        slice_obj = self.slices.pop(site, None)
+        self.attached.pop(site, None)
+        if slice_obj is not None:
+            delete_slices({site: slice_obj}, quiet=True)
+
+    def retire(self, site: str):
+        """
+        Take a site's VM out of the pool without deleting it, for inspection.
+        """
+        print(f"[{site}] Taking the warm VM out of the pool; keeping it for inspection.")
+        self.slices.pop(site, None)
+        self.attached.pop(site, None)
+
+    def release(self, passed: dict[Hashable, Any]) -> dict[Hashable, Any]:
+        """
+        Return the leased VMs to the pool once the module is done with them.
+
+        VMs whose members all passed stay warm with their components attached until the
+        next module's modify; a VM with a failed member leaves the pool and is kept for
+        inspection.
+
+        :param passed: Mapping of key to slice for the members that passed.
+        :type passed: dict
+        :return: The passed slices not owned by the pool, for the module to delete.
+        :rtype: dict
+        """
+        leases, self.leases = self.leases, {}
+        failed_sites = {site for key, site in leases.items() if key not in passed}
+        for site in failed_sites:
+            self.retire(site)
+        return {key: slice_obj for key, slice_obj in passed.items() if key not in leases}
+
+    def close(self, quiet: bool = False):
+        """
+        Delete every VM still in the pool.
+        """
+        slices, self.slices = self.slices, {}
+        if not quiet:
+            print(f"Warm pool: {self.provisioned} base VMs provisioned, reused {self.reused} times")
+            for site, outcome in self.failed.items():
+                kept = f"{outcome.slice.get_name()} kept for inspection" if outcome.submitted else "not submitted"
+                print(f" - {site}: base VM failed ({kept}): {outcome.error}")
+        delete_slices(slices, quiet=quiet)